@@ -1,31 +1,38 @@
-import sqlite3
+"""
+Actualiza precios (y demás datos) del catálogo desde una lista XLSX o CSV
 
-DB = "data/vivero.db"
+Uso:
+    python actualizar_precios_productos.py lista_proveedor.xlsx            # solo vista previa
+    python actualizar_precios_productos.py lista_proveedor.xlsx --aplicar  # aplica los cambios
+"""
+import sys
+from modules import catalogo
+from modules.utils import format_guarani
+
+
+def actualizar_precios(ruta: str, aplicar: bool = False):
+    resumen = catalogo.previsualizar(ruta)
+
+    print(f"📄 {resumen['archivo']}: {resumen['filas']} filas")
+    print(f"   ➕ Nuevos: {resumen['nuevos']}")
+    print(f"   ✏️ Actualizados: {resumen['actualizados']} ({resumen['total_cambios_precio']} cambios de precio)")
+    print(f"   ➖ Sin cambios: {resumen['sin_cambios']}")
+    if resumen["ignoradas"]:
+        print(f"   ⚠️ Columnas ignoradas: {', '.join(resumen['ignoradas'])}")
+    for cambio in resumen["cambios_precio"]:
+        print(f"   💲 {cambio['nombre']}: {format_guarani(cambio['antes'])} -> {format_guarani(cambio['despues'])}")
+    for linea, motivo in resumen["errores"]:
+        print(f"   ❌ Línea {linea}: {motivo}")
+
+    if aplicar:
+        catalogo.importar(ruta)
+        print("🎉 Precios actualizados")
+    else:
+        print("ℹ️ Vista previa: use --aplicar para guardar los cambios")
 
-def actualizar_precios():
-    conn = sqlite3.connect(DB)
-    cur = conn.cursor()
-    
-    # Productos con precios específicos
-    precios_productos = {
-        "Lapacho amarillo": 45000,
-        "Mango": 35000,
-        "Orquídea": 55000,
-        "Eucalipto": 25000,
-        "Cedrón Paraguay": 18000,
-    }
-    
-    for nombre, precio in precios_productos.items():
-        cur.execute("""
-            UPDATE productos 
-            SET precio = ?, stock = CASE WHEN stock = 0 THEN 15 ELSE stock END
-            WHERE nombre LIKE ?
-        """, (precio, f'%{nombre}%'))
-        print(f"✅ {nombre}: {precio:,} ₲")
-    
-    conn.commit()
-    conn.close()
-    print("🎉 Precios actualizados")
 
 if __name__ == "__main__":
-    actualizar_precios()
\ No newline at end of file
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    actualizar_precios(sys.argv[1], "--aplicar" in sys.argv[2:])
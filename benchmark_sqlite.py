@@ -0,0 +1,139 @@
+"""
+Benchmark del camino de escritura del POS sobre SQLite
+Compara el manejo anterior (una conexión nueva por operación, modo journal
+por defecto) contra las conexiones persistentes por hilo de DatabaseService
+con WAL y synchronous=NORMAL.
+
+Uso:
+    python benchmark_sqlite.py [ventas] [hilos]
+"""
+import os
+import sys
+import time
+import shutil
+import sqlite3
+import tempfile
+import threading
+
+TMP_DIR = tempfile.mkdtemp(prefix="bench_vivero_")
+os.environ["DATABASE_URL"] = f"sqlite:///{TMP_DIR}/after.db"
+
+from modules.db_service import db  # noqa: E402  (requiere DATABASE_URL definido)
+
+VENTAS = int(sys.argv[1]) if len(sys.argv) > 1 else 500
+HILOS = int(sys.argv[2]) if len(sys.argv) > 2 else 4
+ITEMS_POR_VENTA = 3
+PRODUCTOS = 200
+
+ESQUEMA = [
+    "CREATE TABLE productos (id INTEGER PRIMARY KEY, nombre TEXT, precio INTEGER, stock INTEGER)",
+    """CREATE TABLE ventas (id INTEGER PRIMARY KEY AUTOINCREMENT, usuario_id INTEGER,
+       fecha_venta TIMESTAMP DEFAULT CURRENT_TIMESTAMP, total INTEGER)""",
+    """CREATE TABLE detalle_ventas (id INTEGER PRIMARY KEY AUTOINCREMENT, venta_id INTEGER,
+       producto_id INTEGER, cantidad INTEGER, precio_unitario INTEGER, subtotal INTEGER)""",
+]
+
+
+def preparar(conn):
+    """Crea el esquema mínimo y carga productos"""
+    for sql in ESQUEMA:
+        conn.execute(sql)
+    conn.executemany(
+        "INSERT INTO productos (id, nombre, precio, stock) VALUES (?, ?, ?, ?)",
+        [(i, f"Planta {i}", 10000 + i, 1000000) for i in range(1, PRODUCTOS + 1)]
+    )
+    conn.commit()
+
+
+def registrar_venta(conn, n: int):
+    """Replica ventas.guardar_venta: consulta precios, cabecera, detalle y stock"""
+    cur = conn.cursor()
+    items = [((n * 7 + k) % PRODUCTOS + 1, 1 + k) for k in range(ITEMS_POR_VENTA)]
+    precios = {}
+    for producto_id, _ in items:
+        cur.execute("SELECT precio FROM productos WHERE id = ?", (producto_id,))
+        precios[producto_id] = cur.fetchone()[0]
+
+    total = sum(precios[p] * c for p, c in items)
+    cur.execute("INSERT INTO ventas (usuario_id, total) VALUES (?, ?) RETURNING id", (1, total))
+    venta_id = cur.fetchone()[0]
+    for producto_id, cantidad in items:
+        cur.execute(
+            "INSERT INTO detalle_ventas (venta_id, producto_id, cantidad, precio_unitario, subtotal) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (venta_id, producto_id, cantidad, precios[producto_id], precios[producto_id] * cantidad)
+        )
+        cur.execute("UPDATE productos SET stock = stock - ? WHERE id = ?", (cantidad, producto_id))
+    conn.commit()
+    cur.close()
+
+
+def venta_antes(path: str, n: int):
+    """Manejo anterior: makedirs + connect + close en cada operación"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30)
+    conn.row_factory = sqlite3.Row
+    try:
+        registrar_venta(conn, n)
+    finally:
+        conn.close()
+
+
+def venta_despues(n: int):
+    """Manejo nuevo: conexión persistente del hilo"""
+    with db.get_connection() as conn:
+        registrar_venta(conn, n)
+
+
+def medir(nombre: str, funcion, hilos: int) -> float:
+    """Ejecuta VENTAS ventas repartidas en 'hilos' hilos y retorna ventas/s"""
+    por_hilo = VENTAS // hilos
+    errores = []
+
+    def trabajador(base: int):
+        for i in range(por_hilo):
+            try:
+                funcion(base + i)
+            except Exception as e:
+                errores.append(e)
+
+    inicio = time.perf_counter()
+    workers = [threading.Thread(target=trabajador, args=(h * por_hilo,)) for h in range(hilos)]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    duracion = time.perf_counter() - inicio
+
+    throughput = (por_hilo * hilos - len(errores)) / duracion
+    extra = f"  ({len(errores)} errores: {errores[0]})" if errores else ""
+    print(f"  {nombre:<32} {throughput:>9.1f} ventas/s  {duracion:>7.2f}s{extra}")
+    return throughput
+
+
+def main():
+    print(f"🧪 Benchmark POS SQLite: {VENTAS} ventas x {ITEMS_POR_VENTA} ítems en {TMP_DIR}")
+
+    path_antes = os.path.join(TMP_DIR, "before.db")
+    conn = sqlite3.connect(path_antes)
+    preparar(conn)
+    conn.close()
+
+    with db.get_connection() as conn:
+        preparar(conn)
+
+    resultados = {}
+    for hilos in (1, HILOS):
+        print(f"\n📊 {hilos} hilo(s)")
+        antes = medir("Antes (conexión por llamada)", lambda n: venta_antes(path_antes, n), hilos)
+        despues = medir("Después (persistente + WAL)", venta_despues, hilos)
+        resultados[hilos] = despues / antes if antes else 0.0
+        print(f"  Mejora: {resultados[hilos]:.1f}x")
+
+    db.close()
+    shutil.rmtree(TMP_DIR, ignore_errors=True)
+    return resultados
+
+
+if __name__ == "__main__":
+    main()
@@ -113,18 +113,13 @@ def crear_usuarios_prueba():
             cur.execute("DELETE FROM permisos_usuario WHERE usuario_id = ?", (usuario_id,))
             
             # Insertar nuevos permisos
-            for modulo, permisos in usuario_data['permisos'].items():
-                cur.execute("""
-                    INSERT INTO permisos_usuario (usuario_id, modulo, puede_ver, puede_crear, puede_editar, puede_eliminar)
-                    VALUES (?, ?, ?, ?, ?, ?)
-                """, (
-                    usuario_id,
-                    modulo,
-                    permisos['ver'],
-                    permisos['crear'],
-                    permisos['editar'],
-                    permisos['eliminar']
-                ))
+            cur.executemany("""
+                INSERT INTO permisos_usuario (usuario_id, modulo, puede_ver, puede_crear, puede_editar, puede_eliminar)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, [
+                (usuario_id, modulo, permisos['ver'], permisos['crear'], permisos['editar'], permisos['eliminar'])
+                for modulo, permisos in usuario_data['permisos'].items()
+            ])
             
             print(f"   🔐 Permisos configurados: {len(usuario_data['permisos'])} módulos")
     
@@ -0,0 +1,19 @@
+"""
+Geocodifica en bloque las direcciones de clientes y pedidos (sin conexión)
+
+Guarda en la tabla geocodificaciones las coordenadas de cada dirección que
+todavía no estaba, usando el nomenclador de ciudades del Paraguay.
+
+Uso:
+    python geocodificar_direcciones.py
+"""
+from modules import geocodificacion_service as geo
+
+
+if __name__ == "__main__":
+    resumen = geo.geocodificar_existentes()
+    print(f"📍 Direcciones distintas: {resumen['direcciones']}")
+    print(f"   ➕ Nuevas: {resumen['nuevas']}")
+    print(f"   ✔️ Ya guardadas: {resumen['existentes']}")
+    if resumen["sin_ubicacion"]:
+        print(f"   ⚠️ Sin ubicar: {resumen['sin_ubicacion']} (corregir con fijar_ubicacion)")
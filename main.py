@@ -5,29 +5,46 @@ import flet as ft
 from dotenv import load_dotenv
 load_dotenv()
 
-# Configuración de base de datos
-DB_URL = os.environ.get("DATABASE_URL")
-if not DB_URL:
-    print("⚠️ No se encontró DATABASE_URL, usando SQLite local para desarrollo.")
-    DB_URL = "sqlite:///data/vivero.db"
-    os.makedirs("data", exist_ok=True)
-
-print(f"🔗 Conectando a la base: {DB_URL}")
-
-# Aplicar migraciones de base de datos
-try:
-    from modules.migrations_new import ensure_schema
-    # force_recreate=False para producción (no elimina datos)
-    # force_recreate=True solo para desarrollo (elimina y recrea todo)
-    is_development = DB_URL.startswith("sqlite")
-    ensure_schema(force_recreate=False)  # Cambiar a True solo para desarrollo
-except Exception as e:
-    print(f"🚨 Error al ejecutar migraciones: {e}")
-    import traceback
-    traceback.print_exc()
-
-# Importar módulo de autenticación
-from modules import auth_service
+
+def iniciar():
+    """
+    Prepara la base y los hilos de fondo antes de servir la aplicación
+
+    Se llama solo al ejecutar main.py: los procesos que dibujan tickets
+    (despacho_service, contexto 'spawn') importan este módulo como
+    __mp_main__ y no deben migrar la base, abrir el pool de conexiones
+    (modules.db_service se conecta al importarse) ni arrancar hilos.
+    """
+    # Configuración de base de datos
+    db_url = os.environ.get("DATABASE_URL")
+    if not db_url:
+        print("⚠️ No se encontró DATABASE_URL, usando SQLite local para desarrollo.")
+        db_url = "sqlite:///data/vivero.db"
+        os.makedirs("data", exist_ok=True)
+
+    print(f"🔗 Conectando a la base: {db_url}")
+
+    # Aplicar migraciones de base de datos
+    try:
+        from modules.migrations_new import ensure_schema
+        # force_recreate=False para producción (no elimina datos)
+        # force_recreate=True solo para desarrollo (elimina y recrea todo)
+        ensure_schema(force_recreate=False)  # Cambiar a True solo para desarrollo
+    except Exception as e:
+        print(f"🚨 Error al ejecutar migraciones: {e}")
+        import traceback
+        traceback.print_exc()
+
+    # Volcado periódico de métricas de consultas (DB_METRICS_DUMP_SECONDS > 0)
+    from modules.config import DB_METRICS_DUMP_SECONDS
+    from modules.query_metrics import metrics
+    metrics.start_periodic_dump(DB_METRICS_DUMP_SECONDS)
+
+    # Cortes periódicos del kardex de stock (INVENTARIO_SNAPSHOT_HORAS > 0)
+    from modules.config import INVENTARIO_SNAPSHOT_HORAS
+    from modules import inventario_service
+    inventario_service.iniciar_cortes_periodicos(INVENTARIO_SNAPSHOT_HORAS)
+
 
 def main(page: ft.Page):
     """Función principal de la aplicación"""
@@ -42,9 +59,11 @@ def main(page: ft.Page):
     page.add(main_content)
 
     # Mostrar vista de login
+    from modules import auth_service
     auth_service.login_view(main_content, page=page)
 
 if __name__ == "__main__":
     print("🌱 Iniciando Vivero Rocío v2.0 (Sistema Optimizado)...")
+    iniciar()
     port = int(os.environ.get("PORT", "8550"))
     ft.app(target=main, view=ft.AppView.WEB_BROWSER, host="0.0.0.0", port=port)
@@ -0,0 +1,489 @@
+"""
+Servicio de base de datos asíncrono
+Misma API que DatabaseService (execute_query / execute_command / transaction)
+para handlers async de Flet, sin bloquear un hilo por consulta.
+
+Backends (según lo instalado):
+- PostgreSQL: asyncpg (pool propio por event loop)
+- SQLite: aiosqlite (una conexión persistente por event loop)
+- Sin driver async: se delega al servicio sincrónico en hilos (asyncio.to_thread)
+
+Las lecturas con read_only=True van a la réplica de `db` cuando está
+disponible (mismo criterio de atraso que db.get_connection).
+
+Nota asyncpg: los parámetros deben tener el tipo Python de la columna
+(int para ids, datetime para timestamps); psycopg2 aceptaba strings.
+"""
+import re
+import time
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Optional, Any, Tuple, List
+from modules.config import DB_POOL_MIN, DB_POOL_MAX, DB_TIMEOUT, SQLITE_PRAGMAS
+from modules.db_service import db
+from modules.query_metrics import metrics, modulo_llamador
+from modules.sql_dialect import (
+    translate_to_sqlite, translate_to_asyncpg, tablas_modificadas, tablas_leidas
+)
+
+# --- Importaciones opcionales ---
+try:
+    import asyncpg
+except ImportError:
+    asyncpg = None
+
+try:
+    import aiosqlite
+except ImportError:
+    aiosqlite = None
+
+
+_RE_FILAS_AFECTADAS = re.compile(r"(\d+)\s*$")
+
+
+class _ConexionAsync:
+    """
+    Conexión asíncrona con la API de DatabaseService
+    Registra métricas y anota tablas escritas para invalidar la caché al confirmar
+    """
+
+    def __init__(self):
+        self._sucias = set()
+
+    def _registrar(self, query: str, inicio: Optional[float], params: Any = None, resultado: Any = None):
+        if inicio is not None:
+            ms = (time.perf_counter() - inicio) * 1000
+            huella = metrics.record(query, ms, modulo_llamador(), params)
+            if isinstance(resultado, list):
+                metrics.add_rows(huella, len(resultado))
+            elif resultado is not None:
+                metrics.add_rows(huella, 1)
+        tablas = tablas_modificadas(query)
+        if tablas:
+            self._sucias.update(tablas)
+
+    def _invalidar(self):
+        if self._sucias and db.cache.enabled:
+            db.cache.invalidate(self._sucias)
+        self._sucias.clear()
+
+    async def begin(self):
+        raise NotImplementedError
+
+    async def commit(self):
+        raise NotImplementedError
+
+    async def rollback(self):
+        raise NotImplementedError
+
+    async def execute_query(self, query: str, params: Optional[Tuple] = None, fetch: str = "all") -> Any:
+        raise NotImplementedError
+
+    async def execute_command(self, query: str, params: Optional[Tuple] = None) -> Optional[int]:
+        raise NotImplementedError
+
+
+class _ConexionAsyncpg(_ConexionAsync):
+    """Adaptador sobre una conexión asyncpg"""
+
+    def __init__(self, conn):
+        super().__init__()
+        self._conn = conn
+        self._tx = None
+
+    @staticmethod
+    def _preparar(query: str, params) -> Tuple[str, list]:
+        sql, nombres = translate_to_asyncpg(query)
+        if nombres:
+            return sql, [params[n] for n in nombres]
+        return sql, list(params or ())
+
+    async def begin(self):
+        self._tx = self._conn.transaction()
+        await self._tx.start()
+
+    async def commit(self):
+        if self._tx is not None:
+            await self._tx.commit()
+            self._tx = None
+        self._invalidar()
+
+    async def rollback(self):
+        if self._tx is not None:
+            await self._tx.rollback()
+            self._tx = None
+        self._sucias.clear()
+
+    async def execute_query(self, query, params=None, fetch="all"):
+        sql, args = self._preparar(query, params)
+        inicio = time.perf_counter() if metrics.enabled else None
+        resultado = None
+        try:
+            if fetch == "one":
+                resultado = await self._conn.fetchrow(sql, *args)
+            elif fetch == "all":
+                resultado = await self._conn.fetch(sql, *args)
+            else:
+                await self._conn.execute(sql, *args)
+            return resultado
+        finally:
+            self._registrar(query, inicio, params, resultado)
+
+    async def execute_command(self, query, params=None):
+        sql, args = self._preparar(query, params)
+        comando = query.strip().upper()
+        inicio = time.perf_counter() if metrics.enabled else None
+        try:
+            if comando.startswith("INSERT") and "RETURNING" in comando:
+                return await self._conn.fetchval(sql, *args)
+
+            estado = await self._conn.execute(sql, *args)
+            if comando.startswith("INSERT"):
+                try:
+                    return await self._conn.fetchval("SELECT lastval()")
+                except Exception:
+                    pass
+            coincidencia = _RE_FILAS_AFECTADAS.search(estado or "")
+            return int(coincidencia.group(1)) if coincidencia else 0
+        finally:
+            self._registrar(query, inicio, params)
+
+
+class _ConexionAiosqlite(_ConexionAsync):
+    """Adaptador sobre la conexión aiosqlite compartida (serializada por un lock)"""
+
+    def __init__(self, conn):
+        super().__init__()
+        self._conn = conn
+
+    async def begin(self):
+        if not self._conn.in_transaction:
+            await self._conn.execute("BEGIN")
+
+    async def commit(self):
+        await self._conn.commit()
+        self._invalidar()
+
+    async def rollback(self):
+        await self._conn.rollback()
+        self._sucias.clear()
+
+    async def execute_query(self, query, params=None, fetch="all"):
+        inicio = time.perf_counter() if metrics.enabled else None
+        resultado = None
+        try:
+            async with self._conn.execute(translate_to_sqlite(query), params or ()) as cur:
+                if fetch == "one":
+                    resultado = await cur.fetchone()
+                elif fetch == "all":
+                    resultado = list(await cur.fetchall())
+                return resultado
+        finally:
+            self._registrar(query, inicio, params, resultado)
+
+    async def execute_command(self, query, params=None):
+        inicio = time.perf_counter() if metrics.enabled else None
+        comando = query.strip().upper()
+        try:
+            async with self._conn.execute(translate_to_sqlite(query), params or ()) as cur:
+                if comando.startswith("INSERT"):
+                    if "RETURNING" in comando:
+                        fila = await cur.fetchone()
+                        return fila[0] if fila else None
+                    return cur.lastrowid
+                return cur.rowcount
+        finally:
+            self._registrar(query, inicio, params)
+
+
+class _ConexionEnHilo(_ConexionAsync):
+    """
+    Adaptador que ejecuta sobre DatabaseService en un hilo dedicado
+    Toda la transacción corre en el mismo hilo (la conexión SQLite es por hilo)
+    """
+
+    def __init__(self, read_only: bool = False):
+        super().__init__()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="db-async")
+        self._read_only = read_only
+        self._cm = None
+        self._conn = None
+
+    async def _en_hilo(self, funcion, *args):
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, funcion, *args)
+
+    async def abrir(self):
+        def _abrir():
+            self._cm = db.get_connection(read_only=self._read_only)
+            self._conn = self._cm.__enter__()
+        await self._en_hilo(_abrir)
+
+    async def cerrar(self, error: Optional[BaseException] = None):
+        def _cerrar():
+            if error is None:
+                self._cm.__exit__(None, None, None)
+            else:
+                self._cm.__exit__(type(error), error, error.__traceback__)
+        try:
+            await self._en_hilo(_cerrar)
+        finally:
+            self._executor.shutdown(wait=False)
+
+    async def begin(self):
+        pass  # psycopg2 / sqlite3 abren la transacción implícitamente
+
+    async def commit(self):
+        await self._en_hilo(self._conn.commit)
+
+    async def rollback(self):
+        await self._en_hilo(self._conn.rollback)
+
+    async def execute_query(self, query, params=None, fetch="all"):
+        def _consultar():
+            cur = self._conn.cursor()
+            try:
+                cur.execute(query, params or ())
+                if fetch == "one":
+                    return cur.fetchone()
+                if fetch == "all":
+                    return cur.fetchall()
+                return None
+            finally:
+                cur.close()
+        return await self._en_hilo(_consultar)
+
+    async def execute_command(self, query, params=None):
+        def _ejecutar():
+            cur = self._conn.cursor()
+            try:
+                cur.execute(query, params or ())
+                comando = query.strip().upper()
+                if comando.startswith("INSERT"):
+                    if "RETURNING" in comando:
+                        fila = cur.fetchone()
+                        return fila[0] if fila else None
+                    if db.db_type == "sqlite":
+                        return cur.lastrowid
+                return cur.rowcount
+            finally:
+                cur.close()
+        return await self._en_hilo(_ejecutar)
+
+
+class AsyncDatabaseService:
+    """
+    Servicio singleton asíncrono de base de datos
+    Comparte configuración, métricas y caché con el servicio sincrónico `db`
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.db_type = db.db_type
+        if self.db_type == "postgresql" and asyncpg is not None:
+            self.backend = "asyncpg"
+        elif self.db_type == "sqlite" and aiosqlite is not None:
+            self.backend = "aiosqlite"
+        else:
+            self.backend = "thread"
+
+        # Recursos ligados a un event loop: {loop: pool | (conexión, lock)};
+        # los de la réplica van bajo (loop, generación de la réplica)
+        self._recursos = {}
+        self._initialized = True
+        print(f"⚡ Servicio de BD async: {self.backend}")
+
+    # ========================================
+    # RECURSOS POR EVENT LOOP
+    # ========================================
+
+    @staticmethod
+    def _clave(replica: bool):
+        loop = asyncio.get_running_loop()
+        return (loop, db._replica_generation) if replica else loop
+
+    async def _pool_asyncpg(self, replica: bool = False):
+        clave = self._clave(replica)
+        pool = self._recursos.get(clave)
+        if pool is None:
+            if replica:
+                # Sesiones de solo lectura, como las del servicio sincrónico
+                pool = await asyncpg.create_pool(
+                    db.replica_url, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX, timeout=DB_TIMEOUT,
+                    server_settings={"default_transaction_read_only": "on"}
+                )
+            else:
+                pool = await asyncpg.create_pool(
+                    db.db_url, min_size=DB_POOL_MIN, max_size=DB_POOL_MAX, timeout=DB_TIMEOUT
+                )
+            self._recursos[clave] = pool
+        return pool
+
+    async def _conexion_aiosqlite(self, replica: bool = False):
+        clave = self._clave(replica)
+        recurso = self._recursos.get(clave)
+        if recurso is None:
+            if replica:
+                conn = await aiosqlite.connect(f"file:{db.replica_path}?mode=ro", uri=True, timeout=DB_TIMEOUT)
+                pragmas = {p: SQLITE_PRAGMAS[p] for p in ("mmap_size", "cache_size", "busy_timeout", "temp_store")}
+            else:
+                conn = await aiosqlite.connect(db.sqlite_path, timeout=DB_TIMEOUT)
+                pragmas = SQLITE_PRAGMAS
+            conn.row_factory = aiosqlite.Row
+            for pragma, valor in pragmas.items():
+                await conn.execute(f"PRAGMA {pragma}={valor}")
+            recurso = (conn, asyncio.Lock())
+            self._recursos[clave] = recurso
+        return recurso
+
+    async def _recurso(self, read_only: bool):
+        """Pool o conexión del event loop actual; la réplica si corresponde y responde"""
+        abrir = self._pool_asyncpg if self.backend == "asyncpg" else self._conexion_aiosqlite
+        # _usar_replica() puede medir el atraso contra el servidor: fuera del event loop
+        if read_only and await asyncio.to_thread(db._usar_replica):
+            try:
+                return await abrir(replica=True)
+            except Exception as e:
+                # Sin réplica se sigue leyendo de la principal
+                db._marcar_replica_caida(e)
+        return await abrir()
+
+    @asynccontextmanager
+    async def get_connection(self, read_only: bool = False):
+        """
+        Context manager asíncrono para obtener una conexión
+        Al salir se descarta lo no confirmado
+
+        Args:
+            read_only: Lectura que tolera el atraso de la réplica (ver db.get_connection)
+        """
+        if self.backend == "asyncpg":
+            pool = await self._recurso(read_only)
+            inicio = time.perf_counter()
+            async with pool.acquire() as conn:
+                if metrics.enabled:
+                    metrics.record_pool_wait((time.perf_counter() - inicio) * 1000)
+                adaptador = _ConexionAsyncpg(conn)
+                try:
+                    yield adaptador
+                finally:
+                    await adaptador.rollback()
+
+        elif self.backend == "aiosqlite":
+            conn, lock = await self._recurso(read_only)
+            # Una sola conexión: las transacciones de distintas tareas se serializan
+            async with lock:
+                adaptador = _ConexionAiosqlite(conn)
+                try:
+                    yield adaptador
+                finally:
+                    if conn.in_transaction:
+                        await adaptador.rollback()
+
+        else:
+            adaptador = _ConexionEnHilo(read_only)
+            await adaptador.abrir()
+            try:
+                yield adaptador
+            except BaseException as e:
+                await adaptador.cerrar(e)
+                raise
+            else:
+                await adaptador.cerrar()
+
+    # ========================================
+    # API (igual a DatabaseService)
+    # ========================================
+
+    async def execute_query(self, query: str, params: Optional[Tuple] = None, fetch: str = "all",
+                            read_only: bool = False) -> Any:
+        """
+        Ejecuta una query SELECT y retorna resultados
+
+        Args:
+            query: Query SQL (con placeholders %s)
+            params: Parámetros de la query
+            fetch: 'one', 'all' o 'none'
+            read_only: Permite leer de la réplica (ver db.get_connection)
+        """
+        if self.backend == "thread":
+            return await asyncio.to_thread(db.execute_query, query, params, fetch, read_only)
+        async with self.get_connection(read_only) as conn:
+            return await conn.execute_query(query, params, fetch)
+
+    async def execute_command(self, query: str, params: Optional[Tuple] = None, commit: bool = True) -> Optional[int]:
+        """
+        Ejecuta un comando INSERT/UPDATE/DELETE
+
+        Returns:
+            ID del registro insertado (si aplica) o número de filas afectadas
+        """
+        if self.backend == "thread":
+            return await asyncio.to_thread(db.execute_command, query, params, commit)
+        async with self.get_connection() as conn:
+            await conn.begin()
+            resultado = await conn.execute_command(query, params)
+            if commit:
+                await conn.commit()
+            return resultado
+
+    async def cached_query(self, query: str, params: Optional[Tuple] = None,
+                           tags: Optional[List[str]] = None, ttl: Optional[float] = None,
+                           read_only: bool = False) -> List[Any]:
+        """Versión async de db.cached_query (comparte la misma caché)"""
+        if not db.cache.enabled:
+            return await self.execute_query(query, params, "all", read_only)
+
+        etiquetas = frozenset(t.lower() for t in tags) if tags else tablas_leidas(query)
+        clave = (query, tuple(params) if params else ())
+        filas = db.cache.get(clave)
+        if filas is not None:
+            return filas
+
+        generacion = db.cache.generacion(etiquetas)
+        filas = list(await self.execute_query(query, params, "all", read_only))
+        db.cache.put(clave, filas, etiquetas, ttl, generacion)
+        return list(filas)
+
+    @asynccontextmanager
+    async def transaction(self):
+        """
+        Transacción explícita:
+
+            async with adb.transaction() as tx:
+                venta_id = await tx.execute_command("INSERT ... RETURNING id", (...))
+                await tx.execute_command("UPDATE productos ...", (...))
+        """
+        async with self.get_connection() as conn:
+            await conn.begin()
+            try:
+                yield conn
+                await conn.commit()
+            except Exception as e:
+                await conn.rollback()
+                print(f"❌ Error en transacción async: {e}")
+                raise
+
+    async def close(self):
+        """Cierra los pools / conexiones del event loop actual (principal y réplica)"""
+        loop = asyncio.get_running_loop()
+        for clave in [c for c in self._recursos if c is loop or (isinstance(c, tuple) and c[0] is loop)]:
+            recurso = self._recursos.pop(clave)
+            if self.backend == "asyncpg":
+                await recurso.close()
+            else:
+                await recurso[0].close()
+
+
+# Instancia global del servicio
+adb = AsyncDatabaseService()
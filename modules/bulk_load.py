@@ -0,0 +1,205 @@
+"""
+Carga masiva de filas
+PostgreSQL: COPY FROM STDIN (con tabla temporal para upserts)
+SQLite: INSERT con múltiples VALUES por sentencia, en una sola transacción
+"""
+import io
+import re
+import sqlite3
+from datetime import date, datetime, time as dtime
+from itertools import islice
+from typing import Iterable, Iterator, List, Optional, Sequence, Tuple
+
+
+_RE_IDENTIFICADOR = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Máximo de parámetros por sentencia en SQLite (SQLITE_MAX_VARIABLE_NUMBER)
+SQLITE_MAX_PARAMS = 32766 if sqlite3.sqlite_version_info >= (3, 32, 0) else 999
+
+_ESCAPES_COPY = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "\r": "\\r"})
+
+
+def validar_identificador(nombre: str) -> str:
+    """Valida un nombre de tabla o columna (se interpola en el SQL)"""
+    if not _RE_IDENTIFICADOR.match(nombre):
+        raise ValueError(f"Identificador inválido: {nombre!r}")
+    return nombre
+
+
+def lotes(filas: Iterable[Sequence], tamanio: int) -> Iterator[List[Sequence]]:
+    """Divide un iterable (incluso un generador) en listas de hasta 'tamanio' filas"""
+    iterador = iter(filas)
+    while True:
+        lote = list(islice(iterador, tamanio))
+        if not lote:
+            return
+        yield lote
+
+
+def actualizar_por_caso(cur, tabla: str, asignacion: str, columna_clave: str,
+                        valores: Sequence[Sequence], tamanio: int,
+                        filtro: str = "", params_filtro: tuple = ()) -> int:
+    """
+    UPDATE con un valor distinto por fila: una sentencia por lote de 'tamanio'
+
+        UPDATE tabla SET <asignacion> WHERE <filtro> clave IN (...)
+
+    donde '{casos}' en la asignación se reemplaza por
+    CASE clave WHEN %s THEN %s ... END (p. ej. "stock = stock + {casos}").
+
+    Args:
+        cur: Cursor de la transacción en curso (no hace commit)
+        valores: (clave, valor) por fila
+        filtro: Condición extra terminada en AND, con sus params_filtro
+
+    Returns:
+        Cantidad de sentencias ejecutadas
+    """
+    tabla = validar_identificador(tabla)
+    columna_clave = validar_identificador(columna_clave)
+    sentencias = 0
+    for lote in lotes(valores, tamanio):
+        casos = " ".join(["WHEN %s THEN %s"] * len(lote))
+        marcadores = ", ".join(["%s"] * len(lote))
+        cur.execute(
+            f"UPDATE {tabla} SET {asignacion.format(casos=f'CASE {columna_clave} {casos} END')} "
+            f"WHERE {filtro}{columna_clave} IN ({marcadores})",
+            [v for par in lote for v in par] + list(params_filtro) + [par[0] for par in lote]
+        )
+        sentencias += 1
+    return sentencias
+
+
+def _valor_copy(valor) -> str:
+    if valor is None:
+        return "\\N"
+    if isinstance(valor, bool):
+        return "t" if valor else "f"
+    if isinstance(valor, (datetime, date, dtime)):
+        return valor.isoformat()
+    if isinstance(valor, (bytes, bytearray, memoryview)):
+        return "\\\\x" + bytes(valor).hex()
+    return str(valor).translate(_ESCAPES_COPY)
+
+
+def formato_copy(lote: Sequence[Sequence]) -> io.StringIO:
+    """Lote de filas en el formato de texto de COPY (tabuladores, \\N para NULL)"""
+    buffer = io.StringIO()
+    buffer.writelines("\t".join(map(_valor_copy, fila)) + "\n" for fila in lote)
+    buffer.seek(0)
+    return buffer
+
+
+def clausula_conflicto(columnas: Sequence[str], conflicto: Optional[Sequence[str]],
+                       actualizar: Optional[Sequence[str]], tabla: str = "",
+                       conservar_nulos: bool = False) -> str:
+    """
+    ON CONFLICT para un upsert (mismo SQL en PostgreSQL y SQLite >= 3.24)
+
+    Args:
+        conflicto: Columnas de la clave única; None = sin manejo de conflictos
+        actualizar: Columnas a actualizar; None = todas menos la clave, () = DO NOTHING
+        tabla, conservar_nulos: Si se indica, un NULL entrante no pisa el valor existente
+    """
+    if not conflicto:
+        return ""
+    if actualizar is None:
+        actualizar = [c for c in columnas if c not in conflicto]
+    clave = ", ".join(conflicto)
+    if not actualizar:
+        return f" ON CONFLICT ({clave}) DO NOTHING"
+    if conservar_nulos:
+        asignaciones = ", ".join(f"{c} = COALESCE(excluded.{c}, {tabla}.{c})" for c in actualizar)
+    else:
+        asignaciones = ", ".join(f"{c} = excluded.{c}" for c in actualizar)
+    return f" ON CONFLICT ({clave}) DO UPDATE SET {asignaciones}"
+
+
+def deduplicar(lote: List[Sequence], columnas: Sequence[str], conflicto: Sequence[str]) -> List[Sequence]:
+    """
+    Deja una fila por clave (la última), como exige ON CONFLICT DO UPDATE
+    de PostgreSQL dentro de una misma sentencia
+    """
+    indices = [list(columnas).index(c) for c in conflicto]
+    unicas = {}
+    for fila in lote:
+        unicas[tuple(fila[i] for i in indices)] = fila
+    return list(unicas.values()) if len(unicas) < len(lote) else lote
+
+
+def sql_insert_multiple(tabla: str, columnas: Sequence[str], n_filas: int, conflicto: str = "") -> str:
+    """INSERT INTO tabla (...) VALUES (?, ...), (?, ...) ... para SQLite"""
+    fila = "(" + ", ".join("?" * len(columnas)) + ")"
+    return f"INSERT INTO {tabla} ({', '.join(columnas)}) VALUES " + ", ".join([fila] * n_filas) + conflicto
+
+
+def filas_por_sentencia_sqlite(n_columnas: int, chunk_size: int) -> int:
+    """Filas por INSERT sin superar el límite de parámetros de SQLite"""
+    return max(1, min(chunk_size, SQLITE_MAX_PARAMS // max(1, n_columnas)))
+
+
+def cargar_postgres(conn, tabla: str, columnas: Sequence[str], filas: Iterable[Sequence],
+                    chunk_size: int, conflicto: Optional[Sequence[str]],
+                    actualizar: Optional[Sequence[str]], conservar_nulos: bool = False) -> int:
+    """Carga con COPY; si hay clave de conflicto pasa por una tabla temporal"""
+    lista_columnas = ", ".join(columnas)
+    cur = conn.cursor()
+    total = 0
+    try:
+        if not conflicto:
+            for lote in lotes(filas, chunk_size):
+                cur.copy_expert(f"COPY {tabla} ({lista_columnas}) FROM STDIN", formato_copy(lote))
+                total += len(lote)
+            return total
+
+        staging = f"_carga_{tabla}"
+        cur.execute(
+            f"CREATE TEMP TABLE IF NOT EXISTS {staging} ON COMMIT DROP AS "
+            f"SELECT {lista_columnas} FROM {tabla} WITH NO DATA"
+        )
+        upsert = (
+            f"INSERT INTO {tabla} ({lista_columnas}) SELECT {lista_columnas} FROM {staging}"
+            + clausula_conflicto(columnas, conflicto, actualizar, tabla, conservar_nulos)
+        )
+        for lote in lotes(filas, chunk_size):
+            lote = deduplicar(lote, columnas, conflicto)
+            cur.copy_expert(f"COPY {staging} ({lista_columnas}) FROM STDIN", formato_copy(lote))
+            cur.execute(upsert)
+            cur.execute(f"TRUNCATE {staging}")
+            total += len(lote)
+        return total
+    finally:
+        cur.close()
+
+
+def cargar_sqlite(conn, tabla: str, columnas: Sequence[str], filas: Iterable[Sequence],
+                  chunk_size: int, conflicto: Optional[Sequence[str]],
+                  actualizar: Optional[Sequence[str]], conservar_nulos: bool = False) -> int:
+    """Carga con INSERT de múltiples VALUES (sentencias preparadas reutilizadas)"""
+    por_sentencia = filas_por_sentencia_sqlite(len(columnas), chunk_size)
+    sufijo = clausula_conflicto(columnas, conflicto, actualizar, tabla, conservar_nulos)
+    sentencias = {}  # {n_filas: sql}
+    total = 0
+    for lote in lotes(filas, por_sentencia):
+        n = len(lote)
+        sql = sentencias.get(n)
+        if sql is None:
+            sql = sentencias[n] = sql_insert_multiple(tabla, columnas, n, sufijo)
+        conn.execute(sql, [valor for fila in lote for valor in fila])
+        total += n
+    return total
+
+
+def columnas_y_filas(columnas: Sequence[str], filas: Iterable) -> Tuple[List[str], Iterable[Sequence]]:
+    """Valida las columnas; acepta filas como tuplas o como diccionarios"""
+    columnas = [validar_identificador(c) for c in columnas]
+    if not columnas:
+        raise ValueError("Se requiere al menos una columna")
+
+    def normalizar():
+        for fila in filas:
+            if isinstance(fila, dict):
+                yield tuple(fila.get(c) for c in columnas)
+            else:
+                yield fila
+    return columnas, normalizar()
@@ -0,0 +1,418 @@
+"""
+Búsqueda de texto en memoria para autocompletar
+IndiceBusqueda indexa textos sin tildes ni mayúsculas por trigramas de cada
+palabra (con el inicio marcado, así sirven también de prefijo): una consulta
+solo mide las palabras del vocabulario que comparten suficientes trigramas
+con ella, y el resultado sale ordenado (igual, empieza con, palabras que empiezan con,
+contiene, con errores de tipeo). Los términos de una o dos letras no tienen
+trigramas propios: se buscan recorriendo el vocabulario.
+
+indice_productos() es el índice del catálogo que comparten todas las
+pantallas que autocompletan productos: se arma una vez y, después de una
+escritura confirmada en productos, la próxima búsqueda relee id y nombre de
+todo el catálogo y reindexa solo los nombres que cambiaron.
+
+BuscadorCiudades usa un trie de prefijos sobre el nomenclador de ciudades
+(lista fija y corta): cada nodo ya guarda sus ciudades ordenadas.
+"""
+import heapq
+import re
+import threading
+from typing import Callable, Dict, Hashable, Iterable, List, Mapping, Optional, Sequence, Set, Tuple
+from modules.db_service import db
+from modules.utils import normalizar_texto
+from modules.ciudades_paraguay import CIUDADES_POR_DEPARTAMENTO
+
+
+_PALABRA = re.compile(r"[a-z0-9]+")
+
+
+def palabras(texto: str) -> Tuple[str, ...]:
+    """Palabras del texto normalizado (sin tildes, minúsculas)"""
+    return tuple(_PALABRA.findall(normalizar_texto(texto)))
+
+
+def _trigramas(palabra: str) -> List[str]:
+    """Trigramas de la palabra con el inicio marcado: 'rosa' -> $$r, $ro, ros, osa"""
+    marcada = "$$" + palabra
+    return [marcada[i:i + 3] for i in range(len(marcada) - 2)]
+
+
+def _distancia(a: str, b: str) -> int:
+    """Distancia de edición con transposiciones (Damerau restringida)"""
+    anterior2, anterior = None, list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        actual = [i] + [0] * len(b)
+        for j in range(1, len(b) + 1):
+            costo = 0 if a[i - 1] == b[j - 1] else 1
+            actual[j] = min(anterior[j] + 1, actual[j - 1] + 1, anterior[j - 1] + costo)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                actual[j] = min(actual[j], anterior2[j - 2] + 1)
+        anterior2, anterior = anterior, actual
+    return anterior[len(b)]
+
+
+def _errores_admitidos(termino: str) -> int:
+    """Errores de tipeo tolerados según el largo del término"""
+    return 0 if len(termino) < 4 else 1 if len(termino) < 8 else 2
+
+
+def _costo_palabra(termino: str, palabra: str) -> Optional[int]:
+    """
+    0 si la palabra empieza con el término, 1 si lo contiene, 2 + errores si
+    su comienzo se parece al término; None si no coincide
+    """
+    if palabra.startswith(termino):
+        return 0
+    if termino in palabra:
+        return 1
+    admitidos = _errores_admitidos(termino)
+    if not admitidos:
+        return None
+    errores = min(
+        _distancia(termino, palabra[:largo])
+        for largo in (len(termino) - 1, len(termino), len(termino) + 1)
+    )
+    return 2 + errores if errores <= admitidos else None
+
+
+class IndiceBusqueda:
+    """Índice de trigramas sobre textos cortos (nombres) identificados por una clave"""
+
+    def __init__(self, textos: Optional[Mapping[Hashable, str]] = None):
+        self._textos: Dict[Hashable, str] = {}
+        self._normalizados: Dict[Hashable, str] = {}
+        self._palabras: Dict[Hashable, Tuple[str, ...]] = {}
+        # Dos niveles: trigrama -> palabras del vocabulario -> claves que la usan
+        self._gramas: Dict[str, Set[str]] = {}
+        self._claves_por_palabra: Dict[str, Set[Hashable]] = {}
+        self._lock = threading.RLock()
+        for clave, texto in (textos or {}).items():
+            self.agregar(clave, texto)
+
+    def __len__(self) -> int:
+        return len(self._textos)
+
+    def __contains__(self, clave) -> bool:
+        return clave in self._textos
+
+    def texto(self, clave) -> Optional[str]:
+        """Texto original indexado con la clave"""
+        return self._textos.get(clave)
+
+    def agregar(self, clave, texto: str):
+        """Indexa (o reemplaza) el texto de la clave"""
+        with self._lock:
+            if self._textos.get(clave) == texto:
+                return
+            self.quitar(clave)
+            self._textos[clave] = texto
+            self._normalizados[clave] = normalizar_texto(texto)
+            self._palabras[clave] = palabras(texto)
+            for palabra in set(self._palabras[clave]):
+                if palabra not in self._claves_por_palabra:
+                    self._claves_por_palabra[palabra] = set()
+                    for grama in _trigramas(palabra):
+                        self._gramas.setdefault(grama, set()).add(palabra)
+                self._claves_por_palabra[palabra].add(clave)
+
+    def quitar(self, clave):
+        """Saca la clave del índice (no hace nada si no estaba)"""
+        with self._lock:
+            if clave not in self._textos:
+                return
+            for palabra in set(self._palabras.pop(clave)):
+                claves = self._claves_por_palabra[palabra]
+                claves.discard(clave)
+                if claves:
+                    continue
+                # Nadie más usa la palabra: sale del vocabulario
+                del self._claves_por_palabra[palabra]
+                for grama in _trigramas(palabra):
+                    con_grama = self._gramas.get(grama)
+                    if con_grama is not None:
+                        con_grama.discard(palabra)
+                        if not con_grama:
+                            del self._gramas[grama]
+            del self._textos[clave]
+            del self._normalizados[clave]
+
+    def sincronizar(self, textos: Mapping[Hashable, str]) -> int:
+        """
+        Deja el índice igual a 'textos' tocando solo las claves nuevas,
+        cambiadas o quitadas
+
+        Returns:
+            Cantidad de claves actualizadas
+        """
+        with self._lock:
+            quitadas = [clave for clave in self._textos if clave not in textos]
+            cambiadas = [clave for clave, texto in textos.items() if self._textos.get(clave) != texto]
+            for clave in quitadas:
+                self.quitar(clave)
+            for clave in cambiadas:
+                self.agregar(clave, textos[clave])
+            return len(quitadas) + len(cambiadas)
+
+    def _palabras_candidatas(self, termino: str) -> Set[str]:
+        """
+        Palabras del vocabulario que comparten suficientes trigramas con el
+        término para poder coincidir: cada error de tipeo rompe a lo sumo 3, y
+        contenerlo en medio de una palabra pierde los 2 del inicio
+
+        Un término de una o dos letras solo tiene trigramas del inicio ('$$e',
+        '$ec'): para encontrarlo en medio de una palabra ('ec' en 'helecho')
+        se recorre el vocabulario.
+        """
+        if len(termino) < 3:
+            return {palabra for palabra in self._claves_por_palabra if termino in palabra}
+        gramas = _trigramas(termino)
+        minimo = max(1, min(len(gramas) - 2, len(gramas) - 3 * _errores_admitidos(termino)))
+        if minimo == 1:
+            candidatas: Set[str] = set()
+            for grama in gramas:
+                candidatas |= self._gramas.get(grama, set())
+            return candidatas
+        cuentas: Dict[str, int] = {}
+        for grama in gramas:
+            for palabra in self._gramas.get(grama, ()):
+                cuentas[palabra] = cuentas.get(palabra, 0) + 1
+        return {palabra for palabra, cuenta in cuentas.items() if cuenta >= minimo}
+
+    def _costos(self, termino: str) -> Dict[Hashable, int]:
+        """{clave: mejor costo del término entre sus palabras} de las claves donde aparece"""
+        costos: Dict[Hashable, int] = {}
+        for palabra in self._palabras_candidatas(termino):
+            costo = _costo_palabra(termino, palabra)
+            if costo is None:
+                continue
+            for clave in self._claves_por_palabra[palabra]:
+                if costo < costos.get(clave, costo + 1):
+                    costos[clave] = costo
+        return costos
+
+    def buscar(
+        self,
+        consulta: str,
+        limite: Optional[int] = 10,
+        admite: Optional[Callable[[Hashable], bool]] = None
+    ) -> List[Hashable]:
+        """
+        Claves que coinciden con la consulta, de la mejor a la peor
+
+        Orden: texto igual, empieza con la consulta, cada término es el
+        comienzo de una palabra, lo contiene, con errores de tipeo; a igual
+        coincidencia, el texto más corto y luego alfabético.
+
+        Args:
+            limite: máximo de resultados (None = todos)
+            admite: filtro opcional por clave (p. ej. solo productos con stock)
+        """
+        normalizada = normalizar_texto(consulta)
+        terminos = palabras(consulta)
+        if not terminos:
+            return []
+
+        with self._lock:
+            total: Optional[Dict[Hashable, int]] = None
+            for termino in terminos:
+                costos = self._costos(termino)
+                if total is None:
+                    total = costos
+                else:
+                    total = {clave: costo + costos[clave] for clave, costo in total.items() if clave in costos}
+                if not total:
+                    return []
+
+            puntajes = []
+            for clave, costo in total.items():
+                if admite is not None and not admite(clave):
+                    continue
+                texto = self._normalizados[clave]
+                grupo = 0 if texto == normalizada else 1 if texto.startswith(normalizada) else 2
+                puntajes.append((grupo, costo, len(texto), texto, clave))
+
+        mejores = heapq.nsmallest(limite, puntajes) if limite is not None else sorted(puntajes)
+        return [puntaje[-1] for puntaje in mejores]
+
+
+# ========================================
+# ÍNDICE COMPARTIDO DEL CATÁLOGO
+# ========================================
+
+_lock = threading.Lock()
+_productos: Optional[IndiceBusqueda] = None
+_productos_cambiaron = threading.Event()
+_cancelar_aviso: Optional[Callable[[], None]] = None
+
+
+def indice_productos() -> IndiceBusqueda:
+    """
+    Índice de nombres de productos por id (se arma la primera vez y se pone
+    al día cuando se confirmó una escritura en productos)
+
+    La caché invalida por tabla, sin saber qué columnas cambiaron: cualquier
+    escritura en productos (también el UPDATE de stock de cada venta) marca
+    el índice, y la próxima búsqueda relee SELECT id, nombre de todo el
+    catálogo (una consulta de n filas) para reindexar solo los nombres que
+    cambiaron. Varias ventas entre dos búsquedas cuestan una sola relectura.
+    """
+    global _productos, _cancelar_aviso
+    with _lock:
+        if _productos is None:
+            _productos = IndiceBusqueda()
+            _cancelar_aviso = db.cache.subscribe("productos", lambda tag: _productos_cambiaron.set())
+            _productos_cambiaron.set()
+        if _productos_cambiaron.is_set():
+            # Se baja antes de leer: una escritura durante la consulta vuelve a marcarlo
+            _productos_cambiaron.clear()
+            try:
+                filas = db.execute_query("SELECT id, nombre FROM productos")
+                cambios = _productos.sincronizar({fila[0]: fila[1] or "" for fila in filas})
+                if cambios:
+                    print(f"🔎 Índice de productos: {cambios} actualizado(s), {len(_productos)} en total")
+            except Exception as e:
+                print(f"⚠️ No se pudo actualizar el índice de productos: {e}")
+                _productos_cambiaron.set()
+        return _productos
+
+
+def buscar_productos(
+    consulta: str,
+    limite: Optional[int] = 10,
+    admite: Optional[Callable[[Hashable], bool]] = None
+) -> List[int]:
+    """Ids de productos que coinciden con la consulta, ordenados (ver IndiceBusqueda.buscar)"""
+    return indice_productos().buscar(consulta, limite, admite)
+
+
+def limpiar_cache():
+    """Descarta el índice de productos (se vuelve a armar en la próxima búsqueda)"""
+    global _productos, _cancelar_aviso
+    with _lock:
+        if _cancelar_aviso:
+            _cancelar_aviso()
+        _productos, _cancelar_aviso = None, None
+
+
+# ========================================
+# CIUDADES
+# ========================================
+
+class TriePrefijos:
+    """Trie de textos normalizados; cada nodo guarda las claves cuyo texto pasa por él"""
+
+    __slots__ = ("hijos", "claves")
+
+    def __init__(self):
+        self.hijos: Dict[str, "TriePrefijos"] = {}
+        self.claves: List[Hashable] = []
+
+    def agregar(self, texto: str, clave):
+        nodo = self
+        for letra in texto:
+            nodo = nodo.hijos.setdefault(letra, TriePrefijos())
+            if clave not in nodo.claves:
+                nodo.claves.append(clave)
+
+    def con_prefijo(self, prefijo: str) -> List[Hashable]:
+        """Claves cuyo texto empieza con el prefijo (en el orden en que se agregaron)"""
+        nodo = self
+        for letra in prefijo:
+            nodo = nodo.hijos.get(letra)
+            if nodo is None:
+                return []
+        return nodo.claves
+
+
+class BuscadorCiudades:
+    """
+    Autocompletado y validación de ciudades del nomenclador, sin tildes ni
+    mayúsculas ('nemby' -> 'Ñemby', 'asuncion' -> 'Asunción')
+    """
+
+    def __init__(self, por_departamento: Mapping[str, Sequence[str]] = CIUDADES_POR_DEPARTAMENTO):
+        self._departamento: Dict[str, str] = {}
+        self._normalizadas: Dict[str, str] = {}
+        for departamento, ciudades in por_departamento.items():
+            for ciudad in ciudades:
+                self._departamento[ciudad] = departamento
+                self._normalizadas[ciudad] = normalizar_texto(ciudad)
+        self._por_nombre = {normalizada: ciudad for ciudad, normalizada in self._normalizadas.items()}
+
+        # Las ciudades se agregan de la más corta a la más larga: cada nodo queda ordenado
+        ordenadas = sorted(self._normalizadas, key=lambda c: (len(self._normalizadas[c]), self._normalizadas[c]))
+        self._nombres = TriePrefijos()
+        self._palabras = TriePrefijos()
+        for ciudad in ordenadas:
+            normalizada = self._normalizadas[ciudad]
+            self._nombres.agregar(normalizada, ciudad)
+            for inicio in (m.start() for m in re.finditer(r"(?<![a-z0-9])[a-z0-9]", normalizada)):
+                if inicio:
+                    self._palabras.agregar(normalizada[inicio:], ciudad)
+        self._ordenadas = ordenadas
+
+    def buscar(self, texto: str, limite: Optional[int] = 5) -> List[str]:
+        """
+        Ciudades que coinciden: primero las que empiezan con el texto, luego
+        las que tienen una palabra que empieza con él y al final las que lo
+        contienen; en cada grupo, de la más corta a la más larga
+        """
+        consulta = normalizar_texto(texto)
+        if not consulta:
+            return []
+        resultado: List[str] = []
+        vistas: Set[str] = set()
+        grupos = (
+            self._nombres.con_prefijo(consulta),
+            self._palabras.con_prefijo(consulta),
+            (c for c in self._ordenadas if consulta in self._normalizadas[c]),
+        )
+        for grupo in grupos:
+            for ciudad in grupo:
+                if ciudad not in vistas:
+                    vistas.add(ciudad)
+                    resultado.append(ciudad)
+                    if limite is not None and len(resultado) >= limite:
+                        return resultado
+        return resultado
+
+    def departamento(self, ciudad: str) -> Optional[str]:
+        """Departamento de una ciudad del nomenclador (acepta el nombre sin tildes)"""
+        return self._departamento.get(self.validar(ciudad) or "")
+
+    def agrupar(self, ciudades: Iterable[str]) -> Dict[str, List[str]]:
+        """{departamento: [ciudades]} respetando el orden recibido"""
+        grupos: Dict[str, List[str]] = {}
+        for ciudad in ciudades:
+            grupos.setdefault(self.departamento(ciudad) or "Otras", []).append(ciudad)
+        return grupos
+
+    def validar(self, texto: Optional[str]) -> Optional[str]:
+        """
+        Nombre oficial de la ciudad si el texto la nombra exactamente
+        (sin importar tildes, mayúsculas ni espacios); None si no es del nomenclador
+        """
+        return self._por_nombre.get(normalizar_texto(texto or ""))
+
+
+_buscador_ciudades: Optional[BuscadorCiudades] = None
+
+
+def buscador_ciudades() -> BuscadorCiudades:
+    """Buscador del nomenclador de ciudades (se arma una sola vez)"""
+    global _buscador_ciudades
+    with _lock:
+        if _buscador_ciudades is None:
+            _buscador_ciudades = BuscadorCiudades()
+        return _buscador_ciudades
+
+
+def buscar_ciudades(texto: str, limite: Optional[int] = 5) -> List[str]:
+    """Ciudades del nomenclador que coinciden con el texto (ver BuscadorCiudades.buscar)"""
+    return buscador_ciudades().buscar(texto, limite)
+
+
+def validar_ciudad(texto: Optional[str]) -> Optional[str]:
+    """Nombre oficial de la ciudad escrita o None (p. ej. para validar importaciones de clientes)"""
+    return buscador_ciudades().validar(texto)
@@ -0,0 +1,361 @@
+"""
+Importación y exportación del catálogo de productos (XLSX / CSV)
+Lectura en streaming, validación por lotes, vista previa de los cambios
+y aplicación en una sola transacción (upsert por nombre).
+"""
+import os
+import re
+import csv
+from typing import Dict, Iterator, List, Optional, Tuple, Any
+from modules.db_service import db
+from modules.bulk_load import lotes
+from modules import inventario_service as inventario
+from modules.config import CATALOGO_LOTE_VALIDACION, CATALOGO_MAX_EJEMPLOS, CURRENCY_SYMBOL, Validation
+from modules.utils import normalizar_texto, sanitize_string
+
+# --- Importaciones opcionales ---
+try:
+    import openpyxl
+except ImportError:
+    openpyxl = None
+
+
+# Campo del catálogo: (columnas candidatas en la tabla productos, encabezados aceptados)
+CAMPOS = {
+    "nombre": (("nombre",), ("nombre", "producto", "articulo")),
+    "categoria": (("categoria",), ("categoria", "rubro")),
+    "precio_compra": (("precio_compra",), ("precio compra", "precio_compra", "costo", "precio costo")),
+    "precio_venta": (("precio_venta", "precio"), ("precio venta", "precio_venta", "precio", "pvp")),
+    "stock": (("stock_actual", "stock"), ("stock", "stock actual", "stock_actual", "existencia")),
+    "stock_minimo": (("stock_minimo",), ("stock minimo", "stock_minimo", "minimo")),
+    "unidad_medida": (("unidad_medida",), ("unidad", "unidad medida", "unidad_medida")),
+    "descripcion": (("descripcion",), ("descripcion", "detalle")),
+}
+
+CAMPOS_ENTEROS = ("precio_compra", "precio_venta", "stock", "stock_minimo")
+CAMPOS_PRECIO = ("precio_compra", "precio_venta")
+
+# Encabezados de la exportación (se vuelven a reconocer al importar)
+ENCABEZADOS_EXPORTACION = {
+    "nombre": "Nombre", "categoria": "Categoría", "precio_compra": "Precio Compra",
+    "precio_venta": "Precio Venta", "stock": "Stock", "stock_minimo": "Stock Mínimo",
+    "unidad_medida": "Unidad", "descripcion": "Descripción",
+}
+
+_ALIAS = {alias: campo for campo, (_, alias_campo) in CAMPOS.items() for alias in alias_campo}
+_RE_DECIMAL = re.compile(r"^\d+[.,]\d{1,2}$")
+
+
+# ========================================
+# LECTURA
+# ========================================
+
+def _filas_crudas(ruta: str) -> Iterator[tuple]:
+    """Filas del archivo como tuplas, sin cargarlo completo en memoria"""
+    extension = os.path.splitext(ruta)[1].lower()
+    if extension in (".xlsx", ".xlsm"):
+        if openpyxl is None:
+            raise ImportError("Se requiere openpyxl para leer archivos Excel")
+        libro = openpyxl.load_workbook(ruta, read_only=True, data_only=True)
+        try:
+            yield from libro.active.iter_rows(values_only=True)
+        finally:
+            libro.close()
+    elif extension in (".csv", ".txt"):
+        with open(ruta, newline="", encoding="utf-8-sig") as archivo:
+            muestra = archivo.read(4096)
+            archivo.seek(0)
+            try:
+                dialecto = csv.Sniffer().sniff(muestra, delimiters=",;\t")
+            except csv.Error:
+                dialecto = csv.excel
+            yield from csv.reader(archivo, dialecto)
+    else:
+        raise ValueError(f"Formato no soportado: {extension or ruta}")
+
+
+def leer_catalogo(ruta: str) -> Tuple[Dict[int, str], List[str], Iterator[Tuple[int, Dict[str, Any]]]]:
+    """
+    Abre un catálogo y reconoce sus encabezados
+
+    Returns:
+        ({índice de columna: campo}, encabezados no reconocidos,
+         iterador de (número de línea, {campo: valor}))
+    """
+    filas = _filas_crudas(ruta)
+    linea = 0
+    for encabezado in filas:
+        linea += 1
+        if any(celda not in (None, "") for celda in encabezado):
+            break
+    else:
+        raise ValueError("El archivo está vacío")
+
+    indices, ignorados = {}, []
+    for i, celda in enumerate(encabezado):
+        if celda in (None, ""):
+            continue
+        campo = _ALIAS.get(normalizar_texto(celda))
+        if campo and campo not in indices.values():
+            indices[i] = campo
+        else:
+            ignorados.append(str(celda))
+    if "nombre" not in indices.values():
+        raise ValueError("El archivo no tiene una columna 'Nombre' o 'Producto'")
+
+    def registros():
+        numero = linea
+        for fila in filas:
+            numero += 1
+            if not any(celda not in (None, "") for celda in fila):
+                continue
+            yield numero, {campo: (fila[i] if i < len(fila) else None) for i, campo in indices.items()}
+
+    return indices, ignorados, registros()
+
+
+# ========================================
+# VALIDACIÓN
+# ========================================
+
+def _entero(valor) -> Optional[int]:
+    """Número entero desde una celda ("150.000 Gs." -> 150000); None si está vacía"""
+    if valor is None or (isinstance(valor, str) and not valor.strip()):
+        return None
+    if isinstance(valor, bool):
+        raise ValueError("no es un número")
+    if isinstance(valor, (int, float)):
+        return int(round(valor))
+
+    texto = str(valor).replace(CURRENCY_SYMBOL, "").replace("Gs.", "").replace("Gs", "").replace("gs", "")
+    texto = texto.replace(" ", "").strip()
+    if _RE_DECIMAL.match(texto):
+        return int(round(float(texto.replace(",", "."))))
+    texto = texto.replace(".", "").replace(",", "")
+    if not texto.isdigit():
+        raise ValueError("no es un número")
+    return int(texto)
+
+
+def validar_fila(valores: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Normaliza y valida una fila del catálogo
+
+    Raises:
+        ValueError con el motivo si la fila no es válida
+    """
+    fila = {}
+    for campo, valor in valores.items():
+        if campo in CAMPOS_ENTEROS:
+            try:
+                numero = _entero(valor)
+            except ValueError:
+                raise ValueError(f"{campo}: '{valor}' no es un número válido")
+            if numero is not None:
+                limite = Validation.MAX_PRECIO if campo in CAMPOS_PRECIO else Validation.MAX_STOCK
+                if not 0 <= numero <= limite:
+                    raise ValueError(f"{campo}: {numero} fuera de rango (0 - {limite})")
+            fila[campo] = numero
+        else:
+            texto = sanitize_string(str(valor)) if valor is not None else ""
+            fila[campo] = texto or None
+
+    if not fila.get("nombre"):
+        raise ValueError("nombre vacío")
+    if len(fila["nombre"]) > 200:
+        raise ValueError("nombre demasiado largo (máx. 200)")
+    return fila
+
+
+def validar_lotes(registros, tamanio: int = CATALOGO_LOTE_VALIDACION):
+    """
+    Valida los registros por lotes
+
+    Yields:
+        (filas válidas, [(línea, motivo), ...]) por cada lote
+    """
+    for lote in lotes(registros, tamanio):
+        validas, errores = [], []
+        for linea, valores in lote:
+            try:
+                validas.append(validar_fila(valores))
+            except ValueError as e:
+                errores.append((linea, str(e)))
+        yield validas, errores
+
+
+def columnas_destino(campos) -> Dict[str, str]:
+    """{campo: columna real en productos} para los campos que existen en el esquema"""
+    destino = {}
+    for campo in campos:
+        columna = db.schema.first_column("productos", *CAMPOS[campo][0])
+        if columna:
+            destino[campo] = columna
+    return destino
+
+
+# ========================================
+# VISTA PREVIA E IMPORTACIÓN
+# ========================================
+
+def _catalogo_actual(destino: Dict[str, str]) -> Dict[str, tuple]:
+    """{nombre: (valores en el orden de destino)} de los productos existentes"""
+    columnas = ", ".join(destino.values())
+    filas = db.execute_query(f"SELECT {columnas} FROM productos")
+    indice_nombre = list(destino).index("nombre")
+    return {fila[indice_nombre]: tuple(fila) for fila in filas}
+
+
+def previsualizar(ruta: str, max_ejemplos: int = CATALOGO_MAX_EJEMPLOS) -> Dict[str, Any]:
+    """
+    Compara el archivo con el catálogo actual sin modificar nada
+
+    Returns:
+        Resumen con cantidades de altas, modificaciones, cambios de precio
+        y errores (más los primeros ejemplos de cada uno)
+    """
+    indices, ignorados, registros = leer_catalogo(ruta)
+    destino = columnas_destino(indices.values())
+    campos = list(destino)
+    existentes = _catalogo_actual(destino)
+
+    resumen = {
+        "archivo": os.path.basename(ruta),
+        "columnas": campos,
+        "ignoradas": ignorados + [c for c in indices.values() if c not in destino],
+        "filas": 0, "nuevos": 0, "actualizados": 0, "sin_cambios": 0,
+        "cambios_precio": [], "total_cambios_precio": 0,
+        "errores": [], "total_errores": 0,
+    }
+
+    for validas, errores in validar_lotes(registros):
+        resumen["filas"] += len(validas) + len(errores)
+        resumen["total_errores"] += len(errores)
+        resumen["errores"].extend(errores[:max_ejemplos - len(resumen["errores"])])
+
+        for fila in validas:
+            nuevo = tuple(fila.get(c) for c in campos)
+            actual = existentes.get(fila["nombre"])
+            if actual is None:
+                resumen["nuevos"] += 1
+            elif any(v is not None and v != a for v, a in zip(nuevo, actual)):
+                resumen["actualizados"] += 1
+                for campo in CAMPOS_PRECIO:
+                    if campo not in destino:
+                        continue
+                    i = campos.index(campo)
+                    if nuevo[i] is not None and nuevo[i] != actual[i]:
+                        resumen["total_cambios_precio"] += 1
+                        if len(resumen["cambios_precio"]) < max_ejemplos:
+                            resumen["cambios_precio"].append(
+                                {"nombre": fila["nombre"], "campo": campo, "antes": actual[i], "despues": nuevo[i]}
+                            )
+            else:
+                resumen["sin_cambios"] += 1
+            # Un nombre repetido en el archivo se compara contra su versión anterior
+            existentes[fila["nombre"]] = tuple(n if n is not None else a for n, a in zip(nuevo, actual or nuevo))
+
+    return resumen
+
+
+def importar(ruta: str) -> Dict[str, Any]:
+    """
+    Aplica el catálogo en una sola transacción (upsert por nombre)
+    Las filas inválidas se omiten; las celdas vacías no pisan valores existentes
+
+    Returns:
+        Resultado de db.bulk_load más 'errores' (filas omitidas)
+    """
+    indices, _, registros = leer_catalogo(ruta)
+    destino = columnas_destino(indices.values())
+    omitidas = []
+    # Stock antes y después, para dejar las diferencias como ajustes en el kardex
+    stock_anterior = None
+    stock_nuevo = {}
+    if "stock" in destino and db.schema.has_table("movimientos_stock"):
+        columna = destino["stock"]
+        stock_anterior = {n: s or 0 for n, s in db.execute_query(f"SELECT nombre, {columna} FROM productos")}
+
+    def filas_validas():
+        for validas, errores in validar_lotes(registros):
+            omitidas.extend(errores)
+            for fila in validas:
+                if stock_anterior is not None and fila.get("stock") is not None:
+                    stock_nuevo[fila["nombre"]] = fila["stock"]
+                yield tuple(fila.get(campo) for campo in destino)
+
+    def registrar_ajustes(cur):
+        """Diferencias de stock como ajustes en el kardex, en la misma transacción que el upsert"""
+        if stock_anterior is None:
+            return
+        cambios = {n: s - stock_anterior.get(n, 0) for n, s in stock_nuevo.items() if s != stock_anterior.get(n, 0)}
+        if not cambios:
+            return
+        cur.execute("SELECT nombre, id FROM productos")
+        ids = {nombre: producto_id for nombre, producto_id in cur.fetchall()}
+        inventario.registrar_movimientos(
+            cur, [(ids[n], diferencia) for n, diferencia in cambios.items() if n in ids], "ajuste",
+            referencia=f"Importación {os.path.basename(ruta)}", actualizar_stock=False
+        )
+
+    resultado = db.bulk_load(
+        "productos", list(destino.values()), filas_validas(),
+        conflict=[destino["nombre"]], keep_on_null=True, on_loaded=registrar_ajustes
+    )
+    resultado["errores"] = len(omitidas)
+    print(f"📦 Catálogo importado: {resultado['rows']} productos, {len(omitidas)} filas omitidas")
+    return resultado
+
+
+# ========================================
+# EXPORTACIÓN
+# ========================================
+
+def exportar(ruta: str, lote: int = CATALOGO_LOTE_VALIDACION) -> int:
+    """
+    Exporta el catálogo a XLSX o CSV (según la extensión) leyendo por lotes
+
+    Returns:
+        Cantidad de productos exportados
+    """
+    destino = columnas_destino(CAMPOS)
+    consulta = f"SELECT {', '.join(destino.values())} FROM productos ORDER BY {destino['nombre']}"
+    encabezado = [ENCABEZADOS_EXPORTACION[campo] for campo in destino]
+    extension = os.path.splitext(ruta)[1].lower()
+    total = 0
+
+    with db.get_connection() as conn:
+        if db.db_type == "postgresql":
+            # Cursor del servidor: las filas llegan de a 'lote'
+            cur = getattr(conn, "raw", conn).cursor(name="exportar_catalogo")
+            cur.itersize = lote
+        else:
+            cur = conn.cursor()
+        try:
+            cur.execute(consulta)
+
+            if extension in (".xlsx", ".xlsm"):
+                if openpyxl is None:
+                    raise ImportError("Se requiere openpyxl para exportar a Excel")
+                libro = openpyxl.Workbook(write_only=True)
+                hoja = libro.create_sheet("Catálogo")
+                hoja.append(encabezado)
+                for filas in iter(lambda: cur.fetchmany(lote), []):
+                    for fila in filas:
+                        hoja.append(list(fila))
+                    total += len(filas)
+                libro.save(ruta)
+            elif extension == ".csv":
+                with open(ruta, "w", newline="", encoding="utf-8-sig") as archivo:
+                    escritor = csv.writer(archivo, delimiter=";")
+                    escritor.writerow(encabezado)
+                    for filas in iter(lambda: cur.fetchmany(lote), []):
+                        escritor.writerows(filas)
+                        total += len(filas)
+            else:
+                raise ValueError(f"Formato no soportado: {extension or ruta}")
+        finally:
+            cur.close()
+
+    print(f"📤 Catálogo exportado: {total} productos -> {ruta}")
+    return total
@@ -1,95 +1,377 @@
-# Lista de ciudades/distritos del Paraguay para autocompletado
-CIUDADES_PARAGUAY = [
+# Ciudades/distritos del Paraguay por departamento (autocompletado y validación)
+CIUDADES_POR_DEPARTAMENTO = {
+    "Capital": [
+        "Asunción",
+    ],
+    "Central": [
+        "Areguá", "Capiatá", "Fernando de la Mora", "Guarambaré", "Itá", "Itauguá",
+        "Julián Augusto Saldívar", "Lambaré", "Limpio", "Luque", "Mariano Roque Alonso",
+        "Ñemby", "Nueva Italia", "San Antonio", "San Lorenzo", "Villa Elisa", "Villeta",
+        "Ypacaraí", "Ypané",
+    ],
+    "Cordillera": [
+        "Altos", "Arroyos y Esteros", "Atyrá", "Caacupé", "Caraguatay", "Emboscada",
+        "Eusebio Ayala", "Isla Pucú", "Itacurubí de la Cordillera", "Juan de Mena",
+        "Loma Grande", "Mbocayaty del Yhaguy", "Nueva Colombia", "Piribebuy",
+        "Primero de Marzo", "San Bernardino", "San José Obrero", "Santa Elena",
+        "Tobatí", "Valenzuela",
+    ],
+    "Paraguarí": [
+        "Acahay", "Caapucú", "Carapeguá", "Escobar", "General Bernardino Caballero",
+        "La Colmena", "Mbuyapey", "Paraguarí", "Pirayú", "Quiindy", "Quyquyhó",
+        "San Roque González de Santa Cruz", "Sapucai", "Tebicuarymí", "Yaguarón",
+        "Ybycuí", "Ybytimí",
+    ],
+    "Guairá": [
+        "Borja", "Capitán Mauricio José Troche", "Coronel Martínez", "Doctor Bottrell",
+        "Félix Pérez Cardozo", "Independencia", "Iturbe", "José Fassardi", "Mbocayaty",
+        "Natalicio Talavera", "Ñumí", "Paso Yobái", "San Salvador", "Villarrica",
+        "Yataity",
+    ],
+    "Caaguazú": [
+        "Caaguazú", "Carayaó", "Coronel Oviedo", "Doctor Cecilio Báez",
+        "Doctor J. Eulogio Estigarribia", "Campo 9", "Nueva Londres", "R.I. 3 Corrales",
+        "Raúl Arsenio Oviedo", "Repatriación", "San Joaquín", "San José de los Arroyos",
+        "Santa Rosa del Mbutuy", "Simón Bolívar", "Tembiaporá", "Vaquería", "Yhú",
+    ],
+    "Caazapá": [
+        "Abai", "Buena Vista", "Caazapá", "Doctor Moisés Bertoni",
+        "General Higinio Morínigo", "Maciel", "Moñito", "San Juan Nepomuceno", "Tavaí",
+        "Tres de Mayo", "Yegros", "Yuty",
+    ],
+    "Itapúa": [
+        "Alto Verá", "Bella Vista", "Cambyretá", "Capitán Meza", "Capitán Miranda",
+        "Carlos Antonio López", "Carmen del Paraná", "Coronel Bogado", "Edelira",
+        "Encarnación", "Fram", "General Artigas", "General Delgado", "Hohenau", "Jesús",
+        "La Paz", "Mayor Otaño", "Natalio", "Nueva Alborada", "Obligado", "Pirapó",
+        "San Cosme y Damián", "San Juan del Paraná", "San Pedro del Paraná",
+        "San Rafael del Paraná", "Tomás Romero Pereira", "Trinidad", "Yatytay",
+    ],
+    "Misiones": [
+        "Ayolas", "San Ignacio", "San Juan Bautista", "San Miguel", "San Patricio",
+        "Santa María", "Santa Rosa", "Santiago", "Villa Florida", "Yabebyry",
+    ],
+    "Alto Paraná": [
+        "Ciudad del Este", "Doctor Juan León Mallorquín", "Domingo Martínez de Irala",
+        "Hernandarias", "Iruña", "Itakyry", "Juan Emilio O'Leary", "Los Cedrales",
+        "Mbaracayú", "Minga Guazú", "Minga Porá", "Naranjal", "Presidente Franco",
+        "San Alberto", "San Cristóbal", "Santa Fe del Paraná", "Santa Rita",
+        "Santa Rosa del Monday", "Tavapy", "Yguazú",
+    ],
+    "Ñeembucú": [
+        "Alberdi", "Cerrito", "Desmochados", "General José Eduvigis Díaz", "Guazú Cuá",
+        "Humaitá", "Isla Umbú", "Laureles", "Mayor José De Jesús Martínez",
+        "Paso de Patria", "Pilar", "San Juan Bautista de Ñeembucú", "Tacuaras",
+        "Villa Franca", "Villa Oliva", "Villalbín",
+    ],
+    "Amambay": [
+        "Bella Vista Norte", "Capitán Bado", "Karapaí", "Pedro Juan Caballero",
+        "Zanja Pytá",
+    ],
+    "Concepción": [
+        "Azotey", "Belén", "Concepción", "Horqueta", "Loreto", "Paso Barreto",
+        "San Alfredo", "San Carlos del Apa", "San Lázaro", "Yby Yaú",
+    ],
+    "San Pedro": [
+        "Antequera", "Choré", "General Aquino", "General Elizardo Aquino", "Guayaibí",
+        "Itacurubí del Rosario", "Liberación", "Lima", "Nueva Germania",
+        "San Estanislao", "San Pablo", "San Pedro del Ycuamandyyú",
+        "Santa Rosa del Aguaray", "Tacuatí", "Unión", "25 de Diciembre",
+        "Villa del Rosario", "Yataity del Norte",
+    ],
+    "Canindeyú": [
+        "Corpus Christi", "Curuguaty", "Gral. Francisco Caballero Álvarez", "Itanará",
+        "Katueté", "La Paloma del Espíritu Santo", "Nueva Esperanza",
+        "Salto del Guairá", "Villa Ygatimí", "Yasy Cañy", "Yby Pytá",
+    ],
+    "Presidente Hayes": [
+        "Benjamín Aceval", "General José María Bruguez", "José Falcón", "Nanawa",
+        "Nueva Asunción", "Puerto Pinasco", "Teniente Irala Fernández", "Villa Hayes",
+    ],
+    "Boquerón": [
+        "Filadelfia", "Loma Plata", "Neuland",
+    ],
+    "Alto Paraguay": [
+        "Bahía Negra", "Carmelo Peralta", "Fuerte Olimpo", "Puerto Casado",
+    ],
+}
+
+# Lista plana, en el mismo orden
+CIUDADES_PARAGUAY = [ciudad for ciudades in CIUDADES_POR_DEPARTAMENTO.values() for ciudad in ciudades]
+
+
+
+# Centroides aproximados (latitud, longitud) de cada ciudad/distrito para
+# calcular distancias sin conexión. Fuera de Central la precisión es la del
+# casco urbano: alcanza para estimar zonas y distancias, no para navegar.
+COORDENADAS_CIUDADES = {
     # Capital
-    "Asunción",
+    "Asunción": (-25.2637, -57.5759),
 
     # Central
-    "Areguá", "Capiatá", "Fernando de la Mora", "Guarambaré", "Itá",
-    "Itauguá", "Julián Augusto Saldívar", "Lambaré", "Limpio", "Luque",
-    "Mariano Roque Alonso", "Ñemby", "Nueva Italia", "San Antonio",
-    "San Lorenzo", "Villa Elisa", "Villeta", "Ypacaraí", "Ypané",
+    "Areguá": (-25.3125, -57.3847),
+    "Capiatá": (-25.3552, -57.4455),
+    "Fernando de la Mora": (-25.3386, -57.5217),
+    "Guarambaré": (-25.4917, -57.4556),
+    "Itá": (-25.5097, -57.3636),
+    "Itauguá": (-25.3925, -57.3544),
+    "Julián Augusto Saldívar": (-25.4354, -57.4468),
+    "Lambaré": (-25.3468, -57.6065),
+    "Limpio": (-25.1661, -57.4856),
+    "Luque": (-25.2700, -57.4872),
+    "Mariano Roque Alonso": (-25.2079, -57.5320),
+    "Ñemby": (-25.3949, -57.5357),
+    "Nueva Italia": (-25.6108, -57.4656),
+    "San Antonio": (-25.4213, -57.5476),
+    "San Lorenzo": (-25.3397, -57.5088),
+    "Villa Elisa": (-25.3676, -57.5927),
+    "Villeta": (-25.5097, -57.5567),
+    "Ypacaraí": (-25.4078, -57.2889),
+    "Ypané": (-25.4561, -57.5303),
 
     # Cordillera
-    "Altos", "Arroyos y Esteros", "Atyrá", "Caacupé", "Caraguatay",
-    "Emboscada", "Eusebio Ayala", "Isla Pucú", "Itacurubí de la Cordillera",
-    "Juan de Mena", "Loma Grande", "Mbocayaty del Yhaguy", "Nueva Colombia",
-    "Piribebuy", "Primero de Marzo", "San Bernardino", "San José Obrero",
-    "Santa Elena", "Tobatí", "Valenzuela",
+    "Altos": (-25.2600, -57.2500),
+    "Arroyos y Esteros": (-25.0500, -57.0900),
+    "Atyrá": (-25.2800, -57.1700),
+    "Caacupé": (-25.3860, -57.1400),
+    "Caraguatay": (-25.2300, -56.8200),
+    "Emboscada": (-25.1250, -57.3600),
+    "Eusebio Ayala": (-25.3900, -56.9700),
+    "Isla Pucú": (-25.1700, -56.9500),
+    "Itacurubí de la Cordillera": (-25.4500, -56.8500),
+    "Juan de Mena": (-24.9600, -56.7200),
+    "Loma Grande": (-25.1200, -57.2200),
+    "Mbocayaty del Yhaguy": (-25.0000, -56.8500),
+    "Nueva Colombia": (-25.1800, -57.3300),
+    "Piribebuy": (-25.4600, -57.0400),
+    "Primero de Marzo": (-24.9700, -56.9300),
+    "San Bernardino": (-25.3100, -57.2900),
+    "San José Obrero": (-25.3000, -56.9800),
+    "Santa Elena": (-25.4000, -56.8000),
+    "Tobatí": (-25.2600, -57.0800),
+    "Valenzuela": (-25.5500, -56.8600),
 
     # Paraguarí
-    "Acahay", "Caapucú", "Carapeguá", "Escobar", "General Bernardino Caballero",
-    "La Colmena", "Mbuyapey", "Paraguarí", "Pirayú", "Quiindy", "Quyquyhó",
-    "San Roque González de Santa Cruz", "Sapucai", "Tebicuarymí", "Yaguarón",
-    "Ybycuí", "Ybytimí",
+    "Acahay": (-25.9100, -57.1200),
+    "Caapucú": (-26.2400, -57.1900),
+    "Carapeguá": (-25.8000, -57.2400),
+    "Escobar": (-25.6500, -57.0500),
+    "General Bernardino Caballero": (-26.0500, -57.0100),
+    "La Colmena": (-25.8900, -56.8400),
+    "Mbuyapey": (-26.2100, -56.7500),
+    "Paraguarí": (-25.6200, -57.1500),
+    "Pirayú": (-25.4800, -57.2400),
+    "Quiindy": (-25.9700, -57.2600),
+    "Quyquyhó": (-26.2300, -56.9800),
+    "San Roque González de Santa Cruz": (-25.8700, -57.0900),
+    "Sapucai": (-25.6600, -56.9600),
+    "Tebicuarymí": (-26.0000, -56.6000),
+    "Yaguarón": (-25.5600, -57.2800),
+    "Ybycuí": (-26.0200, -56.9900),
+    "Ybytimí": (-25.7600, -56.7900),
 
     # Guairá
-    "Borja", "Capitán Mauricio José Troche", "Coronel Martínez", "Doctor Bottrell",
-    "Félix Pérez Cardozo", "Independencia", "Iturbe", "José Fassardi",
-    "Mbocayaty", "Natalicio Talavera", "Ñumí", "Paso Yobái", "San Salvador",
-    "Villarrica", "Yataity",
+    "Borja": (-25.9500, -56.4900),
+    "Capitán Mauricio José Troche": (-25.7900, -56.5300),
+    "Coronel Martínez": (-25.7500, -56.6200),
+    "Doctor Bottrell": (-25.8700, -56.4900),
+    "Félix Pérez Cardozo": (-25.7000, -56.6800),
+    "Independencia": (-25.7100, -56.2400),
+    "Iturbe": (-26.0600, -56.4900),
+    "José Fassardi": (-25.9500, -56.3200),
+    "Mbocayaty": (-25.7200, -56.4200),
+    "Natalicio Talavera": (-25.6500, -56.3000),
+    "Ñumí": (-25.9500, -56.3300),
+    "Paso Yobái": (-25.7200, -56.0300),
+    "San Salvador": (-25.8500, -56.3500),
+    "Villarrica": (-25.7800, -56.4500),
+    "Yataity": (-25.6800, -56.3300),
 
     # Caaguazú
-    "Caaguazú", "Carayaó", "Coronel Oviedo", "Doctor Cecilio Báez",
-    "Doctor J. Eulogio Estigarribia", "Campo 9", "Nueva Londres",
-    "R.I. 3 Corrales", "Raúl Arsenio Oviedo", "Repatriación", "San Joaquín",
-    "San José de los Arroyos", "Santa Rosa del Mbutuy", "Simón Bolívar",
-    "Tembiaporá", "Vaquería", "Yhú",
+    "Caaguazú": (-25.4700, -56.0200),
+    "Carayaó": (-25.2000, -56.4000),
+    "Coronel Oviedo": (-25.4500, -56.4400),
+    "Doctor Cecilio Báez": (-25.0500, -56.3200),
+    "Doctor J. Eulogio Estigarribia": (-25.3700, -55.7000),
+    "Campo 9": (-25.3700, -55.7000),
+    "Nueva Londres": (-25.4000, -56.5500),
+    "R.I. 3 Corrales": (-25.2200, -55.9000),
+    "Raúl Arsenio Oviedo": (-25.0500, -55.6000),
+    "Repatriación": (-25.5300, -55.9500),
+    "San Joaquín": (-25.0300, -56.0500),
+    "San José de los Arroyos": (-25.5300, -56.7400),
+    "Santa Rosa del Mbutuy": (-24.9700, -56.3300),
+    "Simón Bolívar": (-25.1200, -56.4000),
+    "Tembiaporá": (-25.0500, -55.2500),
+    "Vaquería": (-24.9000, -55.8000),
+    "Yhú": (-24.9900, -55.9200),
 
     # Caazapá
-    "Abai", "Buena Vista", "Caazapá", "Doctor Moisés Bertoni", "General Higinio Morínigo",
-    "Maciel", "Moñito", "San Juan Nepomuceno", "Tavaí", "Tres de Mayo", "Yegros", "Yuty",
+    "Abai": (-26.0300, -55.9400),
+    "Buena Vista": (-26.1800, -56.0800),
+    "Caazapá": (-26.1900, -56.3700),
+    "Doctor Moisés Bertoni": (-26.3700, -56.4700),
+    "General Higinio Morínigo": (-26.1000, -56.4500),
+    "Maciel": (-26.1800, -56.4500),
+    "Moñito": (-26.3000, -56.3000),
+    "San Juan Nepomuceno": (-26.1100, -55.9400),
+    "Tavaí": (-26.1800, -55.4700),
+    "Tres de Mayo": (-26.5000, -56.1500),
+    "Yegros": (-26.4000, -56.4000),
+    "Yuty": (-26.6100, -56.2500),
 
     # Itapúa
-    "Alto Verá", "Bella Vista", "Cambyretá", "Capitán Meza", "Capitán Miranda",
-    "Carlos Antonio López", "Carmen del Paraná", "Coronel Bogado", "Edelira",
-    "Encarnación", "Fram", "General Artigas", "General Delgado", "Hohenau",
-    "Jesús", "La Paz", "Mayor Otaño", "Natalio", "Nueva Alborada", "Obligado",
-    "Pirapó", "San Cosme y Damián", "San Juan del Paraná", "San Pedro del Paraná",
-    "San Rafael del Paraná", "Tomás Romero Pereira", "Trinidad", "Yatytay",
+    "Alto Verá": (-26.7300, -55.8500),
+    "Bella Vista": (-27.0500, -55.5700),
+    "Cambyretá": (-27.3300, -55.8000),
+    "Capitán Meza": (-26.9500, -55.3500),
+    "Capitán Miranda": (-27.2000, -55.8000),
+    "Carlos Antonio López": (-26.4000, -54.7400),
+    "Carmen del Paraná": (-27.2200, -56.1500),
+    "Coronel Bogado": (-27.1700, -56.2500),
+    "Edelira": (-26.8000, -55.3000),
+    "Encarnación": (-27.3300, -55.8700),
+    "Fram": (-27.0800, -56.0100),
+    "General Artigas": (-26.9300, -56.2200),
+    "General Delgado": (-27.1000, -56.5300),
+    "Hohenau": (-27.0800, -55.6500),
+    "Jesús": (-27.0500, -55.7500),
+    "La Paz": (-26.9500, -55.9000),
+    "Mayor Otaño": (-26.3700, -54.7300),
+    "Natalio": (-26.7000, -55.1200),
+    "Nueva Alborada": (-27.0000, -55.6500),
+    "Obligado": (-27.0500, -55.6300),
+    "Pirapó": (-26.8500, -55.5500),
+    "San Cosme y Damián": (-27.3200, -56.3300),
+    "San Juan del Paraná": (-27.2300, -55.9300),
+    "San Pedro del Paraná": (-26.8300, -56.2000),
+    "San Rafael del Paraná": (-26.6500, -54.9000),
+    "Tomás Romero Pereira": (-26.5000, -55.2500),
+    "Trinidad": (-27.1300, -55.7000),
+    "Yatytay": (-26.9800, -55.5500),
 
     # Misiones
-    "Ayolas", "San Ignacio", "San Juan Bautista", "San Miguel", "San Patricio",
-    "Santa María", "Santa Rosa", "Santiago", "Villa Florida", "Yabebyry",
+    "Ayolas": (-27.3900, -56.9000),
+    "San Ignacio": (-26.8900, -57.0300),
+    "San Juan Bautista": (-26.6700, -57.1500),
+    "San Miguel": (-26.5300, -57.0400),
+    "San Patricio": (-26.9700, -56.8300),
+    "Santa María": (-26.7800, -56.9000),
+    "Santa Rosa": (-26.8700, -56.8500),
+    "Santiago": (-27.1500, -56.7700),
+    "Villa Florida": (-26.3900, -57.1300),
+    "Yabebyry": (-27.3000, -57.1500),
 
     # Alto Paraná
-    "Ciudad del Este", "Doctor Juan León Mallorquín", "Domingo Martínez de Irala",
-    "Hernandarias", "Iruña", "Itakyry", "Juan Emilio O'Leary", "Los Cedrales",
-    "Mbaracayú", "Minga Guazú", "Minga Porá", "Naranjal", "Presidente Franco",
-    "San Alberto", "San Cristóbal", "Santa Fe del Paraná", "Santa Rita",
-    "Santa Rosa del Monday", "Tavapy", "Yguazú",
+    "Ciudad del Este": (-25.5100, -54.6100),
+    "Doctor Juan León Mallorquín": (-25.4000, -55.2200),
+    "Domingo Martínez de Irala": (-25.9500, -54.6000),
+    "Hernandarias": (-25.4100, -54.6400),
+    "Iruña": (-26.1000, -54.9200),
+    "Itakyry": (-24.9500, -55.1500),
+    "Juan Emilio O'Leary": (-25.4200, -55.3800),
+    "Los Cedrales": (-25.6500, -54.7200),
+    "Mbaracayú": (-25.0000, -54.8000),
+    "Minga Guazú": (-25.4800, -54.8000),
+    "Minga Porá": (-24.9000, -55.0000),
+    "Naranjal": (-25.9600, -55.1900),
+    "Presidente Franco": (-25.5600, -54.6100),
+    "San Alberto": (-24.9700, -54.9000),
+    "San Cristóbal": (-25.8700, -55.3500),
+    "Santa Fe del Paraná": (-25.2500, -54.7000),
+    "Santa Rita": (-25.7900, -55.0900),
+    "Santa Rosa del Monday": (-25.8200, -54.9000),
+    "Tavapy": (-25.6000, -55.0000),
+    "Yguazú": (-25.4500, -55.0000),
 
     # Ñeembucú
-    "Alberdi", "Cerrito", "Desmochados", "General José Eduvigis Díaz", "Guazú Cuá",
-    "Humaitá", "Isla Umbú", "Laureles", "Mayor José De Jesús Martínez",
-    "Paso de Patria", "Pilar", "San Juan Bautista de Ñeembucú", "Tacuaras",
-    "Villa Franca", "Villa Oliva", "Villalbín",
+    "Alberdi": (-26.1900, -58.1300),
+    "Cerrito": (-27.2500, -57.7500),
+    "Desmochados": (-27.1200, -58.1000),
+    "General José Eduvigis Díaz": (-26.9800, -58.1500),
+    "Guazú Cuá": (-26.9200, -57.8500),
+    "Humaitá": (-27.0600, -58.5100),
+    "Isla Umbú": (-26.9500, -58.3000),
+    "Laureles": (-27.2300, -57.4700),
+    "Mayor José De Jesús Martínez": (-26.7800, -58.0000),
+    "Paso de Patria": (-27.2800, -58.5700),
+    "Pilar": (-26.8600, -58.3000),
+    "San Juan Bautista de Ñeembucú": (-26.7000, -57.9000),
+    "Tacuaras": (-26.8300, -57.9500),
+    "Villa Franca": (-26.3300, -58.0500),
+    "Villa Oliva": (-26.0200, -57.8700),
+    "Villalbín": (-26.5500, -58.0500),
 
     # Amambay
-    "Bella Vista Norte", "Capitán Bado", "Karapaí", "Pedro Juan Caballero", "Zanja Pytá",
+    "Bella Vista Norte": (-22.1300, -56.5200),
+    "Capitán Bado": (-23.2700, -55.5400),
+    "Karapaí": (-22.7500, -55.8500),
+    "Pedro Juan Caballero": (-22.5500, -55.7300),
+    "Zanja Pytá": (-22.5200, -55.6500),
 
     # Concepción
-    "Azotey", "Belén", "Concepción", "Horqueta", "Loreto", "Paso Barreto",
-    "San Alfredo", "San Carlos del Apa", "San Lázaro", "Yby Yaú",
+    "Azotey": (-23.3000, -56.5000),
+    "Belén": (-23.4700, -57.2500),
+    "Concepción": (-23.4100, -57.4300),
+    "Horqueta": (-23.3400, -57.0500),
+    "Loreto": (-23.2700, -57.3300),
+    "Paso Barreto": (-22.9000, -57.2500),
+    "San Alfredo": (-22.4000, -57.2500),
+    "San Carlos del Apa": (-22.2000, -57.3000),
+    "San Lázaro": (-22.1700, -57.9300),
+    "Yby Yaú": (-22.9600, -56.5300),
 
     # San Pedro
-    "Antequera", "Choré", "General Aquino", "General Elizardo Aquino",
-    "Guayaibí", "Itacurubí del Rosario", "Liberación", "Lima", "Nueva Germania",
-    "San Estanislao", "San Pablo", "San Pedro del Ycuamandyyú", "Santa Rosa del Aguaray",
-    "Tacuatí", "Unión", "25 de Diciembre", "Villa del Rosario", "Yataity del Norte",
+    "Antequera": (-24.0800, -57.2000),
+    "Choré": (-24.1800, -56.5700),
+    "General Aquino": (-24.4500, -56.9000),
+    "General Elizardo Aquino": (-24.4200, -56.8200),
+    "Guayaibí": (-24.5000, -56.4000),
+    "Itacurubí del Rosario": (-24.5500, -56.8000),
+    "Liberación": (-24.1000, -56.4000),
+    "Lima": (-23.8800, -56.4800),
+    "Nueva Germania": (-23.9000, -56.7300),
+    "San Estanislao": (-24.6500, -56.4300),
+    "San Pablo": (-24.1500, -56.2000),
+    "San Pedro del Ycuamandyyú": (-24.0900, -57.0800),
+    "Santa Rosa del Aguaray": (-23.8000, -56.5000),
+    "Tacuatí": (-23.4500, -56.5800),
+    "Unión": (-24.8000, -56.5000),
+    "25 de Diciembre": (-24.7000, -56.5500),
+    "Villa del Rosario": (-24.4200, -57.1100),
+    "Yataity del Norte": (-24.1000, -56.8500),
 
     # Canindeyú
-    "Corpus Christi", "Curuguaty", "Gral. Francisco Caballero Álvarez", "Itanará",
-    "Katueté", "La Paloma del Espíritu Santo", "Nueva Esperanza", "Salto del Guairá",
-    "Villa Ygatimí", "Yasy Cañy", "Yby Pytá",
+    "Corpus Christi": (-24.0800, -54.9300),
+    "Curuguaty": (-24.4700, -55.6900),
+    "Gral. Francisco Caballero Álvarez": (-24.1000, -54.4500),
+    "Itanará": (-23.8000, -55.4500),
+    "Katueté": (-24.2500, -54.7500),
+    "La Paloma del Espíritu Santo": (-24.1200, -54.6000),
+    "Nueva Esperanza": (-24.5000, -54.8500),
+    "Salto del Guairá": (-24.0600, -54.3100),
+    "Villa Ygatimí": (-24.0800, -55.5000),
+    "Yasy Cañy": (-24.4000, -55.9000),
+    "Yby Pytá": (-24.3000, -55.6000),
 
-    # Presidente Hayes
-    "Benjamín Aceval", "General José María Bruguez", "José Falcón", "Nanawa",
-    "Nueva Asunción", "Puerto Pinasco", "Tacuaras", "Teniente Irala Fernández",
-    "Villa Hayes",
+    # Presidente Hayes ("Tacuaras" se ubica en Ñeembucú)
+    "Benjamín Aceval": (-24.9700, -57.5700),
+    "General José María Bruguez": (-24.7500, -58.8300),
+    "José Falcón": (-25.2400, -57.7200),
+    "Nanawa": (-25.2700, -57.6700),
+    "Nueva Asunción": (-20.7000, -61.9300),
+    "Puerto Pinasco": (-22.6400, -57.7900),
+    "Teniente Irala Fernández": (-22.8000, -59.6000),
+    "Villa Hayes": (-25.1000, -57.5200),
 
     # Boquerón
-    "Filadelfia", "Loma Plata", "Neuland",
+    "Filadelfia": (-22.3500, -60.0300),
+    "Loma Plata": (-22.3800, -59.8500),
+    "Neuland": (-22.6500, -60.1200),
 
     # Alto Paraguay
-    "Bahía Negra", "Carmelo Peralta", "Fuerte Olimpo", "Puerto Casado"
-]
+    "Bahía Negra": (-20.2300, -58.1700),
+    "Carmelo Peralta": (-21.6800, -57.9000),
+    "Fuerte Olimpo": (-21.0400, -57.8700),
+    "Puerto Casado": (-22.2900, -57.9400),
+}
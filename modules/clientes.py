@@ -11,7 +11,7 @@ from modules.utils import (
 )
 from modules.session_service import session
 from modules import dashboard
-from modules.ciudades_paraguay import CIUDADES_PARAGUAY
+from modules import busqueda_service as busqueda
 
 
 def crud_view(content, page=None):
@@ -112,20 +112,24 @@ def crud_view(content, page=None):
         page.update()
 
     def buscar_ciudad(e):
-        """Busca ciudades del Paraguay"""
+        """Busca ciudades del Paraguay (sin importar tildes), agrupadas por departamento"""
         sugerencias_ciudad.controls.clear()
-        texto = ciudad.value.strip().lower()
+        texto = ciudad.value.strip()
 
         if texto:
-            resultados = [c for c in CIUDADES_PARAGUAY if texto in c.lower()][:5]
-            for r in resultados:
+            resultados = busqueda.buscar_ciudades(texto, 5)
+            for departamento, ciudades in busqueda.buscador_ciudades().agrupar(resultados).items():
                 sugerencias_ciudad.controls.append(
-                    ft.TextButton(
-                        r,
-                        on_click=lambda ev, val=r: seleccionar_ciudad(val),
-                        style=ft.ButtonStyle(color=Colors.PRIMARY)
-                    )
+                    ft.Text(departamento, size=FontSizes.TINY, color=Colors.TEXT_SECONDARY, weight="bold")
                 )
+                for r in ciudades:
+                    sugerencias_ciudad.controls.append(
+                        ft.TextButton(
+                            r,
+                            on_click=lambda ev, val=r: seleccionar_ciudad(val),
+                            style=ft.ButtonStyle(color=Colors.PRIMARY)
+                        )
+                    )
             sugerencias_ciudad.visible = True if resultados else False
         else:
             sugerencias_ciudad.visible = False
@@ -339,7 +343,7 @@ def crud_view(content, page=None):
                     nombre_clean,
                     ruc_clean,
                     telefono.value.strip() or None,
-                    ciudad.value.strip() or None,
+                    busqueda.validar_ciudad(ciudad.value) or ciudad.value.strip() or None,
                     ubicacion.value.strip() or None,
                     correo.value.strip() or None
                 ))
@@ -412,7 +416,7 @@ def crud_view(content, page=None):
                     nombre_clean,
                     ruc_clean,
                     telefono.value.strip() or None,
-                    ciudad.value.strip() or None,
+                    busqueda.validar_ciudad(ciudad.value) or ciudad.value.strip() or None,
                     ubicacion.value.strip() or None,
                     correo.value.strip() or None,
                     selected_id["id"]
@@ -0,0 +1,379 @@
+"""
+Módulo de Órdenes de Compra y Recepción de Mercadería
+Las órdenes se arman por proveedor y se reciben completas o por partes:
+toda la entrega se graba con una sola operación (stock, costo y kardex).
+"""
+import flet as ft
+from modules.db_service import db
+from modules.config import Colors, FontSizes, Sizes, Messages, Icons, Spacing
+from modules.utils import format_guarani, parse_guarani, to_int
+from modules.session_service import session
+from modules import dashboard
+from modules import compras_service as compras
+
+
+def crud_view(content, page=None):
+    """Vista de órdenes de compra: alta de órdenes y recepción"""
+    content.controls.clear()
+
+    # === VARIABLES DE ESTADO ===
+    lineas_nuevas = {}          # producto_id -> [nombre, cantidad, precio]
+    orden_actual = {"id": None}
+    campos_recepcion = {}       # producto_id -> (TextField cantidad, TextField costo)
+
+    productos_lista = db.cached_query(
+        "SELECT id, nombre, COALESCE(precio_compra, 0) FROM productos ORDER BY nombre", tags=["productos"]
+    )
+    costos = {pid: costo for pid, _, costo in productos_lista}
+    proveedores_lista = db.cached_query("SELECT id, nombre FROM proveedores ORDER BY nombre", tags=["proveedores"])
+
+    # === CAMPOS DE NUEVA ORDEN ===
+    proveedor = ft.Dropdown(
+        label="Proveedor",
+        width=Sizes.INPUT_WIDTH_LARGE,
+        options=[ft.dropdown.Option(str(pid), nombre) for pid, nombre in proveedores_lista],
+    )
+    producto = ft.Dropdown(
+        label="Producto",
+        width=Sizes.INPUT_WIDTH_MEDIUM,
+        options=[ft.dropdown.Option(str(pid), nombre) for pid, nombre, _ in productos_lista],
+    )
+    cantidad = ft.TextField(label="Cantidad", width=100, height=Sizes.INPUT_HEIGHT)
+    precio = ft.TextField(label="Costo unit.", width=130, height=Sizes.INPUT_HEIGHT, hint_text="Gs.")
+    observaciones = ft.TextField(label="Observaciones", width=Sizes.INPUT_WIDTH_LARGE, multiline=True, max_lines=3)
+    error_msg = ft.Text("", color=Colors.ERROR, size=FontSizes.SMALL)
+    total_orden = ft.Text("", weight="bold", color=Colors.PRIMARY)
+
+    tabla_nueva = ft.DataTable(
+        columns=[
+            ft.DataColumn(ft.Text("Producto", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Cant.", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Costo", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("", color=Colors.PRIMARY)),
+        ],
+        rows=[],
+        column_spacing=10,
+    )
+
+    # === TABLAS DE ÓRDENES ===
+    filtro_estado = ft.Dropdown(
+        label="Estado",
+        width=160,
+        value="",
+        options=[ft.dropdown.Option("", "Todos")] + [ft.dropdown.Option(e) for e in compras.ESTADOS_ORDEN],
+    )
+    tabla_ordenes = ft.DataTable(
+        columns=[
+            ft.DataColumn(ft.Text("N°", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Proveedor", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Fecha", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Líneas", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Total", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Estado", color=Colors.PRIMARY)),
+        ],
+        rows=[],
+        column_spacing=12,
+        show_checkbox_column=False,
+    )
+
+    titulo_recepcion = ft.Text("Seleccione una orden para recibir", weight="bold", color=Colors.PRIMARY)
+    remito = ft.TextField(label="Remito / factura", width=200, height=Sizes.INPUT_HEIGHT)
+    tabla_recepcion = ft.DataTable(
+        columns=[
+            ft.DataColumn(ft.Text("Producto", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Pedido", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Recibido", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Recibir", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Costo", color=Colors.PRIMARY)),
+        ],
+        rows=[],
+        column_spacing=10,
+    )
+
+    # === FUNCIONES DE UTILIDAD ===
+    def show_snackbar(msg: str, color: str):
+        """Muestra mensaje temporal"""
+        page.open(ft.SnackBar(
+            content=ft.Text(msg, color=Colors.TEXT_WHITE),
+            bgcolor=color,
+            duration=3000
+        ))
+
+    def refrescar_nueva():
+        """Redibuja las líneas de la orden en armado"""
+        tabla_nueva.rows = [
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(nombre, size=FontSizes.SMALL)),
+                ft.DataCell(ft.Text(str(cant))),
+                ft.DataCell(ft.Text(format_guarani(costo))),
+                ft.DataCell(ft.IconButton(
+                    icon=Icons.DELETE, icon_color=Colors.ERROR, tooltip="Quitar",
+                    on_click=lambda e, pid=pid: quitar_linea(pid),
+                )),
+            ]) for pid, (nombre, cant, costo) in lineas_nuevas.items()
+        ]
+        total = sum(cant * costo for _, cant, costo in lineas_nuevas.values())
+        total_orden.value = f"{len(lineas_nuevas)} productos - Total {format_guarani(total)}" if lineas_nuevas else ""
+        page.update()
+
+    def agregar_linea(e):
+        error_msg.value = ""
+        cant = to_int(cantidad.value)
+        if not producto.value or not cant or cant <= 0:
+            error_msg.value = "Seleccione un producto y una cantidad válida"
+            page.update()
+            return
+        pid = int(producto.value)
+        nombre = next(o.text for o in producto.options if o.key == producto.value)
+        costo = parse_guarani(precio.value) if precio.value.strip() else costos.get(pid, 0)
+        anterior = lineas_nuevas.get(pid, [nombre, 0, costo])
+        lineas_nuevas[pid] = [nombre, anterior[1] + cant, costo]
+        cantidad.value = ""
+        precio.value = ""
+        refrescar_nueva()
+
+    def quitar_linea(pid):
+        lineas_nuevas.pop(pid, None)
+        refrescar_nueva()
+
+    def cargar_sugeridos(e):
+        """Agrega los productos del proveedor que están bajo el stock mínimo"""
+        if not proveedor.value:
+            error_msg.value = "Seleccione el proveedor"
+            page.update()
+            return
+        sugeridas = compras.lineas_sugeridas(int(proveedor.value))
+        for linea in sugeridas:
+            lineas_nuevas[linea["producto_id"]] = [linea["nombre"], linea["cantidad"], linea["precio_compra"] or 0]
+        show_snackbar(f"📉 {len(sugeridas)} productos sugeridos para reponer", Colors.INFO)
+        refrescar_nueva()
+
+    def crear_orden(e):
+        if not session.tiene_permiso("proveedores", "crear"):
+            show_snackbar(Messages.ERROR_PERMISSION, Colors.ERROR)
+            return
+        if not proveedor.value or not lineas_nuevas:
+            error_msg.value = "La orden necesita proveedor y al menos un producto"
+            page.update()
+            return
+        try:
+            orden_id = compras.crear_orden(
+                int(proveedor.value),
+                [(pid, cant, costo or None) for pid, (_, cant, costo) in lineas_nuevas.items()],
+                observaciones=observaciones.value.strip(),
+            )
+            lineas_nuevas.clear()
+            observaciones.value = ""
+            refrescar_nueva()
+            refrescar_ordenes()
+            abrir_orden(orden_id)
+            show_snackbar(f"✅ Orden de compra #{orden_id} creada", Colors.SUCCESS)
+        except Exception as ex:
+            error_msg.value = f"{Messages.ERROR_CREATE}: {ex}"
+            print(f"❌ Error creando orden de compra: {ex}")
+            page.update()
+
+    # === ÓRDENES Y RECEPCIÓN ===
+    def refrescar_ordenes(e=None):
+        try:
+            ordenes = compras.listar_ordenes(estado=filtro_estado.value or None)
+        except Exception as ex:
+            print(f"❌ Error listando órdenes de compra: {ex}")
+            ordenes = []
+        colores = {"Pendiente": Colors.WARNING, "Parcial": Colors.INFO, "Recibida": Colors.SUCCESS, "Anulada": Colors.TEXT_DISABLED}
+        tabla_ordenes.rows = [
+            ft.DataRow(
+                cells=[
+                    ft.DataCell(ft.Text(str(o["id"]))),
+                    ft.DataCell(ft.Text(o["proveedor"] or "")),
+                    ft.DataCell(ft.Text(str(o["fecha"])[:16])),
+                    ft.DataCell(ft.Text(str(o["lineas"]))),
+                    ft.DataCell(ft.Text(format_guarani(o["total"]))),
+                    ft.DataCell(ft.Text(o["estado"], color=colores.get(o["estado"]), weight="bold")),
+                ],
+                on_select_changed=lambda e, oid=o["id"]: abrir_orden(oid),
+            ) for o in ordenes
+        ]
+        page.update()
+
+    def abrir_orden(orden_id):
+        """Carga la orden en el panel de recepción con lo pendiente ya completado"""
+        orden = compras.obtener_orden(orden_id)
+        if not orden:
+            return
+        orden_actual["id"] = orden_id
+        campos_recepcion.clear()
+        editable = orden["estado"] in ("Pendiente", "Parcial")
+        titulo_recepcion.value = f"Orden #{orden_id} - {orden['proveedor'] or ''} ({orden['estado']})"
+
+        filas = []
+        for linea in orden["lineas"]:
+            recibir_campo = ft.TextField(
+                value=str(linea["pendiente"]), width=80, height=Sizes.INPUT_HEIGHT,
+                disabled=not editable or not linea["pendiente"],
+            )
+            costo_campo = ft.TextField(
+                value=str(linea["precio_compra"] or ""), width=110, height=Sizes.INPUT_HEIGHT, disabled=not editable,
+            )
+            campos_recepcion[linea["producto_id"]] = (recibir_campo, costo_campo)
+            filas.append(ft.DataRow(cells=[
+                ft.DataCell(ft.Text(linea["nombre"] or "", size=FontSizes.SMALL)),
+                ft.DataCell(ft.Text(str(linea["cantidad"]))),
+                ft.DataCell(ft.Text(str(linea["recibida"]))),
+                ft.DataCell(recibir_campo),
+                ft.DataCell(costo_campo),
+            ]))
+        tabla_recepcion.rows = filas
+        boton_recibir.disabled = not editable
+        boton_anular.disabled = orden["estado"] != "Pendiente"
+        page.update()
+
+    def recibir_mercaderia(e):
+        """Graba toda la recepción en una sola transacción"""
+        if not orden_actual["id"]:
+            return
+        if not session.tiene_permiso("proveedores", "editar"):
+            show_snackbar(Messages.ERROR_PERMISSION, Colors.ERROR)
+            return
+        lineas = []
+        for pid, (recibir_campo, costo_campo) in campos_recepcion.items():
+            cant = to_int(recibir_campo.value) if not recibir_campo.disabled else 0
+            if cant and cant > 0:
+                costo = parse_guarani(costo_campo.value) if costo_campo.value.strip() else None
+                lineas.append((pid, cant, costo))
+        if not lineas:
+            show_snackbar("⚠️ No hay cantidades para recibir", Colors.WARNING)
+            return
+        try:
+            resultado = compras.recibir(orden_actual["id"], lineas, referencia=remito.value.strip() or None)
+            remito.value = ""
+            show_snackbar(
+                f"📦 Recibidas {resultado['unidades']} unidades de {resultado['productos']} productos ({resultado['estado']})",
+                Colors.SUCCESS,
+            )
+            refrescar_ordenes()
+            abrir_orden(orden_actual["id"])
+        except ValueError as ex:
+            show_snackbar(f"⚠️ {ex}", Colors.WARNING)
+        except Exception as ex:
+            print(f"❌ Error recibiendo mercadería: {ex}")
+            show_snackbar(f"{Messages.ERROR_UPDATE}: {ex}", Colors.ERROR)
+
+    def anular(e):
+        if not orden_actual["id"]:
+            return
+        try:
+            compras.anular_orden(orden_actual["id"])
+            refrescar_ordenes()
+            abrir_orden(orden_actual["id"])
+            show_snackbar("Orden anulada", Colors.WARNING)
+        except ValueError as ex:
+            show_snackbar(f"⚠️ {ex}", Colors.WARNING)
+
+    boton_recibir = ft.ElevatedButton(
+        "Recibir mercadería",
+        on_click=recibir_mercaderia,
+        bgcolor=Colors.SUCCESS,
+        color=Colors.TEXT_WHITE,
+        icon=Icons.SAVE,
+        height=Sizes.BUTTON_HEIGHT,
+        disabled=True,
+    )
+    boton_anular = ft.ElevatedButton(
+        "Anular",
+        on_click=anular,
+        bgcolor=Colors.ERROR,
+        color=Colors.TEXT_WHITE,
+        icon=Icons.CANCEL,
+        height=Sizes.BUTTON_HEIGHT,
+        disabled=True,
+    )
+
+    volver_icon = ft.IconButton(
+        icon=Icons.BACK,
+        tooltip="Volver al Dashboard",
+        icon_color=Colors.PRIMARY,
+        on_click=lambda e: dashboard.dashboard_view(content, page=page),
+        bgcolor=ft.colors.with_opacity(0.1, Colors.PRIMARY),
+    )
+
+    # === TARJETA DE NUEVA ORDEN ===
+    form_card = ft.Container(
+        content=ft.Column(
+            [
+                ft.Row([volver_icon, ft.Text("Órdenes de Compra", size=FontSizes.XLARGE, weight="bold", color=Colors.PRIMARY)]),
+                proveedor,
+                ft.Row([producto, cantidad], spacing=Spacing.SMALL),
+                ft.Row([
+                    precio,
+                    ft.ElevatedButton("Agregar", on_click=agregar_linea, icon=Icons.ADD, height=Sizes.BUTTON_HEIGHT),
+                    ft.TextButton("Cargar sugeridos", on_click=cargar_sugeridos, icon=ft.icons.TRENDING_DOWN),
+                ], spacing=Spacing.SMALL, wrap=True),
+                ft.Container(
+                    content=ft.Column([tabla_nueva], scroll=ft.ScrollMode.AUTO),
+                    height=260,
+                    border=ft.border.all(1, Colors.BORDER_LIGHT),
+                    border_radius=Sizes.CARD_RADIUS,
+                ),
+                total_orden,
+                observaciones,
+                error_msg,
+                ft.ElevatedButton(
+                    "Crear orden",
+                    on_click=crear_orden,
+                    bgcolor=Colors.PRIMARY,
+                    color=Colors.TEXT_WHITE,
+                    icon=Icons.ADD,
+                    height=Sizes.BUTTON_HEIGHT,
+                ),
+            ],
+            spacing=Spacing.MEDIUM,
+            scroll=ft.ScrollMode.AUTO,
+        ),
+        width=480,
+        height=700,
+        padding=Sizes.CARD_PADDING,
+        border_radius=Sizes.CARD_RADIUS,
+        bgcolor=Colors.CARD_BG,
+        shadow=ft.BoxShadow(blur_radius=12, color=ft.colors.with_opacity(0.2, Colors.TEXT_PRIMARY)),
+    )
+
+    # === TARJETA DE ÓRDENES Y RECEPCIÓN ===
+    ordenes_card = ft.Container(
+        content=ft.Column([
+            ft.Row([filtro_estado, ft.IconButton(icon=Icons.REFRESH, on_click=refrescar_ordenes)]),
+            ft.Container(
+                content=ft.Column([tabla_ordenes], scroll=ft.ScrollMode.AUTO),
+                height=240,
+                border=ft.border.all(1, Colors.BORDER_LIGHT),
+                border_radius=Sizes.CARD_RADIUS,
+            ),
+            titulo_recepcion,
+            ft.Container(
+                content=ft.Column([tabla_recepcion], scroll=ft.ScrollMode.AUTO),
+                height=260,
+                border=ft.border.all(1, Colors.BORDER_LIGHT),
+                border_radius=Sizes.CARD_RADIUS,
+            ),
+            ft.Row([remito, boton_recibir, boton_anular], spacing=Spacing.MEDIUM),
+        ], spacing=Spacing.MEDIUM, scroll=ft.ScrollMode.AUTO),
+        expand=True,
+        height=700,
+        padding=Sizes.CARD_PADDING,
+        border_radius=Sizes.CARD_RADIUS,
+        bgcolor=Colors.CARD_BG,
+        shadow=ft.BoxShadow(blur_radius=12, color=ft.colors.with_opacity(0.2, Colors.TEXT_PRIMARY)),
+    )
+
+    # === LAYOUT PRINCIPAL ===
+    content.controls.append(
+        ft.Row([form_card, ordenes_card], alignment=ft.MainAxisAlignment.SPACE_EVENLY, expand=True)
+    )
+
+    # === EVENTOS ===
+    filtro_estado.on_change = refrescar_ordenes
+
+    # === CARGA INICIAL ===
+    refrescar_ordenes()
+
+    print("✅ Módulo de Órdenes de Compra cargado")
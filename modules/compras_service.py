@@ -0,0 +1,317 @@
+"""
+Órdenes de compra y recepción de mercadería
+Una orden agrupa las líneas pedidas a un proveedor; recibirla (total o
+parcialmente) suma el stock, actualiza el precio de compra y escribe el
+kardex en una sola transacción, con sentencias por lote y no por línea.
+"""
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, Optional, Sequence
+from modules.db_service import db
+from modules.bulk_load import lotes, actualizar_por_caso
+from modules.session_service import session
+from modules import inventario_service as inventario
+from modules import reposicion_service as reposicion
+from modules.config import COMPRAS_LOTE_LINEAS
+
+
+ESTADOS_ORDEN = ("Pendiente", "Parcial", "Recibida", "Anulada")
+
+
+def _agrupar_lineas(lineas: Iterable[Sequence]) -> "OrderedDict[int, List]":
+    """
+    Suma las cantidades por producto (la misma planta puede venir en varias filas)
+
+    Returns:
+        {producto_id: [cantidad, precio_compra o None]} en orden de aparición
+
+    Raises:
+        ValueError si alguna cantidad o precio no es válido
+    """
+    agrupadas: "OrderedDict[int, List]" = OrderedDict()
+    for linea in lineas:
+        producto_id, cantidad = int(linea[0]), int(linea[1])
+        precio = linea[2] if len(linea) > 2 else None
+        if cantidad <= 0:
+            raise ValueError(f"Cantidad inválida para el producto #{producto_id}: {cantidad}")
+        if precio is not None and int(precio) < 0:
+            raise ValueError(f"Precio de compra inválido para el producto #{producto_id}")
+        actual = agrupadas.setdefault(producto_id, [0, None])
+        actual[0] += cantidad
+        if precio is not None:
+            actual[1] = int(precio)
+    return agrupadas
+
+
+# ========================================
+# ÓRDENES
+# ========================================
+
+def crear_orden(
+    proveedor_id: int,
+    lineas: Iterable[Sequence],
+    observaciones: Optional[str] = None,
+    usuario: Optional[str] = None
+) -> int:
+    """
+    Crea una orden de compra
+
+    Args:
+        proveedor_id: Proveedor al que se le compra
+        lineas: (producto_id, cantidad) o (producto_id, cantidad, precio_compra)
+        observaciones: Texto libre
+
+    Returns:
+        ID de la orden
+
+    Raises:
+        ValueError si la orden no tiene líneas válidas
+    """
+    agrupadas = _agrupar_lineas(lineas)
+    if not agrupadas:
+        raise ValueError("La orden no tiene productos")
+
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "INSERT INTO ordenes_compra (proveedor_id, observaciones, usuario) VALUES (%s, %s, %s) RETURNING id",
+                (proveedor_id, observaciones or None, usuario or session.get_username())
+            )
+            orden_id = cur.fetchone()[0]
+            filas = [(orden_id, pid, cantidad, precio) for pid, (cantidad, precio) in agrupadas.items()]
+            for lote in lotes(filas, COMPRAS_LOTE_LINEAS):
+                valores = ", ".join(["(%s, %s, %s, %s)"] * len(lote))
+                cur.execute(
+                    f"INSERT INTO detalle_orden_compra (orden_id, producto_id, cantidad, precio_compra) VALUES {valores}",
+                    [valor for fila in lote for valor in fila]
+                )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    print(f"🧾 Orden de compra #{orden_id} creada: {len(agrupadas)} productos")
+    return orden_id
+
+
+def obtener_orden(orden_id: int) -> Optional[Dict[str, Any]]:
+    """
+    Orden con sus líneas
+
+    Returns:
+        {"id", "proveedor_id", "proveedor", "fecha", "estado", "observaciones", "fecha_recepcion",
+         "lineas": [{"producto_id", "nombre", "cantidad", "recibida", "pendiente", "precio_compra"}]}
+        o None si no existe
+    """
+    orden = db.execute_query("""
+        SELECT o.id, o.proveedor_id, p.nombre, o.fecha, o.estado, o.observaciones, o.fecha_recepcion
+        FROM ordenes_compra o
+        LEFT JOIN proveedores p ON p.id = o.proveedor_id
+        WHERE o.id = %s
+    """, (orden_id,), fetch="one")
+    if not orden:
+        return None
+
+    lineas = db.execute_query("""
+        SELECT d.producto_id, pr.nombre, d.cantidad, d.cantidad_recibida, d.precio_compra
+        FROM detalle_orden_compra d
+        LEFT JOIN productos pr ON pr.id = d.producto_id
+        WHERE d.orden_id = %s
+        ORDER BY pr.nombre
+    """, (orden_id,))
+    return {
+        "id": orden[0], "proveedor_id": orden[1], "proveedor": orden[2], "fecha": orden[3],
+        "estado": orden[4], "observaciones": orden[5], "fecha_recepcion": orden[6],
+        "lineas": [
+            {"producto_id": pid, "nombre": nombre, "cantidad": cantidad, "recibida": recibida,
+             "pendiente": max(cantidad - recibida, 0), "precio_compra": precio}
+            for pid, nombre, cantidad, recibida, precio in lineas
+        ],
+    }
+
+
+def listar_ordenes(
+    estado: Optional[str] = None,
+    proveedor_id: Optional[int] = None,
+    limite: int = 50
+) -> List[Dict[str, Any]]:
+    """Órdenes más recientes primero, con cantidad de líneas y total estimado"""
+    condiciones, params = ["1=1"], []
+    if estado:
+        condiciones.append("o.estado = %s")
+        params.append(estado)
+    if proveedor_id:
+        condiciones.append("o.proveedor_id = %s")
+        params.append(proveedor_id)
+
+    filas = db.execute_query(f"""
+        SELECT o.id, p.nombre, o.fecha, o.estado, COUNT(d.producto_id),
+               COALESCE(SUM(d.cantidad * COALESCE(d.precio_compra, 0)), 0)
+        FROM ordenes_compra o
+        LEFT JOIN proveedores p ON p.id = o.proveedor_id
+        LEFT JOIN detalle_orden_compra d ON d.orden_id = o.id
+        WHERE {' AND '.join(condiciones)}
+        GROUP BY o.id, p.nombre, o.fecha, o.estado
+        ORDER BY o.id DESC
+        LIMIT {int(limite)}
+    """, tuple(params))
+    return [
+        {"id": f[0], "proveedor": f[1], "fecha": f[2], "estado": f[3], "lineas": f[4], "total": int(f[5])}
+        for f in filas
+    ]
+
+
+def anular_orden(orden_id: int):
+    """
+    Anula una orden sin recepciones
+
+    Raises:
+        ValueError si no existe o ya tiene mercadería recibida
+    """
+    filas = db.execute_command(
+        "UPDATE ordenes_compra SET estado = 'Anulada' WHERE id = %s AND estado = 'Pendiente'", (orden_id,)
+    )
+    if not filas:
+        raise ValueError(f"La orden #{orden_id} no existe o ya tiene recepciones")
+    print(f"🚫 Orden de compra #{orden_id} anulada")
+
+
+def lineas_sugeridas(proveedor_id: int) -> List[Dict[str, Any]]:
+    """
+    Productos del proveedor bajo el stock mínimo con la cantidad sugerida
+    (punto de partida para armar una orden)
+
+    Returns:
+        [{"producto_id", "nombre", "cantidad", "precio_compra"}, ...]
+    """
+    sugerencias = {s["id"]: s for s in reposicion.sugerencias() if s["sugerido"] > 0}
+    if not sugerencias or not db.schema.has_column("productos", "proveedor_id"):
+        return []
+    marcadores = ", ".join(["%s"] * len(sugerencias))
+    filas = db.execute_query(
+        f"SELECT id, precio_compra FROM productos WHERE proveedor_id = %s AND id IN ({marcadores})",
+        (proveedor_id,) + tuple(sugerencias)
+    )
+    precios = dict(filas)
+    return [
+        {"producto_id": pid, "nombre": s["nombre"], "cantidad": s["sugerido"], "precio_compra": precios[pid]}
+        for pid, s in sugerencias.items() if pid in precios
+    ]
+
+
+# ========================================
+# RECEPCIÓN
+# ========================================
+
+def recibir(
+    orden_id: Optional[int] = None,
+    lineas: Optional[Iterable[Sequence]] = None,
+    referencia: Optional[str] = None,
+    usuario: Optional[str] = None
+) -> Dict[str, Any]:
+    """
+    Recibe mercadería en una sola transacción
+
+    Por cada lote de líneas: un INSERT de movimientos 'recepcion', un UPDATE
+    de stock y otro de precio de compra. Si algo falla no queda nada a medias.
+
+    Args:
+        orden_id: Orden que se recibe (None = ingreso directo sin orden)
+        lineas: (producto_id, cantidad) o (producto_id, cantidad, precio_compra);
+                None recibe todo lo pendiente de la orden
+        referencia: Remito o factura del proveedor
+
+    Returns:
+        {"orden_id", "productos", "unidades", "estado"}
+
+    Raises:
+        ValueError si la orden no admite recepción, las líneas no son válidas
+        o alguna supera lo pendiente de la orden
+    """
+    if orden_id is None and lineas is None:
+        raise ValueError("Indique la orden o las líneas a recibir")
+    usuario = usuario or session.get_username()
+    bloqueo = " FOR UPDATE" if db.db_type == "postgresql" else ""
+    costo = db.schema.first_column("productos", "precio_compra")
+    actualizacion = ", fecha_actualizacion = CURRENT_TIMESTAMP" if db.schema.has_column("productos", "fecha_actualizacion") else ""
+    estado = None
+
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            pedidas: Dict[int, Sequence] = {}
+            if orden_id is not None:
+                cur.execute(f"SELECT estado FROM ordenes_compra WHERE id = %s{bloqueo}", (orden_id,))
+                orden = cur.fetchone()
+                if not orden:
+                    raise ValueError(f"No existe la orden #{orden_id}")
+                if orden[0] in ("Recibida", "Anulada"):
+                    raise ValueError(f"La orden #{orden_id} está {orden[0].lower()}")
+                cur.execute(
+                    "SELECT producto_id, cantidad, cantidad_recibida, precio_compra FROM detalle_orden_compra WHERE orden_id = %s",
+                    (orden_id,)
+                )
+                pedidas = {f[0]: f for f in cur.fetchall()}
+                if lineas is None:
+                    lineas = [(pid, f[1] - f[2]) for pid, f in pedidas.items() if f[1] > f[2]]
+
+            agrupadas = _agrupar_lineas(lineas)
+            if not agrupadas:
+                raise ValueError("No hay mercadería para recibir")
+            ajenos = [pid for pid in agrupadas if orden_id is not None and pid not in pedidas]
+            if ajenos:
+                raise ValueError(f"Productos fuera de la orden: {', '.join(map(str, ajenos))}")
+            if orden_id is not None:
+                excedidos = [
+                    f"#{pid} ({cantidad} de {pedidas[pid][1] - pedidas[pid][2]} pendientes)"
+                    for pid, (cantidad, _) in agrupadas.items() if cantidad > pedidas[pid][1] - pedidas[pid][2]
+                ]
+                if excedidos:
+                    raise ValueError(f"Se recibe más de lo pendiente: {', '.join(excedidos)}")
+
+            # Stock y kardex
+            if not referencia:
+                referencia = f"OC #{orden_id}" if orden_id is not None else "Ingreso directo"
+            inventario.registrar_movimientos(
+                cur, [(pid, cantidad) for pid, (cantidad, _) in agrupadas.items()],
+                "recepcion", referencia=referencia, usuario=usuario
+            )
+
+            # Último costo: el de la línea recibida o, si no vino, el de la orden
+            precios = []
+            for pid, (_, precio) in agrupadas.items():
+                if precio is None and pid in pedidas:
+                    precio = pedidas[pid][3]
+                if precio:
+                    precios.append((pid, precio))
+            if costo and precios:
+                actualizar_por_caso(cur, "productos", f"{costo} = {{casos}}{actualizacion}", "id", precios, COMPRAS_LOTE_LINEAS)
+
+            if orden_id is not None:
+                actualizar_por_caso(
+                    cur, "detalle_orden_compra", "cantidad_recibida = cantidad_recibida + {casos}", "producto_id",
+                    [(pid, cantidad) for pid, (cantidad, _) in agrupadas.items()], COMPRAS_LOTE_LINEAS,
+                    filtro="orden_id = %s AND ", params_filtro=(orden_id,)
+                )
+                cur.execute(
+                    "SELECT COUNT(*) FROM detalle_orden_compra WHERE orden_id = %s AND cantidad_recibida < cantidad",
+                    (orden_id,)
+                )
+                estado = "Parcial" if cur.fetchone()[0] else "Recibida"
+                cur.execute(
+                    "UPDATE ordenes_compra SET estado = %s, fecha_recepcion = CURRENT_TIMESTAMP WHERE id = %s",
+                    (estado, orden_id)
+                )
+
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    unidades = sum(cantidad for cantidad, _ in agrupadas.values())
+    print(f"📦 Recepción {referencia}: {len(agrupadas)} productos, {unidades} unidades")
+    return {"orden_id": orden_id, "productos": len(agrupadas), "unidades": unidades, "estado": estado}
@@ -18,6 +18,41 @@ DB_POOL_MIN = 1
 DB_POOL_MAX = 10
 DB_TIMEOUT = 10
 
+# Tiempo máximo por sentencia (ms); 0 = sin límite. Los reportes usan su propio límite
+DB_STATEMENT_TIMEOUT_MS = int(os.environ.get("DB_STATEMENT_TIMEOUT_MS", "0"))
+DB_REPORT_TIMEOUT_MS = int(os.environ.get("DB_REPORT_TIMEOUT_MS", "15000"))
+
+# Cargas masivas (db.bulk_load / db.execute_many)
+DB_BULK_CHUNK_SIZE = 5000   # filas por lote de COPY / INSERT
+DB_BATCH_PAGE_SIZE = 500    # sentencias por viaje en execute_many (PostgreSQL)
+
+# Réplica de solo lectura (reportes, dashboard); opcional
+DATABASE_REPLICA_URL = os.environ.get("DATABASE_REPLICA_URL")
+DB_REPLICA_MAX_LAG = float(os.environ.get("DB_REPLICA_MAX_LAG", "30"))  # segundos de atraso tolerados
+DB_REPLICA_CHECK_SECONDS = 5  # cada cuánto se vuelve a medir el atraso / reintentar tras una falla
+
+# SQLite (desarrollo / sucursales sin conexión): una conexión persistente por hilo
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",          # Lectores no bloquean al escritor
+    "synchronous": "NORMAL",        # fsync solo en checkpoints (seguro con WAL)
+    "mmap_size": 268435456,         # 256 MB mapeados en memoria
+    "cache_size": -65536,           # 64 MB de caché de páginas (negativo = KiB)
+    "busy_timeout": 5000,           # Esperar 5 s ante un bloqueo antes de fallar
+    "temp_store": "MEMORY",
+}
+
+# Instrumentación de consultas (latencias, filas, consultas lentas)
+DB_METRICS_ENABLED = os.environ.get("DB_METRICS_ENABLED", "1") == "1"
+DB_SLOW_QUERY_MS = int(os.environ.get("DB_SLOW_QUERY_MS", "250"))
+DB_SLOW_QUERY_SAMPLE = float(os.environ.get("DB_SLOW_QUERY_SAMPLE", "1.0"))  # 0.0 - 1.0
+DB_SLOW_QUERY_LOG_SIZE = 200
+DB_METRICS_DUMP_SECONDS = int(os.environ.get("DB_METRICS_DUMP_SECONDS", "0"))  # 0 = desactivado
+
+# Caché de resultados de lectura (db.cached_query)
+DB_CACHE_MAX_ENTRIES = int(os.environ.get("DB_CACHE_MAX_ENTRIES", "256"))  # 0 = desactivada
+DB_CACHE_MAX_BYTES = 16 * 1024 * 1024
+DB_CACHE_TTL = 60  # segundos; acota lo desactualizado ante escrituras de otros procesos
+
 # ========================================
 # CONFIGURACIÓN DE SEGURIDAD
 # ========================================
@@ -182,6 +217,67 @@ REPORTES_DIR = "reportes"
 TICKETS_DIR = "tickets"
 TEMP_DIR = "temp"
 
+# Importación / exportación del catálogo de productos
+CATALOGO_LOTE_VALIDACION = 1000  # filas validadas por lote
+CATALOGO_MAX_EJEMPLOS = 50       # cambios y errores mostrados en la vista previa
+
+# Ajustes masivos de precios
+PRECIO_REDONDEOS = [1, 50, 100, 500, 1000]  # múltiplos de Gs. permitidos al redondear
+PRECIO_REDONDEO_DEFAULT = 100
+PRECIO_MAX_EJEMPLOS = 20                     # productos mostrados en la vista previa
+
+# Kardex de stock (movimientos_stock)
+INVENTARIO_SNAPSHOT_HORAS = int(os.environ.get("INVENTARIO_SNAPSHOT_HORAS", "24"))  # 0 = sin cortes automáticos
+INVENTARIO_LOTE_MOVIMIENTOS = 500  # movimientos por INSERT
+
+# Reposición (productos bajo el stock mínimo)
+REPOSICION_DIAS_VENTAS = 30       # ventana para calcular la velocidad de venta
+REPOSICION_DIAS_COBERTURA = 14    # días de venta que debe cubrir la reposición sugerida
+REPOSICION_REFRESCO_SEGUNDOS = 60 # recálculo de alertas si no llegan avisos de escritura
+
+# Órdenes de compra y recepción de mercadería
+COMPRAS_LOTE_LINEAS = 500  # líneas por sentencia al grabar o recibir una orden
+
+# Rutas de entrega
+RUTAS_ORIGEN = (  # ubicación del vivero (lat, lon)
+    float(os.environ.get("VIVERO_LATITUD", "-25.3397")),
+    float(os.environ.get("VIVERO_LONGITUD", "-57.5088")),
+)
+RUTAS_VELOCIDAD_KMH = 25       # velocidad promedio de reparto en ciudad
+RUTAS_FACTOR_DESVIO = 1.3      # km por calle / km en línea recta
+RUTAS_MINUTOS_PARADA = 10      # tiempo de entrega en cada parada
+RUTAS_HORA_CIERRE = 18         # hora límite del día de entrega (fecha_entrega)
+RUTAS_TIEMPO_MAXIMO = 0.5      # segundos de mejora local por ruta (luego se usa la mejor hallada)
+RUTAS_CACHE_MAX = 64           # recorridos calculados que se conservan
+
+# Geocodificación sin conexión (ciudades_paraguay + tabla geocodificaciones)
+GEO_CELDA_GRADOS = 0.25        # lado de la celda de la grilla espacial (~25 km)
+GEO_LOTE_DIRECCIONES = 500     # direcciones por consulta al geocodificar en bloque
+GEO_CACHE_MAX = 2048           # direcciones resueltas que se conservan en memoria
+
+# Costo de delivery (pedidos). Tarifa de la zona o, fuera de las zonas, por km de
+# recorrido desde el vivero (RUTAS_ORIGEN); más un recargo según las unidades.
+DELIVERY_ZONAS = {  # zona: (tarifa en Gs., ciudades)
+    "Local": (15000, ["San Lorenzo", "Fernando de la Mora", "Capiatá", "Luque"]),
+    "Gran Asunción": (25000, [
+        "Asunción", "Lambaré", "Villa Elisa", "Ñemby", "San Antonio", "Mariano Roque Alonso",
+        "Limpio", "Julián Augusto Saldívar", "Itauguá", "Areguá", "Ypané",
+    ]),
+}
+DELIVERY_TARIFAS_KM = [(10, 15000), (20, 25000), (40, 45000), (80, 70000), (150, 110000)]  # (hasta km, tarifa)
+DELIVERY_COSTO_KM_EXTRA = 800         # Gs. por km más allá del último tramo
+DELIVERY_RECARGOS_VOLUMEN = [(20, 10000), (50, 25000), (100, 50000)]  # (desde unidades, recargo)
+DELIVERY_RADIO_ZONA_KM = 3            # coordenadas a esta distancia de una ciudad con zona toman su tarifa
+DELIVERY_REDONDEO = 1000              # múltiplo de Gs. del costo calculado
+
+# Autocompletado de productos (índice compartido de busqueda_service)
+BUSQUEDA_SUGERENCIAS = 5              # sugerencias bajo el campo de producto de pedidos
+BUSQUEDA_MAX_RESULTADOS = 100         # productos mostrados en el catálogo del punto de venta al filtrar
+
+# PDF de despacho (tickets de varios pedidos unidos, con hoja de ruta)
+DESPACHO_PROCESOS = None              # procesos que dibujan tickets (None = núcleos del equipo)
+DESPACHO_MIN_PARALELO = 12            # con menos tickets se dibujan en el mismo proceso
+
 # Formato de fecha
 DATE_FORMAT = "%d/%m/%Y"
 DATETIME_FORMAT = "%d/%m/%Y %H:%M:%S"
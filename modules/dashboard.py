@@ -2,53 +2,94 @@
 Módulo Dashboard
 Migrado a nueva arquitectura con PostgreSQL, Config y Utils
 """
+import asyncio
 import flet as ft
 from modules.db_service import db
+from modules.async_db_service import adb
 from modules.config import Colors, FontSizes, Sizes, Messages, Icons, Spacing
 from modules.utils import format_guarani
 from modules.session_service import session
-from modules import productos, clientes, proveedores, pedidos, ventas, reportes, usuarios
+from modules import productos, clientes, proveedores, pedidos, ventas, reportes, usuarios, compras
+from modules import reposicion_service as reposicion
+
+
+# Suscripción a alertas de stock del dashboard de cada página (sesión web)
+_alertas_por_pagina = {}
+
+
+def cancelar_alertas(page):
+    """Cancela la suscripción a alertas de stock del dashboard de esta página"""
+    cancelar = _alertas_por_pagina.pop(page, None)
+    if cancelar:
+        cancelar()
+
+
+def _cancelar_alertas_al_cerrar(page):
+    """Encadena cancelar_alertas al on_close de la página sin pisar el handler que ya tenga"""
+    anterior = page.on_close
+    if getattr(anterior, "cancela_alertas", False):
+        return  # Ya encadenado en una apertura anterior del dashboard
+
+    def al_cerrar(e):
+        cancelar_alertas(page)
+        if anterior:
+            anterior(e)
+
+    al_cerrar.cancela_alertas = True
+    page.on_close = al_cerrar
+
+
+# KPI -> consulta de una sola fila
+_CONSULTAS_KPI = {
+    "ventas_totales": "SELECT COALESCE(SUM(total), 0) FROM ventas",
+    "pedidos_pendientes": "SELECT COUNT(*) FROM pedidos WHERE estado='Pendiente'",
+    "pedidos_entregados": "SELECT COUNT(*) FROM pedidos WHERE estado='Entregado'",
+    "clientes_totales": "SELECT COUNT(*) FROM clientes",
+}
 
 
 def obtener_kpis():
     """Obtiene los KPIs del dashboard desde PostgreSQL"""
-    kpis = {
-        "ventas_totales": 0,
-        "pedidos_pendientes": 0,
-        "pedidos_entregados": 0,
-        "clientes_totales": 0
-    }
+    kpis = dict.fromkeys(_CONSULTAS_KPI, 0)
 
     try:
-        with db.get_connection() as conn:
+        with db.get_connection(read_only=True) as conn:
             cur = conn.cursor()
+            for clave, consulta in _CONSULTAS_KPI.items():
+                cur.execute(consulta)
+                kpis[clave] = cur.fetchone()[0]
 
-            # Ventas totales
-            cur.execute("SELECT COALESCE(SUM(total), 0) FROM ventas")
-            kpis["ventas_totales"] = cur.fetchone()[0]
-
-            # Pedidos pendientes
-            cur.execute("SELECT COUNT(*) FROM pedidos WHERE estado='Pendiente'")
-            kpis["pedidos_pendientes"] = cur.fetchone()[0]
+    except Exception as e:
+        print(f"Error obteniendo KPIs: {e}")
 
-            # Pedidos entregados
-            cur.execute("SELECT COUNT(*) FROM pedidos WHERE estado='Entregado'")
-            kpis["pedidos_entregados"] = cur.fetchone()[0]
+    return kpis
 
-            # Clientes totales
-            cur.execute("SELECT COUNT(*) FROM clientes")
-            kpis["clientes_totales"] = cur.fetchone()[0]
 
+async def obtener_kpis_async():
+    """
+    Versión async de obtener_kpis (adb): las consultas corren a la vez, no
+    ocupan un hilo del handler mientras esperan y, como la versión
+    sincrónica, leen de la réplica si está disponible
+    """
+    try:
+        filas = await asyncio.gather(*[
+            adb.execute_query(q, fetch="one", read_only=True) for q in _CONSULTAS_KPI.values()
+        ])
+        return {clave: fila[0] for clave, fila in zip(_CONSULTAS_KPI, filas)}
     except Exception as e:
         print(f"Error obteniendo KPIs: {e}")
+        return dict.fromkeys(_CONSULTAS_KPI, 0)
 
-    return kpis
+
+def formatear_kpi(clave, valor):
+    """Texto de la tarjeta de un KPI"""
+    return format_guarani(valor) if clave == "ventas_totales" else f"{valor}"
 
 
 def obtener_ventas_recientes():
     """Obtiene las ventas más recientes desde PostgreSQL"""
     try:
-        with db.get_connection() as conn:
+        with db.get_connection(read_only=True) as conn:
             cur = conn.cursor()
             cur.execute("""
                 SELECT v.id, c.nombre, v.total, v.fecha_venta
@@ -66,7 +107,7 @@ def obtener_ventas_recientes():
 def obtener_pedidos_recientes():
     """Obtiene los pedidos más recientes desde PostgreSQL"""
     try:
-        with db.get_connection() as conn:
+        with db.get_connection(read_only=True) as conn:
             cur = conn.cursor()
             cur.execute("""
                 SELECT p.id, c.nombre, p.destino, p.estado, p.fecha_pedido
@@ -81,6 +122,15 @@ def obtener_pedidos_recientes():
         return []
 
 
+def obtener_alertas_stock():
+    """Productos bajo el stock mínimo con la cantidad sugerida a reponer"""
+    try:
+        return reposicion.sugerencias()
+    except Exception as e:
+        print(f"Error obteniendo alertas de stock: {e}")
+        return []
+
+
 def dashboard_view(content, page=None):
     """Vista principal del dashboard"""
     # Limpiar contenido según el tipo de contenedor
@@ -137,6 +187,7 @@ def dashboard_view(content, page=None):
         ("Productos", ft.icons.SPA, "productos", productos.crud_view),
         ("Clientes", ft.icons.PEOPLE, "clientes", clientes.crud_view),
         ("Proveedores", ft.icons.LOCAL_SHIPPING, "proveedores", proveedores.crud_view),
+        ("Compras", ft.icons.INVENTORY, "proveedores", compras.crud_view),
         ("Pedidos", ft.icons.RECEIPT, "pedidos", pedidos.crud_view),
         ("Ventas", ft.icons.PAID, "ventas", ventas.crud_view),
         ("Reportes", ft.icons.INSERT_CHART, "reportes", reportes.crud_view),
@@ -158,6 +209,7 @@ def dashboard_view(content, page=None):
 
     # Botón de cerrar sesión
     def cerrar_sesion(e):
+        cancelar_alertas(page)
         session.logout()
         from modules import auth
         auth.login_view(content, page)
@@ -205,14 +257,23 @@ def dashboard_view(content, page=None):
         shadow=ft.BoxShadow(blur_radius=15, color="#444"),
     )
 
-    # KPIs Cards
-    kpis = obtener_kpis()
+    # KPIs Cards: con página se cargan después de mostrar la vista (async)
+    kpi_textos = {
+        clave: ft.Text("…" if page else formatear_kpi(clave, valor), size=FontSizes.XLARGE, weight="bold")
+        for clave, valor in (dict.fromkeys(_CONSULTAS_KPI) if page else obtener_kpis()).items()
+    }
+
+    async def cargar_kpis():
+        for clave, valor in (await obtener_kpis_async()).items():
+            kpi_textos[clave].value = formatear_kpi(clave, valor)
+        page.update(*kpi_textos.values())
+
     kpi_cards = ft.Row([
         ft.Container(
             content=ft.Column([
                 ft.Icon(ft.icons.PAID, color=Colors.INFO, size=32),
                 ft.Text("Ventas Totales", size=FontSizes.NORMAL, text_align=ft.TextAlign.CENTER),
-                ft.Text(format_guarani(kpis['ventas_totales']), size=FontSizes.XLARGE, weight="bold"),
+                kpi_textos["ventas_totales"],
             ], spacing=Spacing.SMALL, alignment=ft.MainAxisAlignment.CENTER),
             bgcolor="#E3F2FD",
             padding=Spacing.LARGE,
@@ -224,7 +285,7 @@ def dashboard_view(content, page=None):
             content=ft.Column([
                 ft.Icon(ft.icons.RECEIPT, color=Colors.WARNING, size=32),
                 ft.Text("Pedidos Pendientes", size=FontSizes.NORMAL, text_align=ft.TextAlign.CENTER),
-                ft.Text(f"{kpis['pedidos_pendientes']}", size=FontSizes.XLARGE, weight="bold"),
+                kpi_textos["pedidos_pendientes"],
             ], spacing=Spacing.SMALL, alignment=ft.MainAxisAlignment.CENTER),
             bgcolor="#FFF3E0",
             padding=Spacing.LARGE,
@@ -236,7 +297,7 @@ def dashboard_view(content, page=None):
             content=ft.Column([
                 ft.Icon(ft.icons.DONE, color=Colors.SUCCESS, size=32),
                 ft.Text("Pedidos Entregados", size=FontSizes.NORMAL, text_align=ft.TextAlign.CENTER),
-                ft.Text(f"{kpis['pedidos_entregados']}", size=FontSizes.XLARGE, weight="bold"),
+                kpi_textos["pedidos_entregados"],
             ], spacing=Spacing.SMALL, alignment=ft.MainAxisAlignment.CENTER),
             bgcolor="#E8F5E9",
             padding=Spacing.LARGE,
@@ -248,7 +309,7 @@ def dashboard_view(content, page=None):
             content=ft.Column([
                 ft.Icon(ft.icons.PEOPLE, color="#0288D1", size=32),
                 ft.Text("Clientes Totales", size=FontSizes.NORMAL, text_align=ft.TextAlign.CENTER),
-                ft.Text(f"{kpis['clientes_totales']}", size=FontSizes.XLARGE, weight="bold"),
+                kpi_textos["clientes_totales"],
             ], spacing=Spacing.SMALL, alignment=ft.MainAxisAlignment.CENTER),
             bgcolor="#E3F2FD",
             padding=Spacing.LARGE,
@@ -324,6 +385,64 @@ def dashboard_view(content, page=None):
         shadow=ft.BoxShadow(blur_radius=10, color="#BBB"),
     )
 
+    # Alertas de reposición (se actualizan solas cuando cambia el stock)
+    def filas_alertas(alertas):
+        colores = {"AGOTADO": Colors.ERROR, "CRÍTICO": "#FF5722", "BAJO": Colors.WARNING}
+        return [
+            ft.DataRow(cells=[
+                ft.DataCell(ft.Text(a["nombre"] or "")),
+                ft.DataCell(ft.Text(str(a["stock"]))),
+                ft.DataCell(ft.Text(a["estado"], color=colores[a["estado"]], weight="bold")),
+                ft.DataCell(ft.Text(str(a["sugerido"]), weight="bold")),
+            ]) for a in alertas[:8]
+        ]
+
+    alertas = obtener_alertas_stock()
+    alertas_titulo = ft.Text(f"Reposición ({len(alertas)})", weight="bold", size=FontSizes.LARGE, color=Colors.PRIMARY)
+    alertas_tabla = ft.DataTable(
+        columns=[
+            ft.DataColumn(ft.Text("Producto", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Stock", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Estado", color=Colors.PRIMARY)),
+            ft.DataColumn(ft.Text("Sugerido", color=Colors.PRIMARY)),
+        ],
+        rows=filas_alertas(alertas),
+        column_spacing=8,
+    )
+
+    alertas_card = ft.Container(
+        content=ft.Column([
+            alertas_titulo,
+            ft.ListView([ft.Row([alertas_tabla], scroll=ft.ScrollMode.AUTO)], expand=True, height=220)
+        ], spacing=Spacing.NORMAL),
+        bgcolor=Colors.CARD_BG,
+        border_radius=Sizes.CARD_RADIUS,
+        padding=Spacing.LARGE,
+        expand=True,
+        shadow=ft.BoxShadow(blur_radius=10, color="#BBB"),
+    )
+
+    def al_cambiar_stock(nuevos, total):
+        """Llamado desde el hilo de alertas cuando productos pasan a stock bajo"""
+        alertas_actuales = obtener_alertas_stock()
+        alertas_titulo.value = f"Reposición ({total})"
+        alertas_tabla.rows = filas_alertas(alertas_actuales)
+        if page:
+            nombres = ", ".join(a["nombre"] for a in nuevos[:3]) + ("..." if len(nuevos) > 3 else "")
+            page.open(ft.SnackBar(
+                content=ft.Text(f"📉 Stock bajo: {nombres}", color=Colors.TEXT_WHITE),
+                bgcolor=Colors.WARNING,
+                duration=4000
+            ))
+            page.update()
+
+    # Una suscripción por página: reabrir el dashboard reemplaza la anterior
+    # y cerrar la sesión de Flet (el navegador se fue) la cancela
+    cancelar_alertas(page)
+    _alertas_por_pagina[page] = reposicion.suscribir(al_cambiar_stock)
+    if page:
+        _cancelar_alertas_al_cerrar(page)
+
     # Información de permisos del usuario
     permisos_info = ft.Container(
         content=ft.Column([
@@ -364,7 +483,7 @@ def dashboard_view(content, page=None):
         ft.Divider(),
         kpi_cards,
         ft.Divider(),
-        ft.Row([ventas_card, pedidos_card], spacing=Spacing.LARGE, expand=True),
+        ft.Row([ventas_card, pedidos_card, alertas_card], spacing=Spacing.LARGE, expand=True),
     ], expand=True, spacing=Spacing.XLARGE, horizontal_alignment=ft.CrossAxisAlignment.START)
 
     # Agregar contenido según el tipo de contenedor
@@ -386,5 +505,6 @@ def dashboard_view(content, page=None):
 
     if page:
         page.update()
+        page.run_task(cargar_kpis)
 
     print("✅ Dashboard cargado (PostgreSQL + Nueva Arquitectura)")
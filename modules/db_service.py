@@ -3,13 +3,331 @@ Servicio de base de datos unificado
 Maneja conexiones PostgreSQL y SQLite de forma transparente
 """
 import os
+import glob
+import time
 import psycopg2
+import psycopg2.extras
 import sqlite3
 from psycopg2 import pool
 from contextlib import contextmanager
-from threading import Lock
-from typing import Optional, Any, Tuple, List
-from modules.config import DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_TIMEOUT
+from threading import Lock, local
+from typing import Optional, Any, Callable, Tuple, List, Dict, Iterable, Sequence
+from modules.config import (
+    DATABASE_URL, DB_POOL_MIN, DB_POOL_MAX, DB_TIMEOUT, SQLITE_PRAGMAS,
+    DATABASE_REPLICA_URL, DB_REPLICA_MAX_LAG, DB_REPLICA_CHECK_SECONDS,
+    DB_STATEMENT_TIMEOUT_MS, DB_BULK_CHUNK_SIZE, DB_BATCH_PAGE_SIZE
+)
+from modules import bulk_load as carga
+from modules.query_metrics import metrics, modulo_llamador
+from modules.query_cache import QueryCache
+from modules.schema_registry import SchemaRegistry
+from modules.sql_dialect import translate_to_sqlite, tablas_modificadas, tablas_leidas
+
+
+class QueryCancelledError(Exception):
+    """La consulta se canceló (desde la UI o por una consulta más nueva con la misma clave)"""
+
+
+class QueryTimeoutError(QueryCancelledError):
+    """La consulta superó su tiempo máximo de ejecución"""
+
+
+class _ControlConsulta:
+    """
+    Límite de tiempo y cancelación de las sentencias de un bloque get_connection
+    PostgreSQL: statement_timeout + conn.cancel(); SQLite: progress handler + interrupt()
+
+    En SQLite el límite corre por sentencia, como statement_timeout: el cursor
+    llama a iniciar_sentencia() antes de cada execute. Los bloques anidados
+    comparten la conexión del hilo, así que cada control recuerda el que
+    estaba activo y lo vuelve a instalar al salir.
+
+    cancelar() y desactivar() se excluyen con un lock propio: una vez
+    desactivado el bloque su conexión puede volver al pool (o ejecutar la
+    sentencia siguiente del hilo) y una cancelación tardía se ignora.
+    """
+    __slots__ = ("conn", "motor", "timeout", "limite", "cancelada", "anterior", "terminada", "_lock")
+
+    # Instrucciones de la VM de SQLite entre chequeos del progress handler
+    PASOS_SQLITE = 1000
+
+    # Control instalado en cada conexión SQLite: {id(conn): _ControlConsulta}
+    _activos_sqlite: Dict[int, "_ControlConsulta"] = {}
+
+    def __init__(self, conn, motor: str, timeout_ms: Optional[int]):
+        self.conn = conn
+        self.motor = motor
+        self.timeout = timeout_ms / 1000 if timeout_ms else None
+        self.limite = None
+        self.cancelada = False
+        self.anterior: Optional["_ControlConsulta"] = None
+        self.terminada = False
+        self._lock = Lock()
+        self.iniciar_sentencia()
+
+    def iniciar_sentencia(self):
+        """Reinicia el límite de tiempo (SQLite; en PostgreSQL lo aplica el servidor)"""
+        if self.timeout is not None:
+            self.limite = time.monotonic() + self.timeout
+
+    def cancelar(self) -> bool:
+        """
+        Cancela la sentencia en curso (seguro desde otro hilo)
+
+        Returns:
+            False si el bloque ya había terminado (no se toca la conexión)
+        """
+        with self._lock:
+            if self.terminada:
+                return False
+            self.cancelada = True
+            try:
+                if self.motor == "postgresql":
+                    self.conn.cancel()
+                else:
+                    self.conn.interrupt()
+            except Exception as e:
+                print(f"⚠️ No se pudo cancelar la consulta: {e}")
+            return True
+
+    def _interrumpir_sqlite(self) -> int:
+        if self.limite is not None and time.monotonic() > self.limite:
+            return 1
+        # La cancelación de un bloque exterior también corta las sentencias anidadas
+        control = self
+        while control is not None:
+            if control.cancelada:
+                return 1
+            control = control.anterior
+        return 0
+
+    def activar(self, timeout_ms: Optional[int]):
+        if self.motor == "sqlite":
+            self.anterior = self._activos_sqlite.get(id(self.conn))
+            self._activos_sqlite[id(self.conn)] = self
+            self.conn.set_progress_handler(self._interrumpir_sqlite, self.PASOS_SQLITE)
+        elif timeout_ms:
+            # Fuera de toda transacción: el SET no se pierde si el llamador revierte
+            cur = self.conn.cursor()
+            cur.execute("SET statement_timeout = %s", (int(timeout_ms),))
+            cur.close()
+            if not self.conn.autocommit:
+                self.conn.commit()
+
+    def desactivar(self, timeout_ms: Optional[int]):
+        # Espera a una cancelación en curso; desde aquí ya no se cancela
+        with self._lock:
+            self.terminada = True
+        if self.motor == "sqlite":
+            # Vuelve el control del bloque exterior (o ninguno)
+            if self.anterior is not None:
+                self._activos_sqlite[id(self.conn)] = self.anterior
+                self.conn.set_progress_handler(self.anterior._interrumpir_sqlite, self.PASOS_SQLITE)
+            else:
+                self._activos_sqlite.pop(id(self.conn), None)
+                self.conn.set_progress_handler(None, 0)
+        elif timeout_ms and not self.conn.closed:
+            if self.conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                self.conn.rollback()  # El pool también descarta lo no confirmado
+            cur = self.conn.cursor()
+            cur.execute("RESET statement_timeout")
+            cur.close()
+            if not self.conn.autocommit:
+                self.conn.commit()
+
+    def es_cancelacion(self, error: Exception) -> bool:
+        """True si el error lo produjo el límite de tiempo o la cancelación"""
+        if self.motor == "postgresql":
+            return isinstance(error, psycopg2.extensions.QueryCanceledError)
+        return isinstance(error, sqlite3.OperationalError) and "interrupted" in str(error)
+
+
+class InstrumentedCursor:
+    """
+    Envoltorio de cursor que registra latencia, filas leídas y módulo
+    llamador de cada sentencia, traduce el SQL al dialecto SQLite cuando
+    corresponde y anota las tablas escritas para invalidar la caché.
+    Delega todo lo demás al cursor real.
+    """
+    __slots__ = ("_cursor", "_huella", "_traducir", "_conexion")
+
+    def __init__(self, cursor, traducir: bool = False, conexion=None):
+        self._cursor = cursor
+        self._huella = None
+        self._traducir = traducir
+        self._conexion = conexion
+
+    def execute(self, query, params=None):
+        sql = translate_to_sqlite(query) if self._traducir else query
+        if self._conexion is not None:
+            self._conexion.iniciar_sentencia()
+        inicio = time.perf_counter() if metrics.enabled else None
+        try:
+            if params is None:
+                resultado = self._cursor.execute(sql)
+            else:
+                resultado = self._cursor.execute(sql, params)
+        finally:
+            if inicio is not None:
+                ms = (time.perf_counter() - inicio) * 1000
+                self._huella = metrics.record(query, ms, modulo_llamador(), params)
+        if self._conexion is not None:
+            self._conexion.registrar_escritura(query)
+        return resultado
+
+    def executemany(self, query, params_list):
+        sql = translate_to_sqlite(query) if self._traducir else query
+        if self._conexion is not None:
+            self._conexion.iniciar_sentencia()
+        inicio = time.perf_counter() if metrics.enabled else None
+        try:
+            resultado = self._cursor.executemany(sql, params_list)
+        finally:
+            if inicio is not None:
+                ms = (time.perf_counter() - inicio) * 1000
+                self._huella = metrics.record(query, ms, modulo_llamador())
+        if self._conexion is not None:
+            self._conexion.registrar_escritura(query)
+        return resultado
+
+    def fetchone(self):
+        fila = self._cursor.fetchone()
+        if fila is not None and self._huella:
+            metrics.add_rows(self._huella, 1)
+        return fila
+
+    def fetchmany(self, *args, **kwargs):
+        filas = self._cursor.fetchmany(*args, **kwargs)
+        if self._huella:
+            metrics.add_rows(self._huella, len(filas))
+        return filas
+
+    def fetchall(self):
+        filas = self._cursor.fetchall()
+        if self._huella:
+            metrics.add_rows(self._huella, len(filas))
+        return filas
+
+    def __iter__(self):
+        for fila in self._cursor:
+            if self._huella:
+                metrics.add_rows(self._huella, 1)
+            yield fila
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self._cursor.close()
+        return False
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+
+class InstrumentedConnection:
+    """
+    Envoltorio de conexión que entrega cursores instrumentados
+    Al confirmar, invalida en la caché las tablas escritas en la transacción.
+    Delega atributos (autocommit, ...) a la conexión real.
+    Con 'savepoint' (bloque SQLite anidado) commit y rollback actúan solo
+    hasta ese savepoint y la transacción del bloque exterior decide
+    """
+    __slots__ = ("_conn", "_traducir", "_sucias", "_cache", "_control", "_savepoint")
+
+    def __init__(self, conn, traducir: bool = False, sucias: Optional[set] = None, cache=None,
+                 control: Optional[_ControlConsulta] = None, savepoint: Optional[str] = None):
+        object.__setattr__(self, "_conn", conn)
+        object.__setattr__(self, "_traducir", traducir)
+        object.__setattr__(self, "_sucias", sucias if sucias is not None else set())
+        object.__setattr__(self, "_cache", cache)
+        object.__setattr__(self, "_control", control)
+        object.__setattr__(self, "_savepoint", savepoint)
+
+    def cursor(self, *args, **kwargs):
+        return InstrumentedCursor(self._conn.cursor(*args, **kwargs), self._traducir, self)
+
+    def iniciar_sentencia(self):
+        """Reinicia el límite de tiempo por sentencia del bloque (SQLite)"""
+        if self._control is not None:
+            self._control.iniciar_sentencia()
+
+    def registrar_escritura(self, query: str):
+        """Anota las tablas que modifica la sentencia (si es una escritura)"""
+        if self._cache is None:
+            return
+        tablas = tablas_modificadas(query)
+        if not tablas:
+            return
+        if self._en_transaccion():
+            self._sucias.update(tablas)
+        else:
+            # Autocommit: la escritura ya es visible
+            self._cache.invalidate(tablas)
+
+    def _en_transaccion(self) -> bool:
+        if hasattr(self._conn, "in_transaction"):
+            return self._conn.in_transaction  # sqlite3
+        return not self._conn.autocommit  # psycopg2
+
+    def commit(self):
+        if self._savepoint:
+            self._conn.execute(f"RELEASE SAVEPOINT {self._savepoint}")
+            confirmada = not self._conn.in_transaction  # El bloque exterior no tenía transacción
+            self._conn.execute(f"SAVEPOINT {self._savepoint}")
+            if not confirmada:
+                return
+        else:
+            self._conn.commit()
+        self._invalidar_sucias()
+
+    def rollback(self):
+        if self._savepoint:
+            # Las tablas sucias quedan anotadas: son compartidas con el bloque exterior
+            self._conn.execute(f"ROLLBACK TO SAVEPOINT {self._savepoint}")
+            return
+        self._conn.rollback()
+        self._invalidar_sucias()
+
+    def _invalidar_sucias(self):
+        """
+        Invalida las tablas escritas al terminar la transacción, también si se
+        revirtió: una lectura cacheada dentro de ella pudo guardar filas que
+        ya no existen
+        """
+        if self._sucias:
+            self._cache.invalidate(self._sucias)
+            self._sucias.clear()
+
+    def execute(self, query, params=None):
+        """Atajo estilo sqlite3: ejecuta y retorna el cursor"""
+        cur = self.cursor()
+        cur.execute(query, params)
+        return cur
+
+    @property
+    def raw(self):
+        """Conexión real sin instrumentar"""
+        return self._conn
+
+    def __enter__(self):
+        if self._savepoint is None:
+            self._conn.__enter__()
+        return self
+
+    def __exit__(self, tipo, valor, traza):
+        if self._savepoint:
+            self.commit() if tipo is None else self.rollback()
+            return False
+        resultado = self._conn.__exit__(tipo, valor, traza)
+        self._invalidar_sucias()
+        return resultado
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
 
 
 class DatabaseService:
@@ -35,13 +353,25 @@ class DatabaseService:
         self.db_url = DATABASE_URL
         self.db_type = self._detect_db_type()
         self.pool = None
+        self.cache = QueryCache()
+        self.schema = SchemaRegistry(self)  # Se carga en el primer uso
 
         # Inicializar pool si es PostgreSQL
         if self.db_type == "postgresql":
             self._init_postgres_pool()
         else:
+            self._init_sqlite()
             print("⚠️ Usando SQLite - Solo para desarrollo")
 
+        # Réplica opcional para lecturas pesadas (get_connection(read_only=True))
+        self.replica_pool = None
+        self.replica_max_lag = DB_REPLICA_MAX_LAG
+        self._replica_generation = 0
+        self.set_replica(DATABASE_REPLICA_URL)
+
+        # Consultas cancelables en curso: {cancel_key: _ControlConsulta}
+        self._en_curso: Dict[str, _ControlConsulta] = {}
+
         self._initialized = True
 
     def _detect_db_type(self) -> str:
@@ -68,31 +398,333 @@ class DatabaseService:
             print(f"❌ Error inicializando pool PostgreSQL: {e}")
             raise
 
+    def _init_sqlite(self):
+        """Prepara el manejo de conexiones SQLite persistentes por hilo"""
+        self.sqlite_path = self.db_url.replace("sqlite:///", "")
+        directorio = os.path.dirname(self.sqlite_path)
+        if directorio:
+            os.makedirs(directorio, exist_ok=True)
+
+        self._sqlite_local = local()
+        self._sqlite_conns: List[sqlite3.Connection] = []
+        self._sqlite_generation = 0
+
+    def _get_sqlite_connection(self) -> sqlite3.Connection:
+        """
+        Retorna la conexión SQLite del hilo actual, creándola la primera vez
+        La conexión se reutiliza entre llamadas y se configura con SQLITE_PRAGMAS
+        """
+        estado = self._sqlite_local
+        conn = getattr(estado, "conn", None)
+        if conn is not None and estado.generation == self._sqlite_generation:
+            return conn
+
+        conn = sqlite3.connect(self.sqlite_path, timeout=DB_TIMEOUT, check_same_thread=False)
+        conn.row_factory = sqlite3.Row  # Acceso por nombre de columna
+        for pragma, valor in SQLITE_PRAGMAS.items():
+            conn.execute(f"PRAGMA {pragma}={valor}")
+
+        estado.conn = conn
+        estado.generation = self._sqlite_generation
+        estado.depth = 0
+        estado.sucias = set()  # Tablas escritas sin confirmar (compartido entre bloques anidados)
+        with self._lock:
+            self._sqlite_conns.append(conn)
+        return conn
+
+    # ========================================
+    # RÉPLICA DE SOLO LECTURA
+    # ========================================
+
+    def set_replica(self, url: Optional[str]):
+        """
+        Configura (o quita, con None) la réplica de solo lectura
+        Debe ser del mismo motor que la base principal; para SQLite
+        puede ser una copia del archivo (sqlite:///ruta/replica.db)
+        """
+        if self.replica_pool:
+            self.replica_pool.closeall()
+        self.replica_pool = None
+        self.replica_url = None
+        self._replica_lag = None
+        self._replica_medido = 0.0
+        self._replica_caida_hasta = 0.0
+        self._replica_generation += 1  # Las conexiones a la réplica anterior se descartan
+
+        if not url:
+            return
+        if url.startswith("sqlite") != (self.db_type == "sqlite"):
+            print("⚠️ La réplica debe usar el mismo motor que la base principal; se ignora")
+            return
+
+        self.replica_url = url
+        if self.db_type == "postgresql":
+            try:
+                self.replica_pool = psycopg2.pool.SimpleConnectionPool(
+                    DB_POOL_MIN, DB_POOL_MAX, url, connect_timeout=DB_TIMEOUT
+                )
+            except Exception as e:
+                # Sin réplica se sigue leyendo de la principal
+                print(f"⚠️ Réplica no disponible, se usará la principal: {e}")
+                return
+        else:
+            self.replica_path = url.replace("sqlite:///", "")
+        print("✅ Réplica de solo lectura configurada")
+
+    def _marcar_replica_caida(self, error: Exception):
+        """Deja de usar la réplica durante DB_REPLICA_CHECK_SECONDS"""
+        self._replica_caida_hasta = time.monotonic() + DB_REPLICA_CHECK_SECONDS
+        print(f"⚠️ Réplica no disponible, se usará la principal: {error}")
+
+    def _medir_lag_sqlite(self) -> Optional[float]:
+        """Atraso de la copia SQLite: diferencia de mtime entre los archivos (incluido el WAL)"""
+        def ultima_modificacion(ruta):
+            return max(os.path.getmtime(f) for f in glob.glob(glob.escape(ruta) + "*"))
+
+        if not os.path.exists(self.replica_path):
+            return None
+        return max(0.0, ultima_modificacion(self.sqlite_path) - ultima_modificacion(self.replica_path))
+
+    def _medir_lag_postgres(self) -> Optional[float]:
+        """Atraso de la réplica según la última transacción reproducida"""
+        with self._lock:
+            conn = self.replica_pool.getconn()
+        try:
+            conn.autocommit = True
+            cur = conn.cursor()
+            # Sin WAL pendiente la réplica está al día aunque no haya escrituras recientes
+            cur.execute("""
+                SELECT CASE
+                    WHEN NOT pg_is_in_recovery() THEN 0
+                    WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+                    ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+                END
+            """)
+            lag = float(cur.fetchone()[0])
+            cur.close()
+            return lag
+        finally:
+            self.replica_pool.putconn(conn, close=bool(conn.closed))
+
+    def replica_lag(self) -> Optional[float]:
+        """
+        Segundos de atraso de la réplica (medido cada DB_REPLICA_CHECK_SECONDS)
+
+        Returns:
+            Atraso en segundos, o None si no hay réplica o no responde
+        """
+        if not self.replica_url or time.monotonic() < self._replica_caida_hasta:
+            return None
+        if self.db_type == "postgresql" and self.replica_pool is None:
+            return None
+
+        ahora = time.monotonic()
+        if self._replica_lag is None or ahora - self._replica_medido >= DB_REPLICA_CHECK_SECONDS:
+            try:
+                if self.db_type == "postgresql":
+                    self._replica_lag = self._medir_lag_postgres()
+                else:
+                    self._replica_lag = self._medir_lag_sqlite()
+            except Exception as e:
+                self._replica_lag = None
+                self._marcar_replica_caida(e)
+            self._replica_medido = ahora
+        return self._replica_lag
+
+    def _usar_replica(self) -> bool:
+        """True si la réplica existe, responde y su atraso está dentro del límite"""
+        lag = self.replica_lag()
+        return lag is not None and lag <= self.replica_max_lag
+
+    def _abrir_replica(self):
+        """Conexión de lectura a la réplica, o None si falla (se usa la principal)"""
+        try:
+            if self.db_type == "postgresql":
+                with self._lock:
+                    conn = self.replica_pool.getconn()
+                conn.autocommit = True  # Sin transacciones largas que frenen la replicación
+                conn.readonly = True
+                return conn
+
+            estado = self._sqlite_local
+            generacion = (self._sqlite_generation, self._replica_generation)
+            conn = getattr(estado, "replica", None)
+            if conn is not None and estado.replica_generation == generacion:
+                return conn
+            conn = sqlite3.connect(
+                f"file:{self.replica_path}?mode=ro", uri=True,
+                timeout=DB_TIMEOUT, check_same_thread=False
+            )
+            conn.row_factory = sqlite3.Row
+            for pragma in ("mmap_size", "cache_size", "busy_timeout", "temp_store"):
+                conn.execute(f"PRAGMA {pragma}={SQLITE_PRAGMAS[pragma]}")
+            estado.replica = conn
+            estado.replica_generation = generacion
+            with self._lock:
+                self._sqlite_conns.append(conn)
+            return conn
+        except Exception as e:
+            self._marcar_replica_caida(e)
+            return None
+
+    def _replica_responde(self, conn) -> bool:
+        """True si la conexión a la réplica sigue viva después de un error"""
+        if self.db_type == "postgresql" and conn.closed:
+            return False
+        try:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            cur.fetchone()
+            cur.close()
+            return True
+        except Exception:
+            return False
+
+    def _cerrar_replica(self, conn):
+        """Devuelve la conexión de la réplica al pool (SQLite la mantiene abierta)"""
+        try:
+            if self.db_type == "postgresql":
+                self.replica_pool.putconn(conn, close=bool(conn.closed))
+            elif conn.in_transaction:
+                conn.rollback()
+        except Exception as close_error:
+            print(f"⚠️ Error cerrando conexión de réplica: {close_error}")
+
+    # ========================================
+    # TIMEOUTS Y CANCELACIÓN
+    # ========================================
+
     @contextmanager
-    def get_connection(self):
+    def _controlar(self, conn, timeout_ms: Optional[int], cancel_key: Optional[str]):
+        """
+        Aplica el límite de tiempo y registra la conexión bajo cancel_key
+        Una consulta nueva con la misma clave cancela la anterior
+        """
+        if timeout_ms is None:
+            timeout_ms = DB_STATEMENT_TIMEOUT_MS
+        if not timeout_ms and not cancel_key:
+            yield None
+            return
+
+        control = _ControlConsulta(conn, self.db_type, timeout_ms)
+        if cancel_key:
+            with self._lock:
+                anterior = self._en_curso.get(cancel_key)
+                self._en_curso[cancel_key] = control
+            if anterior is not None:
+                anterior.cancelar()
+
+        control.activar(timeout_ms)
+        try:
+            yield control
+        except Exception as e:
+            if not control.es_cancelacion(e):
+                raise
+            if control.cancelada:
+                raise QueryCancelledError(f"Consulta cancelada ({cancel_key})") from e
+            raise QueryTimeoutError(f"La consulta superó {timeout_ms} ms") from e
+        finally:
+            if cancel_key:
+                with self._lock:
+                    if self._en_curso.get(cancel_key) is control:
+                        del self._en_curso[cancel_key]
+            try:
+                control.desactivar(timeout_ms)
+            except Exception as e:
+                print(f"⚠️ Error restaurando el timeout: {e}")
+
+    def cancel(self, cancel_key: str) -> bool:
+        """
+        Cancela la consulta en curso registrada con cancel_key
+
+        Returns:
+            True si había una consulta en curso con esa clave
+        """
+        with self._lock:
+            control = self._en_curso.pop(cancel_key, None)
+        if control is None:
+            return False
+        return control.cancelar()
+
+    @contextmanager
+    def get_connection(self, read_only: bool = False, timeout_ms: Optional[int] = None,
+                       cancel_key: Optional[str] = None):
         """
         Context manager para obtener conexión a la BD
-        Funciona tanto con PostgreSQL como SQLite
+        Funciona tanto con PostgreSQL como SQLite. En SQLite un bloque anidado
+        comparte la conexión del hilo sobre un SAVEPOINT: su commit o su error
+        no confirman ni descartan lo pendiente del bloque exterior
+
+        Args:
+            read_only: Lectura que tolera datos con hasta replica_max_lag
+                       segundos de atraso; va a la réplica si está disponible
+                       y, si no, a la base principal
+            timeout_ms: Tiempo máximo por sentencia (por defecto DB_STATEMENT_TIMEOUT_MS,
+                        0 = sin límite); al superarlo se lanza QueryTimeoutError
+            cancel_key: Clave para cancelar desde otro hilo con db.cancel(clave);
+                        abrir otra conexión con la misma clave cancela la anterior
+                        (QueryCancelledError)
         """
+        if read_only and self._usar_replica():
+            conn = self._abrir_replica()
+            if conn is not None:
+                try:
+                    with self._controlar(conn, timeout_ms, cancel_key) as control:
+                        if self.db_type == "sqlite":
+                            yield InstrumentedConnection(conn, True, control=control)
+                        elif metrics.enabled:
+                            yield InstrumentedConnection(conn)
+                        else:
+                            yield conn
+                except (psycopg2.Error, sqlite3.Error) as e:
+                    # Un error del SQL del llamador (columna inexistente, migración
+                    # que falta en la réplica...) no la deja fuera de servicio
+                    if not self._replica_responde(conn):
+                        self._marcar_replica_caida(e)
+                    raise
+                finally:
+                    self._cerrar_replica(conn)
+                return
+
         conn = None
+        savepoint = None
         try:
             if self.db_type == "postgresql":
-                # Obtener conexión del pool
+                # Obtener conexión del pool (midiendo la espera)
+                inicio = time.perf_counter()
                 with self._lock:
                     conn = self.pool.getconn()
+                if metrics.enabled:
+                    metrics.record_pool_wait((time.perf_counter() - inicio) * 1000)
                 conn.autocommit = False  # Transacciones explícitas
-                yield conn
             else:
-                # SQLite
-                db_path = self.db_url.replace("sqlite:///", "")
-                # Crear directorio si no existe
-                os.makedirs(os.path.dirname(db_path), exist_ok=True)
-                conn = sqlite3.connect(db_path)
-                conn.row_factory = sqlite3.Row  # Acceso por nombre de columna
-                yield conn
+                # SQLite: conexión persistente del hilo (anidable)
+                conn = self._get_sqlite_connection()
+                self._sqlite_local.depth += 1
+                if self._sqlite_local.depth > 1:
+                    # Bloque anidado: trabaja sobre un savepoint para que su
+                    # commit o su error no confirmen ni descarten lo del bloque exterior
+                    conn.execute(f"SAVEPOINT bloque_{self._sqlite_local.depth}")
+                    savepoint = f"bloque_{self._sqlite_local.depth}"
+
+            # SQLite siempre pasa por el envoltorio (traducción de dialecto);
+            # PostgreSQL sin instrumentación ni caché recibe la conexión real
+            cache = self.cache if self.cache.enabled else None
+            with self._controlar(conn, timeout_ms, cancel_key) as control:
+                if self.db_type == "sqlite":
+                    yield InstrumentedConnection(conn, True, self._sqlite_local.sucias, cache, control, savepoint)
+                elif metrics.enabled or cache:
+                    yield InstrumentedConnection(conn, cache=cache)
+                else:
+                    yield conn
 
         except Exception as e:
-            if conn:
+            if savepoint:
+                try:
+                    conn.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                except sqlite3.Error:
+                    pass  # Una interrupción ya revirtió toda la transacción
+            elif conn:
                 conn.rollback()
             print(f"❌ Error en conexión BD: {e}")
             raise
@@ -104,8 +736,22 @@ class DatabaseService:
                         # Devolver al pool
                         self.pool.putconn(conn)
                     else:
-                        # Cerrar SQLite
-                        conn.close()
+                        # SQLite: la conexión sigue abierta; al salir del bloque
+                        # más externo se descarta lo que no se haya confirmado
+                        self._sqlite_local.depth -= 1
+                        if savepoint:
+                            conn.execute(f"RELEASE SAVEPOINT {savepoint}")
+                            if not conn.in_transaction and self._sqlite_local.sucias:
+                                # Sin transacción exterior, liberar el savepoint confirmó
+                                self.cache.invalidate(self._sqlite_local.sucias)
+                                self._sqlite_local.sucias.clear()
+                        elif self._sqlite_local.depth == 0:
+                            if conn.in_transaction:
+                                conn.rollback()
+                            if self._sqlite_local.sucias:
+                                # Lo revertido pudo quedar en la caché si se leyó dentro del bloque
+                                self.cache.invalidate(self._sqlite_local.sucias)
+                            self._sqlite_local.sucias.clear()
                 except Exception as close_error:
                     print(f"⚠️ Error cerrando conexión: {close_error}")
 
@@ -113,7 +759,10 @@ class DatabaseService:
         self,
         query: str,
         params: Optional[Tuple] = None,
-        fetch: str = "all"
+        fetch: str = "all",
+        read_only: bool = False,
+        timeout_ms: Optional[int] = None,
+        cancel_key: Optional[str] = None
     ) -> Any:
         """
         Ejecuta una query SELECT y retorna resultados
@@ -122,31 +771,78 @@ class DatabaseService:
             query: Query SQL
             params: Parámetros de la query
             fetch: 'one', 'all' o 'none'
+            read_only: Permite leer de la réplica (ver get_connection)
+            timeout_ms, cancel_key: Límite de tiempo y cancelación (ver get_connection)
 
         Returns:
             Resultados de la query
         """
-        with self.get_connection() as conn:
+        with self.get_connection(read_only, timeout_ms, cancel_key) as conn:
             cur = conn.cursor()
+            try:
+                # El cursor traduce el dialecto si el motor es SQLite
+                cur.execute(query, params or ())
 
-            # Adaptar query para SQLite vs PostgreSQL
-            if self.db_type == "sqlite":
-                query = self._adapt_query_to_sqlite(query)
-                params = params or ()
-            else:
-                params = params or ()
+                if fetch == "one":
+                    result = cur.fetchone()
+                elif fetch == "all":
+                    result = cur.fetchall()
+                else:
+                    result = None
 
-            cur.execute(query, params)
+                return result
+            finally:
+                cur.close()
 
-            if fetch == "one":
-                result = cur.fetchone()
-            elif fetch == "all":
-                result = cur.fetchall()
-            else:
-                result = None
+    def cached_query(
+        self,
+        query: str,
+        params: Optional[Tuple] = None,
+        tags: Optional[List[str]] = None,
+        ttl: Optional[float] = None,
+        read_only: bool = False
+    ) -> List[Any]:
+        """
+        Ejecuta una query SELECT y cachea el resultado (fetch all)
 
-            cur.close()
-            return result
+        Las entradas se invalidan automáticamente cuando se confirma una
+        escritura sobre alguna de las tablas en 'tags'.
+
+        Args:
+            query: Query SQL
+            params: Parámetros de la query
+            tags: Tablas de las que depende el resultado (por defecto, las de FROM/JOIN)
+            ttl: Segundos de vigencia (por defecto DB_CACHE_TTL)
+            read_only: Permite leer de la réplica (ver get_connection)
+
+        Returns:
+            Lista de filas (copia; se puede modificar sin afectar la caché)
+        """
+        if not self.cache.enabled:
+            return self.execute_query(query, params, "all", read_only)
+
+        etiquetas = frozenset(t.lower() for t in tags) if tags else tablas_leidas(query)
+        clave = (query, tuple(params) if params else ())
+        try:
+            hash(clave)
+        except TypeError:
+            return self.execute_query(query, params, "all", read_only)
+
+        filas = self.cache.get(clave)
+        if filas is not None:
+            return filas
+
+        generacion = self.cache.generacion(etiquetas)
+        filas = self.execute_query(query, params, "all", read_only)
+        self.cache.put(clave, filas, etiquetas, ttl, generacion)
+        return list(filas)
+
+    def invalidate_cache(self, *tags: str):
+        """Invalida la caché de las tablas indicadas (o toda si no se indican)"""
+        if tags:
+            self.cache.invalidate(t.lower() for t in tags)
+        else:
+            self.cache.clear()
 
     def execute_command(
         self,
@@ -167,42 +863,36 @@ class DatabaseService:
         """
         with self.get_connection() as conn:
             cur = conn.cursor()
+            try:
+                # El cursor traduce el dialecto si el motor es SQLite
+                cur.execute(command, params or ())
 
-            # Adaptar comando para SQLite vs PostgreSQL
-            if self.db_type == "sqlite":
-                command = self._adapt_query_to_sqlite(command)
-                params = params or ()
-            else:
-                params = params or ()
-
-            cur.execute(command, params)
-
-            # Obtener ID insertado si es un INSERT
-            last_id = None
-            if command.strip().upper().startswith("INSERT"):
-                if self.db_type == "postgresql":
-                    # PostgreSQL con RETURNING
+                # Obtener ID insertado si es un INSERT
+                last_id = None
+                if command.strip().upper().startswith("INSERT"):
                     if "RETURNING" in command.upper():
+                        # RETURNING (ambos motores): leer la fila antes del commit
                         result = cur.fetchone()
                         last_id = result[0] if result else None
-                    else:
+                    elif self.db_type == "postgresql":
                         # Intentar obtener el último ID
                         try:
                             cur.execute("SELECT lastval()")
                             last_id = cur.fetchone()[0]
                         except:
                             last_id = None
-                else:
-                    # SQLite
-                    last_id = cur.lastrowid
+                    else:
+                        # SQLite
+                        last_id = cur.lastrowid
 
-            rowcount = cur.rowcount
+                rowcount = cur.rowcount
 
-            if commit:
-                conn.commit()
+                if commit:
+                    conn.commit()
 
-            cur.close()
-            return last_id if last_id else rowcount
+                return last_id if last_id else rowcount
+            finally:
+                cur.close()
 
     def execute_many(
         self,
@@ -219,43 +909,106 @@ class DatabaseService:
             commit: Si debe hacer commit automáticamente
 
         Returns:
-            Número de filas afectadas
+            Número de filas afectadas (en PostgreSQL, juegos de parámetros ejecutados)
         """
         with self.get_connection() as conn:
-            cur = conn.cursor()
-
-            # Adaptar comando
             if self.db_type == "sqlite":
-                command = self._adapt_query_to_sqlite(command)
-
-            cur.executemany(command, params_list)
-            rowcount = cur.rowcount
+                cur = conn.cursor()
+                try:
+                    cur.executemany(command, params_list)
+                    rowcount = cur.rowcount
+                finally:
+                    cur.close()
+            else:
+                # executemany de psycopg2 hace un viaje por fila; execute_batch
+                # envía DB_BATCH_PAGE_SIZE sentencias por viaje
+                inicio = time.perf_counter() if metrics.enabled else None
+                cur = getattr(conn, "raw", conn).cursor()
+                try:
+                    psycopg2.extras.execute_batch(cur, command, params_list, page_size=DB_BATCH_PAGE_SIZE)
+                finally:
+                    cur.close()
+                    if inicio is not None:
+                        ms = (time.perf_counter() - inicio) * 1000
+                        metrics.record(command, ms, modulo_llamador())
+                if hasattr(conn, "registrar_escritura"):
+                    conn.registrar_escritura(command)
+                # execute_batch solo informa el último lote: se reporta una fila por juego de parámetros
+                rowcount = len(params_list)
 
             if commit:
                 conn.commit()
 
-            cur.close()
             return rowcount
 
-    def _adapt_query_to_sqlite(self, query: str) -> str:
+    def bulk_load(
+        self,
+        table: str,
+        columns: Sequence[str],
+        rows: Iterable,
+        chunk_size: int = DB_BULK_CHUNK_SIZE,
+        conflict: Optional[Sequence[str]] = None,
+        update: Optional[Sequence[str]] = None,
+        keep_on_null: bool = False,
+        on_loaded: Optional[Callable[[Any], None]] = None
+    ) -> Dict[str, Any]:
         """
-        Adapta una query de PostgreSQL a SQLite
+        Carga masiva de filas en una sola transacción
+
+        PostgreSQL usa COPY FROM STDIN; SQLite, INSERT con múltiples VALUES.
+        Las filas se consumen por lotes, así que 'rows' puede ser un generador.
+
+        Args:
+            table: Tabla destino
+            columns: Columnas en el orden de cada fila
+            rows: Tuplas (en el orden de 'columns') o diccionarios
+            chunk_size: Filas por lote
+            conflict: Columnas de la clave única para hacer upsert (None = INSERT simple)
+            update: Columnas a actualizar en conflicto (None = todas menos la clave,
+                    lista vacía = ignorar las filas repetidas)
+            keep_on_null: En conflicto, un valor NULL no pisa el existente
+            on_loaded: Recibe un cursor de la misma transacción después de cargar
+                       y antes de confirmar (p. ej. para registrar el kardex);
+                       si falla, tampoco se confirman las filas
+
+        Returns:
+            {'rows': filas procesadas, 'seconds': duración, 'rows_per_second': ritmo}
         """
-        # Reemplazar placeholders de PostgreSQL (%s) por SQLite (?)
-        # NOTA: Esta es una conversión simple, puede necesitar ajustes
-        adapted = query.replace("%s", "?")
+        tabla = carga.validar_identificador(table)
+        columnas, filas = carga.columnas_y_filas(columns, rows)
+        if conflict:
+            conflict = [carga.validar_identificador(c) for c in conflict]
+        if update:
+            update = [carga.validar_identificador(c) for c in update]
 
-        # Reemplazar funciones específicas de PostgreSQL
-        adapted = adapted.replace("CURRENT_TIMESTAMP", "datetime('now')")
-        adapted = adapted.replace("CURRENT_DATE", "date('now')")
-        adapted = adapted.replace("COALESCE", "IFNULL")
+        inicio = time.perf_counter()
+        with self.get_connection() as conn:
+            crudo = getattr(conn, "raw", conn)
+            if self.db_type == "postgresql":
+                total = carga.cargar_postgres(crudo, tabla, columnas, filas, chunk_size, conflict, update, keep_on_null)
+            else:
+                total = carga.cargar_sqlite(crudo, tabla, columnas, filas, chunk_size, conflict, update, keep_on_null)
+            if on_loaded is not None:
+                on_loaded(conn.cursor())
+            conn.commit()
+        segundos = time.perf_counter() - inicio
 
-        # Reemplazar tipos de datos
-        adapted = adapted.replace("SERIAL", "INTEGER")
-        adapted = adapted.replace("VARCHAR", "TEXT")
-        adapted = adapted.replace("INTEGER PRIMARY KEY", "INTEGER PRIMARY KEY AUTOINCREMENT")
+        if self.cache.enabled:
+            self.cache.invalidate([tabla.lower()])
+        if metrics.enabled:
+            huella = metrics.record(f"BULK LOAD {tabla} ({', '.join(columnas)})", segundos * 1000, modulo_llamador())
+            metrics.add_rows(huella, total)
 
-        return adapted
+        ritmo = total / segundos if segundos > 0 else float(total)
+        print(f"📥 {tabla}: {total:,} filas cargadas en {segundos:.2f} s ({ritmo:,.0f} filas/s)")
+        return {"rows": total, "seconds": round(segundos, 3), "rows_per_second": round(ritmo)}
+
+    def _adapt_query_to_sqlite(self, query: str) -> str:
+        """
+        Adapta una query de PostgreSQL a SQLite
+        Compatibilidad: delega en modules.sql_dialect (tokenizado y cacheado)
+        """
+        return translate_to_sqlite(query)
 
     @contextmanager
     def transaction(self):
@@ -272,10 +1025,23 @@ class DatabaseService:
                 raise
 
     def close(self):
-        """Cierra el pool de conexiones"""
+        """Cierra el pool de conexiones (o todas las conexiones SQLite abiertas)"""
+        if self.replica_pool:
+            self.replica_pool.closeall()
+            self.replica_pool = None
         if self.pool and self.db_type == "postgresql":
             self.pool.closeall()
             print("✅ Pool de conexiones cerrado")
+        elif self.db_type == "sqlite":
+            with self._lock:
+                conexiones, self._sqlite_conns = self._sqlite_conns, []
+                self._sqlite_generation += 1
+            for conn in conexiones:
+                try:
+                    conn.close()
+                except Exception as e:
+                    print(f"⚠️ Error cerrando conexión SQLite: {e}")
+            print(f"✅ {len(conexiones)} conexiones SQLite cerradas")
 
 
 # Instancia global del servicio
@@ -0,0 +1,114 @@
+"""
+Costo de delivery de pedidos
+Tarifa de la zona (DELIVERY_ZONAS) o por km de recorrido desde el vivero
+(DELIVERY_TARIFAS_KM), más un recargo según las unidades del pedido. La
+distancia y la tarifa del vivero a cada ciudad del nomenclador se calculan
+una sola vez: cotizar() no consulta la base y puede llamarse en cada tecla.
+"""
+import math
+import threading
+from typing import Dict, Optional, Tuple
+from modules import geocodificacion_service as geo
+from modules.ciudades_paraguay import COORDENADAS_CIUDADES
+from modules.utils import normalizar_texto
+from modules.config import (
+    RUTAS_ORIGEN, RUTAS_FACTOR_DESVIO, DELIVERY_ZONAS, DELIVERY_TARIFAS_KM, DELIVERY_COSTO_KM_EXTRA,
+    DELIVERY_RECARGOS_VOLUMEN, DELIVERY_RADIO_ZONA_KM, DELIVERY_REDONDEO
+)
+
+
+_lock = threading.Lock()
+# Ciudad -> (zona o None, km de recorrido desde el vivero, tarifa base)
+_tarifas: Optional[Dict[str, Tuple[Optional[str], float, int]]] = None
+
+
+def _redondear(monto: float) -> int:
+    """Redondea hacia arriba al múltiplo de DELIVERY_REDONDEO"""
+    return int(math.ceil(monto / DELIVERY_REDONDEO) * DELIVERY_REDONDEO)
+
+
+def km_desde_vivero(coords: geo.Coordenadas) -> float:
+    """Km de recorrido estimados del vivero a un punto"""
+    return geo.distancia_km(RUTAS_ORIGEN, coords) * RUTAS_FACTOR_DESVIO
+
+
+def tarifa_por_km(km: float) -> int:
+    """Tarifa del tramo de distancia; más allá del último, se suma por km extra"""
+    for hasta, tarifa in DELIVERY_TARIFAS_KM:
+        if km <= hasta:
+            return tarifa
+    hasta, tarifa = DELIVERY_TARIFAS_KM[-1]
+    return _redondear(tarifa + (km - hasta) * DELIVERY_COSTO_KM_EXTRA)
+
+
+def recargo_volumen(unidades: int) -> int:
+    """Recargo del mayor tramo de unidades alcanzado (0 si no llega a ninguno)"""
+    recargo = 0
+    for desde, monto in DELIVERY_RECARGOS_VOLUMEN:
+        if unidades >= desde:
+            recargo = monto
+    return recargo
+
+
+def tarifas_por_ciudad() -> Dict[str, Tuple[Optional[str], float, int]]:
+    """
+    Distancia y tarifa del vivero a cada ciudad del nomenclador (se arma una sola vez)
+
+    Returns:
+        {ciudad: (zona o None, km, tarifa base)}
+    """
+    global _tarifas
+    with _lock:
+        if _tarifas is None:
+            zonas = {
+                normalizar_texto(ciudad): (zona, tarifa)
+                for zona, (tarifa, ciudades) in DELIVERY_ZONAS.items()
+                for ciudad in ciudades
+            }
+            tarifas = {}
+            for ciudad, coords in COORDENADAS_CIUDADES.items():
+                km = km_desde_vivero(coords)
+                zona, tarifa = zonas.get(normalizar_texto(ciudad), (None, None))
+                tarifas[ciudad] = (zona, km, tarifa if zona else tarifa_por_km(km))
+            _tarifas = tarifas
+        return _tarifas
+
+
+def cotizar(destino: Optional[str], ubicacion: Optional[str] = None, unidades: int = 0) -> Optional[Dict]:
+    """
+    Costo de delivery de un pedido (solo búsquedas en memoria)
+
+    Un destino que es una ciudad usa su tarifa precalculada. Con coordenadas
+    en la ubicación, toma la tarifa de zona de la ciudad más cercana si está
+    a menos de DELIVERY_RADIO_ZONA_KM; si no, la tarifa por km hasta el punto.
+
+    Returns:
+        {'ciudad', 'zona', 'km', 'tarifa', 'recargo', 'total'} o None si no se puede ubicar
+    """
+    ubicado = geo.ubicar_sin_conexion(destino, ubicacion)
+    if not ubicado:
+        return None
+    coords, fuente = ubicado
+    ciudad, distancia = geo.zona_mas_cercana(coords)
+    zona, km, tarifa = tarifas_por_ciudad()[ciudad]
+
+    if fuente == geo.FUENTE_COORDENADAS and (zona is None or distancia > DELIVERY_RADIO_ZONA_KM):
+        km = km_desde_vivero(coords)
+        zona, tarifa = None, tarifa_por_km(km)
+
+    recargo = recargo_volumen(unidades)
+    return {
+        "ciudad": ciudad,
+        "zona": zona,
+        "km": round(km, 1),
+        "tarifa": tarifa,
+        "recargo": recargo,
+        "total": tarifa + recargo,
+    }
+
+
+def limpiar_cache():
+    """Vuelve a calcular las tarifas por ciudad en la próxima cotización"""
+    global _tarifas
+    with _lock:
+        _tarifas = None
@@ -0,0 +1,192 @@
+"""
+PDF de despacho: los tickets de varios pedidos en un solo archivo
+Las cabeceras y las líneas de todos los pedidos se leen con dos consultas, los
+tickets se dibujan en procesos aparte (reportlab es CPU puro) y se unen detrás
+de una hoja de ruta con los pedidos en el orden de visita (rutas_service).
+
+Unir PDFs requiere pypdf; sin él, todo se arma como un único documento en el
+proceso actual (mismo resultado, sin paralelismo).
+"""
+import io
+import os
+import math
+import threading
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from reportlab.platypus import PageBreak
+from modules.db_service import db
+from modules import rutas_service as rutas
+from modules import tickets_pdf
+from modules.config import TICKETS_DIR, DESPACHO_PROCESOS, DESPACHO_MIN_PARALELO
+
+# --- Importaciones opcionales ---
+try:
+    from pypdf import PdfWriter
+except ImportError:
+    PdfWriter = None
+
+
+_lock = threading.Lock()
+_executor: Optional[ProcessPoolExecutor] = None
+_executor_procesos = 0
+
+
+def obtener_pedidos(pedido_ids: Iterable[int]) -> Tuple[Dict[int, Dict[str, Any]], Dict[int, List[tuple]]]:
+    """
+    Cabeceras y líneas de los pedidos (una consulta para cada una)
+
+    Returns:
+        ({id: {campo: valor}}, {id: [(producto, cantidad, precio_unitario, subtotal)]})
+        Los ids inexistentes no aparecen.
+    """
+    ids = sorted({int(pedido_id) for pedido_id in pedido_ids})
+    if not ids:
+        return {}, {}
+    marcadores = ", ".join(["%s"] * len(ids))
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"""
+            SELECT p.id, c.nombre as cliente, c.telefono, c.ruc,
+                p.destino, p.ubicacion, p.fecha_pedido, p.fecha_entrega,
+                p.estado, COALESCE(p.costo_delivery, 0) as delivery,
+                COALESCE(p.costo_total, 0) as total
+            FROM pedidos p
+            LEFT JOIN clientes c ON p.cliente_id = c.id
+            WHERE p.id IN ({marcadores})
+        """, ids)
+        pedidos = {fila[0]: tickets_pdf.pedido_desde_fila(fila) for fila in cur.fetchall()}
+
+        cur.execute(f"""
+            SELECT dp.pedido_id, pr.nombre, dp.cantidad, dp.precio_unitario, dp.subtotal
+            FROM detalle_pedido dp
+            LEFT JOIN productos pr ON dp.producto_id = pr.id
+            WHERE dp.pedido_id IN ({marcadores})
+            ORDER BY dp.pedido_id, dp.id
+        """, ids)
+        detalles: Dict[int, List[tuple]] = {pedido_id: [] for pedido_id in pedidos}
+        for pedido_id, *linea in cur.fetchall():
+            detalles.setdefault(pedido_id, []).append(tuple(linea))
+    return pedidos, detalles
+
+
+def _procesos(cantidad: int, procesos: Optional[int]) -> int:
+    """Procesos a usar para 'cantidad' tickets (1 = en el proceso actual)"""
+    if PdfWriter is None or cantidad < DESPACHO_MIN_PARALELO:
+        return 1
+    return max(1, min(procesos or DESPACHO_PROCESOS or os.cpu_count() or 1, cantidad))
+
+
+def _pool(procesos: int) -> ProcessPoolExecutor:
+    """
+    Pool de procesos compartido entre impresiones; se crea la primera vez y
+    solo se rehace si cambia la cantidad de procesos o se rompió
+
+    Usa 'spawn': los procesos no heredan el pool de conexiones ni los hilos
+    de la interfaz. Al arrancar importan el módulo principal como __mp_main__,
+    por eso main.py deja migraciones e hilos bajo `if __name__ == "__main__"`.
+    """
+    global _executor, _executor_procesos
+    if _executor is not None and (_executor_procesos != procesos or getattr(_executor, "_broken", False)):
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+    if _executor is None:
+        contexto = multiprocessing.get_context("spawn")
+        _executor = ProcessPoolExecutor(max_workers=procesos, mp_context=contexto)
+        _executor_procesos = procesos
+    return _executor
+
+
+def cerrar_pool():
+    """Termina los procesos del pool compartido (se vuelve a crear al imprimir)"""
+    global _executor, _executor_procesos
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=True)
+        _executor = None
+        _executor_procesos = 0
+
+
+def dibujar_tickets(datos: List[tuple], procesos: int) -> List[bytes]:
+    """
+    Dibuja cada (pedido, detalles, generado_por) como PDF en memoria, en el mismo orden
+
+    Con más de un proceso usa el pool compartido. Si no puede arrancar
+    (p. ej. en un ejecutable empaquetado) o un proceso muere, se dibujan
+    en el proceso actual.
+    """
+    if procesos > 1:
+        try:
+            with _lock:
+                pool = _pool(procesos)
+                tamanio = max(1, math.ceil(len(datos) / (procesos * 4)))
+                return list(pool.map(tickets_pdf.dibujar_ticket, datos, chunksize=tamanio))
+        except (OSError, RuntimeError, BrokenProcessPool) as e:
+            print(f"⚠️ No se pudo dibujar en paralelo, se continúa en un proceso: {e}")
+    return [tickets_pdf.dibujar_ticket(d) for d in datos]
+
+
+def generar_despacho(
+    pedido_ids: Iterable[int],
+    generado_por: str = "",
+    archivo: Optional[str] = None,
+    procesos: Optional[int] = None,
+    salida: Optional[datetime] = None
+) -> Optional[Dict[str, Any]]:
+    """
+    Genera un PDF con la hoja de ruta y el ticket de cada pedido, en orden de visita
+
+    Args:
+        generado_por: usuario que figura en los pies
+        archivo: ruta del PDF (por defecto tickets/despacho_<fecha>.pdf)
+        procesos: procesos para dibujar tickets (por defecto DESPACHO_PROCESOS)
+        salida: hora de salida del reparto para estimar llegadas (por defecto ahora)
+
+    Returns:
+        {'archivo', 'orden': [ids], 'omitidos': [ids inexistentes], 'plan'}
+        o None si ninguno de los pedidos existe
+    """
+    pedido_ids = list(pedido_ids)
+    pedidos, detalles = obtener_pedidos(pedido_ids)
+    if not pedidos:
+        return None
+
+    plan = rutas.planificar_pedidos(
+        [(p["id"], p["destino"], p["ubicacion"], p["fecha_entrega"]) for p in pedidos.values()],
+        salida=salida
+    )
+    orden = plan["orden"]
+    paradas = [pedidos[pedido_id] for pedido_id in orden]
+    manifiesto = tickets_pdf.elementos_manifiesto(paradas, plan, generado_por)
+
+    if archivo is None:
+        os.makedirs(TICKETS_DIR, exist_ok=True)
+        archivo = os.path.join(TICKETS_DIR, f"despacho_{datetime.now().strftime('%Y%m%d_%H%M%S')}.pdf")
+
+    datos = [(pedidos[pedido_id], detalles[pedido_id], generado_por) for pedido_id in orden]
+    procesos = _procesos(len(datos), procesos)
+
+    if PdfWriter is None:
+        elementos = list(manifiesto)
+        for pedido, lineas, usuario in datos:
+            elementos.append(PageBreak())
+            elementos += tickets_pdf.elementos_ticket(pedido, lineas, usuario)
+        tickets_pdf.documento(archivo).build(elementos)
+    else:
+        writer = PdfWriter()
+        for contenido in [tickets_pdf.pdf_en_memoria(manifiesto)] + dibujar_tickets(datos, procesos):
+            writer.append(io.BytesIO(contenido))
+        with open(archivo, "wb") as f:
+            writer.write(f)
+        writer.close()
+
+    print(f"✅ Despacho generado: {archivo} ({len(orden)} pedidos, {procesos} proceso(s))")
+    encontrados = set(pedidos)
+    return {
+        "archivo": archivo,
+        "orden": orden,
+        "omitidos": sorted({int(p) for p in pedido_ids} - encontrados),
+        "plan": plan,
+    }
@@ -0,0 +1,362 @@
+"""
+Geocodificación sin conexión
+Ubica direcciones de texto libre (clientes y pedidos) con el nomenclador de
+ciudades_paraguay: coordenadas escritas en la dirección o el centroide de la
+ciudad mencionada. Lo resuelto se guarda en la tabla geocodificaciones
+(migración 8) con la dirección normalizada como clave, y una grilla espacial
+en memoria responde qué ciudad/zona está más cerca de un punto.
+"""
+import math
+import re
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+from modules.db_service import db
+from modules.bulk_load import lotes
+from modules.ciudades_paraguay import COORDENADAS_CIUDADES
+from modules.utils import normalizar_texto
+from modules.config import GEO_CELDA_GRADOS, GEO_LOTE_DIRECCIONES, GEO_CACHE_MAX
+
+
+Coordenadas = Tuple[float, float]
+
+FUENTE_COORDENADAS = "coordenadas"
+FUENTE_CIUDAD = "ciudad"
+FUENTE_MANUAL = "manual"
+
+_KM_POR_GRADO = 111.19
+_PATRON_COORDENADAS = re.compile(r"(-?\d{1,2}\.\d+)\s*,\s*(-?\d{1,3}\.\d+)")
+
+# Nombre normalizado -> (nombre, coordenadas)
+_CIUDADES = {normalizar_texto(nombre): (nombre, coords) for nombre, coords in COORDENADAS_CIUDADES.items()}
+# Los nombres más largos primero: "San Juan Bautista de Ñeembucú" antes que "San Juan Bautista"
+_PATRON_CIUDADES = re.compile(
+    r"(?<![a-z0-9])(" + "|".join(re.escape(n) for n in sorted(_CIUDADES, key=len, reverse=True)) + r")(?![a-z0-9])"
+)
+
+_memoria: "OrderedDict[str, Optional[Coordenadas]]" = OrderedDict()
+_lock = threading.Lock()
+_indice: Optional["IndiceEspacial"] = None
+
+
+# ========================================
+# DISTANCIAS Y TEXTO
+# ========================================
+
+def distancia_km(a: Coordenadas, b: Coordenadas) -> float:
+    """Distancia en línea recta (haversine) entre dos puntos"""
+    lat1, lon1, lat2, lon2 = map(math.radians, (a[0], a[1], b[0], b[1]))
+    h = math.sin((lat2 - lat1) / 2) ** 2 + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    return 2 * 6371.0 * math.asin(math.sqrt(h))
+
+
+def coordenadas_de_texto(texto: Optional[str]) -> Optional[Coordenadas]:
+    """
+    Extrae "lat, lon" de un texto o enlace de mapas
+    Ej: "-25.30, -57.60", "https://maps.google.com/?q=-25.3,-57.6", ".../@-25.3,-57.6,15z"
+    """
+    if not texto:
+        return None
+    coincidencia = _PATRON_COORDENADAS.search(str(texto))
+    if not coincidencia:
+        return None
+    lat, lon = float(coincidencia.group(1)), float(coincidencia.group(2))
+    if -90 <= lat <= 90 and -180 <= lon <= 180:
+        return (lat, lon)
+    return None
+
+
+def ciudad_en_texto(texto: Optional[str]) -> Optional[str]:
+    """
+    Primera ciudad del nomenclador mencionada en un texto (palabras completas)
+    Ej: "Barrio Laurelty, San Lorenzo" -> "San Lorenzo"
+    """
+    coincidencia = _PATRON_CIUDADES.search(normalizar_texto(texto))
+    return _CIUDADES[coincidencia.group(1)][0] if coincidencia else None
+
+
+def clave_direccion(ciudad: Optional[str], direccion: Optional[str]) -> str:
+    """Clave de la caché: dirección y ciudad normalizadas ("" si no hay datos)"""
+    partes = (normalizar_texto(direccion), normalizar_texto(ciudad))
+    return " | ".join(parte for parte in partes if parte)
+
+
+def ubicar_sin_conexion(ciudad: Optional[str], direccion: Optional[str] = None) -> Optional[Tuple[Coordenadas, str]]:
+    """
+    Ubica una dirección sin consultar la base ni servicios externos
+
+    Orden: coordenadas escritas en la dirección, ciudad exacta, y por último
+    una ciudad mencionada dentro del texto (primero en la ciudad, luego en la dirección).
+
+    Returns:
+        ((lat, lon), fuente) o None
+    """
+    coords = coordenadas_de_texto(direccion) or coordenadas_de_texto(ciudad)
+    if coords:
+        return coords, FUENTE_COORDENADAS
+    for texto in (ciudad, direccion):
+        exacta = _CIUDADES.get(normalizar_texto(texto))
+        if exacta:
+            return exacta[1], FUENTE_CIUDAD
+    for texto in (ciudad, direccion):
+        nombre = ciudad_en_texto(texto)
+        if nombre:
+            return COORDENADAS_CIUDADES[nombre], FUENTE_CIUDAD
+    return None
+
+
+# ========================================
+# GRILLA ESPACIAL
+# ========================================
+
+class IndiceEspacial:
+    """
+    Puntos con nombre repartidos en celdas de 'celda' grados
+
+    Las búsquedas recorren anillos de celdas alrededor del punto y se
+    detienen cuando ningún anillo siguiente puede tener algo más cerca.
+    """
+
+    def __init__(self, celda: float = GEO_CELDA_GRADOS):
+        self.celda = celda
+        self._celdas: Dict[Tuple[int, int], List[Tuple[str, Coordenadas]]] = defaultdict(list)
+        self._total = 0
+        self._extremos: Optional[List[int]] = None  # [fila mín, fila máx, columna mín, columna máx]
+
+    def __len__(self) -> int:
+        return self._total
+
+    def _celda_de(self, coords: Coordenadas) -> Tuple[int, int]:
+        return math.floor(coords[0] / self.celda), math.floor(coords[1] / self.celda)
+
+    def agregar(self, nombre: str, coords: Coordenadas):
+        i, j = self._celda_de(coords)
+        self._celdas[(i, j)].append((nombre, coords))
+        self._total += 1
+        if self._extremos is None:
+            self._extremos = [i, i, j, j]
+        else:
+            e = self._extremos
+            self._extremos = [min(e[0], i), max(e[1], i), min(e[2], j), max(e[3], j)]
+
+    def _anillo(self, centro: Tuple[int, int], radio: int) -> Iterable[Tuple[int, int]]:
+        ci, cj = centro
+        if radio == 0:
+            yield centro
+            return
+        for dj in range(-radio, radio + 1):
+            yield ci - radio, cj + dj
+            yield ci + radio, cj + dj
+        for di in range(-radio + 1, radio):
+            yield ci + di, cj - radio
+            yield ci + di, cj + radio
+
+    def cercanos(
+        self,
+        coords: Coordenadas,
+        cantidad: Optional[int] = 1,
+        radio_km: Optional[float] = None
+    ) -> List[Tuple[float, str, Coordenadas]]:
+        """
+        Los 'cantidad' puntos más cercanos (None = todos los del radio)
+
+        Returns:
+            [(distancia_km, nombre, coordenadas), ...] de menor a mayor distancia
+        """
+        if not self._total or (cantidad is None and radio_km is None):
+            return []
+        centro = self._celda_de(coords)
+        fila_min, fila_max, columna_min, columna_max = self._extremos
+        ultimo_anillo = max(
+            abs(centro[0] - fila_min), abs(centro[0] - fila_max),
+            abs(centro[1] - columna_min), abs(centro[1] - columna_max)
+        )
+        encontrados = []
+        for radio in range(ultimo_anillo + 1):
+            for celda in self._anillo(centro, radio):
+                for nombre, punto in self._celdas.get(celda, ()):
+                    distancia = distancia_km(coords, punto)
+                    if radio_km is None or distancia <= radio_km:
+                        encontrados.append((distancia, nombre, punto))
+
+            # Lo que esté más allá de este anillo queda al menos a 'radio' celdas enteras
+            latitud = min(abs(coords[0]) + (radio + 1) * self.celda, 89.0)
+            cota = radio * self.celda * _KM_POR_GRADO * math.cos(math.radians(latitud))
+            if radio_km is not None and cota > radio_km:
+                break
+            if cantidad is not None and len(encontrados) >= cantidad:
+                encontrados.sort()
+                if encontrados[cantidad - 1][0] <= cota:
+                    break
+        encontrados.sort()
+        return encontrados if cantidad is None else encontrados[:cantidad]
+
+
+def indice_ciudades() -> IndiceEspacial:
+    """Grilla con el centroide de cada ciudad del nomenclador (se arma una sola vez)"""
+    global _indice
+    with _lock:
+        if _indice is None:
+            indice = IndiceEspacial()
+            for nombre, coords in COORDENADAS_CIUDADES.items():
+                indice.agregar(nombre, coords)
+            _indice = indice
+        return _indice
+
+
+def zona_mas_cercana(coords: Optional[Coordenadas]) -> Optional[Tuple[str, float]]:
+    """Ciudad cuyo centroide está más cerca del punto: (nombre, distancia_km)"""
+    if not coords:
+        return None
+    cercana = indice_ciudades().cercanos(coords, 1)
+    return (cercana[0][1], cercana[0][0]) if cercana else None
+
+
+# ========================================
+# CACHÉ PERSISTENTE
+# ========================================
+
+def _recordar(clave: str, coords: Optional[Coordenadas]):
+    with _lock:
+        _memoria[clave] = coords
+        _memoria.move_to_end(clave)
+        while len(_memoria) > GEO_CACHE_MAX:
+            _memoria.popitem(last=False)
+
+
+def _consultar_guardadas(claves: Sequence[str]) -> Dict[str, Coordenadas]:
+    """Coordenadas ya guardadas en geocodificaciones, por lotes de claves"""
+    guardadas = {}
+    for lote in lotes(claves, GEO_LOTE_DIRECCIONES):
+        marcadores = ", ".join(["%s"] * len(lote))
+        filas = db.execute_query(
+            f"SELECT direccion, latitud, longitud FROM geocodificaciones WHERE direccion IN ({marcadores})",
+            tuple(lote)
+        )
+        for direccion, latitud, longitud in filas or []:
+            guardadas[direccion] = (float(latitud), float(longitud))
+    return guardadas
+
+
+def _guardar(filas: List[Tuple[str, float, float, str]]):
+    """Inserta direcciones nuevas (las que otro proceso ya guardó se respetan)"""
+    if filas:
+        db.bulk_load(
+            "geocodificaciones", ["direccion", "latitud", "longitud", "fuente"], filas,
+            chunk_size=GEO_LOTE_DIRECCIONES, conflict=["direccion"], update=[]
+        )
+
+
+def geocodificar(direcciones: Sequence[Tuple[Optional[str], Optional[str]]]) -> List[Optional[Coordenadas]]:
+    """
+    Coordenadas de varias direcciones con una consulta por lote
+
+    Primero la memoria, luego la tabla geocodificaciones (incluye las
+    correcciones manuales) y por último el nomenclador; lo que se resuelve
+    sin conexión se guarda para la próxima vez.
+
+    Args:
+        direcciones: (ciudad, direccion) por fila, en el orden deseado
+
+    Returns:
+        (lat, lon) o None por cada dirección
+    """
+    claves = [clave_direccion(ciudad, direccion) for ciudad, direccion in direcciones]
+    resueltas: Dict[str, Optional[Coordenadas]] = {"": None}
+    with _lock:
+        for clave in set(claves):
+            if clave in _memoria:
+                resueltas[clave] = _memoria[clave]
+                _memoria.move_to_end(clave)
+
+    faltan = [clave for clave in dict.fromkeys(claves) if clave not in resueltas]
+    persistente = bool(faltan) and db.schema.has_table("geocodificaciones")
+    if persistente:
+        resueltas.update(_consultar_guardadas(faltan))
+
+    nuevas = []
+    for (ciudad, direccion), clave in zip(direcciones, claves):
+        if clave in resueltas:
+            continue
+        ubicada = ubicar_sin_conexion(ciudad, direccion)
+        resueltas[clave] = ubicada[0] if ubicada else None
+        if ubicada:
+            nuevas.append((clave, ubicada[0][0], ubicada[0][1], ubicada[1]))
+    if persistente:
+        _guardar(nuevas)
+
+    for clave in faltan:
+        _recordar(clave, resueltas[clave])
+    return [resueltas[clave] for clave in claves]
+
+
+def fijar_ubicacion(ciudad: Optional[str], direccion: Optional[str], coords: Coordenadas):
+    """Corrige a mano las coordenadas de una dirección (pisa las calculadas)"""
+    clave = clave_direccion(ciudad, direccion)
+    if not clave:
+        raise ValueError("La dirección está vacía")
+    lat, lon = float(coords[0]), float(coords[1])
+    if not (-90 <= lat <= 90 and -180 <= lon <= 180):
+        raise ValueError("Coordenadas fuera de rango")
+    db.bulk_load(
+        "geocodificaciones", ["direccion", "latitud", "longitud", "fuente"],
+        [(clave, lat, lon, FUENTE_MANUAL)], conflict=["direccion"]
+    )
+    _recordar(clave, (lat, lon))
+
+
+def geocodificar_existentes(tamanio_lote: int = GEO_LOTE_DIRECCIONES) -> Dict[str, int]:
+    """
+    Geocodifica en bloque las direcciones de clientes y pedidos que aún no
+    están en la caché (pedidos.destino/ubicacion y clientes.ciudad/direccion)
+
+    Returns:
+        {'direcciones': distintas, 'nuevas': guardadas ahora,
+         'existentes': ya guardadas, 'sin_ubicacion': no resueltas}
+    """
+    resumen = {"direcciones": 0, "nuevas": 0, "existentes": 0, "sin_ubicacion": 0}
+    if not db.schema.has_table("geocodificaciones"):
+        print("⚠️ Falta la tabla geocodificaciones (migración 8)")
+        return resumen
+
+    inicio = time.perf_counter()
+    fuentes = [("pedidos", "destino", "ubicacion"), ("clientes", "ciudad", "direccion")]
+    pendientes: Dict[str, Tuple[Optional[str], Optional[str]]] = {}
+    for tabla, columna_ciudad, columna_direccion in fuentes:
+        if not (db.schema.has_column(tabla, columna_ciudad) and db.schema.has_column(tabla, columna_direccion)):
+            continue
+        filas = db.execute_query(f"SELECT DISTINCT {columna_ciudad}, {columna_direccion} FROM {tabla}")
+        for ciudad, direccion in filas or []:
+            clave = clave_direccion(ciudad, direccion)
+            if clave:
+                pendientes.setdefault(clave, (ciudad, direccion))
+
+    resumen["direcciones"] = len(pendientes)
+    for lote in lotes(list(pendientes.items()), tamanio_lote):
+        guardadas = _consultar_guardadas([clave for clave, _ in lote])
+        nuevas = []
+        for clave, (ciudad, direccion) in lote:
+            if clave in guardadas:
+                continue
+            ubicada = ubicar_sin_conexion(ciudad, direccion)
+            if ubicada:
+                nuevas.append((clave, ubicada[0][0], ubicada[0][1], ubicada[1]))
+            else:
+                resumen["sin_ubicacion"] += 1
+        _guardar(nuevas)
+        resumen["existentes"] += len(guardadas)
+        resumen["nuevas"] += len(nuevas)
+
+    limpiar_cache()
+    print(
+        f"🗺️ Geocodificación: {resumen['nuevas']} nuevas, {resumen['existentes']} ya guardadas, "
+        f"{resumen['sin_ubicacion']} sin ubicar ({time.perf_counter() - inicio:.2f} s)"
+    )
+    return resumen
+
+
+def limpiar_cache():
+    """Descarta las direcciones resueltas en memoria"""
+    with _lock:
+        _memoria.clear()
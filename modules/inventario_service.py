@@ -0,0 +1,290 @@
+"""
+Kardex de stock
+Cada cambio de stock (venta, pedido entregado, recepción, ajuste) se
+registra en movimientos_stock dentro de la misma transacción que lo causa.
+Los cortes periódicos guardan el stock de cada producto para que
+"stock al día X" lea el último corte más los pocos movimientos posteriores.
+"""
+import threading
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Sequence
+from modules.db_service import db
+from modules.bulk_load import lotes, actualizar_por_caso
+from modules.session_service import session
+from modules.config import INVENTARIO_LOTE_MOVIMIENTOS
+
+
+TIPOS_MOVIMIENTO = ("inicial", "venta", "pedido", "recepcion", "ajuste")
+
+_detener_cortes = threading.Event()
+_hilo_cortes: Optional[threading.Thread] = None
+
+
+def columna_stock() -> str:
+    """Columna de stock real de productos (stock o stock_actual según el esquema)"""
+    return db.schema.first_column("productos", "stock", "stock_actual") or "stock"
+
+
+# ========================================
+# REGISTRO DE MOVIMIENTOS
+# ========================================
+
+def registrar_movimientos(
+    cur,
+    movimientos: Iterable[Sequence],
+    tipo: str,
+    referencia: Optional[str] = None,
+    usuario: Optional[str] = None,
+    actualizar_stock: bool = True
+) -> int:
+    """
+    Registra movimientos en la transacción del cursor recibido (no hace commit)
+
+    Un INSERT de varias filas por lote y un único UPDATE de productos,
+    sin importar cuántas líneas tenga la operación.
+
+    Args:
+        cur: Cursor de la transacción en curso
+        movimientos: (producto_id, cantidad) o (producto_id, cantidad, referencia);
+                     cantidad positiva = entrada, negativa = salida
+        tipo: Uno de TIPOS_MOVIMIENTO
+        referencia: Referencia común (número de venta, pedido, etc.)
+        actualizar_stock: False si el llamador ya fijó el stock (ajuste manual)
+
+    Returns:
+        Cantidad de movimientos registrados
+    """
+    if tipo not in TIPOS_MOVIMIENTO:
+        raise ValueError(f"Tipo de movimiento inválido: {tipo}")
+    usuario = usuario or session.get_username()
+
+    filas = [
+        (m[0], tipo, int(m[1]), m[2] if len(m) > 2 else referencia, usuario)
+        for m in movimientos if m[1]
+    ]
+    if not filas:
+        return 0
+
+    for lote in lotes(filas, INVENTARIO_LOTE_MOVIMIENTOS):
+        valores = ", ".join(["(%s, %s, %s, %s, %s)"] * len(lote))
+        cur.execute(
+            f"INSERT INTO movimientos_stock (producto_id, tipo, cantidad, referencia, usuario) VALUES {valores}",
+            [valor for fila in lote for valor in fila]
+        )
+
+    if actualizar_stock:
+        netos: Dict[int, int] = OrderedDict()
+        for producto_id, _, cantidad, _, _ in filas:
+            netos[producto_id] = netos.get(producto_id, 0) + cantidad
+        stock = columna_stock()
+        actualizar_por_caso(
+            cur, "productos", f"{stock} = COALESCE({stock}, 0) + {{casos}}", "id",
+            list(netos.items()), INVENTARIO_LOTE_MOVIMIENTOS
+        )
+
+    return len(filas)
+
+
+def registrar_pedidos(cur, pedido_ids: Sequence[int], entregados: bool = True) -> int:
+    """
+    Movimientos de los pedidos que pasan a 'Entregado' (salida de stock) o
+    que dejan de estarlo (devolución), en la transacción del cursor recibido
+    """
+    if not pedido_ids:
+        return 0
+    marcadores = ", ".join(["%s"] * len(pedido_ids))
+    cur.execute(f"""
+        SELECT pedido_id, producto_id, SUM(cantidad) FROM detalle_pedido
+        WHERE pedido_id IN ({marcadores})
+        GROUP BY pedido_id, producto_id
+    """, tuple(pedido_ids))
+    signo = -1 if entregados else 1
+    return registrar_movimientos(
+        cur,
+        [(producto_id, signo * cantidad, f"Pedido #{pedido_id}") for pedido_id, producto_id, cantidad in cur.fetchall()],
+        "pedido",
+    )
+
+
+# ========================================
+# CORTES
+# ========================================
+
+def tomar_corte() -> Optional[int]:
+    """
+    Guarda el stock de cada producto según el kardex (último corte + movimientos nuevos)
+
+    Returns:
+        ID del corte, o None si no hubo movimientos desde el anterior
+    """
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            if db.db_type == "postgresql":
+                # Espera a las transacciones que están escribiendo movimientos:
+                # ningún id menor al tope puede confirmarse después del corte
+                cur.execute("LOCK TABLE movimientos_stock IN SHARE MODE")
+
+            cur.execute("SELECT id, ultimo_movimiento_id FROM cortes_stock ORDER BY id DESC LIMIT 1")
+            anterior = cur.fetchone()
+            anterior_id, desde = (anterior[0], anterior[1]) if anterior else (0, 0)
+
+            cur.execute("SELECT COALESCE(MAX(id), 0) FROM movimientos_stock")
+            hasta = cur.fetchone()[0]
+            if anterior and hasta == desde:
+                conn.rollback()
+                return None
+
+            cur.execute("INSERT INTO cortes_stock (ultimo_movimiento_id) VALUES (%s) RETURNING id", (hasta,))
+            corte_id = cur.fetchone()[0]
+            cur.execute("""
+                INSERT INTO snapshots_stock (corte_id, producto_id, stock)
+                SELECT %s, producto_id, SUM(cantidad) FROM (
+                    SELECT producto_id, stock AS cantidad FROM snapshots_stock WHERE corte_id = %s
+                    UNION ALL
+                    SELECT producto_id, cantidad FROM movimientos_stock WHERE id > %s AND id <= %s
+                ) t
+                GROUP BY producto_id
+                HAVING SUM(cantidad) <> 0
+            """, (corte_id, anterior_id, desde, hasta))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    print(f"📸 Corte de stock #{corte_id} (movimientos hasta #{hasta})")
+    return corte_id
+
+
+def iniciar_cortes_periodicos(horas: int):
+    """Hilo daemon que toma un corte cada 'horas' (0 = desactivado)"""
+    global _hilo_cortes
+    if horas <= 0 or (_hilo_cortes and _hilo_cortes.is_alive()):
+        return
+    _detener_cortes.clear()
+
+    def _loop():
+        while True:
+            try:
+                tomar_corte()
+            except Exception as e:
+                print(f"⚠️ Error tomando corte de stock: {e}")
+            if _detener_cortes.wait(horas * 3600):
+                return
+
+    _hilo_cortes = threading.Thread(target=_loop, name="cortes-stock", daemon=True)
+    _hilo_cortes.start()
+
+
+def detener_cortes_periodicos():
+    """Detiene el hilo de cortes periódicos"""
+    global _hilo_cortes
+    _detener_cortes.set()
+    _hilo_cortes = None
+
+
+# ========================================
+# CONSULTAS
+# ========================================
+
+def _limite(fecha) -> Optional[datetime]:
+    """Una fecha sin hora incluye todo ese día"""
+    if isinstance(fecha, datetime) or fecha is None:
+        return fecha
+    if isinstance(fecha, date):
+        return datetime.combine(fecha + timedelta(days=1), datetime.min.time())
+    raise ValueError(f"Fecha inválida: {fecha!r}")
+
+
+def stock_al(fecha=None, producto_ids: Optional[Sequence[int]] = None) -> Dict[int, int]:
+    """
+    Stock de cada producto al momento indicado (o actual si fecha es None)
+
+    Lee el último corte anterior a la fecha y suma solo los movimientos
+    registrados después de él; nunca recorre todo el historial.
+
+    Returns:
+        {producto_id: stock} (productos sin stock ni movimientos se omiten)
+    """
+    limite = _limite(fecha)
+    filtro_producto, params_producto = "", ()
+    if producto_ids:
+        filtro_producto = f" AND producto_id IN ({', '.join(['%s'] * len(producto_ids))})"
+        params_producto = tuple(producto_ids)
+
+    if limite is None:
+        corte = db.execute_query(
+            "SELECT id, ultimo_movimiento_id FROM cortes_stock ORDER BY id DESC LIMIT 1", fetch="one"
+        )
+    else:
+        corte = db.execute_query(
+            "SELECT id, ultimo_movimiento_id FROM cortes_stock WHERE fecha < %s ORDER BY fecha DESC, id DESC LIMIT 1",
+            (limite,), fetch="one"
+        )
+    corte_id, desde = (corte[0], corte[1]) if corte else (0, 0)
+
+    filtro_fecha, params_fecha = ("", ()) if limite is None else (" AND fecha < %s", (limite,))
+    filas = db.execute_query(f"""
+        SELECT producto_id, SUM(cantidad) FROM (
+            SELECT producto_id, stock AS cantidad FROM snapshots_stock
+            WHERE corte_id = %s{filtro_producto}
+            UNION ALL
+            SELECT producto_id, cantidad FROM movimientos_stock
+            WHERE id > %s{filtro_fecha}{filtro_producto}
+        ) t
+        GROUP BY producto_id
+    """, (corte_id,) + params_producto + (desde,) + params_fecha + params_producto)
+    return {producto_id: int(stock) for producto_id, stock in filas if stock}
+
+
+def kardex(producto_id: int, desde=None, hasta=None) -> Dict:
+    """
+    Movimientos de un producto con saldo acumulado
+
+    Returns:
+        {"saldo_inicial": n, "movimientos": [{"id", "fecha", "tipo", "cantidad", "referencia", "usuario", "saldo"}]}
+    """
+    inicio = desde
+    if isinstance(desde, date) and not isinstance(desde, datetime):
+        inicio = datetime.combine(desde, datetime.min.time())
+    saldo = stock_al(inicio, [producto_id]).get(producto_id, 0) if inicio else 0
+
+    condiciones, params = ["producto_id = %s"], [producto_id]
+    if inicio:
+        condiciones.append("fecha >= %s")
+        params.append(inicio)
+    if hasta:
+        condiciones.append("fecha < %s")
+        params.append(_limite(hasta))
+    filas = db.execute_query(f"""
+        SELECT id, fecha, tipo, cantidad, referencia, usuario FROM movimientos_stock
+        WHERE {' AND '.join(condiciones)}
+        ORDER BY fecha, id
+    """, tuple(params))
+
+    movimientos = []
+    saldo_inicial = saldo
+    for mov_id, fecha, tipo, cantidad, referencia, usuario in filas:
+        saldo += cantidad
+        movimientos.append({"id": mov_id, "fecha": fecha, "tipo": tipo, "cantidad": cantidad,
+                            "referencia": referencia, "usuario": usuario, "saldo": saldo})
+    return {"saldo_inicial": saldo_inicial, "movimientos": movimientos}
+
+
+def diferencias() -> List[Dict]:
+    """
+    Productos cuyo stock no coincide con el kardex (stock editado fuera del sistema)
+
+    Returns:
+        [{"id", "nombre", "stock", "kardex"}, ...]
+    """
+    segun_kardex = stock_al()
+    stock = columna_stock()
+    return [
+        {"id": pid, "nombre": nombre, "stock": actual, "kardex": segun_kardex.get(pid, 0)}
+        for pid, nombre, actual in db.execute_query(f"SELECT id, nombre, COALESCE({stock}, 0) FROM productos ORDER BY nombre")
+        if actual != segun_kardex.get(pid, 0)
+    ]
@@ -351,10 +351,349 @@ class CreateDefaultDataMigration(Migration):
         print("✅ Datos por defecto eliminados")
 
 
+class HotQueryIndexesMigration(Migration):
+    """
+    Migración 3 - Índices compuestos, parciales y de cobertura para las
+    consultas más frecuentes (listado de pedidos, caja, ventas por sesión
+    y reportes por fecha)
+    """
+
+    # (nombre, tabla, columnas clave, columnas INCLUDE, predicado parcial)
+    INDICES: List[Tuple[str, str, str, str, str]] = [
+        # pedidos WHERE estado = %s ORDER BY fecha_pedido DESC LIMIT 50
+        ("idx_pedidos_estado_fecha", "pedidos", "estado, fecha_pedido DESC", "cliente_id", ""),
+        # Pedidos pendientes por fecha de entrega (rutas de reparto)
+        ("idx_pedidos_pendientes_entrega", "pedidos", "fecha_entrega", "cliente_id", "estado = 'Pendiente'"),
+        # ventas WHERE sesion_caja_id = %s (cierre de caja: SUM(total))
+        ("idx_ventas_sesion_caja", "ventas", "sesion_caja_id", "total", ""),
+        # ventas por rango de fecha (reportes, ventas del día)
+        ("idx_ventas_fecha_cubre", "ventas", "fecha_venta", "cliente_id, total", ""),
+        # sesiones_caja WHERE usuario_id = %s AND estado = 'Abierta'
+        ("idx_sesiones_abiertas_usuario", "sesiones_caja", "usuario_id, fecha_apertura DESC", "monto_apertura", "estado = 'Abierta'"),
+        # detalle_ventas JOIN ventas (productos más vendidos por fecha)
+        ("idx_detalle_ventas_venta_cubre", "detalle_ventas", "venta_id", "producto_id, cantidad, subtotal", ""),
+    ]
+
+    # Índices de una sola columna que quedan cubiertos por los nuevos
+    # (misma columna inicial), se eliminan para no duplicar escrituras
+    REEMPLAZADOS: List[Tuple[str, str, str]] = [
+        ("idx_pedidos_estado", "pedidos", "estado"),
+        ("idx_ventas_fecha", "ventas", "fecha_venta"),
+        ("idx_detalle_ventas_venta", "detalle_ventas", "venta_id"),
+    ]
+
+    def __init__(self):
+        super().__init__(3, "Índices compuestos y de cobertura para consultas frecuentes")
+
+    @staticmethod
+    def sql_indice(nombre: str, tabla: str, columnas: str, incluir: str,
+                   predicado: str, motor: str = None) -> str:
+        """
+        Construye el CREATE INDEX según el motor
+        SQLite no soporta INCLUDE: las columnas cubiertas se agregan a la clave
+        """
+        if (motor or db.db_type) == "postgresql":
+            sql = f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({columnas})"
+            if incluir:
+                sql += f" INCLUDE ({incluir})"
+        else:
+            clave = f"{columnas}, {incluir}" if incluir else columnas
+            sql = f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla} ({clave})"
+
+        if predicado:
+            sql += f" WHERE {predicado}"
+        return sql
+
+    def up(self, conn, motor: str = None):
+        cur = conn.cursor()
+
+        for nombre, tabla, columnas, incluir, predicado in self.INDICES:
+            cur.execute(self.sql_indice(nombre, tabla, columnas, incluir, predicado, motor))
+
+        for nombre, _, _ in self.REEMPLAZADOS:
+            cur.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+        print(f"✅ {len(self.INDICES)} índices de consultas frecuentes creados")
+
+    def down(self, conn):
+        cur = conn.cursor()
+
+        for nombre, tabla, columna in self.REEMPLAZADOS:
+            cur.execute(f"CREATE INDEX IF NOT EXISTS {nombre} ON {tabla}({columna})")
+
+        for nombre, _, _, _, _ in self.INDICES:
+            cur.execute(f"DROP INDEX IF EXISTS {nombre}")
+
+        print("✅ Índices de consultas frecuentes eliminados")
+
+
+class PriceAdjustmentsMigration(Migration):
+    """
+    Migración 4 - Proveedor de cada producto e historial de ajustes masivos
+    de precios (permite revertir un ajuste completo)
+    """
+
+    def __init__(self):
+        super().__init__(4, "Proveedor por producto e historial de ajustes de precios")
+
+    def up(self, conn, motor: str = None):
+        cur = conn.cursor()
+
+        # ========== PROVEEDOR DEL PRODUCTO ==========
+        if (motor or db.db_type) == "postgresql":
+            cur.execute("ALTER TABLE productos ADD COLUMN IF NOT EXISTS proveedor_id INTEGER REFERENCES proveedores(id)")
+        else:
+            cur.execute("PRAGMA table_info(productos)")
+            if "proveedor_id" not in [fila[1] for fila in cur.fetchall()]:
+                cur.execute("ALTER TABLE productos ADD COLUMN proveedor_id INTEGER REFERENCES proveedores(id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_productos_proveedor ON productos(proveedor_id)")
+
+        # ========== AJUSTES DE PRECIOS ==========
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ajustes_precios (
+                id SERIAL PRIMARY KEY,
+                descripcion TEXT,
+                regla TEXT NOT NULL,
+                usuario TEXT,
+                productos_afectados INTEGER DEFAULT 0,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                revertido BOOLEAN DEFAULT false,
+                fecha_reversion TIMESTAMP
+            )
+        """)
+
+        # Precio anterior y nuevo de cada producto tocado por un ajuste
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS historial_precios (
+                ajuste_id INTEGER NOT NULL REFERENCES ajustes_precios(id) ON DELETE CASCADE,
+                producto_id INTEGER NOT NULL REFERENCES productos(id) ON DELETE CASCADE,
+                precio_anterior INTEGER,
+                precio_nuevo INTEGER,
+                PRIMARY KEY (ajuste_id, producto_id)
+            )
+        """)
+
+        print("✅ Historial de ajustes de precios creado")
+
+    def down(self, conn):
+        cur = conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS historial_precios")
+        cur.execute("DROP TABLE IF EXISTS ajustes_precios")
+        cur.execute("DROP INDEX IF EXISTS idx_productos_proveedor")
+        if db.db_type == "postgresql":
+            # SQLite no permite quitar una columna con clave foránea: queda sin uso
+            cur.execute("ALTER TABLE productos DROP COLUMN IF EXISTS proveedor_id")
+        print("✅ Historial de ajustes de precios eliminado")
+
+
+class StockLedgerMigration(Migration):
+    """
+    Migración 5 - Kardex: libro de movimientos de stock (solo inserciones)
+    y cortes periódicos con el stock de cada producto
+    """
+
+    def __init__(self):
+        super().__init__(5, "Movimientos de stock (kardex) y cortes periódicos")
+
+    def up(self, conn):
+        cur = conn.cursor()
+
+        # ========== MOVIMIENTOS ==========
+        # cantidad con signo: positiva = entrada, negativa = salida
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS movimientos_stock (
+                id SERIAL PRIMARY KEY,
+                producto_id INTEGER NOT NULL REFERENCES productos(id) ON DELETE CASCADE,
+                fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                tipo TEXT NOT NULL,
+                cantidad INTEGER NOT NULL,
+                referencia TEXT,
+                usuario TEXT
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_movimientos_producto ON movimientos_stock(producto_id, id)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_movimientos_fecha ON movimientos_stock(fecha)")
+
+        # ========== CORTES ==========
+        # Un corte resume todos los movimientos con id <= ultimo_movimiento_id
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS cortes_stock (
+                id SERIAL PRIMARY KEY,
+                fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                ultimo_movimiento_id INTEGER NOT NULL
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_cortes_fecha ON cortes_stock(fecha)")
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS snapshots_stock (
+                corte_id INTEGER NOT NULL REFERENCES cortes_stock(id) ON DELETE CASCADE,
+                producto_id INTEGER NOT NULL,
+                stock INTEGER NOT NULL,
+                PRIMARY KEY (corte_id, producto_id)
+            )
+        """)
+
+        # Saldo inicial: el stock actual de cada producto abre el kardex
+        cur.execute("""
+            INSERT INTO movimientos_stock (producto_id, tipo, cantidad, referencia)
+            SELECT id, 'inicial', stock, 'Saldo inicial' FROM productos
+            WHERE COALESCE(stock, 0) <> 0
+        """)
+
+        print("✅ Kardex de stock creado")
+
+    def down(self, conn):
+        cur = conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS snapshots_stock")
+        cur.execute("DROP TABLE IF EXISTS cortes_stock")
+        cur.execute("DROP TABLE IF EXISTS movimientos_stock")
+        print("✅ Kardex de stock eliminado")
+
+
+class ReorderIndexesMigration(Migration):
+    """
+    Migración 6 - Índice parcial con los productos bajo el stock mínimo
+    (se mantiene solo al cambiar el stock) y movimientos por fecha para
+    calcular la velocidad de venta
+    """
+
+    # reposicion_service lo usa tal cual en sus consultas (si el texto no
+    # coincide con el del índice, el planificador no lo usa)
+    PREDICADO = "COALESCE({stock}, 0) <= COALESCE(stock_minimo, 5)"
+
+    def __init__(self):
+        super().__init__(6, "Índice parcial de productos bajo stock mínimo")
+
+    def up(self, conn):
+        cur = conn.cursor()
+        cur.execute(f"CREATE INDEX IF NOT EXISTS idx_productos_bajo_minimo ON productos (stock, id) WHERE {self.PREDICADO.format(stock='stock')}")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_movimientos_producto_fecha ON movimientos_stock(producto_id, fecha)")
+        print("✅ Índices de reposición creados")
+
+    def down(self, conn):
+        cur = conn.cursor()
+        cur.execute("DROP INDEX IF EXISTS idx_productos_bajo_minimo")
+        cur.execute("DROP INDEX IF EXISTS idx_movimientos_producto_fecha")
+        print("✅ Índices de reposición eliminados")
+
+
+class PurchaseOrdersMigration(Migration):
+    """
+    Migración 7 - Órdenes de compra a proveedores y su recepción
+    """
+
+    def __init__(self):
+        super().__init__(7, "Órdenes de compra y recepción de mercadería")
+
+    def up(self, conn):
+        cur = conn.cursor()
+
+        # ========== ÓRDENES ==========
+        # estado: Pendiente, Parcial, Recibida o Anulada
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS ordenes_compra (
+                id SERIAL PRIMARY KEY,
+                proveedor_id INTEGER NOT NULL REFERENCES proveedores(id),
+                fecha TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+                estado TEXT NOT NULL DEFAULT 'Pendiente',
+                observaciones TEXT,
+                usuario TEXT,
+                fecha_recepcion TIMESTAMP
+            )
+        """)
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_ordenes_compra_proveedor ON ordenes_compra(proveedor_id, fecha)")
+        cur.execute("CREATE INDEX IF NOT EXISTS idx_ordenes_compra_estado ON ordenes_compra(estado)")
+
+        # ========== LÍNEAS ==========
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS detalle_orden_compra (
+                orden_id INTEGER NOT NULL REFERENCES ordenes_compra(id) ON DELETE CASCADE,
+                producto_id INTEGER NOT NULL REFERENCES productos(id),
+                cantidad INTEGER NOT NULL,
+                cantidad_recibida INTEGER NOT NULL DEFAULT 0,
+                precio_compra INTEGER,
+                PRIMARY KEY (orden_id, producto_id)
+            )
+        """)
+
+        print("✅ Tablas de órdenes de compra creadas")
+
+    def down(self, conn):
+        cur = conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS detalle_orden_compra")
+        cur.execute("DROP TABLE IF EXISTS ordenes_compra")
+        print("✅ Tablas de órdenes de compra eliminadas")
+
+
+class GeocodeCacheMigration(Migration):
+    """
+    Migración 8 - Caché persistente de direcciones geocodificadas
+    (dirección normalizada -> latitud/longitud)
+    """
+
+    def __init__(self):
+        super().__init__(8, "Caché de geocodificación de direcciones")
+
+    def up(self, conn):
+        cur = conn.cursor()
+
+        # fuente: coordenadas (escritas en la dirección), ciudad (centroide) o manual
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS geocodificaciones (
+                direccion TEXT PRIMARY KEY,
+                latitud REAL NOT NULL,
+                longitud REAL NOT NULL,
+                fuente TEXT NOT NULL,
+                fecha TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        print("✅ Tabla de geocodificaciones creada")
+
+    def down(self, conn):
+        cur = conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS geocodificaciones")
+        print("✅ Tabla de geocodificaciones eliminada")
+
+
+class OrderVersionMigration(Migration):
+    """
+    Migración 9 - Versión de cada pedido para detectar ediciones simultáneas
+    (control de concurrencia optimista)
+    """
+
+    def __init__(self):
+        super().__init__(9, "Versión de pedidos para edición concurrente")
+
+    def up(self, conn, motor: str = None):
+        cur = conn.cursor()
+        if (motor or db.db_type) == "postgresql":
+            cur.execute("ALTER TABLE pedidos ADD COLUMN IF NOT EXISTS version INTEGER NOT NULL DEFAULT 1")
+        else:
+            cur.execute("PRAGMA table_info(pedidos)")
+            if "version" not in [fila[1] for fila in cur.fetchall()]:
+                cur.execute("ALTER TABLE pedidos ADD COLUMN version INTEGER NOT NULL DEFAULT 1")
+        print("✅ Versión de pedidos agregada")
+
+    def down(self, conn):
+        cur = conn.cursor()
+        if db.db_type == "postgresql":
+            cur.execute("ALTER TABLE pedidos DROP COLUMN IF EXISTS version")
+        else:
+            cur.execute("ALTER TABLE pedidos DROP COLUMN version")
+        print("✅ Versión de pedidos eliminada")
+
+
 # Lista de todas las migraciones
 MIGRATIONS: List[Migration] = [
     InitialMigration(),
     CreateDefaultDataMigration(),
+    HotQueryIndexesMigration(),
+    PriceAdjustmentsMigration(),
+    StockLedgerMigration(),
+    ReorderIndexesMigration(),
+    PurchaseOrdersMigration(),
+    GeocodeCacheMigration(),
+    OrderVersionMigration(),
 ]
 
 
@@ -418,6 +757,10 @@ def apply_migrations(force_recreate: bool = False):
             conn.commit()
             print("✅ Todas las migraciones aplicadas exitosamente")
 
+            # El esquema pudo cambiar: recargar metadatos y descartar la caché
+            db.schema.refresh()
+            db.invalidate_cache()
+
         except Exception as e:
             conn.rollback()
             print(f"❌ Error aplicando migraciones: {e}")
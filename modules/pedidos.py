@@ -6,16 +6,16 @@ import flet as ft
 import webbrowser
 import os
 from datetime import date, datetime
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.lib.units import mm
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
 from modules import dashboard
+from modules import busqueda_service as busqueda
+from modules import delivery_service as delivery
+from modules import despacho_service as despacho
+from modules import inventario_service as inventario
+from modules import pedidos_service
+from modules import rutas_service as rutas
+from modules import tickets_pdf
 from modules.db_service import db
-from modules.config import Colors, FontSizes, Sizes, Messages, Icons, Spacing
+from modules.config import Colors, FontSizes, Sizes, Messages, Icons, Spacing, RUTAS_ORIGEN, BUSQUEDA_SUGERENCIAS
 from modules.utils import format_guarani, parse_guarani, open_whatsapp
 
 # Constantes para compatibilidad con código existente
@@ -93,214 +93,14 @@ def generar_ticket_pedido(pedido_id):
         os.makedirs(TICKET_DIR)
 
     try:
-        with db.get_connection() as conn:
-            cur = conn.cursor()
+        pedidos, detalles = despacho.obtener_pedidos([pedido_id])
+        if not pedidos:
+            return None
+        pedido = pedidos[int(pedido_id)]
 
-            # Obtener datos del pedido
-            cur.execute("""
-                SELECT p.id, c.nombre as cliente, c.telefono, c.ruc,
-                    p.destino, p.ubicacion, p.fecha_pedido, p.fecha_entrega,
-                    p.estado, COALESCE(p.costo_delivery, 0) as delivery,
-                    COALESCE(p.costo_total, 0) as total
-                FROM pedidos p
-                LEFT JOIN clientes c ON p.cliente_id = c.id
-                WHERE p.id = %s
-            """, (pedido_id,))
-
-            pedido_data = cur.fetchone()
-            if not pedido_data:
-                return None
-
-            # Obtener detalles del pedido
-            cur.execute("""
-                SELECT pr.nombre, dp.cantidad, dp.precio_unitario, dp.subtotal
-                FROM detalle_pedido dp
-                LEFT JOIN productos pr ON dp.producto_id = pr.id
-                WHERE dp.pedido_id = %s
-            """, (pedido_id,))
-
-            detalles = cur.fetchall()
-
-        # Datos del pedido
-        pid, cliente, telefono, ruc, destino, ubicacion, fecha_pedido, fecha_entrega, estado, delivery, total = pedido_data
-
-        filename = f"{TICKET_DIR}/pedido_{pid}.pdf"
-
-        # Crear documento PDF
-        doc = SimpleDocTemplate(
-            filename,
-            pagesize=(210*mm, 297*mm),  # A4
-            rightMargin=15*mm,
-            leftMargin=15*mm,
-            topMargin=15*mm,
-            bottomMargin=20*mm
-        )
-
-        elementos = []
-        styles = getSampleStyleSheet()
-
-        # Colores
-        VERDE_OSCURO = colors.HexColor("#2E7D32")
-        VERDE_CLARO = colors.HexColor("#E8F5E8")
-
-        # --- ENCABEZADO ---
-        titulo_style = ParagraphStyle(
-            'Titulo',
-            parent=styles['Heading1'],
-            fontSize=24,
-            spaceAfter=10,
-            alignment=TA_CENTER,
-            textColor=VERDE_OSCURO,
-            fontName='Helvetica-Bold'
-        )
-
-        elementos.append(Paragraph("🌱 VIVERO ROCÍO", titulo_style))
-        elementos.append(Paragraph("TICKET DE PEDIDO", titulo_style))
-        elementos.append(Spacer(1, 15))
-
-        # --- INFORMACIÓN DEL PEDIDO ---
-        info_pedido = [['INFORMACIÓN DEL PEDIDO']]
-
-        info_table = Table(info_pedido, colWidths=[180*mm])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), VERDE_OSCURO),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 14),
-            ('TOPPADDING', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ]))
-        elementos.append(info_table)
-        elementos.append(Spacer(1, 5))
-
-        # Datos del pedido
-        datos_pedido = [
-            ['Pedido N°:', str(pid), 'Estado:', estado],
-            ['Cliente:', cliente or 'Sin cliente', 'Teléfono:', telefono or 'Sin teléfono'],
-            ['RUC:', ruc or 'Sin RUC', 'Fecha Pedido:', str(fecha_pedido)[:10] if fecha_pedido else 'Sin fecha'],
-            ['Destino:', destino or 'Sin destino', 'Fecha Entrega:', str(fecha_entrega)[:10] if fecha_entrega else 'Sin fecha'],
-            ['Ubicación:', ubicacion or 'Sin ubicación', '', ''],
-        ]
-
-        datos_table = Table(datos_pedido, colWidths=[45*mm, 45*mm, 45*mm, 45*mm])
-        datos_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), VERDE_CLARO),
-            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 10),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('LEFTPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        elementos.append(datos_table)
-        elementos.append(Spacer(1, 15))
-
-        # --- PRODUCTOS ---
-        productos_header = [['PRODUCTOS DEL PEDIDO']]
-        productos_header_table = Table(productos_header, colWidths=[180*mm])
-        productos_header_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (-1, -1), VERDE_OSCURO),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
-            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, -1), 14),
-            ('TOPPADDING', (0, 0), (-1, -1), 10),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
-        ]))
-        elementos.append(productos_header_table)
-        elementos.append(Spacer(1, 5))
-
-        # Tabla de productos
-        if detalles:
-            productos_data = [['Producto', 'Cantidad', 'Precio Unitario', 'Subtotal']]
-
-            for detalle in detalles:
-                nombre_prod, cantidad, precio_unit, subtotal = detalle
-                productos_data.append([
-                    nombre_prod or 'Producto eliminado',
-                    str(cantidad),
-                    format_gs(precio_unit),
-                    format_gs(subtotal)
-                ])
-
-            productos_table = Table(productos_data, colWidths=[80*mm, 30*mm, 35*mm, 35*mm])
-            productos_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), VERDE_OSCURO),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 12),
-                ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
-                ('FONTSIZE', (0, 1), (-1, -1), 10),
-                ('ALIGN', (0, 1), (0, -1), 'LEFT'),
-                ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
-                ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, VERDE_CLARO]),
-                ('GRID', (0, 0), (-1, -1), 1, colors.grey),
-                ('TOPPADDING', (0, 0), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-                ('LEFTPADDING', (0, 0), (-1, -1), 8),
-                ('RIGHTPADDING', (0, 0), (-1, -1), 8),
-            ]))
-            elementos.append(productos_table)
-        else:
-            elementos.append(Paragraph("No hay productos en este pedido.", styles['Normal']))
-
-        elementos.append(Spacer(1, 15))
-
-        # --- TOTALES ---
-        subtotal_pedido = total - delivery if total else 0
-
-        totales_data = [
-            ['', '', 'Subtotal:', format_gs(subtotal_pedido)],
-            ['', '', 'Delivery:', format_gs(delivery)],
-            ['', '', 'TOTAL:', format_gs(total)],
-        ]
-
-        totales_table = Table(totales_data, colWidths=[80*mm, 30*mm, 35*mm, 35*mm])
-        totales_table.setStyle(TableStyle([
-            ('FONTSIZE', (0, 0), (-1, -1), 12),
-            ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
-            ('FONTNAME', (2, 0), (-1, -1), 'Helvetica-Bold'),
-            ('BACKGROUND', (2, 2), (-1, 2), VERDE_OSCURO),
-            ('TEXTCOLOR', (2, 2), (-1, 2), colors.white),
-            ('FONTSIZE', (2, 2), (-1, 2), 14),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-            ('RIGHTPADDING', (2, 0), (-1, -1), 10),
-        ]))
-        elementos.append(totales_table)
-        elementos.append(Spacer(1, 20))
-
-        # --- PIE DE PÁGINA ---
-        pie_data = [
-            ['¡GRACIAS POR SU PREFERENCIA!'],
-            ['Vivero Rocío - Sistema de Gestión de Pedidos'],
-            [f'Generado el {datetime.now().strftime("%d/%m/%Y %H:%M:%S")} por {obtener_usuario_actual(None)}'],
-        ]
-
-        pie_table = Table(pie_data, colWidths=[180*mm])
-        pie_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (0, 0), VERDE_OSCURO),
-            ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
-            ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (0, 0), 16),
-            ('ALIGN', (0, 0), (0, 0), 'CENTER'),
-            ('BACKGROUND', (0, 1), (0, -1), colors.white),
-            ('TEXTCOLOR', (0, 1), (0, -1), colors.grey),
-            ('FONTNAME', (0, 1), (0, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 1), (0, -1), 10),
-            ('ALIGN', (0, 1), (0, -1), 'CENTER'),
-            ('TOPPADDING', (0, 0), (-1, -1), 8),
-            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
-        ]))
-        elementos.append(pie_table)
-
-        # Generar PDF
-        doc.build(elementos)
+        filename = f"{TICKET_DIR}/pedido_{pedido['id']}.pdf"
+        elementos = tickets_pdf.elementos_ticket(pedido, detalles[pedido["id"]], obtener_usuario_actual(None))
+        tickets_pdf.documento(filename).build(elementos)
 
         print(f"✅ Ticket generado: {filename}")
         return filename
@@ -346,8 +146,10 @@ def crud_view(content, page=None):
     # --- Variables de estado ---
     today = date.today()
     detalle_items = []
-    pedido_editando = {"id": None}
+    pedido_editando = {"id": None, "version": None}
+    delivery_manual = {"activo": False}  # el usuario escribió el costo: no recalcular
     pedidos_seleccionados = []
+    pedidos_visibles = []  # ids de la tabla actual (para seleccionar todos)
 
     # --- Función para mostrar notificaciones ---
     def mostrar_snackbar(msg: str, color: str = SUCCESS_COLOR):
@@ -466,6 +268,7 @@ def crud_view(content, page=None):
         border_radius=8,
         bgcolor=ft.colors.WHITE,
         hint_text="Ej: Asunción",
+        on_change=lambda e: refrescar_detalle(),
     )
 
     ubicacion = ft.TextField(
@@ -474,6 +277,7 @@ def crud_view(content, page=None):
         border_radius=8,
         bgcolor=ft.colors.WHITE,
         hint_text="Dirección detallada",
+        on_change=lambda e: refrescar_detalle(),
     )
 
     fecha_pedido = ft.TextField(
@@ -502,9 +306,16 @@ def crud_view(content, page=None):
             e.control.value = formateado
         else:
             e.control.value = "0"
+        delivery_manual["activo"] = True
+        delivery_field.helper_text = "Costo manual"
         page.update()
         refrescar_detalle()
 
+    def recalcular_delivery(e=None):
+        """Vuelve al costo calculado por zona/distancia"""
+        delivery_manual["activo"] = False
+        refrescar_detalle()
+
     delivery_field = ft.TextField(
         label="🚛 Delivery",
         value="0",
@@ -515,6 +326,14 @@ def crud_view(content, page=None):
         prefix_text="Gs. ",
     )
 
+    recalcular_delivery_btn = ft.IconButton(
+        icon=ft.icons.CALCULATE,
+        icon_color=PRIMARY_COLOR,
+        tooltip="Calcular delivery por zona/distancia",
+        on_click=recalcular_delivery,
+        icon_size=20,
+    )
+
     estado_dd = ft.Dropdown(
         label="📋 Estado",
         width=140,
@@ -538,6 +357,7 @@ def crud_view(content, page=None):
     )
 
     productos_lista = obtener_productos()
+    productos_por_id = {p["id"]: p for p in productos_lista}
 
     producto_field = ft.TextField(
         label="🔍 Buscar producto",
@@ -633,6 +453,7 @@ def crud_view(content, page=None):
             ft.dropdown.Option("Todos"),
             ft.dropdown.Option("Pendiente"),
             ft.dropdown.Option("Entregado"),
+            ft.dropdown.Option("Cancelado"),
         ],
         value="Todos",
         on_change=lambda e: refrescar_pedidos(),
@@ -651,16 +472,37 @@ def crud_view(content, page=None):
         style=ft.ButtonStyle(shape=ft.RoundedRectangleBorder(radius=8)),
     )
 
+    # ---------------- OPERACIONES SOBRE LOS SELECCIONADOS ----------------
+    seleccion_texto = ft.Text("Seleccionados: 0", size=12, color=ft.colors.GREY_600)
+
+    def boton_lote(icono, tooltip, color, accion):
+        return ft.IconButton(icon=icono, icon_color=color, tooltip=tooltip, on_click=lambda e: accion(), icon_size=20)
+
+    date_picker_reprogramar = ft.DatePicker(
+        first_date=date(2023, 1, 1),
+        last_date=date(2030, 12, 31),
+        on_change=lambda e: reprogramar_seleccionados(e.control.value),
+    )
+    page.overlay.append(date_picker_reprogramar)
+
+    acciones_lote = ft.Row([
+        boton_lote(ft.icons.SELECT_ALL, "Seleccionar todos los visibles", PRIMARY_COLOR, lambda: seleccionar_visibles(True)),
+        boton_lote(ft.icons.DESELECT, "Quitar selección", ft.colors.GREY_600, lambda: seleccionar_visibles(False)),
+        boton_lote(ft.icons.LOCAL_SHIPPING, "Marcar como entregados", SUCCESS_COLOR, lambda: entregar_seleccionados()),
+        boton_lote(ft.icons.EVENT, "Reprogramar entrega", BLUE_COLOR, lambda: abrir_reprogramar()),
+        boton_lote(ft.icons.BLOCK, "Cancelar pedidos", WARNING_COLOR, lambda: cancelar_seleccionados()),
+        boton_lote(ft.icons.PRINT, "Imprimir tickets", ft.colors.GREY_800, lambda: imprimir_seleccionados()),
+        boton_lote(ft.icons.DELETE_SWEEP, "Eliminar pedidos", ERROR_COLOR, lambda: eliminar_seleccionados()),
+    ], spacing=0)
+
     # ---------------- FUNCIONES CON POSTGRESQL ----------------
     def refrescar_clientes():
         """Refresca lista de clientes desde PostgreSQL"""
         cliente_dd.options.clear()
         try:
-            with db.get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("SELECT id, nombre FROM clientes ORDER BY nombre ASC")
-                for cid, nom in cur.fetchall():
-                    cliente_dd.options.append(ft.dropdown.Option(str(cid), nom))
+            clientes = db.cached_query("SELECT id, nombre FROM clientes ORDER BY nombre ASC", tags=["clientes"])
+            for cid, nom in clientes:
+                cliente_dd.options.append(ft.dropdown.Option(str(cid), nom))
             print(f"📋 {len(cliente_dd.options)} clientes cargados")
         except Exception as e:
             print(f"❌ Error refrescando clientes: {e}")
@@ -674,57 +516,26 @@ def crud_view(content, page=None):
             return
 
         try:
-            with db.get_connection() as conn:
-                cur = conn.cursor()
-
-                # Obtener información de columnas
-                cur.execute("""
-                    SELECT column_name
-                    FROM information_schema.columns
-                    WHERE table_name = 'clientes'
-                """)
-                columnas_existentes = [col[0] for col in cur.fetchall()]
-
-                # Construir SELECT dinámico
-                campos_select = ["id", "nombre"]
-
-                if "ruc" in columnas_existentes:
-                    campos_select.append("ruc")
-                else:
-                    campos_select.append("'' as ruc")
-
-                if "telefono" in columnas_existentes:
-                    campos_select.append("telefono")
-                elif "tel" in columnas_existentes:
-                    campos_select.append("tel as telefono")
-                else:
-                    campos_select.append("'' as telefono")
-
-                if "ciudad" in columnas_existentes:
-                    campos_select.append("ciudad")
-                else:
-                    campos_select.append("'' as ciudad")
-
-                if "ubicacion" in columnas_existentes:
-                    campos_select.append("ubicacion")
-                elif "direccion" in columnas_existentes:
-                    campos_select.append("direccion as ubicacion")
-                else:
-                    campos_select.append("'' as ubicacion")
-
-                consulta = f"SELECT {', '.join(campos_select)} FROM clientes WHERE id=%s"
-                cur.execute(consulta, (cliente_dd.value,))
-                row = cur.fetchone()
-
-                if row:
-                    ruc_field.value = str(row[2]) if row[2] else ""
-                    tel_field.value = str(row[3]) if row[3] else ""
-                    destino.value = str(row[4]) if row[4] else ""
-                    ubicacion.value = str(row[5]) if row[5] else ""
-                else:
-                    ruc_field.value = tel_field.value = destino.value = ubicacion.value = ""
+            # SELECT armado una sola vez según las columnas reales de clientes
+            consulta = db.schema.select("clientes", [
+                ("id", ["id"]),
+                ("nombre", ["nombre"]),
+                ("ruc", ["ruc"]),
+                ("telefono", ["telefono", "tel"]),
+                ("ciudad", ["ciudad"]),
+                ("ubicacion", ["ubicacion", "direccion"]),
+            ], where="id = %s")
+            row = db.execute_query(consulta, (cliente_dd.value,), fetch="one")
+
+            if row:
+                ruc_field.value = str(row[2]) if row[2] else ""
+                tel_field.value = str(row[3]) if row[3] else ""
+                destino.value = str(row[4]) if row[4] else ""
+                ubicacion.value = str(row[5]) if row[5] else ""
+            else:
+                ruc_field.value = tel_field.value = destino.value = ubicacion.value = ""
 
-            page.update()
+            refrescar_detalle()
 
         except Exception as e:
             print(f"❌ Error cargando cliente: {e}")
@@ -737,8 +548,9 @@ def crud_view(content, page=None):
         """Muestra sugerencias de productos"""
         sugerencias_list.controls.clear()
         if valor.strip():
-            coincidencias = [p for p in productos_lista if valor.lower() in p["nombre"].lower()]
-            for prod in coincidencias[:5]:
+            ids = busqueda.buscar_productos(valor, BUSQUEDA_SUGERENCIAS, admite=productos_por_id.__contains__)
+            coincidencias = [productos_por_id[pid] for pid in ids]
+            for prod in coincidencias:
                 sugerencias_list.controls.append(
                     ft.Container(
                         content=ft.ListTile(
@@ -845,8 +657,24 @@ def crud_view(content, page=None):
             refrescar_detalle()
             mostrar_snackbar(f"🗑️ Eliminado: {producto_eliminado['producto']}", WARNING_COLOR)
 
+    def actualizar_delivery():
+        """Completa el costo de delivery según destino y unidades (sin consultar la base)"""
+        if delivery_manual["activo"]:
+            return
+        unidades = sum(item["cantidad"] for item in detalle_items)
+        cotizacion = delivery.cotizar(destino.value, ubicacion.value, unidades)
+        if not cotizacion:
+            delivery_field.helper_text = "Destino sin ubicar" if (destino.value or "").strip() else None
+            return
+        delivery_field.value = f"{cotizacion['total']:,}".replace(",", ".")
+        detalle = cotizacion["zona"] or f"{cotizacion['km']:g} km"
+        if cotizacion["recargo"]:
+            detalle += " + volumen"
+        delivery_field.helper_text = f"{cotizacion['ciudad']} · {detalle}"
+
     def refrescar_detalle():
         """Refresca la tabla de detalle de productos"""
+        actualizar_delivery()
         detalle_tabla.rows.clear()
         total_productos = 0
 
@@ -886,12 +714,15 @@ def crud_view(content, page=None):
     def limpiar_formulario():
         """Limpia el formulario completo"""
         pedido_editando["id"] = None
+        pedido_editando["version"] = None
         cliente_dd.value = None
         ruc_field.value = tel_field.value = destino.value = ubicacion.value = ""
         estado_dd.value = "Pendiente"
         fecha_pedido.value = str(date.today())
         fecha_entrega.value = ""
         delivery_field.value = "0"
+        delivery_field.helper_text = None
+        delivery_manual["activo"] = False
         detalle_items.clear()
         limpiar_campos_producto()
         refrescar_detalle()
@@ -922,6 +753,8 @@ def crud_view(content, page=None):
                 delivery_cost = parse_gs(delivery_field.value)
                 total_final = sum(item["subtotal"] for item in detalle_items) + delivery_cost
 
+                estado_anterior = None
+                lineas = [(item["id"], item["cantidad"], item["precio"]) for item in detalle_items]
                 if pedido_editando["id"] is None:
                     # INSERTAR NUEVO PEDIDO
                     cur.execute("""
@@ -938,25 +771,29 @@ def crud_view(content, page=None):
                 else:
                     # ACTUALIZAR PEDIDO EXISTENTE
                     pedido_id = pedido_editando["id"]
-                    cur.execute("""
-                        UPDATE pedidos
-                        SET cliente_id=%s, destino=%s, ubicacion=%s, fecha_pedido=%s,
-                            fecha_entrega=%s, estado=%s, costo_delivery=%s, costo_total=%s
-                        WHERE id=%s
-                    """, (cliente_dd.value, destino.value, ubicacion.value, fecha_pedido.value,
-                            f_entrega_val, estado_dd.value, delivery_cost, total_final, pedido_id))
-
-                    # Eliminar detalles anteriores
-                    cur.execute("DELETE FROM detalle_pedido WHERE pedido_id=%s", (pedido_id,))
+                    bloqueo = " FOR UPDATE" if db.db_type == "postgresql" else ""
+                    cur.execute(f"SELECT estado FROM pedidos WHERE id=%s{bloqueo}", (pedido_id,))
+                    fila_estado = cur.fetchone()
+                    estado_anterior = fila_estado[0] if fila_estado else None
+
+                    # Falla si otro usuario lo guardó después de abrirlo (se revierte todo)
+                    pedidos_service.actualizar_pedido(cur, pedido_id, pedido_editando["version"], {
+                        "cliente_id": cliente_dd.value, "destino": destino.value, "ubicacion": ubicacion.value,
+                        "fecha_pedido": fecha_pedido.value, "fecha_entrega": f_entrega_val,
+                        "estado": estado_dd.value, "costo_delivery": delivery_cost, "costo_total": total_final,
+                    })
+                    if estado_anterior == "Entregado":
+                        # Devolver al stock lo entregado con el detalle anterior
+                        inventario.registrar_pedidos(cur, [pedido_id], entregados=False)
                     mensaje = "✏️ Pedido actualizado exitosamente"
                     color = ft.colors.BLUE_700
 
-                # Insertar detalles
-                for item in detalle_items:
-                    cur.execute("""
-                        INSERT INTO detalle_pedido (pedido_id, producto_id, cantidad, precio_unitario, subtotal)
-                        VALUES (%s, %s, %s, %s, %s)
-                    """, (pedido_id, item["id"], item["cantidad"], item["precio"], item["subtotal"]))
+                # Solo las líneas nuevas, modificadas o quitadas
+                pedidos_service.guardar_detalle(cur, pedido_id, lineas)
+
+                # Un pedido entregado descuenta su detalle del stock (kardex)
+                if estado_dd.value == "Entregado":
+                    inventario.registrar_pedidos(cur, [pedido_id])
 
                 conn.commit()
 
@@ -964,6 +801,11 @@ def crud_view(content, page=None):
                 refrescar_pedidos()
                 mostrar_snackbar(mensaje, color)
 
+        except pedidos_service.PedidoModificadoError as e:
+            print(f"⚠️ {e}")
+            error_msg.value = "⚠️ Otro usuario modificó este pedido. Vuelva a abrirlo para ver los cambios."
+            mostrar_snackbar("⚠️ El pedido cambió mientras lo editaba: no se guardó", WARNING_COLOR)
+            page.update()
         except Exception as e:
             print(f"❌ Error guardando pedido: {e}")
             error_msg.value = f"❌ Error: {str(e)}"
@@ -971,13 +813,104 @@ def crud_view(content, page=None):
             page.update()
 
     def toggle_pedido_seleccion(pedido_id, selected):
-        """Marca/desmarca pedido para rutas"""
+        """Marca/desmarca pedido para rutas y operaciones por lote"""
         if selected:
             if pedido_id not in pedidos_seleccionados:
                 pedidos_seleccionados.append(pedido_id)
         else:
             if pedido_id in pedidos_seleccionados:
                 pedidos_seleccionados.remove(pedido_id)
+        seleccion_texto.value = f"Seleccionados: {len(pedidos_seleccionados)}"
+        page.update()
+
+    def seleccionar_visibles(marcar: bool):
+        """Selecciona (o deselecciona) todos los pedidos de la tabla"""
+        pedidos_seleccionados.clear()
+        if marcar:
+            pedidos_seleccionados.extend(pedidos_visibles)
+        refrescar_pedidos(busqueda_pedidos.value or "")
+
+    def ejecutar_lote(operacion, hecho: str, *args):
+        """Aplica una operación a todos los seleccionados y refresca la tabla una vez"""
+        if not pedidos_seleccionados:
+            mostrar_snackbar("⚠️ Seleccione al menos un pedido", WARNING_COLOR)
+            return
+        try:
+            resultado = operacion(list(pedidos_seleccionados), *args)
+        except ValueError as ex:
+            mostrar_snackbar(f"⚠️ {ex}", WARNING_COLOR)
+            return
+        except Exception as ex:
+            print(f"❌ Error en operación por lote: {ex}")
+            mostrar_snackbar("❌ Error actualizando pedidos", ERROR_COLOR)
+            return
+
+        procesados, omitidos = resultado["procesados"], resultado["omitidos"]
+        for pedido_id in procesados:
+            pedidos_seleccionados.remove(pedido_id)
+        refrescar_pedidos(busqueda_pedidos.value or "")
+        mensaje = f"✅ {len(procesados)} pedido(s) {hecho}"
+        if omitidos:
+            mensaje += f" · {len(omitidos)} omitido(s) (entregados o cancelados)"
+        mostrar_snackbar(mensaje, SUCCESS_COLOR if procesados else WARNING_COLOR)
+
+    def entregar_seleccionados():
+        ejecutar_lote(pedidos_service.marcar_entregados, "entregados")
+
+    def cancelar_seleccionados():
+        ejecutar_lote(pedidos_service.cancelar, "cancelados")
+
+    def abrir_reprogramar():
+        if not pedidos_seleccionados:
+            mostrar_snackbar("⚠️ Seleccione al menos un pedido", WARNING_COLOR)
+            return
+        page.open(date_picker_reprogramar)
+
+    def reprogramar_seleccionados(fecha):
+        if fecha:
+            ejecutar_lote(pedidos_service.reprogramar, f"reprogramados al {fecha.strftime('%d/%m/%Y')}", fecha)
+
+    def eliminar_seleccionados():
+        """Pide confirmación y elimina todos los seleccionados"""
+        if not pedidos_seleccionados:
+            mostrar_snackbar("⚠️ Seleccione al menos un pedido", WARNING_COLOR)
+            return
+
+        def confirmar(e):
+            page.close(dialogo)
+            ejecutar_lote(pedidos_service.eliminar, "eliminados")
+
+        dialogo = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Confirmar eliminación"),
+            content=ft.Text(f"¿Eliminar {len(pedidos_seleccionados)} pedido(s)?\nEsta acción no se puede deshacer."),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: page.close(dialogo)),
+                ft.ElevatedButton("Eliminar", on_click=confirmar, bgcolor=ERROR_COLOR, color="white"),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        page.open(dialogo)
+
+    def imprimir_seleccionados():
+        """Genera un PDF de despacho con la hoja de ruta y los tickets seleccionados"""
+        if not pedidos_seleccionados:
+            mostrar_snackbar("⚠️ Seleccione al menos un pedido", WARNING_COLOR)
+            return
+        try:
+            mostrar_snackbar(f"🖨️ Generando despacho de {len(pedidos_seleccionados)} pedido(s)...", BLUE_COLOR)
+            resultado = despacho.generar_despacho(pedidos_seleccionados, obtener_usuario_actual(page))
+        except Exception as e:
+            print(f"❌ Error generando despacho: {e}")
+            resultado = None
+        if not resultado:
+            mostrar_snackbar("❌ Error generando tickets", ERROR_COLOR)
+            return
+        mensaje = f"🖨️ Despacho de {len(resultado['orden'])} pedido(s): {resultado['archivo']}"
+        if resultado["omitidos"]:
+            mensaje += f" ({len(resultado['omitidos'])} ya no existen)"
+        abrir_pdf(resultado["archivo"])
+        mostrar_snackbar(mensaje, SUCCESS_COLOR)
 
     def generar_ticket_pedido_btn(pedido_id):
         """Genera ticket PDF del pedido"""
@@ -1023,17 +956,17 @@ def crud_view(content, page=None):
 
                 cur.execute(query, params)
                 pedidos = cur.fetchall()
+                pedidos_visibles[:] = [pedido[0] for pedido in pedidos]
 
                 for pedido in pedidos:
                     pid, cliente_nombre, destino_val, ubicacion_val, fecha_pedido_val, fecha_entrega_val, estado_val, delivery, total = pedido
 
-                    estado_color = SUCCESS_COLOR if estado_val == "Entregado" else WARNING_COLOR
+                    estado_color = {"Entregado": SUCCESS_COLOR, "Cancelado": ft.colors.GREY_500}.get(estado_val, WARNING_COLOR)
 
                     checkbox = ft.Checkbox(
                         value=pid in pedidos_seleccionados,
                         on_change=lambda e, pid=pid: toggle_pedido_seleccion(pid, e.control.value),
-                        disabled=estado_val != "Pendiente",
-                    ) if estado_val == "Pendiente" else ft.Text("-", size=12, color=ft.colors.GREY_400)
+                    )
 
                     # Formatear fechas
                     fecha_pedido_str = str(fecha_pedido_val)[:10] if fecha_pedido_val else "-"
@@ -1097,6 +1030,7 @@ def crud_view(content, page=None):
                         )
                     )
 
+                seleccion_texto.value = f"Seleccionados: {len(pedidos_seleccionados)}"
                 print(f"📋 {len(pedidos)} pedidos cargados")
                 page.update()
 
@@ -1110,9 +1044,10 @@ def crud_view(content, page=None):
             with db.get_connection() as conn:
                 cur = conn.cursor()
 
-                cur.execute("""
+                version = "version" if pedidos_service.usa_version() else "NULL"
+                cur.execute(f"""
                     SELECT cliente_id, destino, ubicacion, fecha_pedido, fecha_entrega, estado,
-                            COALESCE(costo_delivery, 0) as delivery
+                            COALESCE(costo_delivery, 0) as delivery, {version}
                     FROM pedidos WHERE id = %s
                 """, (pedido_id,))
 
@@ -1122,6 +1057,7 @@ def crud_view(content, page=None):
                     return
 
                 pedido_editando["id"] = pedido_id
+                pedido_editando["version"] = pedido[7]
                 cliente_dd.value = str(pedido[0])
                 destino.value = pedido[1] or ""
                 ubicacion.value = pedido[2] or ""
@@ -1129,6 +1065,9 @@ def crud_view(content, page=None):
                 fecha_entrega.value = str(pedido[4])[:10] if pedido[4] else ""
                 estado_dd.value = pedido[5] or "Pendiente"
                 delivery_field.value = str(pedido[6]) if pedido[6] else "0"
+                # El costo guardado se respeta; el botón de calcular lo rehace
+                delivery_manual["activo"] = True
+                delivery_field.helper_text = None
 
                 cargar_cliente(None)
 
@@ -1162,16 +1101,11 @@ def crud_view(content, page=None):
         """Elimina un pedido - PostgreSQL"""
         def confirmar_eliminacion(e):
             try:
-                with db.get_connection() as conn:
-                    cur = conn.cursor()
-
-                    cur.execute("DELETE FROM detalle_pedido WHERE pedido_id = %s", (pedido_id,))
-                    cur.execute("DELETE FROM pedidos WHERE id = %s", (pedido_id,))
-
-                    conn.commit()
-
-                    refrescar_pedidos()
-                    mostrar_snackbar(f"🗑️ Pedido #{pedido_id} eliminado", WARNING_COLOR)
+                pedidos_service.eliminar([pedido_id])
+                if pedido_id in pedidos_seleccionados:
+                    pedidos_seleccionados.remove(pedido_id)
+                refrescar_pedidos()
+                mostrar_snackbar(f"🗑️ Pedido #{pedido_id} eliminado", WARNING_COLOR)
 
             except Exception as ex:
                 print(f"❌ Error eliminando: {ex}")
@@ -1233,24 +1167,42 @@ def crud_view(content, page=None):
 
                 placeholders = ",".join(["%s"] * len(pedidos_seleccionados))
                 cur.execute(f"""
-                    SELECT p.id, c.nombre, p.destino, p.ubicacion, p.costo_total
+                    SELECT p.id, c.nombre, p.destino, p.ubicacion, p.costo_total, p.fecha_entrega
                     FROM pedidos p
                     LEFT JOIN clientes c ON p.cliente_id = c.id
                     WHERE p.id IN ({placeholders}) AND p.estado = 'Pendiente'
                     ORDER BY p.destino
                 """, pedidos_seleccionados)
 
-                pedidos_ruta = cur.fetchall()
+                filas_ruta = cur.fetchall()
 
-            if not pedidos_ruta:
+            if not filas_ruta:
                 mostrar_snackbar("⚠️ No hay pedidos pendientes seleccionados", WARNING_COLOR)
                 return
 
+            # Orden de visita optimizado (vecino más cercano + 2-opt/Or-opt, con fecha de entrega)
+            plan = rutas.planificar_pedidos([(f[0], f[2], f[3], f[5]) for f in filas_ruta])
+            por_id = {f[0]: f[:5] for f in filas_ruta}
+            pedidos_ruta = [por_id[pid] for pid in plan["orden"]]
+
+            resumen_ruta = f"🛣️ {plan['distancia_km']:g} km · ~{plan['duracion_min'] // 60}h {plan['duracion_min'] % 60:02d}m"
+            if plan["distancia_original_km"] > plan["distancia_km"]:
+                resumen_ruta += f" (orden alfabético: {plan['distancia_original_km']:g} km)"
+            if plan["sin_ubicacion"]:
+                resumen_ruta += f" · {len(plan['sin_ubicacion'])} sin ubicación al final"
+
             destinos_list = ft.Column([], spacing=8)
             total_ruta = 0
 
             for i, (pid, cliente, destino, ubicacion, total) in enumerate(pedidos_ruta, 1):
                 total_ruta += total or 0
+                llegada = plan["llegadas"].get(pid)
+                if llegada:
+                    aviso_llegada = f"🕒 Llegada estimada {llegada.strftime('%d/%m %H:%M')}"
+                    if pid in plan["tarde"]:
+                        aviso_llegada += " ⚠️ después de la fecha de entrega"
+                else:
+                    aviso_llegada = "❔ Sin ubicación: no se incluyó en la optimización"
                 destinos_list.controls.append(
                     ft.Card(
                         content=ft.Container(
@@ -1260,6 +1212,8 @@ def crud_view(content, page=None):
                                     ft.Text(cliente or "Sin cliente", weight="bold", size=14),
                                     ft.Text(f"📍 {destino} - {ubicacion}", size=12, color=ft.colors.GREY_600),
                                     ft.Text(f"💰 {format_gs(total or 0)}", size=12, color=PRIMARY_COLOR, weight="bold"),
+                                    ft.Text(aviso_llegada, size=11,
+                                            color=ERROR_COLOR if pid in plan["tarde"] else ft.colors.GREY_600),
                                 ], spacing=2, expand=True),
                                 ft.IconButton(
                                     icon=ft.icons.MAP,
@@ -1282,16 +1236,21 @@ def crud_view(content, page=None):
                     mostrar_snackbar("⚠️ Se necesitan al menos 2 destinos", WARNING_COLOR)
                     return
 
-                origen = "Vivero Rocío, Paraguay"
-                destinos = [f"{destino}, {ubicacion}" for _, _, destino, ubicacion, _ in pedidos_ruta]
+                origen = f"{RUTAS_ORIGEN[0]},{RUTAS_ORIGEN[1]}"
+                destinos = [
+                    f"{plan['coordenadas'][pid][0]},{plan['coordenadas'][pid][1]}" if pid in plan["coordenadas"]
+                    else f"{destino} {ubicacion or ''}".strip()
+                    for pid, _, destino, ubicacion, _ in pedidos_ruta
+                ]
 
-                destino_final = destinos[0]
-                waypoints = destinos[1:] if len(destinos) > 1 else []
+                # Se respeta el orden optimizado: el último es el destino final
+                destino_final = destinos[-1]
+                waypoints = destinos[:-1]
 
                 url = f"https://www.google.com/maps/dir/{origen.replace(' ', '+')}"
 
                 if waypoints:
-                    waypoints_str = "/".join([wp.replace(' ', '+').replace(',', '') for wp in waypoints])
+                    waypoints_str = "/".join([wp.replace(' ', '+') for wp in waypoints])
                     url += f"/{waypoints_str}"
 
                 url += f"/{destino_final.replace(' ', '+')}"
@@ -1302,21 +1261,12 @@ def crud_view(content, page=None):
 
             def marcar_como_entregado():
                 try:
-                    with db.get_connection() as conn:
-                        cur = conn.cursor()
-
-                        placeholders = ",".join(["%s"] * len(pedidos_seleccionados))
-                        cur.execute(f"""
-                            UPDATE pedidos SET estado = 'Entregado'
-                            WHERE id IN ({placeholders})
-                        """, pedidos_seleccionados)
-
-                        conn.commit()
-
-                        pedidos_seleccionados.clear()
-                        refrescar_pedidos()
-                        mostrar_snackbar("✅ Pedidos marcados como 'Entregado'", SUCCESS_COLOR)
-                        cerrar_modal_rutas()
+                    # Una transacción: estado, versión y salida de stock de todos los pedidos
+                    pedidos_service.marcar_entregados([f[0] for f in filas_ruta])
+                    pedidos_seleccionados.clear()
+                    refrescar_pedidos()
+                    mostrar_snackbar("✅ Pedidos marcados como 'Entregado'", SUCCESS_COLOR)
+                    cerrar_modal_rutas()
 
                 except Exception as e:
                     print(f"❌ Error actualizando estados: {e}")
@@ -1334,6 +1284,7 @@ def crud_view(content, page=None):
                             ft.Text(f"📦 Pedidos seleccionados: {len(pedidos_ruta)}", size=14, weight="bold"),
                             ft.Text(f"💰 Total de la ruta: {format_gs(total_ruta)}", size=14, weight="bold", color=PRIMARY_COLOR),
                         ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                        ft.Text(resumen_ruta, size=12, color=BLUE_COLOR),
 
                         ft.Divider(),
 
@@ -1423,7 +1374,7 @@ def crud_view(content, page=None):
                         )
                     ], spacing=4),
                 ], spacing=10),
-                ft.Row([delivery_field, estado_dd, costo_total], spacing=10),
+                ft.Row([delivery_field, recalcular_delivery_btn, estado_dd, costo_total], spacing=10),
             ], spacing=10),
             padding=12,
         ),
@@ -1491,7 +1442,8 @@ def crud_view(content, page=None):
                     busqueda_pedidos, filtro_estado,
                 ], spacing=8),
                 ft.Row([
-                    ft.Text(f"Seleccionados: {len(pedidos_seleccionados)}", size=12, color=ft.colors.GREY_600),
+                    seleccion_texto,
+                    acciones_lote,
                     ft.Container(expand=True),
                     calcular_rutas_btn,
                 ], spacing=8),
@@ -0,0 +1,249 @@
+"""
+Grabación de pedidos
+El detalle de un pedido editado se guarda por diferencias contra lo que hay
+en la base (altas, cambios y bajas, una sentencia para cada uno) en lugar de
+borrar y volver a insertar todas las líneas. La columna version (migración 9)
+evita que dos usuarios se pisen los cambios sin enterarse.
+
+Las operaciones sobre varios pedidos seleccionados (entregar, reprogramar,
+cancelar, eliminar) son una sola transacción con sentencias por conjunto.
+"""
+from datetime import date, datetime
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+from modules.db_service import db
+from modules import inventario_service as inventario
+from modules.config import DATE_FORMAT_DB
+
+
+# Un pedido entregado o cancelado ya no se entrega, reprograma ni cancela
+ESTADOS_CERRADOS = ("Entregado", "Cancelado")
+
+
+class PedidoModificadoError(Exception):
+    """Otro usuario guardó o eliminó el pedido después de abrirlo para editar"""
+
+
+def _agrupar_lineas(lineas: Iterable[Sequence]) -> Dict[int, Tuple[int, int]]:
+    """
+    (producto_id, cantidad, precio_unitario) -> {producto_id: (cantidad, precio)}
+    Un producto repetido suma cantidades y queda con el último precio.
+    """
+    agrupadas: Dict[int, Tuple[int, int]] = {}
+    for producto_id, cantidad, precio in lineas:
+        cantidad, precio = int(cantidad), int(precio)
+        if cantidad <= 0 or precio < 0:
+            raise ValueError(f"Línea inválida para el producto {producto_id}")
+        anterior = agrupadas.get(int(producto_id), (0, precio))[0]
+        agrupadas[int(producto_id)] = (anterior + cantidad, precio)
+    return agrupadas
+
+
+def diferencias_detalle(actuales: Sequence[Sequence], lineas: Iterable[Sequence]) -> Dict[str, List]:
+    """
+    Compara el detalle guardado con el editado
+
+    Args:
+        actuales: (id, producto_id, cantidad, precio_unitario, subtotal) de detalle_pedido
+        lineas: (producto_id, cantidad, precio_unitario) editadas
+
+    Returns:
+        {'altas': [(producto_id, cantidad, precio, subtotal)],
+         'cambios': [(id, cantidad, precio, subtotal)],
+         'bajas': [id, ...]}
+    """
+    editadas = _agrupar_lineas(lineas)
+    altas, cambios, bajas = [], [], []
+    vistos = set()
+    for detalle_id, producto_id, cantidad, precio, subtotal in actuales:
+        if producto_id not in editadas or producto_id in vistos:
+            # Quitado del pedido, o fila repetida de un producto (queda la primera)
+            bajas.append(detalle_id)
+            continue
+        vistos.add(producto_id)
+        nueva_cantidad, nuevo_precio = editadas[producto_id]
+        nuevo_subtotal = nueva_cantidad * nuevo_precio
+        if (cantidad, precio, subtotal) != (nueva_cantidad, nuevo_precio, nuevo_subtotal):
+            cambios.append((detalle_id, nueva_cantidad, nuevo_precio, nuevo_subtotal))
+    for producto_id, (cantidad, precio) in editadas.items():
+        if producto_id not in vistos:
+            altas.append((producto_id, cantidad, precio, cantidad * precio))
+    return {"altas": altas, "cambios": cambios, "bajas": bajas}
+
+
+def guardar_detalle(cur, pedido_id: int, lineas: Iterable[Sequence]) -> Dict[str, int]:
+    """
+    Deja el detalle del pedido igual a 'lineas' tocando solo las filas que cambian
+    (en la transacción del cursor recibido)
+
+    Returns:
+        {'altas': n, 'cambios': n, 'bajas': n}
+    """
+    cur.execute(
+        "SELECT id, producto_id, cantidad, precio_unitario, subtotal FROM detalle_pedido WHERE pedido_id = %s ORDER BY id",
+        (pedido_id,)
+    )
+    diferencias = diferencias_detalle(cur.fetchall(), lineas)
+    altas, cambios, bajas = diferencias["altas"], diferencias["cambios"], diferencias["bajas"]
+
+    if bajas:
+        marcadores = ", ".join(["%s"] * len(bajas))
+        cur.execute(f"DELETE FROM detalle_pedido WHERE id IN ({marcadores})", tuple(bajas))
+
+    if cambios:
+        casos = " ".join(["WHEN %s THEN %s"] * len(cambios))
+        marcadores = ", ".join(["%s"] * len(cambios))
+        params: List[Any] = []
+        for posicion in (1, 2, 3):  # cantidad, precio_unitario, subtotal
+            params += [v for cambio in cambios for v in (cambio[0], cambio[posicion])]
+        cur.execute(f"""
+            UPDATE detalle_pedido SET
+                cantidad = CASE id {casos} END,
+                precio_unitario = CASE id {casos} END,
+                subtotal = CASE id {casos} END
+            WHERE id IN ({marcadores})
+        """, params + [cambio[0] for cambio in cambios])
+
+    if altas:
+        valores = ", ".join(["(%s, %s, %s, %s, %s)"] * len(altas))
+        cur.execute(
+            f"INSERT INTO detalle_pedido (pedido_id, producto_id, cantidad, precio_unitario, subtotal) VALUES {valores}",
+            [v for alta in altas for v in (pedido_id,) + tuple(alta)]
+        )
+
+    return {"altas": len(altas), "cambios": len(cambios), "bajas": len(bajas)}
+
+
+def usa_version() -> bool:
+    """True si pedidos tiene la columna version (migración 9)"""
+    return db.schema.has_column("pedidos", "version")
+
+
+def actualizar_pedido(cur, pedido_id: int, version: Optional[int], campos: Dict[str, Any]) -> Optional[int]:
+    """
+    UPDATE de la cabecera del pedido que solo se aplica si nadie lo guardó
+    desde que se leyó 'version'
+
+    Args:
+        campos: {columna: valor} a actualizar
+
+    Returns:
+        La nueva versión (None si la tabla no tiene versión)
+
+    Raises:
+        PedidoModificadoError si la versión ya no coincide o el pedido no existe
+    """
+    asignaciones = [f"{columna} = %s" for columna in campos]
+    params = list(campos.values())
+    condicion = "id = %s"
+    if usa_version() and version is not None:
+        asignaciones.append("version = version + 1")
+        condicion += " AND version = %s"
+        params += [pedido_id, version]
+    else:
+        params.append(pedido_id)
+
+    cur.execute(f"UPDATE pedidos SET {', '.join(asignaciones)} WHERE {condicion}", params)
+    if cur.rowcount == 0:
+        raise PedidoModificadoError(f"El pedido #{pedido_id} fue modificado por otro usuario")
+    return version + 1 if usa_version() and version is not None else None
+
+
+# ========================================
+# OPERACIONES POR LOTE
+# ========================================
+
+def _ids_unicos(pedido_ids: Iterable[int]) -> List[int]:
+    return sorted({int(pedido_id) for pedido_id in pedido_ids})
+
+
+def _resultado(ids: List[int], procesados: Iterable[int]) -> Dict[str, List[int]]:
+    procesados = sorted(procesados)
+    hechos = set(procesados)
+    return {"procesados": procesados, "omitidos": [pedido_id for pedido_id in ids if pedido_id not in hechos]}
+
+
+def _actualizar_abiertos(cur, ids: List[int], asignaciones: str, params: Sequence = ()) -> List[int]:
+    """UPDATE de los pedidos aún no cerrados de la lista (sube la versión); devuelve los tocados"""
+    version = ", version = version + 1" if usa_version() else ""
+    marcadores = ", ".join(["%s"] * len(ids))
+    cerrados = ", ".join(["%s"] * len(ESTADOS_CERRADOS))
+    cur.execute(f"""
+        UPDATE pedidos SET {asignaciones}{version}
+        WHERE id IN ({marcadores}) AND COALESCE(estado, 'Pendiente') NOT IN ({cerrados})
+        RETURNING id
+    """, list(params) + ids + list(ESTADOS_CERRADOS))
+    return [fila[0] for fila in cur.fetchall()]
+
+
+def marcar_entregados(pedido_ids: Iterable[int]) -> Dict[str, List[int]]:
+    """
+    Marca como entregados los pedidos abiertos y descuenta su detalle del stock
+    (kardex) en la misma transacción
+
+    Returns:
+        {'procesados': [ids], 'omitidos': [ids ya cerrados o inexistentes]}
+    """
+    ids = _ids_unicos(pedido_ids)
+    if not ids:
+        return _resultado(ids, [])
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        entregados = _actualizar_abiertos(cur, ids, "estado = 'Entregado'")
+        inventario.registrar_pedidos(cur, entregados)
+        conn.commit()
+    return _resultado(ids, entregados)
+
+
+def reprogramar(pedido_ids: Iterable[int], fecha_entrega) -> Dict[str, List[int]]:
+    """
+    Cambia la fecha de entrega de los pedidos abiertos
+
+    Args:
+        fecha_entrega: date, datetime o texto 'YYYY-MM-DD'
+
+    Raises:
+        ValueError si la fecha no es válida
+    """
+    if isinstance(fecha_entrega, datetime):
+        fecha_entrega = fecha_entrega.date()
+    if not isinstance(fecha_entrega, date):
+        try:
+            fecha_entrega = datetime.strptime(str(fecha_entrega).strip()[:10], DATE_FORMAT_DB).date()
+        except ValueError:
+            raise ValueError(f"Fecha de entrega inválida: {fecha_entrega}")
+
+    ids = _ids_unicos(pedido_ids)
+    if not ids:
+        return _resultado(ids, [])
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        reprogramados = _actualizar_abiertos(cur, ids, "fecha_entrega = %s", (fecha_entrega.strftime(DATE_FORMAT_DB),))
+        conn.commit()
+    return _resultado(ids, reprogramados)
+
+
+def cancelar(pedido_ids: Iterable[int]) -> Dict[str, List[int]]:
+    """Cancela los pedidos abiertos (los entregados no se tocan)"""
+    ids = _ids_unicos(pedido_ids)
+    if not ids:
+        return _resultado(ids, [])
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cancelados = _actualizar_abiertos(cur, ids, "estado = 'Cancelado'")
+        conn.commit()
+    return _resultado(ids, cancelados)
+
+
+def eliminar(pedido_ids: Iterable[int]) -> Dict[str, List[int]]:
+    """Elimina los pedidos y su detalle (dos DELETE por conjunto)"""
+    ids = _ids_unicos(pedido_ids)
+    if not ids:
+        return _resultado(ids, [])
+    marcadores = ", ".join(["%s"] * len(ids))
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute(f"DELETE FROM detalle_pedido WHERE pedido_id IN ({marcadores})", ids)
+        cur.execute(f"DELETE FROM pedidos WHERE id IN ({marcadores}) RETURNING id", ids)
+        eliminados = [fila[0] for fila in cur.fetchall()]
+        conn.commit()
+    return _resultado(ids, eliminados)
@@ -0,0 +1,260 @@
+"""
+Ajustes masivos de precios
+Porcentaje, monto fijo o margen sobre el costo, filtrados por categoría,
+proveedor o margen actual, con redondeo a múltiplos de guaraníes.
+Cada ajuste es un UPDATE sobre todo el conjunto en una sola transacción y
+deja una foto de los precios anteriores en historial_precios para revertirlo.
+"""
+import json
+from typing import Any, Dict, List, Optional, Tuple
+from modules.db_service import db
+from modules.session_service import session
+from modules.config import PRECIO_REDONDEOS, PRECIO_REDONDEO_DEFAULT, PRECIO_MAX_EJEMPLOS, Validation
+
+
+TIPOS_AJUSTE = ("porcentaje", "monto", "margen")
+MODOS_REDONDEO = ("cercano", "arriba", "abajo")
+
+
+def regla_ajuste(
+    tipo: str,
+    valor: float,
+    categoria: Optional[str] = None,
+    proveedor_id: Optional[int] = None,
+    margen_menor_a: Optional[float] = None,
+    redondeo: int = PRECIO_REDONDEO_DEFAULT,
+    modo_redondeo: str = "cercano"
+) -> Dict[str, Any]:
+    """
+    Valida y arma la regla de un ajuste (se guarda tal cual en ajustes_precios)
+
+    Args:
+        tipo: 'porcentaje' (+10 = 10% más), 'monto' (Gs. a sumar o restar)
+              o 'margen' (precio de venta = costo + valor %)
+        valor: Porcentaje o monto según el tipo
+        categoria, proveedor_id: Filtros opcionales
+        margen_menor_a: Solo productos cuyo margen actual sobre el costo es menor (%)
+        redondeo: Múltiplo de Gs. al que se redondea el precio nuevo
+        modo_redondeo: 'cercano', 'arriba' o 'abajo'
+
+    Raises:
+        ValueError si la regla no es válida
+    """
+    if tipo not in TIPOS_AJUSTE:
+        raise ValueError(f"Tipo de ajuste inválido: {tipo}")
+    if modo_redondeo not in MODOS_REDONDEO:
+        raise ValueError(f"Modo de redondeo inválido: {modo_redondeo}")
+    if redondeo not in PRECIO_REDONDEOS:
+        raise ValueError(f"Redondeo no permitido: {redondeo}")
+    if tipo == "monto":
+        if abs(valor) > Validation.MAX_PRECIO:
+            raise ValueError("Monto fuera de rango")
+    elif not -100 < valor <= 1000:
+        raise ValueError("Porcentaje fuera de rango (-100 a 1000)")
+
+    return {
+        "tipo": tipo,
+        "valor": int(valor) if tipo == "monto" else round(float(valor), 2),
+        "categoria": categoria or None,
+        "proveedor_id": int(proveedor_id) if proveedor_id else None,
+        "margen_menor_a": round(float(margen_menor_a), 2) if margen_menor_a is not None else None,
+        "redondeo": int(redondeo),
+        "modo_redondeo": modo_redondeo,
+    }
+
+
+def _sql_ajuste(regla: Dict[str, Any]) -> Tuple[str, str, str, tuple]:
+    """
+    Traduce la regla a SQL (aritmética entera, igual en PostgreSQL y SQLite)
+
+    Returns:
+        (columna de precio, expresión del precio nuevo, condición WHERE, parámetros del WHERE)
+    """
+    precio = db.schema.first_column("productos", "precio_venta", "precio")
+    costo = db.schema.first_column("productos", "precio_compra")
+    if not precio:
+        raise ValueError("La tabla productos no tiene columna de precio")
+    if (regla["tipo"] == "margen" or regla["margen_menor_a"] is not None) and not costo:
+        raise ValueError("La tabla productos no tiene precio de compra")
+
+    # Porcentajes en centésimos para no depender de la aritmética decimal de cada motor
+    if regla["tipo"] == "porcentaje":
+        factor = 10000 + int(round(regla["valor"] * 100))
+        crudo = f"(CAST({precio} AS BIGINT) * {factor} + 5000) / 10000"
+    elif regla["tipo"] == "margen":
+        factor = 10000 + int(round(regla["valor"] * 100))
+        crudo = f"(CAST({costo} AS BIGINT) * {factor} + 5000) / 10000"
+    else:
+        crudo = f"(CAST({precio} AS BIGINT) + {int(regla['valor'])})"
+
+    n = regla["redondeo"]
+    if n == 1:
+        nuevo = crudo
+    elif regla["modo_redondeo"] == "arriba":
+        nuevo = f"(({crudo} + {n - 1}) / {n}) * {n}"
+    elif regla["modo_redondeo"] == "abajo":
+        nuevo = f"({crudo} / {n}) * {n}"
+    else:
+        nuevo = f"(({crudo} + {n // 2}) / {n}) * {n}"
+
+    condiciones = [f"{precio} IS NOT NULL", f"{nuevo} >= 0", f"{nuevo} <> {precio}"]
+    parametros = []
+    if regla["tipo"] == "margen" or regla["margen_menor_a"] is not None:
+        condiciones.append(f"{costo} > 0")
+    if regla["margen_menor_a"] is not None:
+        # precio < costo * (1 + margen%)  <=>  margen actual menor al indicado
+        limite = 10000 + int(round(regla["margen_menor_a"] * 100))
+        condiciones.append(f"CAST({precio} AS BIGINT) * 10000 < CAST({costo} AS BIGINT) * {limite}")
+    if regla["categoria"]:
+        condiciones.append("categoria = %s")
+        parametros.append(regla["categoria"])
+    if regla["proveedor_id"]:
+        condiciones.append("proveedor_id = %s")
+        parametros.append(regla["proveedor_id"])
+
+    return precio, nuevo, " AND ".join(condiciones), tuple(parametros)
+
+
+def previsualizar_ajuste(regla: Dict[str, Any], max_ejemplos: int = PRECIO_MAX_EJEMPLOS) -> Dict[str, Any]:
+    """
+    Cuenta los productos afectados sin modificar nada
+
+    Returns:
+        {"productos": n, "diferencia_total": Gs., "ejemplos": [{"id", "nombre", "antes", "despues"}, ...]}
+    """
+    precio, nuevo, where, params = _sql_ajuste(regla)
+    total, diferencia = db.execute_query(
+        f"SELECT COUNT(*), COALESCE(SUM({nuevo} - {precio}), 0) FROM productos WHERE {where}",
+        params, fetch="one"
+    )
+    ejemplos = db.execute_query(
+        f"SELECT id, nombre, {precio}, {nuevo} FROM productos WHERE {where} ORDER BY nombre LIMIT {int(max_ejemplos)}",
+        params
+    )
+    return {
+        "productos": total,
+        "diferencia_total": int(diferencia),
+        "ejemplos": [{"id": i, "nombre": n, "antes": a, "despues": d} for i, n, a, d in ejemplos],
+    }
+
+
+def aplicar_ajuste(regla: Dict[str, Any], descripcion: str = "", usuario: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Aplica el ajuste en una sola transacción
+
+    Guarda los precios anteriores en historial_precios y actualiza todo el
+    conjunto con un único UPDATE. Al confirmar, la caché de 'productos'
+    (catálogo del punto de venta) queda invalidada.
+
+    Returns:
+        {"ajuste_id": id, "productos": cantidad de productos modificados}
+    """
+    precio, nuevo, where, params = _sql_ajuste(regla)
+    bloqueo = " FOR UPDATE" if db.db_type == "postgresql" else ""
+    actualizacion = ", fecha_actualizacion = CURRENT_TIMESTAMP" if db.schema.has_column("productos", "fecha_actualizacion") else ""
+
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "INSERT INTO ajustes_precios (descripcion, regla, usuario) VALUES (%s, %s, %s) RETURNING id",
+                (descripcion or None, json.dumps(regla), usuario or session.get_username())
+            )
+            ajuste_id = cur.fetchone()[0]
+
+            # Foto de los precios a modificar (filas bloqueadas hasta el commit en PostgreSQL)
+            cur.execute(f"""
+                INSERT INTO historial_precios (ajuste_id, producto_id, precio_anterior, precio_nuevo)
+                SELECT %s, id, {precio}, {nuevo} FROM productos WHERE {where}{bloqueo}
+            """, (ajuste_id,) + params)
+            afectados = cur.rowcount
+
+            cur.execute(f"""
+                UPDATE productos
+                SET {precio} = (
+                    SELECT h.precio_nuevo FROM historial_precios h
+                    WHERE h.ajuste_id = %s AND h.producto_id = productos.id
+                ){actualizacion}
+                WHERE id IN (SELECT producto_id FROM historial_precios WHERE ajuste_id = %s)
+            """, (ajuste_id, ajuste_id))
+
+            cur.execute("UPDATE ajustes_precios SET productos_afectados = %s WHERE id = %s", (afectados, ajuste_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    print(f"💲 Ajuste de precios #{ajuste_id} aplicado: {afectados} productos")
+    return {"ajuste_id": ajuste_id, "productos": afectados}
+
+
+def revertir_ajuste(ajuste_id: int) -> Dict[str, int]:
+    """
+    Restaura los precios anteriores a un ajuste
+
+    Solo se revierten los productos que conservan el precio que dejó el
+    ajuste; los editados después (a mano o por otro ajuste) se respetan.
+
+    Returns:
+        {"revertidos": n, "conservados": n}
+
+    Raises:
+        ValueError si el ajuste no existe o ya fue revertido
+    """
+    precio = db.schema.first_column("productos", "precio_venta", "precio")
+    actualizacion = ", fecha_actualizacion = CURRENT_TIMESTAMP" if db.schema.has_column("productos", "fecha_actualizacion") else ""
+
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        try:
+            bloqueo = " FOR UPDATE" if db.db_type == "postgresql" else ""
+            cur.execute(f"SELECT revertido, productos_afectados FROM ajustes_precios WHERE id = %s{bloqueo}", (ajuste_id,))
+            ajuste = cur.fetchone()
+            if not ajuste:
+                raise ValueError(f"No existe el ajuste #{ajuste_id}")
+            if ajuste[0]:
+                raise ValueError(f"El ajuste #{ajuste_id} ya fue revertido")
+
+            cur.execute(f"""
+                UPDATE productos
+                SET {precio} = (
+                    SELECT h.precio_anterior FROM historial_precios h
+                    WHERE h.ajuste_id = %s AND h.producto_id = productos.id
+                ){actualizacion}
+                WHERE id IN (
+                    SELECT h.producto_id FROM historial_precios h
+                    WHERE h.ajuste_id = %s AND h.precio_nuevo = productos.{precio}
+                )
+            """, (ajuste_id, ajuste_id))
+            revertidos = cur.rowcount
+
+            cur.execute(
+                "UPDATE ajustes_precios SET revertido = true, fecha_reversion = CURRENT_TIMESTAMP WHERE id = %s",
+                (ajuste_id,)
+            )
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+
+    print(f"↩️ Ajuste de precios #{ajuste_id} revertido: {revertidos} productos")
+    return {"revertidos": revertidos, "conservados": (ajuste[1] or 0) - revertidos}
+
+
+def listar_ajustes(limite: int = 20) -> List[Dict[str, Any]]:
+    """Últimos ajustes aplicados (más recientes primero)"""
+    filas = db.execute_query(f"""
+        SELECT id, fecha, descripcion, regla, usuario, productos_afectados, revertido
+        FROM ajustes_precios
+        ORDER BY id DESC
+        LIMIT {int(limite)}
+    """)
+    return [
+        {"id": f[0], "fecha": f[1], "descripcion": f[2], "regla": json.loads(f[3]),
+         "usuario": f[4], "productos": f[5], "revertido": bool(f[6])}
+        for f in filas
+    ]
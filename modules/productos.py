@@ -4,12 +4,14 @@ Migrado a nueva arquitectura con PostgreSQL, Config y Utils
 """
 import flet as ft
 from modules.db_service import db
-from modules.config import Colors, FontSizes, Sizes, Messages, Icons, Spacing
+from modules.config import Colors, FontSizes, Sizes, Messages, Icons, Spacing, PRECIO_REDONDEOS, PRECIO_REDONDEO_DEFAULT
 from modules.utils import (
     format_guarani, parse_guarani, sanitize_string, to_int
 )
 from modules.session_service import session
-from modules import dashboard
+from modules import dashboard, catalogo, precios_service
+from modules import inventario_service as inventario
+from modules import reposicion_service as reposicion
 
 
 def crud_view(content, page=None):
@@ -115,6 +117,8 @@ def crud_view(content, page=None):
         height=Sizes.INPUT_HEIGHT,
     )
 
+    filtro_bajo_minimo = ft.Switch(label="Solo bajo mínimo", value=False)
+
     # === FUNCIONES DE UTILIDAD ===
     def show_snackbar(msg: str, color: str):
         """Muestra mensaje temporal"""
@@ -161,9 +165,9 @@ def crud_view(content, page=None):
                 cur = conn.cursor()
 
                 # Query optimizada con columnas específicas y LIMIT
-                query = """
+                query = f"""
                     SELECT id, nombre, categoria, precio_compra, precio_venta,
-                           stock_actual, stock_minimo
+                           {inventario.columna_stock()}, stock_minimo
                     FROM productos
                     WHERE 1=1
                 """
@@ -178,6 +182,12 @@ def crud_view(content, page=None):
                     query += " AND categoria = %s"
                     params.append(filtro_categoria.value)
 
+                if filtro_bajo_minimo.value:
+                    # Conjunto chico servido por el índice parcial (sin recorrer el catálogo)
+                    ids = [f[0] for f in reposicion.bajo_minimo(filtro_nombre.value.strip())][:100]
+                    query += f" AND id IN ({', '.join(['%s'] * len(ids))})" if ids else " AND 1=0"
+                    params.extend(ids)
+
                 query += " ORDER BY id ASC LIMIT 100"
 
                 cur.execute(query, tuple(params))
@@ -232,9 +242,9 @@ def crud_view(content, page=None):
         try:
             with db.get_connection() as conn:
                 cur = conn.cursor()
-                cur.execute("""
+                cur.execute(f"""
                     SELECT id, nombre, categoria, precio_compra, precio_venta,
-                           stock_actual, stock_minimo, descripcion
+                           {inventario.columna_stock()}, stock_minimo, descripcion
                     FROM productos WHERE id=%s
                 """, (pid,))
                 prod = cur.fetchone()
@@ -314,10 +324,11 @@ def crud_view(content, page=None):
                 cur = conn.cursor()
 
                 # Insertar producto
-                cur.execute("""
+                cur.execute(f"""
                     INSERT INTO productos
-                    (nombre, categoria, precio_compra, precio_venta, stock_actual, stock_minimo, descripcion)
+                    (nombre, categoria, precio_compra, precio_venta, {inventario.columna_stock()}, stock_minimo, descripcion)
                     VALUES (%s, %s, %s, %s, %s, %s, %s)
+                    RETURNING id
                 """, (
                     nombre_clean,
                     categoria.value,
@@ -327,6 +338,12 @@ def crud_view(content, page=None):
                     s_minimo,
                     descripcion.value.strip() or None
                 ))
+                producto_id = cur.fetchone()[0]
+
+                # Stock inicial en el kardex (el INSERT ya lo fijó)
+                inventario.registrar_movimientos(
+                    cur, [(producto_id, s_actual)], "inicial", referencia="Alta de producto", actualizar_stock=False
+                )
 
                 conn.commit()
 
@@ -402,11 +419,17 @@ def crud_view(content, page=None):
             with db.get_connection() as conn:
                 cur = conn.cursor()
 
+                # Misma columna que registrar_movimientos (stock o stock_actual)
+                stock = inventario.columna_stock()
+                cur.execute(f"SELECT {stock} FROM productos WHERE id=%s", (selected_id["id"],))
+                fila_stock = cur.fetchone()
+                stock_anterior = (fila_stock[0] or 0) if fila_stock else 0
+
                 # Actualizar producto
-                cur.execute("""
+                cur.execute(f"""
                     UPDATE productos
                     SET nombre=%s, categoria=%s, precio_compra=%s, precio_venta=%s,
-                        stock_actual=%s, stock_minimo=%s, descripcion=%s
+                        {stock}=%s, stock_minimo=%s, descripcion=%s
                     WHERE id=%s
                 """, (
                     nombre_clean,
@@ -419,6 +442,12 @@ def crud_view(content, page=None):
                     selected_id["id"]
                 ))
 
+                # Corrección manual de stock: queda como ajuste en el kardex
+                inventario.registrar_movimientos(
+                    cur, [(selected_id["id"], s_actual - stock_anterior)], "ajuste",
+                    referencia="Edición de producto", actualizar_stock=False
+                )
+
                 conn.commit()
 
                 limpiar_form()
@@ -454,6 +483,237 @@ def crud_view(content, page=None):
             show_snackbar(Messages.ERROR_DELETE, Colors.ERROR)
             page.update()
 
+    # === IMPORTAR / EXPORTAR CATÁLOGO ===
+    def confirmar_importacion(ruta):
+        """Muestra la vista previa de cambios y aplica la importación si se confirma"""
+        try:
+            resumen = catalogo.previsualizar(ruta)
+        except Exception as ex:
+            print(f"❌ Error leyendo catálogo: {ex}")
+            show_snackbar(f"❌ No se pudo leer el archivo: {ex}", Colors.ERROR)
+            return
+
+        detalle = [
+            ft.Text(f"📄 {resumen['archivo']}: {resumen['filas']} filas", weight="bold"),
+            ft.Text(f"➕ Nuevos: {resumen['nuevos']}", color=Colors.SUCCESS),
+            ft.Text(f"✏️ Actualizados: {resumen['actualizados']} "
+                    f"({resumen['total_cambios_precio']} cambios de precio)", color=Colors.INFO),
+            ft.Text(f"➖ Sin cambios: {resumen['sin_cambios']}", color=Colors.TEXT_SECONDARY),
+        ]
+        if resumen["ignoradas"]:
+            detalle.append(ft.Text(f"⚠️ Columnas ignoradas: {', '.join(resumen['ignoradas'])}", color=Colors.WARNING))
+        for cambio in resumen["cambios_precio"]:
+            detalle.append(ft.Text(
+                f"💲 {cambio['nombre']}: {format_guarani(cambio['antes'] or 0)} → {format_guarani(cambio['despues'])}",
+                size=FontSizes.SMALL,
+            ))
+        if resumen["total_errores"]:
+            detalle.append(ft.Text(f"❌ {resumen['total_errores']} filas con errores (se omiten):", color=Colors.ERROR))
+            for linea, motivo in resumen["errores"]:
+                detalle.append(ft.Text(f"Línea {linea}: {motivo}", size=FontSizes.SMALL, color=Colors.ERROR))
+
+        def aplicar(e):
+            page.close(dialogo)
+            try:
+                resultado = catalogo.importar(ruta)
+                refrescar_tabla()
+                show_snackbar(f"✅ {resultado['rows']} productos importados", Colors.SUCCESS)
+            except Exception as ex:
+                print(f"❌ Error importando catálogo: {ex}")
+                show_snackbar(f"❌ Error importando: {ex}", Colors.ERROR)
+
+        hay_cambios = resumen["nuevos"] or resumen["actualizados"]
+        dialogo = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Vista previa de importación"),
+            content=ft.Column(detalle, scroll=ft.ScrollMode.AUTO, width=520, height=380, spacing=Spacing.SMALL),
+            actions=[
+                ft.TextButton("Cancelar", on_click=lambda e: page.close(dialogo)),
+                ft.ElevatedButton("Aplicar", on_click=aplicar, disabled=not hay_cambios,
+                                  bgcolor=Colors.SUCCESS, color=Colors.TEXT_WHITE),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        page.open(dialogo)
+
+    def archivo_para_importar(e: ft.FilePickerResultEvent):
+        if e.files and e.files[0].path:
+            confirmar_importacion(e.files[0].path)
+
+    def archivo_para_exportar(e: ft.FilePickerResultEvent):
+        if not e.path:
+            return
+        ruta = e.path if e.path.lower().endswith((".xlsx", ".csv")) else e.path + ".xlsx"
+        try:
+            total = catalogo.exportar(ruta)
+            show_snackbar(f"📤 {total} productos exportados a {ruta}", Colors.SUCCESS)
+        except Exception as ex:
+            print(f"❌ Error exportando catálogo: {ex}")
+            show_snackbar(f"❌ Error exportando: {ex}", Colors.ERROR)
+
+    selector_importar = ft.FilePicker(on_result=archivo_para_importar)
+    selector_exportar = ft.FilePicker(on_result=archivo_para_exportar)
+    if page:
+        page.overlay.extend([selector_importar, selector_exportar])
+
+    # === AJUSTE MASIVO DE PRECIOS ===
+    def abrir_ajuste_precios(e):
+        """Diálogo de ajuste por porcentaje, monto o margen con vista previa y reversión"""
+        tipo = ft.Dropdown(
+            label="Tipo de ajuste", width=Sizes.INPUT_WIDTH_MEDIUM, value="porcentaje",
+            options=[
+                ft.dropdown.Option("porcentaje", "Porcentaje (%)"),
+                ft.dropdown.Option("monto", "Monto fijo (₲)"),
+                ft.dropdown.Option("margen", "Margen sobre costo (%)"),
+            ],
+        )
+        valor = ft.TextField(label="Valor", width=Sizes.INPUT_WIDTH_SMALL, hint_text="Ej: 10")
+        categoria_ajuste = ft.Dropdown(
+            label="Categoría", width=Sizes.INPUT_WIDTH_MEDIUM, value="",
+            options=[ft.dropdown.Option("", "Todas")] + [ft.dropdown.Option(o.key) for o in categoria.options],
+        )
+        proveedores = db.cached_query("SELECT id, nombre FROM proveedores ORDER BY nombre", tags=["proveedores"]) \
+            if db.schema.has_column("productos", "proveedor_id") else []
+        proveedor_ajuste = ft.Dropdown(
+            label="Proveedor", width=Sizes.INPUT_WIDTH_MEDIUM, value="", visible=bool(proveedores),
+            options=[ft.dropdown.Option("", "Todos")] + [ft.dropdown.Option(str(pid), nom) for pid, nom in proveedores],
+        )
+        margen_menor = ft.TextField(label="Solo margen menor a (%)", width=Sizes.INPUT_WIDTH_SMALL)
+        redondeo = ft.Dropdown(
+            label="Redondear a", width=Sizes.INPUT_WIDTH_SMALL, value=str(PRECIO_REDONDEO_DEFAULT),
+            options=[ft.dropdown.Option(str(n), format_guarani(n)) for n in PRECIO_REDONDEOS],
+        )
+        modo = ft.Dropdown(
+            label="Redondeo", width=Sizes.INPUT_WIDTH_SMALL, value="cercano",
+            options=[ft.dropdown.Option(m, m.capitalize()) for m in precios_service.MODOS_REDONDEO],
+        )
+        resultado = ft.Column(spacing=Spacing.SMALL)
+        historial = ft.Column(spacing=Spacing.SMALL)
+
+        def leer_regla():
+            try:
+                return precios_service.regla_ajuste(
+                    tipo.value,
+                    float((valor.value or "0").replace(",", ".")),
+                    categoria=categoria_ajuste.value or None,
+                    proveedor_id=int(proveedor_ajuste.value) if proveedor_ajuste.value else None,
+                    margen_menor_a=float(margen_menor.value.replace(",", ".")) if margen_menor.value.strip() else None,
+                    redondeo=int(redondeo.value),
+                    modo_redondeo=modo.value,
+                )
+            except ValueError as ex:
+                resultado.controls = [ft.Text(f"❌ {ex}", color=Colors.ERROR)]
+                page.update()
+                return None
+
+        def vista_previa(e):
+            regla = leer_regla()
+            if not regla:
+                return
+            resumen = precios_service.previsualizar_ajuste(regla)
+            resultado.controls = [ft.Text(
+                f"{resumen['productos']} productos cambian de precio "
+                f"(diferencia total {format_guarani(resumen['diferencia_total'])})",
+                weight="bold",
+            )] + [
+                ft.Text(f"💲 {ej['nombre']}: {format_guarani(ej['antes'])} → {format_guarani(ej['despues'])}",
+                        size=FontSizes.SMALL)
+                for ej in resumen["ejemplos"]
+            ]
+            page.update()
+
+        def aplicar(e):
+            regla = leer_regla()
+            if not regla:
+                return
+            try:
+                aplicado = precios_service.aplicar_ajuste(regla)
+            except Exception as ex:
+                print(f"❌ Error aplicando ajuste de precios: {ex}")
+                show_snackbar(f"❌ Error aplicando ajuste: {ex}", Colors.ERROR)
+                return
+            refrescar_tabla()
+            cargar_historial()
+            resultado.controls = []
+            show_snackbar(f"✅ Ajuste #{aplicado['ajuste_id']}: {aplicado['productos']} precios actualizados", Colors.SUCCESS)
+
+        def revertir(ajuste_id):
+            try:
+                revertido = precios_service.revertir_ajuste(ajuste_id)
+            except ValueError as ex:
+                show_snackbar(f"⚠️ {ex}", Colors.WARNING)
+                return
+            refrescar_tabla()
+            cargar_historial()
+            show_snackbar(f"↩️ Ajuste #{ajuste_id} revertido: {revertido['revertidos']} precios restaurados", Colors.SUCCESS)
+
+        def cargar_historial():
+            historial.controls = [
+                ft.Row([
+                    ft.Text(f"#{a['id']} {a['descripcion'] or a['regla']['tipo']} · {a['regla']['valor']} · "
+                            f"{a['productos']} productos", size=FontSizes.SMALL, expand=True),
+                    ft.TextButton("Revertir", on_click=lambda e, i=a["id"]: revertir(i), disabled=a["revertido"]),
+                ])
+                for a in precios_service.listar_ajustes(5)
+            ]
+            page.update()
+
+        dialogo = ft.AlertDialog(
+            modal=True,
+            title=ft.Text("Ajuste masivo de precios"),
+            content=ft.Column(
+                [
+                    ft.Row([tipo, valor], wrap=True),
+                    ft.Row([categoria_ajuste, proveedor_ajuste, margen_menor], wrap=True),
+                    ft.Row([redondeo, modo], wrap=True),
+                    ft.Divider(),
+                    resultado,
+                    ft.Divider(),
+                    ft.Text("Últimos ajustes", weight="bold"),
+                    historial,
+                ],
+                scroll=ft.ScrollMode.AUTO, width=560, height=460, spacing=Spacing.SMALL,
+            ),
+            actions=[
+                ft.TextButton("Cerrar", on_click=lambda e: page.close(dialogo)),
+                ft.OutlinedButton("Vista previa", on_click=vista_previa),
+                ft.ElevatedButton("Aplicar", on_click=aplicar, bgcolor=Colors.SUCCESS, color=Colors.TEXT_WHITE),
+            ],
+            actions_alignment=ft.MainAxisAlignment.END,
+        )
+        page.open(dialogo)
+        cargar_historial()
+
+    botones_catalogo = ft.Row(
+        [
+            ft.OutlinedButton(
+                "Ajustar precios",
+                icon=ft.icons.PRICE_CHANGE,
+                on_click=abrir_ajuste_precios,
+                disabled=not session.tiene_permiso("productos", "editar"),
+            ),
+            ft.OutlinedButton(
+                "Importar catálogo",
+                icon=ft.icons.UPLOAD_FILE,
+                on_click=lambda e: selector_importar.pick_files(
+                    dialog_title="Lista de productos (XLSX o CSV)",
+                    allowed_extensions=["xlsx", "csv"],
+                ),
+                disabled=not session.tiene_permiso("productos", "crear"),
+            ),
+            ft.OutlinedButton(
+                "Exportar catálogo",
+                icon=Icons.EXPORT,
+                on_click=lambda e: selector_exportar.save_file(
+                    dialog_title="Exportar catálogo",
+                    file_name="catalogo_productos.xlsx",
+                    allowed_extensions=["xlsx", "csv"],
+                ),
+            ),
+        ],
+        spacing=Spacing.MEDIUM,
+    )
+
     # === BOTONES DE ACCIÓN ===
     botones = ft.Row(
         [
@@ -529,7 +789,7 @@ def crud_view(content, page=None):
 
     # === TARJETA DE FILTROS ===
     filtros_card = ft.Container(
-        content=ft.Row([filtro_nombre, filtro_categoria], spacing=Spacing.MEDIUM),
+        content=ft.Row([filtro_nombre, filtro_categoria, filtro_bajo_minimo, botones_catalogo], spacing=Spacing.MEDIUM, wrap=True),
         padding=Spacing.MEDIUM,
         border_radius=Sizes.CARD_RADIUS,
         bgcolor=ft.colors.with_opacity(0.5, Colors.BG_WHITE),
@@ -571,6 +831,7 @@ def crud_view(content, page=None):
     # === EVENTOS ===
     filtro_nombre.on_change = refrescar_tabla
     filtro_categoria.on_change = refrescar_tabla
+    filtro_bajo_minimo.on_change = refrescar_tabla
 
     # === CARGA INICIAL ===
     refrescar_tabla()
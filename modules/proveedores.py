@@ -10,7 +10,7 @@ from modules.utils import (
     validate_ruc, open_whatsapp, sanitize_string
 )
 from modules.session_service import session
-from modules import dashboard
+from modules import dashboard, compras
 
 
 def crud_view(content, page=None):
@@ -478,7 +478,16 @@ def crud_view(content, page=None):
     form_card = ft.Container(
         content=ft.Column(
             [
-                ft.Row([volver_icon, ft.Text("Gestión de Proveedores", size=FontSizes.XLARGE, weight="bold", color=Colors.PRIMARY)]),
+                ft.Row([
+                    volver_icon,
+                    ft.Text("Gestión de Proveedores", size=FontSizes.XLARGE, weight="bold", color=Colors.PRIMARY),
+                    ft.IconButton(
+                        icon=ft.icons.INVENTORY,
+                        tooltip="Órdenes de compra y recepción",
+                        icon_color=Colors.PRIMARY,
+                        on_click=lambda e: compras.crud_view(content, page=page),
+                    ),
+                ]),
                 nombre,
                 ruc,
                 direccion,
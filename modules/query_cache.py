@@ -0,0 +1,164 @@
+"""
+Caché de resultados para consultas de lectura
+LRU acotado por cantidad de entradas y por memoria aproximada, con
+invalidación por tabla (tag) cuando se confirma una escritura.
+"""
+import sys
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Tuple
+from modules.config import DB_CACHE_MAX_ENTRIES, DB_CACHE_MAX_BYTES, DB_CACHE_TTL
+
+
+def _tamano_aproximado(filas: List[Any]) -> int:
+    """Estimación barata de memoria de un resultado (bytes)"""
+    total = sys.getsizeof(filas)
+    for fila in filas:
+        total += 64
+        for valor in fila:
+            total += sys.getsizeof(valor)
+    return total
+
+
+class QueryCache:
+    """
+    Caché LRU thread-safe de resultados de consultas
+
+    Cada entrada guarda (filas, tags, vencimiento, tamaño). Las escrituras
+    confirmadas invalidan todas las entradas que tengan alguno de sus tags.
+    Un contador de generación por tag evita guardar resultados leídos
+    mientras otra conexión confirmaba una escritura sobre esas tablas.
+    """
+
+    def __init__(self, max_entries: int = DB_CACHE_MAX_ENTRIES,
+                 max_bytes: int = DB_CACHE_MAX_BYTES, ttl: float = DB_CACHE_TTL):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = ttl
+        self.enabled = max_entries > 0
+        self._lock = threading.Lock()
+        self._entradas: "OrderedDict[Tuple, Tuple[List[Any], frozenset, float, int]]" = OrderedDict()
+        self._por_tag: Dict[str, Set[Tuple]] = {}
+        self._generacion: Dict[str, int] = {}
+        self._oyentes: Dict[str, List[Callable[[str], None]]] = {}
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def generacion(self, tags: Iterable[str]) -> Tuple[int, ...]:
+        """Foto de la generación actual de los tags (tomar antes de consultar)"""
+        with self._lock:
+            return tuple(self._generacion.get(t, 0) for t in tags)
+
+    def get(self, clave: Tuple) -> Optional[List[Any]]:
+        """Retorna una copia de las filas cacheadas o None si no hay entrada vigente"""
+        with self._lock:
+            entrada = self._entradas.get(clave)
+            if entrada is None:
+                self.misses += 1
+                return None
+            filas, tags, vence, _ = entrada
+            if vence < time.monotonic():
+                self._eliminar(clave)
+                self.misses += 1
+                return None
+            self._entradas.move_to_end(clave)
+            self.hits += 1
+            return list(filas)
+
+    def put(self, clave: Tuple, filas: List[Any], tags: frozenset,
+            ttl: Optional[float] = None, generacion: Optional[Tuple[int, ...]] = None):
+        """
+        Guarda un resultado. Si se pasa la generación tomada antes de consultar
+        y algún tag fue invalidado entre medio, el resultado se descarta.
+        """
+        tamano = _tamano_aproximado(filas)
+        if tamano > self.max_bytes:
+            return
+
+        with self._lock:
+            if generacion is not None and generacion != tuple(self._generacion.get(t, 0) for t in tags):
+                return
+            if clave in self._entradas:
+                self._eliminar(clave)
+
+            vence = time.monotonic() + (self.default_ttl if ttl is None else ttl)
+            self._entradas[clave] = (list(filas), tags, vence, tamano)
+            self._bytes += tamano
+            for tag in tags:
+                self._por_tag.setdefault(tag, set()).add(clave)
+
+            # Desalojar las menos usadas hasta respetar los límites
+            while self._entradas and (len(self._entradas) > self.max_entries or self._bytes > self.max_bytes):
+                self._eliminar(next(iter(self._entradas)))
+
+    def invalidate(self, tags: Iterable[str]):
+        """Descarta todas las entradas asociadas a cualquiera de los tags"""
+        avisos = []
+        with self._lock:
+            for tag in tags:
+                self._generacion[tag] = self._generacion.get(tag, 0) + 1
+                avisos.extend((oyente, tag) for oyente in self._oyentes.get(tag, ()))
+                claves = self._por_tag.pop(tag, None)
+                if not claves:
+                    continue
+                for clave in list(claves):
+                    if clave in self._entradas:
+                        self._eliminar(clave)
+                        self.invalidations += 1
+
+        # Fuera del lock: un oyente puede volver a consultar la caché
+        for oyente, tag in avisos:
+            try:
+                oyente(tag)
+            except Exception as e:
+                print(f"⚠️ Error notificando invalidación de '{tag}': {e}")
+
+    def subscribe(self, tag: str, oyente: Callable[[str], None]) -> Callable[[], None]:
+        """
+        Llama a oyente(tag) cada vez que se confirma una escritura sobre la tabla
+        (en el hilo que confirma: debe ser rápido)
+
+        Returns:
+            Función para cancelar la suscripción
+        """
+        with self._lock:
+            self._oyentes.setdefault(tag, []).append(oyente)
+
+        def cancelar():
+            with self._lock:
+                oyentes = self._oyentes.get(tag, [])
+                if oyente in oyentes:
+                    oyentes.remove(oyente)
+        return cancelar
+
+    def clear(self):
+        """Vacía la caché completa"""
+        with self._lock:
+            self._entradas.clear()
+            self._por_tag.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Estadísticas de uso de la caché"""
+        with self._lock:
+            return {
+                "entries": len(self._entradas),
+                "bytes": self._bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "invalidations": self.invalidations,
+            }
+
+    def _eliminar(self, clave: Tuple):
+        """Quita una entrada (requiere tener el lock)"""
+        filas, tags, _, tamano = self._entradas.pop(clave)
+        self._bytes -= tamano
+        for tag in tags:
+            claves = self._por_tag.get(tag)
+            if claves is not None:
+                claves.discard(clave)
+                if not claves:
+                    del self._por_tag[tag]
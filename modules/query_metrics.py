@@ -0,0 +1,274 @@
+"""
+Instrumentación de consultas SQL
+Registra latencias por huella de consulta, filas devueltas, espera del pool
+y módulo que originó la consulta. Mantiene un log de consultas lentas.
+"""
+import re
+import sys
+import time
+import random
+import threading
+from collections import deque
+from functools import lru_cache
+from typing import Dict, Any, List, Optional
+from modules.config import (
+    DB_METRICS_ENABLED, DB_SLOW_QUERY_MS, DB_SLOW_QUERY_SAMPLE,
+    DB_SLOW_QUERY_LOG_SIZE
+)
+
+
+# Límites superiores (ms) de los buckets del histograma, escala logarítmica
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Módulos que no cuentan como "origen" de una consulta
+_MODULOS_INTERNOS = (
+    "modules.db_service", "modules.async_db_service", "modules.query_metrics",
+    "contextlib", "asyncio", "concurrent.futures", "threading",
+)
+
+_RE_STRING = re.compile(r"'(?:[^']|'')*'")
+_RE_NUMERO = re.compile(r"\b\d+(?:\.\d+)?\b")
+_RE_PARAM = re.compile(r"%s|\?")
+_RE_LISTA = re.compile(r"\(\s*\?(?:\s*,\s*\?)+\s*\)")
+_RE_ESPACIOS = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(sql: str) -> str:
+    """
+    Normaliza una consulta SQL a su huella: literales y parámetros
+    se reemplazan por ?, listas IN se colapsan y se unifican espacios
+
+    Ejemplo:
+        "SELECT * FROM ventas WHERE id = 5" -> "SELECT * FROM ventas WHERE id = ?"
+    """
+    huella = _RE_STRING.sub("?", sql)
+    huella = _RE_NUMERO.sub("?", huella)
+    huella = _RE_PARAM.sub("?", huella)
+    huella = _RE_LISTA.sub("(?...)", huella)
+    return _RE_ESPACIOS.sub(" ", huella).strip()
+
+
+def _indice_bucket(ms: float) -> int:
+    """Retorna el índice del bucket del histograma para una latencia"""
+    for i, limite in enumerate(BUCKETS_MS):
+        if ms <= limite:
+            return i
+    return len(BUCKETS_MS)
+
+
+def modulo_llamador() -> str:
+    """Nombre del primer módulo fuera de la capa de base de datos en la pila"""
+    frame = sys._getframe(1)
+    while frame is not None:
+        modulo = frame.f_globals.get("__name__", "?")
+        if not modulo.startswith(_MODULOS_INTERNOS):
+            return modulo
+        frame = frame.f_back
+    return "?"
+
+
+class _EstadisticaConsulta:
+    """Acumulador de métricas para una huella de consulta"""
+    __slots__ = ("count", "total_ms", "max_ms", "rows", "buckets", "callers")
+
+    def __init__(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.rows = 0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+        self.callers: Dict[str, int] = {}
+
+    def percentil(self, p: float) -> float:
+        """Aproxima el percentil p (0-100) con el límite superior del bucket"""
+        objetivo = self.count * p / 100.0
+        acumulado = 0
+        for i, n in enumerate(self.buckets):
+            acumulado += n
+            if acumulado >= objetivo and n:
+                return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else self.max_ms
+        return self.max_ms
+
+
+class QueryMetrics:
+    """
+    Servicio singleton que acumula métricas de consultas
+    Seguro entre hilos; el registro es O(1) por sentencia
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+            cls._instance._initialized = False
+        return cls._instance
+
+    def __init__(self):
+        if self._initialized:
+            return
+
+        self.enabled = DB_METRICS_ENABLED
+        self.slow_threshold_ms = DB_SLOW_QUERY_MS
+        self.slow_sample_rate = DB_SLOW_QUERY_SAMPLE
+        self._lock = threading.Lock()
+        self._stats: Dict[str, _EstadisticaConsulta] = {}
+        self._slow_log: deque = deque(maxlen=DB_SLOW_QUERY_LOG_SIZE)
+        self._pool_waits = 0
+        self._pool_wait_ms = 0.0
+        self._pool_wait_max_ms = 0.0
+        self._dump_thread: Optional[threading.Thread] = None
+        self._dump_stop = threading.Event()
+        self._initialized = True
+
+    # ========================================
+    # REGISTRO
+    # ========================================
+
+    def record(self, sql: str, elapsed_ms: float, caller: str, params: Any = None) -> str:
+        """
+        Registra la ejecución de una sentencia
+
+        Returns:
+            Huella de la consulta (para asociar luego las filas leídas)
+        """
+        huella = fingerprint(sql)
+        with self._lock:
+            stat = self._stats.get(huella)
+            if stat is None:
+                stat = self._stats[huella] = _EstadisticaConsulta()
+            stat.count += 1
+            stat.total_ms += elapsed_ms
+            if elapsed_ms > stat.max_ms:
+                stat.max_ms = elapsed_ms
+            stat.buckets[_indice_bucket(elapsed_ms)] += 1
+            stat.callers[caller] = stat.callers.get(caller, 0) + 1
+
+        if elapsed_ms >= self.slow_threshold_ms and random.random() < self.slow_sample_rate:
+            self._slow_log.append({
+                "timestamp": time.time(),
+                "ms": round(elapsed_ms, 2),
+                "caller": caller,
+                "fingerprint": huella,
+                "sql": sql.strip(),
+                "params": repr(params)[:200] if params else None,
+            })
+        return huella
+
+    def add_rows(self, huella: str, rows: int):
+        """Suma filas devueltas a una huella ya registrada"""
+        if rows <= 0:
+            return
+        with self._lock:
+            stat = self._stats.get(huella)
+            if stat is not None:
+                stat.rows += rows
+
+    def record_pool_wait(self, elapsed_ms: float):
+        """Registra el tiempo de espera para obtener una conexión del pool"""
+        with self._lock:
+            self._pool_waits += 1
+            self._pool_wait_ms += elapsed_ms
+            if elapsed_ms > self._pool_wait_max_ms:
+                self._pool_wait_max_ms = elapsed_ms
+
+    # ========================================
+    # CONSULTA
+    # ========================================
+
+    def snapshot(self) -> Dict[str, Any]:
+        """
+        Retorna una copia de todas las métricas acumuladas
+
+        Returns:
+            Diccionario con 'queries' (por huella), 'pool' y 'slow_queries'
+        """
+        with self._lock:
+            consultas = {
+                huella: {
+                    "count": s.count,
+                    "total_ms": round(s.total_ms, 3),
+                    "avg_ms": round(s.total_ms / s.count, 3) if s.count else 0.0,
+                    "max_ms": round(s.max_ms, 3),
+                    "p50_ms": s.percentil(50),
+                    "p95_ms": s.percentil(95),
+                    "p99_ms": s.percentil(99),
+                    "rows": s.rows,
+                    "histogram": dict(zip([f"<={b}ms" for b in BUCKETS_MS] + ["inf"], s.buckets)),
+                    "callers": dict(s.callers),
+                }
+                for huella, s in self._stats.items()
+            }
+            pool = {
+                "waits": self._pool_waits,
+                "total_ms": round(self._pool_wait_ms, 3),
+                "avg_ms": round(self._pool_wait_ms / self._pool_waits, 3) if self._pool_waits else 0.0,
+                "max_ms": round(self._pool_wait_max_ms, 3),
+            }
+        return {"queries": consultas, "pool": pool, "slow_queries": list(self._slow_log)}
+
+    def top(self, n: int = 10, key: str = "total_ms") -> List[Dict[str, Any]]:
+        """Las n huellas con mayor valor de la clave indicada"""
+        consultas = self.snapshot()["queries"]
+        ordenadas = sorted(consultas.items(), key=lambda kv: kv[1][key], reverse=True)
+        return [dict(fingerprint=h, **datos) for h, datos in ordenadas[:n]]
+
+    def slow_queries(self) -> List[Dict[str, Any]]:
+        """Copia del log de consultas lentas (más antiguas primero)"""
+        return list(self._slow_log)
+
+    def reset(self):
+        """Descarta todas las métricas acumuladas"""
+        with self._lock:
+            self._stats.clear()
+            self._slow_log.clear()
+            self._pool_waits = 0
+            self._pool_wait_ms = 0.0
+            self._pool_wait_max_ms = 0.0
+
+    def format_report(self, n: int = 10) -> str:
+        """Reporte de texto con las consultas más costosas"""
+        snap = self.snapshot()
+        lineas = ["📊 Métricas de consultas (top por tiempo total)"]
+        for q in self.top(n):
+            origen = max(q["callers"], key=q["callers"].get) if q["callers"] else "?"
+            lineas.append(
+                f"  {q['count']:>6}x  total {q['total_ms']:>10.1f}ms  "
+                f"p95 {q['p95_ms']:>7.1f}ms  filas {q['rows']:>7}  [{origen}]  {q['fingerprint'][:100]}"
+            )
+        pool = snap["pool"]
+        lineas.append(
+            f"  Pool: {pool['waits']} esperas, prom {pool['avg_ms']}ms, máx {pool['max_ms']}ms"
+        )
+        lineas.append(f"  Consultas lentas registradas: {len(snap['slow_queries'])}")
+        return "\n".join(lineas)
+
+    # ========================================
+    # VOLCADO PERIÓDICO
+    # ========================================
+
+    def start_periodic_dump(self, interval_seconds: int, n: int = 10):
+        """Inicia un hilo daemon que imprime el reporte cada interval_seconds"""
+        if interval_seconds <= 0 or (self._dump_thread and self._dump_thread.is_alive()):
+            return
+
+        self._dump_stop.clear()
+
+        def _loop():
+            while not self._dump_stop.wait(interval_seconds):
+                try:
+                    print(self.format_report(n))
+                except Exception as e:
+                    print(f"⚠️ Error volcando métricas: {e}")
+
+        self._dump_thread = threading.Thread(target=_loop, name="query-metrics-dump", daemon=True)
+        self._dump_thread.start()
+
+    def stop_periodic_dump(self):
+        """Detiene el volcado periódico"""
+        self._dump_stop.set()
+        self._dump_thread = None
+
+
+# Instancia global del servicio
+metrics = QueryMetrics()
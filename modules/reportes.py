@@ -9,10 +9,11 @@ from reportlab.lib.pagesizes import A4
 from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
 from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
 from reportlab.lib import colors
-from modules.db_service import db
-from modules.config import Colors, FontSizes, Sizes, Messages, Icons, Spacing
+from modules.db_service import db, QueryCancelledError, QueryTimeoutError
+from modules.config import Colors, FontSizes, Sizes, Messages, Icons, Spacing, DB_REPORT_TIMEOUT_MS
 from modules.utils import format_guarani, open_whatsapp
 from modules import dashboard
+from modules import reposicion_service as reposicion
 
 
 def crud_view(content, page=None):
@@ -27,6 +28,9 @@ def crud_view(content, page=None):
             duration=3000
         ))
 
+    # Clave de cancelación: un refresco nuevo cancela el anterior de esta página
+    clave_consulta = f"reportes:{id(page)}"
+
     # Variables de fecha
     fecha_actual = datetime.now().strftime("%Y-%m-%d")
     fecha_inicio_mes = datetime.now().strftime("%Y-%m-01")
@@ -266,7 +270,7 @@ def crud_view(content, page=None):
 
     def abrir_detalle_ventas(venta_id):
         try:
-            with db.get_connection() as conn:
+            with db.get_connection(read_only=True) as conn:
                 cur = conn.cursor()
                 cur.execute("""
                     SELECT p.nombre, dv.cantidad, dv.precio_unitario, dv.subtotal
@@ -310,7 +314,8 @@ def crud_view(content, page=None):
         registro_count = 0
 
         try:
-            with db.get_connection() as conn:
+            with db.get_connection(read_only=True, timeout_ms=DB_REPORT_TIMEOUT_MS,
+                                   cancel_key=clave_consulta) as conn:
                 cur = conn.cursor()
 
                 # Reporte de Ventas
@@ -522,44 +527,30 @@ def crud_view(content, page=None):
                         ft.DataColumn(ft.Text("Stock Actual", color=Colors.PRIMARY)),
                         ft.DataColumn(ft.Text("Stock Mínimo", color=Colors.PRIMARY)),
                         ft.DataColumn(ft.Text("Estado", color=Colors.PRIMARY)),
+                        ft.DataColumn(ft.Text("Venta/día", color=Colors.PRIMARY)),
+                        ft.DataColumn(ft.Text("Sugerido", color=Colors.PRIMARY)),
                     ]
                     tabla.columns.extend(columns)
 
-                    query = """SELECT id, nombre, COALESCE(stock, 0) as stock_actual,
-                                     COALESCE(stock_minimo, 5) as stock_min
-                              FROM productos
-                              WHERE COALESCE(stock, 0) <= COALESCE(stock_minimo, 5)"""
-                    params = []
-                    if filtro_texto:
-                        query += " AND LOWER(nombre) LIKE %s"
-                        params.append(f"%{filtro_texto}%")
-                    query += " ORDER BY stock_actual ASC LIMIT 100"
-
-                    cur.execute(query, params)
-                    for prod in cur.fetchall():
+                    # Índice parcial de productos bajo mínimo + velocidad de venta del kardex
+                    colores_estado = {"AGOTADO": Colors.ERROR, "CRÍTICO": "#FF5722", "BAJO": Colors.WARNING}
+                    for prod in reposicion.sugerencias(filtro_texto)[:100]:
                         registro_count += 1
-                        stock_actual, stock_min = prod[2], prod[3]
-
-                        if stock_actual == 0:
-                            estado, color = "AGOTADO", Colors.ERROR
-                        elif stock_actual <= stock_min * 0.5:
-                            estado, color = "CRÍTICO", "#FF5722"
-                        else:
-                            estado, color = "BAJO", Colors.WARNING
-
                         estado_container = ft.Container(
-                            content=ft.Text(estado, color=Colors.TEXT_WHITE, weight="bold", size=FontSizes.XSMALL),
-                            bgcolor=color,
+                            content=ft.Text(prod["estado"], color=Colors.TEXT_WHITE, weight="bold", size=FontSizes.XSMALL),
+                            bgcolor=colores_estado[prod["estado"]],
                             padding=ft.padding.symmetric(vertical=4, horizontal=8),
                             border_radius=8
                         )
 
                         tabla.rows.append(ft.DataRow(cells=[
-                            ft.DataCell(ft.Text(str(prod[0]))),
-                            ft.DataCell(ft.Text(prod[1] or "")),
-                            ft.DataCell(ft.Text(str(stock_actual))),
-                            ft.DataCell(ft.Text(str(stock_min))),
+                            ft.DataCell(ft.Text(str(prod["id"]))),
+                            ft.DataCell(ft.Text(prod["nombre"] or "")),
+                            ft.DataCell(ft.Text(str(prod["stock"]))),
+                            ft.DataCell(ft.Text(str(prod["stock_minimo"]))),
                             ft.DataCell(estado_container),
+                            ft.DataCell(ft.Text(f"{prod['por_dia']:g}")),
+                            ft.DataCell(ft.Text(str(prod["sugerido"]), weight="bold")),
                         ]))
 
                 # Productos Más Vendidos
@@ -673,6 +664,13 @@ def crud_view(content, page=None):
                         ]))
                         posicion += 1
 
+        except QueryTimeoutError:
+            error_msg.value = "⏱️ El reporte tardó demasiado. Acote el rango de fechas o el filtro."
+            if not silent_mode:
+                show_snackbar(error_msg.value, Colors.WARNING)
+        except QueryCancelledError:
+            # Reemplazado por un refresco más nuevo o cancelado por el usuario
+            return
         except Exception as ex:
             error_msg.value = f"⚠️ Error al generar reporte: {str(ex)}"
             if not silent_mode:
@@ -687,6 +685,10 @@ def crud_view(content, page=None):
 
         page.update()
 
+    def cancelar_consulta(e):
+        if db.cancel(clave_consulta):
+            show_snackbar("⏹️ Reporte cancelado", Colors.INFO)
+
     # UI de filtros y acciones
     filtros_card = ft.Container(
         content=ft.Column([
@@ -704,6 +706,13 @@ def crud_view(content, page=None):
                     color=Colors.TEXT_WHITE,
                     on_click=refrescar_tabla
                 ),
+                ft.ElevatedButton(
+                    "⏹️ Cancelar",
+                    bgcolor="#757575",
+                    color=Colors.TEXT_WHITE,
+                    on_click=cancelar_consulta,
+                    tooltip="Detener el reporte en curso"
+                ),
                 ft.ElevatedButton(
                     "📄 Exportar PDF",
                     bgcolor="#D32F2F",
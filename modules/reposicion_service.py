@@ -0,0 +1,192 @@
+"""
+Reposición de stock
+El conjunto de productos bajo el mínimo lo mantiene un índice parcial
+(migración 6): consultarlo recorre solo esos productos, no el catálogo.
+La cantidad sugerida sale de la velocidad de venta reciente (kardex) y las
+alertas se recalculan cuando se confirma una escritura sobre productos.
+"""
+import math
+import threading
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional, Sequence
+from modules.db_service import db
+from modules.inventario_service import columna_stock
+from modules.migrations_new import ReorderIndexesMigration
+from modules.config import REPOSICION_DIAS_VENTAS, REPOSICION_DIAS_COBERTURA, REPOSICION_REFRESCO_SEGUNDOS
+
+
+# Mismo texto que el índice parcial idx_productos_bajo_minimo (si no, el planificador no lo usa)
+PREDICADO_BAJO_MINIMO = ReorderIndexesMigration.PREDICADO
+
+_lock = threading.Lock()
+_suscriptores: List[Callable[[List[Dict], int], None]] = []
+_alertados: Optional[set] = None
+_cambios = threading.Event()
+_hilo: Optional[threading.Thread] = None
+_cancelar_aviso: Optional[Callable[[], None]] = None
+
+
+def estado_stock(stock: int, minimo: int) -> str:
+    """AGOTADO, CRÍTICO (hasta la mitad del mínimo), BAJO u OK"""
+    if stock <= 0:
+        return "AGOTADO"
+    if stock <= minimo * 0.5:
+        return "CRÍTICO"
+    if stock <= minimo:
+        return "BAJO"
+    return "OK"
+
+
+# ========================================
+# CONSULTAS
+# ========================================
+
+def bajo_minimo(filtro_nombre: str = "") -> List[tuple]:
+    """
+    Productos con stock menor o igual al mínimo (cacheado)
+
+    El predicado se arma con columna_stock(), igual que el índice parcial de
+    la migración 6: en el esquema migrado (columna stock) la consulta usa el
+    índice; en un esquema antiguo con stock_actual no hay índice y se recorre
+    la tabla.
+
+    Returns:
+        [(id, nombre, stock, stock_minimo), ...] ordenados por stock
+    """
+    stock = columna_stock()
+    consulta = f"""
+        SELECT id, nombre, COALESCE({stock}, 0), COALESCE(stock_minimo, 5)
+        FROM productos
+        WHERE {PREDICADO_BAJO_MINIMO.format(stock=stock)}
+    """
+    params = ()
+    if filtro_nombre:
+        consulta += " AND LOWER(nombre) LIKE %s"
+        params = (f"%{filtro_nombre.lower()}%",)
+    consulta += f" ORDER BY COALESCE({stock}, 0), id"
+    return db.cached_query(consulta, params, tags=["productos"])
+
+
+def velocidad_ventas(producto_ids: Sequence[int], dias: int = REPOSICION_DIAS_VENTAS) -> Dict[int, float]:
+    """Unidades vendidas o entregadas por día en los últimos 'dias' (solo los productos pedidos)"""
+    if not producto_ids or not db.schema.has_table("movimientos_stock"):
+        return {}
+    marcadores = ", ".join(["%s"] * len(producto_ids))
+    filas = db.execute_query(f"""
+        SELECT producto_id, -SUM(cantidad) FROM movimientos_stock
+        WHERE producto_id IN ({marcadores})
+          AND fecha >= %s
+          AND tipo IN ('venta', 'pedido')
+        GROUP BY producto_id
+    """, tuple(producto_ids) + (datetime.now() - timedelta(days=dias),))
+    return {producto_id: max(int(unidades or 0), 0) / dias for producto_id, unidades in filas}
+
+
+def sugerencias(
+    filtro_nombre: str = "",
+    dias: int = REPOSICION_DIAS_VENTAS,
+    cobertura: int = REPOSICION_DIAS_COBERTURA
+) -> List[Dict]:
+    """
+    Productos a reponer con la cantidad sugerida
+
+    Objetivo = stock mínimo + lo que se vende en 'cobertura' días al ritmo
+    de los últimos 'dias' (sin ventas recientes: el doble del mínimo).
+
+    Returns:
+        [{"id", "nombre", "stock", "stock_minimo", "estado", "por_dia", "sugerido"}, ...]
+    """
+    productos = bajo_minimo(filtro_nombre)
+    velocidades = velocidad_ventas([p[0] for p in productos], dias)
+
+    resultado = []
+    for producto_id, nombre, stock, minimo in productos:
+        por_dia = velocidades.get(producto_id, 0.0)
+        demanda = math.ceil(por_dia * cobertura) if por_dia else minimo
+        resultado.append({
+            "id": producto_id,
+            "nombre": nombre,
+            "stock": stock,
+            "stock_minimo": minimo,
+            "estado": estado_stock(stock, minimo),
+            "por_dia": round(por_dia, 2),
+            "sugerido": max(minimo + demanda - stock, 0),
+        })
+    return resultado
+
+
+# ========================================
+# ALERTAS
+# ========================================
+
+def suscribir(callback: Callable[[List[Dict], int], None]) -> Callable[[], None]:
+    """
+    Recibe callback(nuevos, total) cada vez que productos pasan a estar
+    bajo el mínimo ('nuevos' son los registros de sugerencias() de esos productos)
+
+    Returns:
+        Función para cancelar la suscripción
+    """
+    global _hilo, _cancelar_aviso
+    with _lock:
+        _suscriptores.append(callback)
+        if _hilo is None or not _hilo.is_alive():
+            _cancelar_aviso = db.cache.subscribe("productos", lambda tag: _cambios.set())
+            _hilo = threading.Thread(target=_vigilar, name="alertas-reposicion", daemon=True)
+            _hilo.start()
+
+    def cancelar():
+        with _lock:
+            if callback in _suscriptores:
+                _suscriptores.remove(callback)
+    return cancelar
+
+
+def revisar() -> List[Dict]:
+    """
+    Recalcula el conjunto bajo el mínimo y avisa a los suscriptores de los
+    productos que entraron desde la revisión anterior
+
+    Returns:
+        Productos que entraron al conjunto (vacío en la primera revisión)
+    """
+    global _alertados
+    actuales = {fila[0] for fila in bajo_minimo()}
+    with _lock:
+        anteriores = _alertados
+        _alertados = actuales
+        suscriptores = list(_suscriptores)
+    if anteriores is None:
+        return []
+
+    nuevos_ids = actuales - anteriores
+    if not nuevos_ids:
+        return []
+    nuevos = [s for s in sugerencias() if s["id"] in nuevos_ids]
+    for callback in suscriptores:
+        try:
+            callback(nuevos, len(actuales))
+        except Exception as e:
+            print(f"⚠️ Error notificando alerta de reposición: {e}")
+    print(f"📉 {len(nuevos)} productos pasaron a stock bajo ({len(actuales)} en total)")
+    return nuevos
+
+
+def _vigilar():
+    """Hilo daemon: revisa tras cada escritura confirmada (o periódicamente)"""
+    global _hilo, _cancelar_aviso
+    while True:
+        with _lock:
+            if not _suscriptores:
+                # Se decide bajo el lock: un suscribir() concurrente arranca otro hilo
+                if _cancelar_aviso:
+                    _cancelar_aviso()
+                _cancelar_aviso = None
+                _hilo = None
+                return
+        try:
+            revisar()
+        except Exception as e:
+            print(f"⚠️ Error revisando stock mínimo: {e}")
+        _cambios.wait(REPOSICION_REFRESCO_SEGUNDOS)
+        _cambios.clear()
@@ -0,0 +1,357 @@
+"""
+Optimización de rutas de entrega
+Ordena las paradas con vecino más cercano y las mejora con 2-opt y Or-opt
+sobre una matriz de distancias local (haversine), respetando la fecha de
+entrega de cada pedido como hora límite. Los recorridos ya calculados se
+reutilizan mientras no cambie el conjunto de paradas.
+"""
+import threading
+import time
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from modules import geocodificacion_service as geo
+from modules.geocodificacion_service import Coordenadas, distancia_km
+from modules.config import (
+    RUTAS_ORIGEN, RUTAS_VELOCIDAD_KMH, RUTAS_FACTOR_DESVIO, RUTAS_MINUTOS_PARADA,
+    RUTAS_HORA_CIERRE, RUTAS_TIEMPO_MAXIMO, RUTAS_CACHE_MAX, DATE_FORMAT, DATE_FORMAT_DB
+)
+
+
+# Cada minuto de atraso pesa como 10 km de recorrido: primero llegar a tiempo
+_KM_POR_MINUTO_TARDE = 10.0
+_MAX_PASADAS = 100
+
+_cache: "OrderedDict[tuple, Tuple]" = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+# ========================================
+# UBICACIONES
+# ========================================
+
+def ubicar(destino: Optional[str], ubicacion: Optional[str] = None) -> Optional[Coordenadas]:
+    """Coordenadas de un pedido: las escritas en la ubicación o el centro de la ciudad de destino"""
+    ubicado = geo.ubicar_sin_conexion(destino, ubicacion)
+    return ubicado[0] if ubicado else None
+
+
+def limite_entrega(fecha_entrega) -> Optional[datetime]:
+    """Hora límite de un pedido: la fecha de entrega a la hora de cierre del reparto"""
+    if not fecha_entrega:
+        return None
+    if isinstance(fecha_entrega, datetime):
+        return fecha_entrega
+    if isinstance(fecha_entrega, date):
+        return datetime.combine(fecha_entrega, datetime.min.time()).replace(hour=RUTAS_HORA_CIERRE)
+    for formato in (DATE_FORMAT_DB, DATE_FORMAT):
+        try:
+            return datetime.strptime(str(fecha_entrega)[:10], formato).replace(hour=RUTAS_HORA_CIERRE)
+        except ValueError:
+            continue
+    return None
+
+
+# ========================================
+# OPTIMIZACIÓN
+# ========================================
+
+class _Problema:
+    """Matriz de distancias y tiempos (nodo 0 = origen) y evaluación de recorridos"""
+
+    def __init__(self, puntos: List[Coordenadas], limites: List[Optional[float]], volver: bool):
+        n = len(puntos)
+        self.volver = volver
+        self.d = [[distancia_km(puntos[i], puntos[j]) * RUTAS_FACTOR_DESVIO for j in range(n)] for i in range(n)]
+        minutos_por_km = 60.0 / RUTAS_VELOCIDAD_KMH
+        self.t = [[km * minutos_por_km for km in fila] for fila in self.d]
+
+        # Un límite que ni el peor recorrido posible alcanza no restringe nada
+        cota = sum(max(fila) for fila in self.t) + n * RUTAS_MINUTOS_PARADA
+        self.limite = [lim if lim is not None and lim < cota else None for lim in limites]
+        self.con_limite = any(lim is not None for lim in self.limite)
+
+    def evaluar(self, ruta: Sequence[int], desde: int = 0, estado=None) -> Tuple[float, float, List]:
+        """
+        Recorre la ruta desde la posición 'desde' (estado = acumulados hasta la anterior)
+
+        Returns:
+            (distancia, tardanza en minutos, acumulados por posición a partir de 'desde')
+        """
+        dist, reloj, tarde = estado if estado else (0.0, 0.0, 0.0)
+        anterior = ruta[desde - 1] if desde > 0 else 0
+        acumulados = []
+        d, t, limite = self.d, self.t, self.limite
+        for nodo in ruta[desde:]:
+            dist += d[anterior][nodo]
+            reloj += t[anterior][nodo]
+            if limite[nodo] is not None and reloj > limite[nodo]:
+                tarde += reloj - limite[nodo]
+            reloj += RUTAS_MINUTOS_PARADA
+            acumulados.append((dist, reloj, tarde))
+            anterior = nodo
+        regreso = d[anterior][0] if self.volver and ruta else 0.0
+        return dist + regreso, tarde, acumulados
+
+    def supera(self, ruta: Sequence[int], desde: int, estado, tope: float) -> bool:
+        """
+        True si el objetivo de la ruta llega a 'tope' (corta apenas lo alcanza:
+        distancia y tardanza solo crecen a lo largo del recorrido)
+        """
+        dist, reloj, tarde = estado if estado else (0.0, 0.0, 0.0)
+        anterior = ruta[desde - 1] if desde > 0 else 0
+        d, t, limite = self.d, self.t, self.limite
+        for indice in range(desde, len(ruta)):
+            nodo = ruta[indice]
+            dist += d[anterior][nodo]
+            reloj += t[anterior][nodo]
+            if limite[nodo] is not None and reloj > limite[nodo]:
+                tarde += reloj - limite[nodo]
+            if dist + _KM_POR_MINUTO_TARDE * tarde >= tope:
+                return True
+            reloj += RUTAS_MINUTOS_PARADA
+            anterior = nodo
+        regreso = d[anterior][0] if self.volver and ruta else 0.0
+        return dist + regreso + _KM_POR_MINUTO_TARDE * tarde >= tope
+
+    def costo(self, ruta: Sequence[int]) -> float:
+        dist, tarde, _ = self.evaluar(ruta)
+        return dist + _KM_POR_MINUTO_TARDE * tarde
+
+    def arista(self, a: int, b: Optional[int]) -> float:
+        """Distancia entre nodos; b None = fin de un recorrido sin regreso"""
+        if b is None:
+            return self.d[a][0] if self.volver else 0.0
+        return self.d[a][b]
+
+
+def _vecino_mas_cercano(p: _Problema, nodos: List[int]) -> List[int]:
+    ruta, pendientes, actual = [], set(nodos), 0
+    while pendientes:
+        actual = min(pendientes, key=lambda j: (p.d[actual][j], j))
+        ruta.append(actual)
+        pendientes.remove(actual)
+    return ruta
+
+
+def _construir(p: _Problema, n: int) -> List[int]:
+    """Vecino más cercano; con límites, también probando primero los pedidos con hora límite"""
+    nodos = list(range(1, n + 1))
+    candidatas = [_vecino_mas_cercano(p, nodos)]
+    if p.con_limite:
+        urgentes = sorted((j for j in nodos if p.limite[j] is not None), key=lambda j: p.limite[j])
+        resto = [j for j in nodos if p.limite[j] is None]
+        candidatas.append(urgentes + _vecino_mas_cercano(p, resto))
+    return min(candidatas, key=p.costo)
+
+
+class _Mejora:
+    """Búsqueda local 2-opt + Or-opt (primera mejora) sobre un recorrido"""
+
+    def __init__(self, p: _Problema, ruta: List[int]):
+        self.p = p
+        self.ruta = ruta
+        self.fin = time.perf_counter() + RUTAS_TIEMPO_MAXIMO
+        self._recalcular()
+
+    def agotado(self) -> bool:
+        """Se acabó el tiempo de búsqueda: se devuelve la mejor ruta encontrada"""
+        return time.perf_counter() > self.fin
+
+    def _recalcular(self):
+        dist, tarde, self.acumulados = self.p.evaluar(self.ruta)
+        self.objetivo = dist + _KM_POR_MINUTO_TARDE * tarde
+        # con_limite_hasta[k]: paradas con hora límite en las posiciones < k
+        self.con_limite_hasta = [0]
+        for nodo in self.ruta:
+            self.con_limite_hasta.append(self.con_limite_hasta[-1] + (self.p.limite[nodo] is not None))
+
+    def _hay_limites(self, desde: int, hasta: int) -> bool:
+        """Hay paradas con hora límite entre las posiciones desde..hasta (inclusive)"""
+        hasta = min(hasta, len(self.ruta) - 1)
+        return self.con_limite_hasta[hasta + 1] > self.con_limite_hasta[desde]
+
+    def _siguiente(self, k: int) -> Optional[int]:
+        return self.ruta[k + 1] if k + 1 < len(self.ruta) else None
+
+    def _anterior(self, k: int) -> int:
+        return self.ruta[k - 1] if k > 0 else 0
+
+    def _probar(self, desde: int, hasta: int, delta_distancia: float, construir) -> bool:
+        """
+        Aplica el movimiento (que reordena las posiciones desde..hasta) si mejora el objetivo
+
+        Sin horas límite desde 'desde' la tardanza no cambia: alcanza con la
+        diferencia de distancia. Sin horas límite dentro del tramo, un movimiento
+        que alarga el recorrido solo puede atrasar las paradas siguientes.
+        """
+        if not self._hay_limites(desde, len(self.ruta) - 1):
+            if delta_distancia < -1e-9:
+                self.ruta = construir()
+                self._recalcular()
+                return True
+            return False
+        if delta_distancia >= 0 and not self._hay_limites(desde, hasta):
+            return False
+        nueva = construir()
+        estado = self.acumulados[desde - 1] if desde > 0 else None
+        if not self.p.supera(nueva, desde, estado, self.objetivo - 1e-9):
+            self.ruta = nueva
+            self._recalcular()
+            return True
+        return False
+
+    def dos_opt(self) -> bool:
+        """Invierte tramos ruta[i..j]; sigue recorriendo después de cada mejora"""
+        p, n, mejoro = self.p, len(self.ruta), False
+        for i in range(n - 1):
+            if self.agotado():
+                break
+            for j in range(i + 1, n):
+                a, b, c, d = self._anterior(i), self.ruta[i], self.ruta[j], self._siguiente(j)
+                delta = p.d[a][c] + p.arista(b, d) - p.d[a][b] - p.arista(c, d)
+                if self._probar(i, j, delta, lambda i=i, j=j: self.ruta[:i] + self.ruta[i:j + 1][::-1] + self.ruta[j + 1:]):
+                    mejoro = True
+        return mejoro
+
+    def or_opt(self) -> bool:
+        """Mueve tramos de 1 a 3 paradas a otra posición (también invertidos)"""
+        p, n, mejoro = self.p, len(self.ruta), False
+        for largo in (1, 2, 3):
+            for i in range(n - largo + 1):
+                if self.agotado():
+                    return mejoro
+                j = i + largo - 1
+                tramo = self.ruta[i:j + 1]
+                a, d = self._anterior(i), self._siguiente(j)
+                quitar = p.d[a][tramo[0]] + p.arista(tramo[-1], d) - p.arista(a, d)
+                resto = self.ruta[:i] + self.ruta[j + 1:]
+                movio = False
+                for k in range(len(resto) + 1):
+                    if k == i:
+                        continue
+                    x = resto[k - 1] if k > 0 else 0
+                    y = resto[k] if k < len(resto) else None
+                    for invertido in (False, True):
+                        s0, s1 = (tramo[-1], tramo[0]) if invertido else (tramo[0], tramo[-1])
+                        delta = p.d[x][s0] + p.arista(s1, y) - p.arista(x, y) - quitar
+                        movido = tramo[::-1] if invertido else tramo
+                        if self._probar(min(i, k), max(j, k + largo - 1), delta, lambda k=k, movido=movido, resto=resto: resto[:k] + movido + resto[k:]):
+                            movio = mejoro = True
+                            break
+                    if movio:
+                        break
+        return mejoro
+
+    def optimizar(self) -> List[int]:
+        for _ in range(_MAX_PASADAS):
+            # Or-opt solo cuando 2-opt ya no encuentra mejoras
+            if not self.dos_opt() and not self.or_opt() or self.agotado():
+                break
+        return self.ruta
+
+
+def optimizar_ruta(
+    paradas: Sequence[Dict[str, Any]],
+    origen: Coordenadas = RUTAS_ORIGEN,
+    salida: Optional[datetime] = None,
+    volver: bool = False
+) -> Dict[str, Any]:
+    """
+    Calcula el orden de visita de las paradas
+
+    Args:
+        paradas: [{"id", "coordenadas": (lat, lon) o None, "limite": datetime o None}, ...]
+        origen: Punto de partida (el vivero)
+        salida: Hora de salida (por defecto ahora)
+        volver: True si el recorrido termina en el origen
+
+    Returns:
+        {"orden": [ids], "distancia_km", "distancia_original_km", "duracion_min",
+         "llegadas": {id: datetime}, "tarde": [ids], "sin_ubicacion": [ids]}
+        Las paradas sin coordenadas van al final, en el orden recibido.
+    """
+    salida = salida or datetime.now()
+    ubicadas = [p for p in paradas if p.get("coordenadas")]
+    sin_ubicacion = [p["id"] for p in paradas if not p.get("coordenadas")]
+    limites = [None] + [
+        (p["limite"] - salida).total_seconds() / 60 if p.get("limite") else None for p in ubicadas
+    ]
+    problema = _Problema([tuple(origen)] + [tuple(p["coordenadas"]) for p in ubicadas], limites, volver)
+    n = len(ubicadas)
+
+    # La clave es el conjunto de paradas (sin importar el orden en que se
+    # eligieron) y la salida redondeada a 15 minutos; se guarda solo el orden
+    # de visita y los tiempos se recalculan siempre con la salida real
+    clave = (
+        tuple(origen), volver, salida.replace(minute=salida.minute - salida.minute % 15, second=0, microsecond=0),
+        tuple(sorted(
+            ((p["id"], tuple(p["coordenadas"]), p.get("limite")) for p in ubicadas), key=lambda c: str(c[0])
+        )),
+    )
+    with _cache_lock:
+        orden = _cache.get(clave)
+        if orden is not None:
+            _cache.move_to_end(clave)
+
+    if orden is not None:
+        nodo_de = {p["id"]: nodo for nodo, p in enumerate(ubicadas, 1)}
+        ruta = [nodo_de[i] for i in orden]
+    else:
+        ruta = _Mejora(problema, _construir(problema, n)).optimizar() if n else []
+        with _cache_lock:
+            _cache[clave] = tuple(ubicadas[nodo - 1]["id"] for nodo in ruta)
+            while len(_cache) > RUTAS_CACHE_MAX:
+                _cache.popitem(last=False)
+
+    distancia, _, acumulados = problema.evaluar(ruta)
+    distancia_original, _, _ = problema.evaluar(list(range(1, n + 1)))
+
+    llegadas, tarde = {}, []
+    for posicion, nodo in enumerate(ruta):
+        parada = ubicadas[nodo - 1]
+        llegada = salida + timedelta(minutes=acumulados[posicion][1] - RUTAS_MINUTOS_PARADA)
+        llegadas[parada["id"]] = llegada
+        if parada.get("limite") and llegada > parada["limite"]:
+            tarde.append(parada["id"])
+
+    resultado = {
+        "orden": [ubicadas[nodo - 1]["id"] for nodo in ruta] + sin_ubicacion,
+        "distancia_km": round(distancia, 1),
+        "distancia_original_km": round(distancia_original, 1),
+        "duracion_min": int(round(acumulados[-1][1])) if acumulados else 0,
+        "llegadas": llegadas,
+        "tarde": tarde,
+        "sin_ubicacion": sin_ubicacion,
+    }
+    return resultado
+
+
+def planificar_pedidos(
+    pedidos: Sequence[Sequence],
+    salida: Optional[datetime] = None,
+    volver: bool = False
+) -> Dict[str, Any]:
+    """
+    Optimiza la ruta de filas de pedidos (ubicados con la caché de geocodificación)
+
+    Args:
+        pedidos: (id, destino, ubicacion, fecha_entrega) por pedido
+
+    Returns:
+        El resultado de optimizar_ruta() más "coordenadas": {id: (lat, lon)}
+    """
+    ubicaciones = geo.geocodificar([(destino, ubicacion) for _, destino, ubicacion, _ in pedidos])
+    paradas = [
+        {"id": fila[0], "coordenadas": coords, "limite": limite_entrega(fila[3])}
+        for fila, coords in zip(pedidos, ubicaciones)
+    ]
+    resultado = optimizar_ruta(paradas, salida=salida, volver=volver)
+    resultado["coordenadas"] = {p["id"]: p["coordenadas"] for p in paradas if p["coordenadas"]}
+    return resultado
+
+
+def limpiar_cache():
+    """Descarta los recorridos calculados"""
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,136 @@
+"""
+Registro de metadatos del esquema de base de datos
+Introspecciona las tablas una sola vez (al iniciar o después de migrar)
+y responde desde memoria consultas de existencia y tipo de columnas.
+"""
+import threading
+from typing import Dict, Optional, Sequence, Tuple
+
+
+# Campo de un SELECT compilado: (alias, columnas candidatas en orden de preferencia)
+Campo = Tuple[str, Sequence[str]]
+
+
+class SchemaRegistry:
+    """
+    Caché en memoria de {tabla: {columna: tipo}} y de sentencias SELECT
+    armadas según las columnas que realmente existen
+    """
+
+    def __init__(self, db):
+        self._db = db
+        self._lock = threading.Lock()
+        self._tablas: Optional[Dict[str, Dict[str, str]]] = None
+        self._selects: Dict[Tuple, str] = {}
+
+    # ========================================
+    # INTROSPECCIÓN
+    # ========================================
+
+    def refresh(self):
+        """Vuelve a leer el catálogo (llamar después de aplicar migraciones)"""
+        if self._db.db_type == "postgresql":
+            consulta = """
+                SELECT table_name, column_name, data_type
+                FROM information_schema.columns
+                WHERE table_schema = current_schema()
+                ORDER BY table_name, ordinal_position
+            """
+        else:
+            consulta = """
+                SELECT m.name, p.name, p.type
+                FROM sqlite_master m JOIN pragma_table_info(m.name) p
+                WHERE m.type = 'table'
+                ORDER BY m.name, p.cid
+            """
+
+        tablas: Dict[str, Dict[str, str]] = {}
+        with self._db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute(consulta)
+            for tabla, columna, tipo in cur.fetchall():
+                tablas.setdefault(tabla.lower(), {})[columna.lower()] = (tipo or "").lower()
+            cur.close()
+
+        with self._lock:
+            self._tablas = tablas
+            self._selects.clear()
+        print(f"🗂️ Esquema cargado: {len(tablas)} tablas")
+
+    def _catalogo(self) -> Dict[str, Dict[str, str]]:
+        if self._tablas is None:
+            self.refresh()
+        return self._tablas
+
+    # ========================================
+    # CONSULTAS
+    # ========================================
+
+    def has_table(self, tabla: str) -> bool:
+        """True si la tabla existe"""
+        return tabla.lower() in self._catalogo()
+
+    def columns(self, tabla: str) -> Dict[str, str]:
+        """Columnas de la tabla con su tipo ({} si no existe)"""
+        return dict(self._catalogo().get(tabla.lower(), {}))
+
+    def has_column(self, tabla: str, columna: str) -> bool:
+        """True si la columna existe en la tabla"""
+        return columna.lower() in self._catalogo().get(tabla.lower(), {})
+
+    def column_type(self, tabla: str, columna: str) -> Optional[str]:
+        """Tipo de la columna (en minúsculas) o None si no existe"""
+        return self._catalogo().get(tabla.lower(), {}).get(columna.lower())
+
+    def first_column(self, tabla: str, *candidatas: str) -> Optional[str]:
+        """Primera de las columnas candidatas que existe en la tabla"""
+        columnas = self._catalogo().get(tabla.lower(), {})
+        for candidata in candidatas:
+            if candidata.lower() in columnas:
+                return candidata
+        return None
+
+    def select(self, tabla: str, campos: Sequence[Campo], where: str = "",
+               default: str = "''", coalesce: Sequence[str] = (), order_by: str = "") -> str:
+        """
+        SELECT precompilado según las columnas existentes (memoizado)
+
+        Args:
+            tabla: Tabla de origen
+            campos: Lista de (alias, [columnas candidatas]); si ninguna existe
+                    se selecciona el valor por defecto con ese alias
+            where: Condición opcional (con placeholders %s)
+            default: Expresión para campos sin columna existente
+            coalesce: Alias cuyos NULL se reemplazan por 'default'
+            order_by: Orden opcional
+
+        Ejemplo:
+            db.schema.select("clientes", [("id", ["id"]), ("telefono", ["telefono", "tel"])], "id = %s")
+            -> "SELECT id, tel AS telefono FROM clientes WHERE id = %s"
+        """
+        clave = (tabla, tuple((alias, tuple(cands)) for alias, cands in campos), where, default, tuple(coalesce), order_by)
+        sql = self._selects.get(clave)
+        if sql is not None:
+            return sql
+
+        expresiones = []
+        for alias, candidatas in campos:
+            columna = self.first_column(tabla, *candidatas)
+            if columna is None:
+                expresiones.append(f"{default} AS {alias}")
+            elif alias in coalesce:
+                expresiones.append(f"COALESCE({columna}, {default}) AS {alias}")
+            elif columna.lower() == alias.lower():
+                expresiones.append(columna)
+            else:
+                expresiones.append(f"{columna} AS {alias}")
+
+        sql = f"SELECT {', '.join(expresiones)} FROM {tabla}"
+        if where:
+            sql += f" WHERE {where}"
+        if order_by:
+            sql += f" ORDER BY {order_by}"
+
+        with self._lock:
+            self._selects[clave] = sql
+        return sql
@@ -0,0 +1,310 @@
+"""
+Traducción de SQL de PostgreSQL a SQLite
+Tokeniza la consulta una sola vez (respetando literales, identificadores
+entre comillas y comentarios) y cachea el resultado por texto de SQL.
+"""
+import re
+from functools import lru_cache
+from typing import List, Tuple
+
+
+# Tipos de token: str, qid, comment, param, named, pct, cast, word, num, ws, op
+_TOKEN_RE = re.compile(r"""
+    (?P<str>'(?:[^']|'')*')
+  | (?P<qid>"(?:[^"]|"")*")
+  | (?P<comment>--[^\n]*|/\*.*?\*/)
+  | (?P<param>%s)
+  | (?P<named>%\((?P<name>\w+)\)s)
+  | (?P<pct>%%)
+  | (?P<cast>::)
+  | (?P<word>[A-Za-z_][A-Za-z0-9_$]*)
+  | (?P<num>\d+(?:\.\d+)?)
+  | (?P<ws>\s+)
+  | (?P<op>.)
+""", re.VERBOSE | re.DOTALL)
+
+# Cast de PostgreSQL -> función / afinidad SQLite
+_CASTS = {
+    "date": "DATE({})",
+    "timestamp": "DATETIME({})",
+    "timestamptz": "DATETIME({})",
+    "time": "TIME({})",
+    "int": "CAST({} AS INTEGER)",
+    "integer": "CAST({} AS INTEGER)",
+    "bigint": "CAST({} AS INTEGER)",
+    "smallint": "CAST({} AS INTEGER)",
+    "numeric": "CAST({} AS REAL)",
+    "decimal": "CAST({} AS REAL)",
+    "real": "CAST({} AS REAL)",
+    "float": "CAST({} AS REAL)",
+    "double": "CAST({} AS REAL)",
+    "text": "CAST({} AS TEXT)",
+    "varchar": "CAST({} AS TEXT)",
+    "boolean": "CAST({} AS INTEGER)",
+}
+
+# Vistas de information_schema emuladas sobre el catálogo de SQLite
+_INFORMATION_SCHEMA = {
+    "columns": (
+        "(SELECT 'public' AS table_schema, m.name AS table_name, p.name AS column_name, "
+        "p.type AS data_type, CASE WHEN p.\"notnull\" THEN 'NO' ELSE 'YES' END AS is_nullable, "
+        "p.dflt_value AS column_default, p.cid + 1 AS ordinal_position "
+        "FROM sqlite_master m JOIN pragma_table_info(m.name) p WHERE m.type = 'table')"
+    ),
+    "tables": (
+        "(SELECT 'public' AS table_schema, name AS table_name, 'BASE TABLE' AS table_type "
+        "FROM sqlite_master WHERE type = 'table')"
+    ),
+}
+
+
+def tokenize(sql: str) -> List[Tuple[str, str]]:
+    """Divide el SQL en tokens (tipo, texto)"""
+    return [(m.lastgroup if m.lastgroup != "name" else "named", m.group(0))
+            for m in _TOKEN_RE.finditer(sql)]
+
+
+def _siguiente(tokens: List[Tuple[str, str]], i: int) -> int:
+    """Índice del siguiente token significativo desde i (o len)"""
+    while i < len(tokens) and tokens[i][0] in ("ws", "comment"):
+        i += 1
+    return i
+
+
+def _inicio_operando(salida: List[str], tipos: List[str]) -> int:
+    """
+    Índice en 'salida' donde empieza el operando que precede a un cast ::
+    Soporta identificadores calificados (a.b), parámetros, literales,
+    y expresiones entre paréntesis (incluida una función: f(...))
+    """
+    i = len(salida) - 1
+    if i < 0:
+        return 0
+
+    if salida[i] == ")":
+        profundidad = 0
+        while i >= 0:
+            if tipos[i] == "op" and salida[i] == ")":
+                profundidad += 1
+            elif tipos[i] == "op" and salida[i] == "(":
+                profundidad -= 1
+                if profundidad == 0:
+                    break
+            i -= 1
+        if i > 0 and tipos[i - 1] == "word":
+            i -= 1
+        return max(i, 0)
+
+    # Identificador calificado: a.b.c
+    while i >= 2 and salida[i - 1] == "." and tipos[i - 2] in ("word", "qid"):
+        i -= 2
+    return i
+
+
+@lru_cache(maxsize=1024)
+def translate_to_sqlite(sql: str) -> str:
+    """
+    Traduce una consulta escrita para PostgreSQL (psycopg2) a SQLite
+
+    - %s -> ?, %(nombre)s -> :nombre, %% -> %
+    - ILIKE -> LIKE (LIKE de SQLite ya ignora mayúsculas en ASCII)
+    - SERIAL PRIMARY KEY -> INTEGER PRIMARY KEY AUTOINCREMENT
+    - NOW() -> CURRENT_TIMESTAMP, lastval() -> last_insert_rowid()
+    - expr::tipo -> DATE(expr) / CAST(expr AS ...)
+    - information_schema.columns / tables -> catálogo de SQLite
+
+    Literales, identificadores entre comillas y comentarios no se modifican
+    (salvo %% dentro de literales, que psycopg2 también convierte a %).
+    """
+    tokens = tokenize(sql)
+    salida: List[str] = []
+    tipos: List[str] = []
+
+    def emitir(texto: str, tipo: str = "op"):
+        salida.append(texto)
+        tipos.append(tipo)
+
+    i = 0
+    n = len(tokens)
+    while i < n:
+        tipo, texto = tokens[i]
+
+        if tipo == "param":
+            emitir("?", "param")
+        elif tipo == "named":
+            emitir(":" + texto[2:-2], "param")
+        elif tipo == "pct":
+            emitir("%")
+        elif tipo == "str":
+            emitir(texto.replace("%%", "%"), "str")
+
+        elif tipo == "cast":
+            j = _siguiente(tokens, i + 1)
+            nombre_tipo = tokens[j][1].lower() if j < n else ""
+            i = j + 1
+            # Tipos con argumentos o de dos palabras: varchar(50), double precision
+            k = _siguiente(tokens, i)
+            if k < n and tokens[k][1] == "(":
+                while k < n and tokens[k][1] != ")":
+                    k += 1
+                i = k + 1
+            elif nombre_tipo == "double" and k < n and tokens[k][1].lower() == "precision":
+                i = k + 1
+
+            inicio = _inicio_operando(salida, tipos)
+            operando = "".join(salida[inicio:])
+            del salida[inicio:], tipos[inicio:]
+            plantilla = _CASTS.get(nombre_tipo, "{}")
+            emitir(plantilla.format(operando), "word")
+            continue
+
+        elif tipo == "word":
+            palabra = texto.upper()
+            j = _siguiente(tokens, i + 1)
+            siguiente = tokens[j][1] if j < n else ""
+
+            if palabra == "ILIKE":
+                emitir("LIKE", "word")
+            elif palabra in ("SERIAL", "BIGSERIAL"):
+                k = _siguiente(tokens, j + 1)
+                if siguiente.upper() == "PRIMARY" and k < n and tokens[k][1].upper() == "KEY":
+                    emitir("INTEGER PRIMARY KEY AUTOINCREMENT", "word")
+                    i = k + 1
+                    continue
+                emitir("INTEGER", "word")
+            elif palabra in ("NOW", "LASTVAL") and siguiente == "(":
+                k = _siguiente(tokens, j + 1)
+                if k < n and tokens[k][1] == ")":
+                    emitir("CURRENT_TIMESTAMP" if palabra == "NOW" else "last_insert_rowid()", "word")
+                    i = k + 1
+                    continue
+                emitir(texto, "word")
+            elif palabra == "INFORMATION_SCHEMA" and siguiente == ".":
+                k = _siguiente(tokens, j + 1)
+                vista = tokens[k][1].lower() if k < n else ""
+                if vista in _INFORMATION_SCHEMA:
+                    emitir(_INFORMATION_SCHEMA[vista], "word")
+                    i = k + 1
+                    continue
+                emitir(texto, "word")
+            else:
+                emitir(texto, "word")
+
+        else:
+            emitir(texto, tipo)
+
+        i += 1
+
+    return "".join(salida)
+
+
+
+def _nombre_tabla(tokens: List[Tuple[str, str]], i: int) -> Tuple[str, int]:
+    """
+    Lee un nombre de tabla (posiblemente calificado: esquema.tabla) desde i
+    Retorna (nombre en minúsculas sin comillas, índice siguiente)
+    """
+    i = _siguiente(tokens, i)
+    nombre = ""
+    while i < len(tokens) and tokens[i][0] in ("word", "qid"):
+        nombre = tokens[i][1].strip('"').lower()
+        j = _siguiente(tokens, i + 1)
+        if j < len(tokens) and tokens[j][1] == ".":
+            i = _siguiente(tokens, j + 1)
+            continue
+        return nombre, j
+    return nombre, i
+
+
+def _palabras(sql: str) -> List[Tuple[str, str]]:
+    """Tokens significativos (sin espacios ni comentarios)"""
+    return [tok for tok in tokenize(sql) if tok[0] not in ("ws", "comment")]
+
+
+@lru_cache(maxsize=1024)
+def tablas_modificadas(sql: str) -> frozenset:
+    """
+    Tablas que una sentencia escribe (INSERT/UPDATE/DELETE/TRUNCATE/DDL)
+    Se usa para invalidar la caché de consultas al confirmar la transacción
+    """
+    tokens = _palabras(sql)
+    tablas = set()
+    for i, (tipo, texto) in enumerate(tokens):
+        if tipo != "word":
+            continue
+        palabra = texto.upper()
+        anterior = tokens[i - 1][1].upper() if i > 0 else ""
+        siguiente = tokens[i + 1][1].upper() if i + 1 < len(tokens) else ""
+
+        # INSERT/UPDATE OR <conflicto> (SQLite: IGNORE, REPLACE, ABORT, FAIL, ROLLBACK)
+        con_conflicto = i >= 3 and tokens[i - 2][1].upper() == "OR" and tokens[i - 3][1].upper() == "INSERT"
+
+        if palabra == "INTO" and (anterior in ("INSERT", "REPLACE") or con_conflicto):
+            tablas.add(_nombre_tabla(tokens, i + 1)[0])
+        elif palabra == "UPDATE" and anterior not in ("DO", "FOR", "ON"):
+            inicio = i + 3 if siguiente == "OR" else i + 1
+            tablas.add(_nombre_tabla(tokens, inicio)[0])
+        elif palabra == "FROM" and anterior == "DELETE":
+            tablas.add(_nombre_tabla(tokens, i + 1)[0])
+        elif palabra == "TRUNCATE":
+            inicio = i + 2 if siguiente == "TABLE" else i + 1
+            tablas.add(_nombre_tabla(tokens, inicio)[0])
+        elif palabra == "TABLE" and anterior in ("ALTER", "DROP", "CREATE"):
+            inicio = i + 1
+            while inicio < len(tokens) and tokens[inicio][1].upper() in ("IF", "NOT", "EXISTS"):
+                inicio += 1
+            tablas.add(_nombre_tabla(tokens, inicio)[0])
+    tablas.discard("")
+    return frozenset(tablas)
+
+
+@lru_cache(maxsize=1024)
+def tablas_leidas(sql: str) -> frozenset:
+    """Tablas que aparecen después de FROM / JOIN en una consulta"""
+    tokens = _palabras(sql)
+    tablas = set()
+    for i, (tipo, texto) in enumerate(tokens):
+        if tipo == "word" and texto.upper() in ("FROM", "JOIN"):
+            j = i + 1
+            if j < len(tokens) and tokens[j][1] == "(":
+                continue  # Subconsulta: sus tablas se capturan en su propio FROM
+            tablas.add(_nombre_tabla(tokens, j)[0])
+    tablas.discard("")
+    return frozenset(tablas)
+
+
+@lru_cache(maxsize=1024)
+def translate_to_asyncpg(sql: str) -> Tuple[str, Tuple[str, ...]]:
+    """
+    Traduce placeholders de psycopg2 al formato numerado de asyncpg
+
+    - %s -> $1, $2, ...   (en orden de aparición)
+    - %(nombre)s -> $k    (el mismo nombre reutiliza el mismo número)
+    - %% -> %
+
+    Returns:
+        (sql traducido, nombres en orden de número si hubo placeholders con nombre)
+    """
+    salida: List[str] = []
+    nombres: List[str] = []
+    posicionales = 0
+
+    for tipo, texto in tokenize(sql):
+        if tipo == "param":
+            posicionales += 1
+            salida.append(f"${posicionales}")
+        elif tipo == "named":
+            nombre = texto[2:-2]
+            if nombre not in nombres:
+                nombres.append(nombre)
+            salida.append(f"${nombres.index(nombre) + 1}")
+        elif tipo == "pct":
+            salida.append("%")
+        elif tipo == "str":
+            salida.append(texto.replace("%%", "%"))
+        else:
+            salida.append(texto)
+
+    if posicionales and nombres:
+        raise ValueError("No se pueden mezclar placeholders %s y %(nombre)s")
+    return "".join(salida), tuple(nombres)
@@ -0,0 +1,290 @@
+"""
+Dibujo de tickets de pedido y de la hoja de ruta del despacho (reportlab)
+Solo arma PDFs a partir de datos ya consultados: no usa la base, así los
+procesos que dibujan tickets en paralelo (despacho_service) no abren conexiones.
+"""
+import io
+from datetime import datetime
+from typing import Any, Dict, List, Sequence
+from xml.sax.saxutils import escape
+from reportlab.lib import colors
+from reportlab.lib.enums import TA_CENTER
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import mm
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from modules.utils import format_guarani
+
+
+VERDE_OSCURO = colors.HexColor("#2E7D32")
+VERDE_CLARO = colors.HexColor("#E8F5E8")
+
+# Columnas de la cabecera de un pedido, en el orden de la consulta
+CAMPOS_PEDIDO = (
+    "id", "cliente", "telefono", "ruc", "destino", "ubicacion",
+    "fecha_pedido", "fecha_entrega", "estado", "delivery", "total",
+)
+
+
+def pedido_desde_fila(fila: Sequence) -> Dict[str, Any]:
+    """Cabecera {campo: valor} desde una fila con las columnas de CAMPOS_PEDIDO"""
+    pedido = dict(zip(CAMPOS_PEDIDO, fila))
+    pedido["delivery"] = pedido["delivery"] or 0
+    pedido["total"] = pedido["total"] or 0
+    return pedido
+
+
+def documento(destino) -> SimpleDocTemplate:
+    """Documento A4 de los tickets (destino: nombre de archivo o buffer)"""
+    return SimpleDocTemplate(
+        destino,
+        pagesize=(210*mm, 297*mm),  # A4
+        rightMargin=15*mm,
+        leftMargin=15*mm,
+        topMargin=15*mm,
+        bottomMargin=20*mm
+    )
+
+
+def _titulo(styles) -> ParagraphStyle:
+    return ParagraphStyle(
+        'Titulo',
+        parent=styles['Heading1'],
+        fontSize=24,
+        spaceAfter=10,
+        alignment=TA_CENTER,
+        textColor=VERDE_OSCURO,
+        fontName='Helvetica-Bold'
+    )
+
+
+def _franja(texto: str) -> Table:
+    """Barra verde de ancho completo con un título de sección"""
+    tabla = Table([[texto]], colWidths=[180*mm])
+    tabla.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), VERDE_OSCURO),
+        ('TEXTCOLOR', (0, 0), (-1, -1), colors.white),
+        ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, -1), 14),
+        ('TOPPADDING', (0, 0), (-1, -1), 10),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 10),
+    ]))
+    return tabla
+
+
+def _fecha(valor) -> str:
+    return str(valor)[:10] if valor else 'Sin fecha'
+
+
+def elementos_ticket(pedido: Dict[str, Any], detalles: Sequence[Sequence], generado_por: str) -> List:
+    """
+    Flowables del ticket de un pedido
+
+    Args:
+        pedido: {campo: valor} con los CAMPOS_PEDIDO
+        detalles: (producto, cantidad, precio_unitario, subtotal) por línea
+        generado_por: usuario que figura en el pie
+    """
+    elementos = []
+    styles = getSampleStyleSheet()
+    titulo_style = _titulo(styles)
+
+    # --- ENCABEZADO ---
+    elementos.append(Paragraph("🌱 VIVERO ROCÍO", titulo_style))
+    elementos.append(Paragraph("TICKET DE PEDIDO", titulo_style))
+    elementos.append(Spacer(1, 15))
+
+    # --- INFORMACIÓN DEL PEDIDO ---
+    elementos.append(_franja('INFORMACIÓN DEL PEDIDO'))
+    elementos.append(Spacer(1, 5))
+
+    datos_pedido = [
+        ['Pedido N°:', str(pedido["id"]), 'Estado:', pedido["estado"]],
+        ['Cliente:', pedido["cliente"] or 'Sin cliente', 'Teléfono:', pedido["telefono"] or 'Sin teléfono'],
+        ['RUC:', pedido["ruc"] or 'Sin RUC', 'Fecha Pedido:', _fecha(pedido["fecha_pedido"])],
+        ['Destino:', pedido["destino"] or 'Sin destino', 'Fecha Entrega:', _fecha(pedido["fecha_entrega"])],
+        ['Ubicación:', pedido["ubicacion"] or 'Sin ubicación', '', ''],
+    ]
+
+    datos_table = Table(datos_pedido, colWidths=[45*mm, 45*mm, 45*mm, 45*mm])
+    datos_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, -1), VERDE_CLARO),
+        ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+        ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 10),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('LEFTPADDING', (0, 0), (-1, -1), 8),
+        ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    elementos.append(datos_table)
+    elementos.append(Spacer(1, 15))
+
+    # --- PRODUCTOS ---
+    elementos.append(_franja('PRODUCTOS DEL PEDIDO'))
+    elementos.append(Spacer(1, 5))
+
+    if detalles:
+        productos_data = [['Producto', 'Cantidad', 'Precio Unitario', 'Subtotal']]
+        for nombre_prod, cantidad, precio_unit, subtotal in detalles:
+            productos_data.append([
+                nombre_prod or 'Producto eliminado',
+                str(cantidad),
+                format_guarani(precio_unit),
+                format_guarani(subtotal)
+            ])
+
+        productos_table = Table(productos_data, colWidths=[80*mm, 30*mm, 35*mm, 35*mm])
+        productos_table.setStyle(TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), VERDE_OSCURO),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 12),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 1), (-1, -1), 10),
+            ('ALIGN', (0, 1), (0, -1), 'LEFT'),
+            ('ALIGN', (1, 1), (-1, -1), 'CENTER'),
+            ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, VERDE_CLARO]),
+            ('GRID', (0, 0), (-1, -1), 1, colors.grey),
+            ('TOPPADDING', (0, 0), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+            ('LEFTPADDING', (0, 0), (-1, -1), 8),
+            ('RIGHTPADDING', (0, 0), (-1, -1), 8),
+        ]))
+        elementos.append(productos_table)
+    else:
+        elementos.append(Paragraph("No hay productos en este pedido.", styles['Normal']))
+
+    elementos.append(Spacer(1, 15))
+
+    # --- TOTALES ---
+    total, delivery = pedido["total"], pedido["delivery"]
+    subtotal_pedido = total - delivery if total else 0
+
+    totales_data = [
+        ['', '', 'Subtotal:', format_guarani(subtotal_pedido)],
+        ['', '', 'Delivery:', format_guarani(delivery)],
+        ['', '', 'TOTAL:', format_guarani(total)],
+    ]
+
+    totales_table = Table(totales_data, colWidths=[80*mm, 30*mm, 35*mm, 35*mm])
+    totales_table.setStyle(TableStyle([
+        ('FONTSIZE', (0, 0), (-1, -1), 12),
+        ('ALIGN', (2, 0), (-1, -1), 'RIGHT'),
+        ('FONTNAME', (2, 0), (-1, -1), 'Helvetica-Bold'),
+        ('BACKGROUND', (2, 2), (-1, 2), VERDE_OSCURO),
+        ('TEXTCOLOR', (2, 2), (-1, 2), colors.white),
+        ('FONTSIZE', (2, 2), (-1, 2), 14),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+        ('RIGHTPADDING', (2, 0), (-1, -1), 10),
+    ]))
+    elementos.append(totales_table)
+    elementos.append(Spacer(1, 20))
+
+    # --- PIE DE PÁGINA ---
+    pie_data = [
+        ['¡GRACIAS POR SU PREFERENCIA!'],
+        ['Vivero Rocío - Sistema de Gestión de Pedidos'],
+        [f'Generado el {datetime.now().strftime("%d/%m/%Y %H:%M:%S")} por {generado_por}'],
+    ]
+
+    pie_table = Table(pie_data, colWidths=[180*mm])
+    pie_table.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (0, 0), VERDE_OSCURO),
+        ('TEXTCOLOR', (0, 0), (0, 0), colors.white),
+        ('FONTNAME', (0, 0), (0, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (0, 0), 16),
+        ('ALIGN', (0, 0), (0, 0), 'CENTER'),
+        ('BACKGROUND', (0, 1), (0, -1), colors.white),
+        ('TEXTCOLOR', (0, 1), (0, -1), colors.grey),
+        ('FONTNAME', (0, 1), (0, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 1), (0, -1), 10),
+        ('ALIGN', (0, 1), (0, -1), 'CENTER'),
+        ('TOPPADDING', (0, 0), (-1, -1), 8),
+        ('BOTTOMPADDING', (0, 0), (-1, -1), 8),
+    ]))
+    elementos.append(pie_table)
+    return elementos
+
+
+def elementos_manifiesto(paradas: Sequence[Dict[str, Any]], plan: Dict[str, Any], generado_por: str) -> List:
+    """
+    Flowables de la hoja de ruta: los pedidos en el orden de visita
+
+    Args:
+        paradas: cabeceras de los pedidos (CAMPOS_PEDIDO) ya ordenadas
+        plan: resultado de rutas_service.planificar_pedidos()
+    """
+    styles = getSampleStyleSheet()
+    celda = ParagraphStyle('Celda', parent=styles['Normal'], fontSize=8, leading=10)
+    llegadas, tarde = plan.get("llegadas", {}), set(plan.get("tarde", []))
+    sin_ubicacion = set(plan.get("sin_ubicacion", []))
+
+    elementos = [
+        Paragraph("🌱 VIVERO ROCÍO", _titulo(styles)),
+        _franja(f'HOJA DE RUTA - {len(paradas)} PEDIDO(S)'),
+        Spacer(1, 5),
+    ]
+
+    filas = [['#', 'Pedido', 'Cliente', 'Destino / Ubicación', 'Llegada', 'Total']]
+    for orden, pedido in enumerate(paradas, 1):
+        llegada = llegadas.get(pedido["id"])
+        if pedido["id"] in sin_ubicacion:
+            hora = 'Sin ubicar'
+        else:
+            hora = llegada.strftime("%H:%M") if llegada else '-'
+            hora += ' (tarde)' if pedido["id"] in tarde else ''
+        lugar = " - ".join(v for v in (pedido["destino"], pedido["ubicacion"]) if v) or 'Sin destino'
+        cliente = pedido["cliente"] or 'Sin cliente'
+        if pedido["telefono"]:
+            cliente += f" ({pedido['telefono']})"
+        filas.append([
+            str(orden), f"#{pedido['id']}", Paragraph(escape(cliente), celda), Paragraph(escape(lugar), celda),
+            hora, format_guarani(pedido["total"]),
+        ])
+
+    tabla = Table(filas, colWidths=[8*mm, 16*mm, 50*mm, 60*mm, 20*mm, 26*mm], repeatRows=1)
+    tabla.setStyle(TableStyle([
+        ('BACKGROUND', (0, 0), (-1, 0), VERDE_OSCURO),
+        ('TEXTCOLOR', (0, 0), (-1, 0), colors.white),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTNAME', (0, 1), (-1, -1), 'Helvetica'),
+        ('FONTSIZE', (0, 0), (-1, -1), 8),
+        ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ('ALIGN', (-1, 1), (-1, -1), 'RIGHT'),
+        ('ROWBACKGROUNDS', (0, 1), (-1, -1), [colors.white, VERDE_CLARO]),
+        ('GRID', (0, 0), (-1, -1), 0.5, colors.grey),
+    ]))
+    elementos.append(tabla)
+    elementos.append(Spacer(1, 10))
+
+    total = sum(pedido["total"] or 0 for pedido in paradas)
+    resumen = (
+        f"Recorrido estimado: {plan.get('distancia_km', 0)} km, {plan.get('duracion_min', 0)} min. "
+        f"Total a cobrar: {format_guarani(total)}. "
+        f"Generado el {datetime.now().strftime('%d/%m/%Y %H:%M')} por {generado_por}"
+    )
+    elementos.append(Paragraph(resumen, styles['Normal']))
+    return elementos
+
+
+def pdf_en_memoria(elementos: List) -> bytes:
+    """Arma un PDF con los flowables y devuelve su contenido"""
+    buffer = io.BytesIO()
+    documento(buffer).build(elementos)
+    return buffer.getvalue()
+
+
+def dibujar_ticket(datos: Sequence) -> bytes:
+    """
+    Ticket de un pedido como PDF en memoria (lo llaman los procesos de despacho)
+
+    Args:
+        datos: (pedido, detalles, generado_por), como en elementos_ticket()
+    """
+    pedido, detalles, generado_por = datos
+    return pdf_en_memoria(elementos_ticket(pedido, detalles, generado_por))
@@ -182,67 +182,64 @@ def crud_view(content, page=None):
         tabla.rows.clear()
         
         try:
-            with db.get_connection() as conn:
-                cur = conn.cursor()
-                
-                query = """SELECT id, username, nombre_completo, email, rol, estado, ultimo_acceso
-                           FROM usuarios WHERE 1=1"""
-                params = []
-                
-                if filtro_username.value.strip():
-                    query += " AND LOWER(username) LIKE %s"
-                    params.append(f"%{filtro_username.value.strip().lower()}%")
-                
-                if filtro_rol.value:
-                    query += " AND rol = %s"
-                    params.append(filtro_rol.value)
+            query = """SELECT id, username, nombre_completo, email, rol, estado, ultimo_acceso
+                       FROM usuarios WHERE 1=1"""
+            params = []
+            
+            if filtro_username.value.strip():
+                query += " AND LOWER(username) LIKE %s"
+                params.append(f"%{filtro_username.value.strip().lower()}%")
+            
+            if filtro_rol.value:
+                query += " AND rol = %s"
+                params.append(filtro_rol.value)
+            
+            query += " ORDER BY fecha_creacion DESC"
+            
+            # Cacheada: cualquier alta/edición/baja o login confirmado invalida la tabla
+            usuarios = db.cached_query(query, params, tags=["usuarios"])
+            
+            for usuario in usuarios:
+                uid, uname, nombre, email_u, rol_u, estado_u, ultimo_acceso = usuario
                 
-                query += " ORDER BY fecha_creacion DESC"
+                # Contenedor de estado con color
+                estado_color = "#4CAF50" if estado_u == "Activo" else "#F44336"
+                estado_container = ft.Container(
+                    content=ft.Text(estado_u, color="white", weight="bold", size=12),
+                    bgcolor=estado_color,
+                    padding=ft.padding.symmetric(vertical=4, horizontal=8),
+                    border_radius=8
+                )
                 
-                cur.execute(query, params)
-                usuarios = cur.fetchall()
+                # Contenedor de rol con color
+                rol_colors = {
+                    "Administrador": "#D32F2F",
+                    "Gerente": "#1976D2", 
+                    "Vendedor": "#388E3C",
+                    "Usuario": "#757575"
+                }
+                rol_container = ft.Container(
+                    content=ft.Text(rol_u, color="white", weight="bold", size=12),
+                    bgcolor=rol_colors.get(rol_u, "#757575"),
+                    padding=ft.padding.symmetric(vertical=4, horizontal=8),
+                    border_radius=8
+                )
                 
-                for usuario in usuarios:
-                    uid, uname, nombre, email_u, rol_u, estado_u, ultimo_acceso = usuario
-                    
-                    # Contenedor de estado con color
-                    estado_color = "#4CAF50" if estado_u == "Activo" else "#F44336"
-                    estado_container = ft.Container(
-                        content=ft.Text(estado_u, color="white", weight="bold", size=12),
-                        bgcolor=estado_color,
-                        padding=ft.padding.symmetric(vertical=4, horizontal=8),
-                        border_radius=8
-                    )
-                    
-                    # Contenedor de rol con color
-                    rol_colors = {
-                        "Administrador": "#D32F2F",
-                        "Gerente": "#1976D2", 
-                        "Vendedor": "#388E3C",
-                        "Usuario": "#757575"
-                    }
-                    rol_container = ft.Container(
-                        content=ft.Text(rol_u, color="white", weight="bold", size=12),
-                        bgcolor=rol_colors.get(rol_u, "#757575"),
-                        padding=ft.padding.symmetric(vertical=4, horizontal=8),
-                        border_radius=8
-                    )
-                    
-                    ultimo_acceso_str = str(ultimo_acceso) if ultimo_acceso else "Nunca"
-                    
-                    tabla.rows.append(ft.DataRow(
-                        cells=[
-                            ft.DataCell(ft.Text(str(uid))),
-                            ft.DataCell(ft.Text(uname)),
-                            ft.DataCell(ft.Text(nombre)),
-                            ft.DataCell(ft.Text(email_u or "")),
-                            ft.DataCell(rol_container),
-                            ft.DataCell(estado_container),
-                            ft.DataCell(ft.Text(ultimo_acceso_str)),
-                        ],
-                        on_select_changed=lambda e, uid=uid: seleccionar(uid),
-                    ))
+                ultimo_acceso_str = str(ultimo_acceso) if ultimo_acceso else "Nunca"
                 
+                tabla.rows.append(ft.DataRow(
+                    cells=[
+                        ft.DataCell(ft.Text(str(uid))),
+                        ft.DataCell(ft.Text(uname)),
+                        ft.DataCell(ft.Text(nombre)),
+                        ft.DataCell(ft.Text(email_u or "")),
+                        ft.DataCell(rol_container),
+                        ft.DataCell(estado_container),
+                        ft.DataCell(ft.Text(ultimo_acceso_str)),
+                    ],
+                    on_select_changed=lambda e, uid=uid: seleccionar(uid),
+                ))
+            
         except Exception as ex:
             print(f"Error refrescando tabla: {ex}")
             show_snackbar(f"Error cargando usuarios: {str(ex)}", "#F44336")
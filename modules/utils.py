@@ -3,6 +3,7 @@ Utilidades compartidas para todo el sistema
 Funciones de formato, validación, conversión, etc.
 """
 import re
+import unicodedata
 import webbrowser
 from datetime import datetime
 from typing import Optional, Union
@@ -269,6 +270,17 @@ def generar_numero_pedido() -> str:
 # FUNCIONES DE BÚSQUEDA Y FILTRADO
 # ========================================
 
+def normalizar_texto(texto: str) -> str:
+    """
+    Minúsculas, sin tildes y con espacios simples (para comparar nombres y encabezados)
+    Ej: "  Cedrón  Paraguay " -> "cedron paraguay"
+    """
+    if not texto:
+        return ""
+    sin_tildes = unicodedata.normalize("NFKD", str(texto)).encode("ascii", "ignore").decode("ascii")
+    return re.sub(r"\s+", " ", sin_tildes).strip().lower()
+
+
 def buscar_en_texto(texto: str, busqueda: str) -> bool:
     """
     Busca un término en un texto (case-insensitive)
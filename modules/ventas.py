@@ -6,9 +6,11 @@ import flet as ft
 import re
 from datetime import datetime
 from modules.db_service import db
-from modules.config import Colors, FontSizes, Sizes, Messages, Icons, Spacing
+from modules.config import Colors, FontSizes, Sizes, Messages, Icons, Spacing, BUSQUEDA_MAX_RESULTADOS
 from modules.utils import format_guarani, parse_guarani, to_int
 from modules.session_service import session
+from modules import busqueda_service as busqueda
+from modules import inventario_service as inventario
 
 # --- Funciones de compatibilidad ---
 def format_gs(n):
@@ -32,6 +34,16 @@ SUCCESS_COLOR = Colors.SUCCESS
 WARNING_COLOR = Colors.WARNING
 ERROR_COLOR = Colors.ERROR
 
+# Campos de cliente (alias, columnas candidatas según versión del esquema)
+CAMPOS_CLIENTE = [
+    ("id", ["id"]),
+    ("nombre", ["nombre"]),
+    ("telefono", ["telefono", "tel"]),
+    ("email", ["email", "correo"]),
+    ("direccion", ["direccion", "ubicacion"]),
+]
+CAMPOS_CONTACTO = ("telefono", "email", "direccion")
+
 def crud_view(content, page=None):
     print("🛒 Iniciando módulo de ventas PdV COMPLETO (PostgreSQL)...")
 
@@ -55,10 +67,11 @@ def crud_view(content, page=None):
 
     # --- Variables globales del módulo ---
     sesion_actual = {"id": None, "monto_apertura": 0}
-    carrito_venta = []
+    carrito_venta = {}  # {producto_id: item}, en el orden en que se agregaron
     modal_overlay = None
     actualizar_carrito_fn = None
     actualizar_ventas_fn = None
+    actualizar_catalogo_fn = None
 
     print(f"👤 Usuario actual: {current_user['nombre_completo']} (ID: {current_user['id']})")
 
@@ -187,20 +200,19 @@ def crud_view(content, page=None):
     def obtener_productos():
         """Obtiene productos activos con stock"""
         try:
-            with db.get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT id, nombre, categoria,
-                        COALESCE(NULLIF(precio_venta, 0), NULLIF(precio, 0), 0) AS precio_final,
-                        COALESCE(stock, 0) AS stock_final,
-                        COALESCE(unidad_medida, unidad, 'Unidad') AS unidad_final
-                    FROM productos
-                    WHERE COALESCE(stock, 0) >= 0
-                    ORDER BY nombre
-                """)
-                productos = cur.fetchall()
-                print(f"📦 Productos disponibles: {len(productos)}")
-                return productos
+            # Cacheada: un ajuste masivo de precios (o cualquier escritura en
+            # productos) la invalida al confirmarse
+            productos = db.cached_query("""
+                SELECT id, nombre, categoria,
+                    COALESCE(NULLIF(precio_venta, 0), NULLIF(precio, 0), 0) AS precio_final,
+                    COALESCE(stock, 0) AS stock_final,
+                    COALESCE(unidad_medida, unidad, 'Unidad') AS unidad_final
+                FROM productos
+                WHERE COALESCE(stock, 0) >= 0
+                ORDER BY nombre
+            """, tags=["productos"])
+            print(f"📦 Productos disponibles: {len(productos)}")
+            return productos
         except Exception as e:
             print(f"Error obteniendo productos: {e}")
             return []
@@ -208,19 +220,11 @@ def crud_view(content, page=None):
     def obtener_clientes():
         """Obtiene clientes activos"""
         try:
-            with db.get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT id, nombre,
-                        COALESCE(telefono, tel, '') as telefono,
-                        COALESCE(email, correo, '') as email,
-                        COALESCE(direccion, ubicacion, '') as direccion
-                    FROM clientes
-                    ORDER BY nombre
-                """)
-                clientes = cur.fetchall()
-                print(f"👥 Clientes disponibles: {len(clientes)}")
-                return clientes if clientes else [(1, "Cliente General", "", "", "")]
+            # Cacheada: se invalida al confirmar cualquier escritura en clientes
+            consulta = db.schema.select("clientes", CAMPOS_CLIENTE, coalesce=CAMPOS_CONTACTO, order_by="nombre")
+            clientes = db.cached_query(consulta, tags=["clientes"])
+            print(f"👥 Clientes disponibles: {len(clientes)}")
+            return clientes if clientes else [(1, "Cliente General", "", "", "")]
         except Exception as e:
             print(f"Error obteniendo clientes: {e}")
             return [(1, "Cliente General", "", "", "")]
@@ -228,18 +232,8 @@ def crud_view(content, page=None):
     def obtener_cliente_por_id(cliente_id):
         """Obtiene datos completos del cliente por ID"""
         try:
-            with db.get_connection() as conn:
-                cur = conn.cursor()
-                cur.execute("""
-                    SELECT id, nombre,
-                        COALESCE(telefono, tel, '') as telefono,
-                        COALESCE(email, correo, '') as email,
-                        COALESCE(direccion, ubicacion, '') as direccion
-                    FROM clientes
-                    WHERE id = %s
-                """, (cliente_id,))
-                cliente = cur.fetchone()
-                return cliente
+            consulta = db.schema.select("clientes", CAMPOS_CLIENTE, where="id = %s", coalesce=CAMPOS_CONTACTO)
+            return db.execute_query(consulta, (cliente_id,), fetch="one")
         except Exception as e:
             print(f"Error obteniendo cliente {cliente_id}: {e}")
             return None
@@ -298,24 +292,23 @@ def crud_view(content, page=None):
                 venta_id = cur.fetchone()[0]
                 print(f"✅ Venta principal guardada con ID: {venta_id}")
 
-                # Insertar detalles y actualizar stock
+                # Insertar detalles
                 for i, item in enumerate(carrito, 1):
                     producto_id, cantidad, precio_unitario = item['id'], item['cantidad'], item['precio']
                     subtotal_item = cantidad * precio_unitario
 
-                    # Insertar detalle
                     cur.execute("""
                         INSERT INTO detalle_ventas (venta_id, producto_id, cantidad, precio_unitario, subtotal)
                         VALUES (%s, %s, %s, %s, %s)
                     """, (venta_id, producto_id, cantidad, precio_unitario, subtotal_item))
 
-                    # Actualizar stock
-                    cur.execute("""
-                        UPDATE productos SET stock = stock - %s WHERE id = %s
-                    """, (cantidad, producto_id))
-
                     print(f"  📋 Detalle {i}: {item['nombre']} x{cantidad} = ₲{subtotal_item:,}")
 
+                # Salida de stock y kardex: un INSERT y un UPDATE para todo el carrito
+                inventario.registrar_movimientos(
+                    cur, [(item['id'], -item['cantidad']) for item in carrito], "venta", referencia=numero_venta
+                )
+
                 # Confirmar transacción
                 conn.commit()
 
@@ -335,43 +328,39 @@ def crud_view(content, page=None):
 
     def calcular_totales():
         """Calcula totales del carrito"""
-        subtotal = sum(item['cantidad'] * item['precio'] for item in carrito_venta)
+        subtotal = sum(item['cantidad'] * item['precio'] for item in carrito_venta.values())
         descuento = 0
         total = subtotal - descuento
         return subtotal, descuento, total
 
     # --- FUNCIÓN PARA AGREGAR AL CARRITO ---
+    # Un solo SnackBar reutilizado: avisar no reenvía la página
+    aviso_carrito = ft.SnackBar(content=ft.Text("", color="white"))
+
+    def avisar_carrito(texto, color, duracion):
+        aviso_carrito.content.value = texto
+        aviso_carrito.bgcolor = color
+        aviso_carrito.duration = duracion
+        page.open(aviso_carrito)
+
     def agregar_al_carrito(prod_id, prod_nombre, prod_precio, prod_stock, prod_unidad):
         """Agrega o actualiza producto en el carrito"""
         print(f"🛒 AGREGANDO AL CARRITO: {prod_nombre} (ID: {prod_id}) - Stock: {prod_stock}")
 
-        # Buscar si ya existe en el carrito
-        item_existente = None
-        for i, item in enumerate(carrito_venta):
-            if item['id'] == prod_id:
-                item_existente = item
-                break
+        item_existente = carrito_venta.get(prod_id)
 
         if item_existente:
             # Producto ya existe - aumentar cantidad
             if item_existente['cantidad'] < prod_stock:
                 item_existente['cantidad'] += 1
                 print(f"✅ Cantidad aumentada: {prod_nombre} x{item_existente['cantidad']}")
-                page.snack_bar = ft.SnackBar(
-                    content=ft.Text(f"✅ {prod_nombre} x{item_existente['cantidad']}", color="white"),
-                    bgcolor=SUCCESS_COLOR,
-                    duration=1500,
-                )
+                avisar_carrito(f"✅ {prod_nombre} x{item_existente['cantidad']}", SUCCESS_COLOR, 1500)
             else:
                 print(f"⚠️ Stock insuficiente para {prod_nombre}")
-                page.snack_bar = ft.SnackBar(
-                    content=ft.Text(f"⚠️ Stock insuficiente para {prod_nombre}", color="white"),
-                    bgcolor=WARNING_COLOR,
-                    duration=2000,
-                )
+                avisar_carrito(f"⚠️ Stock insuficiente para {prod_nombre}", WARNING_COLOR, 2000)
         else:
             # Producto nuevo - agregar al carrito
-            nuevo_item = {
+            carrito_venta[prod_id] = {
                 'id': prod_id,
                 'nombre': prod_nombre,
                 'precio': prod_precio,
@@ -379,20 +368,12 @@ def crud_view(content, page=None):
                 'stock': prod_stock,
                 'unidad': prod_unidad
             }
-            carrito_venta.append(nuevo_item)
             print(f"✅ Producto agregado: {prod_nombre} - ₲{prod_precio:,}")
-            page.snack_bar = ft.SnackBar(
-                content=ft.Text(f"✅ {prod_nombre} agregado al carrito", color="white"),
-                bgcolor=SUCCESS_COLOR,
-                duration=1500,
-            )
-
-        # Mostrar notificación y actualizar carrito
-        page.snack_bar.open = True
-        page.update()
+            avisar_carrito(f"✅ {prod_nombre} agregado al carrito", SUCCESS_COLOR, 1500)
 
+        # Solo la fila del producto y los totales
         if actualizar_carrito_fn:
-            actualizar_carrito_fn()
+            actualizar_carrito_fn(prod_id)
 
         print(f"🛒 Carrito actual: {len(carrito_venta)} productos únicos")
 
@@ -1088,13 +1069,13 @@ def crud_view(content, page=None):
                         print(f"👤 Datos del cliente para ticket: {cliente_datos['nombre']}")
 
                 # Guardar venta
-                exito, resultado = guardar_venta(cliente_id, subtotal, descuento, total, monto_pagado, vuelto, metodo, carrito_venta)
+                exito, resultado = guardar_venta(cliente_id, subtotal, descuento, total, monto_pagado, vuelto, metodo, list(carrito_venta.values()))
 
                 if exito:
                     print(f"🎉 Venta procesada exitosamente: {resultado}")
 
                     # Guardar datos para el ticket
-                    carrito_backup = carrito_venta.copy()
+                    carrito_backup = list(carrito_venta.values())
                     totales_info = {
                         'subtotal': subtotal,
                         'descuento': descuento,
@@ -1113,6 +1094,8 @@ def crud_view(content, page=None):
                         actualizar_carrito_fn()
                     if actualizar_ventas_fn:
                         actualizar_ventas_fn()
+                    if actualizar_catalogo_fn:
+                        actualizar_catalogo_fn()
 
                     # Mostrar ticket
                     mostrar_ticket_venta(resultado, cliente_datos, carrito_backup, totales_info)
@@ -1309,7 +1292,9 @@ def crud_view(content, page=None):
 
     def crear_columna_productos():
         """Columna izquierda - Catálogo de productos"""
+        nonlocal actualizar_catalogo_fn
         productos = obtener_productos()
+        catalogo = {"productos": productos, "por_id": {p[0]: p for p in productos}, "texto": ""}
 
         search_field = ft.TextField(
             label="🔍 Buscar producto",
@@ -1318,373 +1303,449 @@ def crud_view(content, page=None):
             border_radius=8,
             bgcolor=ft.colors.WHITE,
         )
-        productos_list = ft.Column([], spacing=8, scroll=ft.ScrollMode.AUTO)
+        sin_resultados = ft.Container(
+            content=ft.Column([
+                ft.Icon(ft.icons.SEARCH_OFF, size=60, color=ft.colors.GREY_400),
+                ft.Text("No hay productos disponibles", color=ft.colors.GREY_600, size=14),
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=10),
+            alignment=ft.alignment.center,
+            height=150,
+            visible=False,
+        )
+        productos_list = ft.Column([sin_resultados], spacing=8, scroll=ft.ScrollMode.AUTO)
+
+        # Pool de tarjetas reutilizables: la i-ésima muestra el i-ésimo resultado.
+        # Se crean solo cuando hay más resultados que tarjetas; filtrar cambia los
+        # textos de las que muestran otro producto y oculta las que sobran.
+        tarjetas = []
+
+        def agregar_desde_tarjeta(e):
+            producto = catalogo["por_id"].get(e.control.data)
+            if producto:
+                id_prod, nombre, categoria, precio, stock, unidad = producto
+                agregar_al_carrito(id_prod, nombre, precio, stock, unidad)
+
+        def crear_tarjeta():
+            tarjeta = {
+                "producto": None,
+                "nombre": ft.Text("", weight="bold", size=15, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS),
+                "categoria": ft.Text("", size=12, color=ft.colors.GREY_600),
+                "precio": ft.Text("", size=13, weight="bold", color=PRIMARY_COLOR),
+                "stock": ft.Text("", size=12, weight="bold"),
+                "boton": ft.IconButton(
+                    icon=ft.icons.ADD_SHOPPING_CART,
+                    icon_color="white",
+                    bgcolor=PRIMARY_COLOR,
+                    on_click=agregar_desde_tarjeta,
+                    icon_size=20,
+                    width=45,
+                    height=45,
+                ),
+            }
+            tarjeta["card"] = ft.Container(
+                content=ft.Row([
+                    ft.Column([
+                        tarjeta["nombre"],
+                        tarjeta["categoria"],
+                        ft.Row([tarjeta["precio"], tarjeta["stock"]], spacing=10),
+                    ], expand=True, spacing=3),
+                    tarjeta["boton"],
+                ], spacing=10),
+                padding=12,
+                border_radius=10,
+                bgcolor=ft.colors.WHITE,
+                border=ft.border.all(1, ft.colors.GREY_300),
+                ink=True,
+                shadow=ft.BoxShadow(blur_radius=3, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
+            )
+            return tarjeta
+
+        def mostrar_en_tarjeta(tarjeta, producto) -> bool:
+            """Muestra el producto en la tarjeta; False si ya lo mostraba igual"""
+            if tarjeta["producto"] == producto and tarjeta["card"].visible:
+                return False
+            id_prod, nombre, categoria, precio, stock, unidad = producto
+            tarjeta["producto"] = producto
+            tarjeta["nombre"].value = nombre
+            tarjeta["categoria"].value = f"📂 {categoria}"
+            tarjeta["precio"].value = f"💰 {formatear_guaranies(precio)}"
+            tarjeta["stock"].value = f"📦 Stock: {stock}"
+            tarjeta["stock"].color = SUCCESS_COLOR if stock > 10 else WARNING_COLOR if stock > 0 else ERROR_COLOR
+            tarjeta["boton"].data = id_prod
+            tarjeta["boton"].tooltip = f"Agregar {nombre}"
+            tarjeta["card"].visible = True
+            return True
 
         def filtrar_productos(texto):
-            productos_list.controls.clear()
-            productos_filtrados = [p for p in productos if texto.lower() in p[1].lower()] if texto else productos
+            catalogo["texto"] = texto or ""
+            if texto and texto.strip():
+                ids = busqueda.buscar_productos(texto, BUSQUEDA_MAX_RESULTADOS, admite=lambda pid: pid in catalogo["por_id"])
+                productos_filtrados = [catalogo["por_id"][pid] for pid in ids]
+            else:
+                productos_filtrados = catalogo["productos"]
+
+            cambiados = []
+            while len(tarjetas) < len(productos_filtrados):
+                tarjeta = crear_tarjeta()
+                tarjetas.append(tarjeta)
+                productos_list.controls.append(tarjeta["card"])
+                if productos_list not in cambiados:
+                    cambiados.append(productos_list)
+
+            for tarjeta, producto in zip(tarjetas, productos_filtrados):
+                if mostrar_en_tarjeta(tarjeta, producto):
+                    cambiados.append(tarjeta["card"])
+            for tarjeta in tarjetas[len(productos_filtrados):]:
+                if tarjeta["card"].visible:
+                    tarjeta["card"].visible = False
+                    cambiados.append(tarjeta["card"])
+
+            if sin_resultados.visible != (not productos_filtrados):
+                sin_resultados.visible = not productos_filtrados
+                cambiados.append(sin_resultados)
+
+            if cambiados and productos_list.page:
+                page.update(*cambiados)
+
+        def actualizar_catalogo():
+            """Relee el catálogo (p. ej. el stock tras una venta): solo se reenvían las tarjetas que cambiaron"""
+            productos = obtener_productos()
+            catalogo["productos"] = productos
+            catalogo["por_id"] = {p[0]: p for p in productos}
+            filtrar_productos(catalogo["texto"])
+
+        actualizar_catalogo_fn = actualizar_catalogo
+
+        search_field.on_change = lambda e: filtrar_productos(e.control.value)
+        filtrar_productos("")
+
+        return ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Icon(ft.icons.INVENTORY, color=PRIMARY_COLOR, size=24),
+                    ft.Text("Catálogo de Productos", size=18, weight="bold", color=PRIMARY_COLOR),
+                ], spacing=8),
+                search_field,
+                ft.Container(
+                    content=productos_list,
+                    height=480,
+                ),
+            ], spacing=12),
+            padding=15,
+            border_radius=12,
+            bgcolor=ft.colors.with_opacity(0.02, ft.colors.GREY),
+            expand=True,
+            shadow=ft.BoxShadow(blur_radius=5, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
+        )
+
+    def crear_columna_carrito():
+        """Columna central - Carrito de Venta"""
+        nonlocal actualizar_carrito_fn
+
+        carrito_vacio = ft.Container(
+            content=ft.Column([
+                ft.Icon(ft.icons.SHOPPING_CART_OUTLINED, size=80, color=ft.colors.GREY_400),
+                ft.Text("Carrito vacío", color=ft.colors.GREY_600, size=18, weight="bold"),
+                ft.Text("Agregue productos del catálogo", color=ft.colors.GREY_500, size=14),
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=12),
+            alignment=ft.alignment.center,
+            height=200,
+        )
+        carrito_list = ft.Column([carrito_vacio], spacing=10, scroll=ft.ScrollMode.AUTO)
+        filas_carrito = {}  # producto_id -> {"card", "cantidad", "total"}
+
+        totales_container = ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Text("Subtotal:", weight="bold", size=16),
+                    ft.Text("₲ 0", weight="bold", text_align=ft.TextAlign.RIGHT, expand=True, size=16),
+                ]),
+                ft.Divider(height=2, color=PRIMARY_COLOR),
+                ft.Row([
+                    ft.Text("TOTAL:", size=20, weight="bold", color=PRIMARY_COLOR),
+                    ft.Text("₲ 0", size=20, weight="bold", color=PRIMARY_COLOR, text_align=ft.TextAlign.RIGHT, expand=True),
+                ]),
+            ], spacing=8),
+            padding=15,
+            border_radius=12,
+            bgcolor=ft.colors.with_opacity(0.1, PRIMARY_COLOR),
+            border=ft.border.all(2, PRIMARY_COLOR),
+        )
+
+        pagar_button = ft.ElevatedButton(
+            content=ft.Row([
+                ft.Icon(ft.icons.PAYMENT, color="white", size=24),
+                ft.Text("PROCESAR PAGO", size=16, weight="bold", color="white"),
+            ], alignment=ft.MainAxisAlignment.CENTER, spacing=8),
+            bgcolor=SUCCESS_COLOR,
+            color="white",
+            height=55,
+            on_click=lambda e: mostrar_overlay_pago() if carrito_venta and sesion_actual["id"] else None,
+            disabled=True,
+            style=ft.ButtonStyle(
+                shape=ft.RoundedRectangleBorder(radius=12),
+                shadow_color=SUCCESS_COLOR,
+                elevation=8,
+            ),
+        )
+
+        subtotal_text = totales_container.content.controls[0].controls[1]
+        total_text = totales_container.content.controls[2].controls[1]
+
+        def cambiar_cantidad(prod_id, valor):
+            item = carrito_venta.get(prod_id)
+            if not item:
+                return
+            try:
+                nueva_cantidad = int(valor)
+            except ValueError:
+                return
+            if nueva_cantidad <= 0:
+                quitar_del_carrito(prod_id)
+            elif nueva_cantidad <= item['stock']:
+                item['cantidad'] = nueva_cantidad
+                actualizar_carrito(prod_id)
+
+        def quitar_del_carrito(prod_id):
+            if carrito_venta.pop(prod_id, None):
+                actualizar_carrito(prod_id)
+
+        def crear_fila(item):
+            """Controles de un producto del carrito (se crean una vez y luego se modifican)"""
+            cantidad_field = ft.TextField(
+                value=str(item['cantidad']),
+                width=80,
+                height=40,
+                text_align=ft.TextAlign.CENTER,
+                keyboard_type=ft.KeyboardType.NUMBER,
+                border_radius=8,
+                bgcolor=ft.colors.WHITE,
+                text_size=14,
+                on_change=lambda e, pid=item['id']: cambiar_cantidad(pid, e.control.value),
+            )
+            total_item = ft.Text(formatear_guaranies(item['cantidad'] * item['precio']),
+                weight="bold", size=15, color=PRIMARY_COLOR)
+
+            item_card = ft.Container(
+                content=ft.Column([
+                    ft.Row([
+                        ft.Column([
+                            ft.Text(item['nombre'], weight="bold", size=15, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS),
+                            ft.Text(f"Precio: {formatear_guaranies(item['precio'])}", size=13, color=ft.colors.GREY_600),
+                        ], expand=True, spacing=3),
+                        ft.IconButton(
+                            icon=ft.icons.DELETE_OUTLINE,
+                            icon_color=ERROR_COLOR,
+                            on_click=lambda e, pid=item['id']: quitar_del_carrito(pid),
+                            icon_size=20,
+                            tooltip="Eliminar producto",
+                        ),
+                    ]),
+                    ft.Row([
+                        ft.Text("Cantidad:", size=14, weight="bold"),
+                        cantidad_field,
+                        ft.Text("Total:", size=14, weight="bold", expand=True, text_align=ft.TextAlign.RIGHT),
+                        total_item,
+                    ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
+                ], spacing=8),
+                padding=15,
+                border_radius=10,
+                bgcolor=ft.colors.WHITE,
+                border=ft.border.all(1, ft.colors.GREY_300),
+                shadow=ft.BoxShadow(blur_radius=3, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
+            )
+            return {"card": item_card, "cantidad": cantidad_field, "total": total_item}
+
+        def actualizar_carrito(*prod_ids):
+            """
+            Pone al día las filas de los productos indicados (todas si no se indica
+            ninguno) y los totales. Solo se envían los controles que cambiaron: una
+            fila nueva o quitada, o la cantidad y el total de una existente.
+            """
+            if prod_ids:
+                ids = prod_ids
+            else:
+                ids = list(carrito_venta) + [pid for pid in filas_carrito if pid not in carrito_venta]
+
+            cambiados = []
+            for prod_id in ids:
+                item = carrito_venta.get(prod_id)
+                fila = filas_carrito.get(prod_id)
+                if item is None:
+                    if fila:
+                        carrito_list.controls.remove(fila["card"])
+                        del filas_carrito[prod_id]
+                        cambiados.append(carrito_list)
+                elif fila is None:
+                    fila = filas_carrito[prod_id] = crear_fila(item)
+                    carrito_list.controls.append(fila["card"])
+                    cambiados.append(carrito_list)
+                else:
+                    fila["cantidad"].value = str(item['cantidad'])
+                    fila["total"].value = formatear_guaranies(item['cantidad'] * item['precio'])
+                    cambiados += [fila["cantidad"], fila["total"]]
+
+            carrito_vacio.visible = not carrito_venta
+
+            # Actualizar totales
+            subtotal, descuento, total = calcular_totales()
+            subtotal_text.value = formatear_guaranies(subtotal)
+            total_text.value = formatear_guaranies(total)
+
+            # Actualizar botón
+            pagar_button.disabled = not (carrito_venta and sesion_actual["id"])
+            pagar_button.bgcolor = SUCCESS_COLOR if not pagar_button.disabled else ft.colors.GREY_400
+
+            if carrito_list.page:
+                page.update(*dict.fromkeys(cambiados + [carrito_vacio, subtotal_text, total_text, pagar_button]))
+
+        actualizar_carrito_fn = actualizar_carrito
+
+        return ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Icon(ft.icons.SHOPPING_CART, color=PRIMARY_COLOR, size=24),
+                    ft.Text("Carrito de Venta", size=18, weight="bold", color=PRIMARY_COLOR),
+                ], spacing=8),
+                ft.Container(
+                    content=carrito_list,
+                    height=300,
+                ),
+                totales_container,
+                pagar_button,
+            ], spacing=15),
+            padding=15,
+            border_radius=12,
+            bgcolor=ft.colors.with_opacity(0.02, ft.colors.GREY),
+            width=400,
+            shadow=ft.BoxShadow(blur_radius=5, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
+        )
+
+    def crear_columna_ventas():
+        """Columna derecha - Ventas del día"""
+        nonlocal actualizar_ventas_fn
+
+        ventas_list = ft.Column([], spacing=8, scroll=ft.ScrollMode.AUTO)
+        total_ventas_text = ft.Text("Total del día: ₲ 0", size=16, weight="bold", color=PRIMARY_COLOR)
+
+        def actualizar_ventas():
+            ventas_list.controls.clear()
+            ventas = obtener_ventas_del_dia()
 
-            if not productos_filtrados:
-                productos_list.controls.append(
+            if not ventas:
+                ventas_list.controls.append(
                     ft.Container(
                         content=ft.Column([
-                            ft.Icon(ft.icons.SEARCH_OFF, size=60, color=ft.colors.GREY_400),
-                            ft.Text("No hay productos disponibles", color=ft.colors.GREY_600, size=14),
-                        ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=10),
+                            ft.Icon(ft.icons.RECEIPT_LONG, size=60, color=ft.colors.GREY_400),
+                            ft.Text("Sin ventas", color=ft.colors.GREY_600, size=16, weight="bold"),
+                            ft.Text("Las ventas aparecerán aquí", color=ft.colors.GREY_500, size=12),
+                        ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=8),
                         alignment=ft.alignment.center,
                         height=150,
                     )
                 )
+                total_ventas_text.value = "Total del día: ₲ 0"
             else:
-                for producto in
-                # CONTINUACIÓN DESDE LÍNEA 1355
-
-                            else:
-                                for producto in productos_filtrados:
-                                    id_prod, nombre, categoria, precio, stock, unidad = producto
-
-                                    def crear_handler(prod_id, prod_nombre, prod_precio, prod_stock, prod_unidad):
-                                        def handler(e):
-                                            agregar_al_carrito(prod_id, prod_nombre, prod_precio, prod_stock, prod_unidad)
-                                        return handler
-
-                                    stock_color = SUCCESS_COLOR if stock > 10 else WARNING_COLOR if stock > 0 else ERROR_COLOR
-
-                                    producto_card = ft.Container(
-                                        content=ft.Row([
-                                            ft.Column([
-                                                ft.Text(nombre, weight="bold", size=15, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS),
-                                                ft.Text(f"📂 {categoria}", size=12, color=ft.colors.GREY_600),
-                                                ft.Row([
-                                                    ft.Text(f"💰 {formatear_guaranies(precio)}", size=13, weight="bold", color=PRIMARY_COLOR),
-                                                    ft.Text(f"📦 Stock: {stock}", size=12, color=stock_color, weight="bold"),
-                                                ], spacing=10),
-                                            ], expand=True, spacing=3),
-                                            ft.IconButton(
-                                                icon=ft.icons.ADD_SHOPPING_CART,
-                                                icon_color="white",
-                                                bgcolor=PRIMARY_COLOR,
-                                                on_click=crear_handler(id_prod, nombre, precio, stock, unidad),
-                                                icon_size=20,
-                                                width=45,
-                                                height=45,
-                                                tooltip=f"Agregar {nombre}",
-                                            ),
-                                        ], spacing=10),
-                                        padding=12,
-                                        border_radius=10,
-                                        bgcolor=ft.colors.WHITE,
-                                        border=ft.border.all(1, ft.colors.GREY_300),
-                                        ink=True,
-                                        shadow=ft.BoxShadow(blur_radius=3, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
-                                    )
-                                    productos_list.controls.append(producto_card)
-
-                            page.update()
-
-                        search_field.on_change = lambda e: filtrar_productos(e.control.value)
-                        filtrar_productos("")
-
-                        return ft.Container(
-                            content=ft.Column([
-                                ft.Row([
-                                    ft.Icon(ft.icons.INVENTORY, color=PRIMARY_COLOR, size=24),
-                                    ft.Text("Catálogo de Productos", size=18, weight="bold", color=PRIMARY_COLOR),
-                                ], spacing=8),
-                                search_field,
-                                ft.Container(
-                                    content=productos_list,
-                                    height=480,
-                                ),
-                            ], spacing=12),
-                            padding=15,
-                            border_radius=12,
-                            bgcolor=ft.colors.with_opacity(0.02, ft.colors.GREY),
-                            expand=True,
-                            shadow=ft.BoxShadow(blur_radius=5, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
-                        )
+                total_dia = sum(venta[1] for venta in ventas)
+                total_ventas_text.value = f"Total del día: {formatear_guaranies(total_dia)}"
 
-                    def crear_columna_carrito():
-                        """Columna central - Carrito de Venta"""
-                        nonlocal actualizar_carrito_fn
-
-                        carrito_list = ft.Column([], spacing=10, scroll=ft.ScrollMode.AUTO)
-
-                        totales_container = ft.Container(
-                            content=ft.Column([
-                                ft.Row([
-                                    ft.Text("Subtotal:", weight="bold", size=16),
-                                    ft.Text("₲ 0", weight="bold", text_align=ft.TextAlign.RIGHT, expand=True, size=16),
-                                ]),
-                                ft.Divider(height=2, color=PRIMARY_COLOR),
-                                ft.Row([
-                                    ft.Text("TOTAL:", size=20, weight="bold", color=PRIMARY_COLOR),
-                                    ft.Text("₲ 0", size=20, weight="bold", color=PRIMARY_COLOR, text_align=ft.TextAlign.RIGHT, expand=True),
-                                ]),
-                            ], spacing=8),
-                            padding=15,
-                            border_radius=12,
-                            bgcolor=ft.colors.with_opacity(0.1, PRIMARY_COLOR),
-                            border=ft.border.all(2, PRIMARY_COLOR),
-                        )
+                for venta in ventas:
+                    numero, total, metodo, fecha, cliente, vendedor = venta
+                    fecha_corta = fecha.split(' ')[1][:5] if fecha and ' ' in str(fecha) else "N/A"
 
-                        pagar_button = ft.ElevatedButton(
-                            content=ft.Row([
-                                ft.Icon(ft.icons.PAYMENT, color="white", size=24),
-                                ft.Text("PROCESAR PAGO", size=16, weight="bold", color="white"),
-                            ], alignment=ft.MainAxisAlignment.CENTER, spacing=8),
-                            bgcolor=SUCCESS_COLOR,
-                            color="white",
-                            height=55,
-                            on_click=lambda e: mostrar_overlay_pago() if carrito_venta and sesion_actual["id"] else None,
-                            disabled=True,
-                            style=ft.ButtonStyle(
-                                shape=ft.RoundedRectangleBorder(radius=12),
-                                shadow_color=SUCCESS_COLOR,
-                                elevation=8,
-                            ),
-                        )
+                    venta_card = ft.Container(
+                        content=ft.Column([
+                            ft.Row([
+                                ft.Column([
+                                    ft.Text(f"#{numero}", weight="bold", size=12, color=PRIMARY_COLOR),
+                                    ft.Text(f"🕐 {fecha_corta}", size=10, color=ft.colors.GREY_600),
+                                ], spacing=2),
+                                ft.Column([
+                                    ft.Text(formatear_guaranies(total), weight="bold", size=13, text_align=ft.TextAlign.RIGHT),
+                                    ft.Text(metodo, size=10, color=ft.colors.GREY_600, text_align=ft.TextAlign.RIGHT),
+                                ], spacing=2, horizontal_alignment=ft.CrossAxisAlignment.END),
+                            ]),
+                            ft.Row([
+                                ft.Text(f"👤 {cliente or 'Cliente General'}", size=10, color=ft.colors.GREY_500, expand=True, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS),
+                                ft.Text(f"👨‍💼 {vendedor or 'N/A'}", size=10, color=ft.colors.GREY_500, text_align=ft.TextAlign.RIGHT),
+                            ]),
+                        ], spacing=5),
+                        padding=10,
+                        border_radius=8,
+                        bgcolor=ft.colors.WHITE,
+                        border=ft.border.all(1, ft.colors.GREY_300),
+                        shadow=ft.BoxShadow(blur_radius=2, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
+                    )
+                    ventas_list.controls.append(venta_card)
 
-                        def actualizar_carrito():
-                            carrito_list.controls.clear()
-
-                            if not carrito_venta:
-                                carrito_list.controls.append(
-                                    ft.Container(
-                                        content=ft.Column([
-                                            ft.Icon(ft.icons.SHOPPING_CART_OUTLINED, size=80, color=ft.colors.GREY_400),
-                                            ft.Text("Carrito vacío", color=ft.colors.GREY_600, size=18, weight="bold"),
-                                            ft.Text("Agregue productos del catálogo", color=ft.colors.GREY_500, size=14),
-                                        ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=12),
-                                        alignment=ft.alignment.center,
-                                        height=200,
-                                    )
-                                )
-                            else:
-                                for i, item in enumerate(carrito_venta):
-                                    cantidad_field = ft.TextField(
-                                        value=str(item['cantidad']),
-                                        width=80,
-                                        height=40,
-                                        text_align=ft.TextAlign.CENTER,
-                                        keyboard_type=ft.KeyboardType.NUMBER,
-                                        border_radius=8,
-                                        bgcolor=ft.colors.WHITE,
-                                        text_size=14,
-                                    )
-
-                                    def crear_handler_cantidad(idx):
-                                        def handler(e):
-                                            try:
-                                                nueva_cantidad = int(e.control.value)
-                                                if nueva_cantidad > 0 and nueva_cantidad <= carrito_venta[idx]['stock']:
-                                                    carrito_venta[idx]['cantidad'] = nueva_cantidad
-                                                    actualizar_carrito()
-                                                elif nueva_cantidad <= 0:
-                                                    carrito_venta.pop(idx)
-                                                    actualizar_carrito()
-                                            except ValueError:
-                                                actualizar_carrito()
-                                        return handler
-
-                                    cantidad_field.on_change = crear_handler_cantidad(i)
-
-                                    def crear_handler_eliminar(idx):
-                                        def handler(e):
-                                            if idx < len(carrito_venta):
-                                                carrito_venta.pop(idx)
-                                                actualizar_carrito()
-                                        return handler
-
-                                    item_card = ft.Container(
-                                        content=ft.Column([
-                                            ft.Row([
-                                                ft.Column([
-                                                    ft.Text(item['nombre'], weight="bold", size=15, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS),
-                                                    ft.Text(f"Precio: {formatear_guaranies(item['precio'])}", size=13, color=ft.colors.GREY_600),
-                                                ], expand=True, spacing=3),
-                                                ft.IconButton(
-                                                    icon=ft.icons.DELETE_OUTLINE,
-                                                    icon_color=ERROR_COLOR,
-                                                    on_click=crear_handler_eliminar(i),
-                                                    icon_size=20,
-                                                    tooltip="Eliminar producto",
-                                                ),
-                                            ]),
-                                            ft.Row([
-                                                ft.Text("Cantidad:", size=14, weight="bold"),
-                                                cantidad_field,
-                                                ft.Text("Total:", size=14, weight="bold", expand=True, text_align=ft.TextAlign.RIGHT),
-                                                ft.Text(formatear_guaranies(item['cantidad'] * item['precio']),
-                                                    weight="bold", size=15, color=PRIMARY_COLOR),
-                                            ], alignment=ft.MainAxisAlignment.SPACE_BETWEEN),
-                                        ], spacing=8),
-                                        padding=15,
-                                        border_radius=10,
-                                        bgcolor=ft.colors.WHITE,
-                                        border=ft.border.all(1, ft.colors.GREY_300),
-                                        shadow=ft.BoxShadow(blur_radius=3, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
-                                    )
-                                    carrito_list.controls.append(item_card)
-
-                            # Actualizar totales
-                            subtotal, descuento, total = calcular_totales()
-                            totales_container.content.controls[0].controls[1].value = formatear_guaranies(subtotal)
-                            totales_container.content.controls[2].controls[1].value = formatear_guaranies(total)
-
-                            # Actualizar botón
-                            pagar_button.disabled = not (carrito_venta and sesion_actual["id"])
-                            pagar_button.bgcolor = SUCCESS_COLOR if not pagar_button.disabled else ft.colors.GREY_400
-
-                            page.update()
-
-                        actualizar_carrito_fn = actualizar_carrito
-
-                        return ft.Container(
-                            content=ft.Column([
-                                ft.Row([
-                                    ft.Icon(ft.icons.SHOPPING_CART, color=PRIMARY_COLOR, size=24),
-                                    ft.Text("Carrito de Venta", size=18, weight="bold", color=PRIMARY_COLOR),
-                                ], spacing=8),
-                                ft.Container(
-                                    content=carrito_list,
-                                    height=300,
-                                ),
-                                totales_container,
-                                pagar_button,
-                            ], spacing=15),
-                            padding=15,
-                            border_radius=12,
-                            bgcolor=ft.colors.with_opacity(0.02, ft.colors.GREY),
-                            width=400,
-                            shadow=ft.BoxShadow(blur_radius=5, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
-                        )
+            page.update()
 
-                    def crear_columna_ventas():
-                        """Columna derecha - Ventas del día"""
-                        nonlocal actualizar_ventas_fn
-
-                        ventas_list = ft.Column([], spacing=8, scroll=ft.ScrollMode.AUTO)
-                        total_ventas_text = ft.Text("Total del día: ₲ 0", size=16, weight="bold", color=PRIMARY_COLOR)
-
-                        def actualizar_ventas():
-                            ventas_list.controls.clear()
-                            ventas = obtener_ventas_del_dia()
-
-                            if not ventas:
-                                ventas_list.controls.append(
-                                    ft.Container(
-                                        content=ft.Column([
-                                            ft.Icon(ft.icons.RECEIPT_LONG, size=60, color=ft.colors.GREY_400),
-                                            ft.Text("Sin ventas", color=ft.colors.GREY_600, size=16, weight="bold"),
-                                            ft.Text("Las ventas aparecerán aquí", color=ft.colors.GREY_500, size=12),
-                                        ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=8),
-                                        alignment=ft.alignment.center,
-                                        height=150,
-                                    )
-                                )
-                                total_ventas_text.value = "Total del día: ₲ 0"
-                            else:
-                                total_dia = sum(venta[1] for venta in ventas)
-                                total_ventas_text.value = f"Total del día: {formatear_guaranies(total_dia)}"
-
-                                for venta in ventas:
-                                    numero, total, metodo, fecha, cliente, vendedor = venta
-                                    fecha_corta = fecha.split(' ')[1][:5] if fecha and ' ' in str(fecha) else "N/A"
-
-                                    venta_card = ft.Container(
-                                        content=ft.Column([
-                                            ft.Row([
-                                                ft.Column([
-                                                    ft.Text(f"#{numero}", weight="bold", size=12, color=PRIMARY_COLOR),
-                                                    ft.Text(f"🕐 {fecha_corta}", size=10, color=ft.colors.GREY_600),
-                                                ], spacing=2),
-                                                ft.Column([
-                                                    ft.Text(formatear_guaranies(total), weight="bold", size=13, text_align=ft.TextAlign.RIGHT),
-                                                    ft.Text(metodo, size=10, color=ft.colors.GREY_600, text_align=ft.TextAlign.RIGHT),
-                                                ], spacing=2, horizontal_alignment=ft.CrossAxisAlignment.END),
-                                            ]),
-                                            ft.Row([
-                                                ft.Text(f"👤 {cliente or 'Cliente General'}", size=10, color=ft.colors.GREY_500, expand=True, max_lines=1, overflow=ft.TextOverflow.ELLIPSIS),
-                                                ft.Text(f"👨‍💼 {vendedor or 'N/A'}", size=10, color=ft.colors.GREY_500, text_align=ft.TextAlign.RIGHT),
-                                            ]),
-                                        ], spacing=5),
-                                        padding=10,
-                                        border_radius=8,
-                                        bgcolor=ft.colors.WHITE,
-                                        border=ft.border.all(1, ft.colors.GREY_300),
-                                        shadow=ft.BoxShadow(blur_radius=2, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
-                                    )
-                                    ventas_list.controls.append(venta_card)
-
-                            page.update()
-
-                        actualizar_ventas_fn = actualizar_ventas
-                        actualizar_ventas()
-
-                        return ft.Container(
-                            content=ft.Column([
-                                ft.Row([
-                                    ft.Icon(ft.icons.RECEIPT_LONG, color=PRIMARY_COLOR, size=24),
-                                    ft.Text("Ventas del Día", size=18, weight="bold", color=PRIMARY_COLOR),
-                                ], spacing=8),
-                                total_ventas_text,
-                                ft.Container(
-                                    content=ventas_list,
-                                    height=450,
-                                ),
-                            ], spacing=12),
-                            padding=15,
-                            border_radius=12,
-                            bgcolor=ft.colors.with_opacity(0.02, ft.colors.GREY),
-                            width=350,
-                            shadow=ft.BoxShadow(blur_radius=5, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
-                        )
+        actualizar_ventas_fn = actualizar_ventas
+        actualizar_ventas()
 
-                    # --- LAYOUT PRINCIPAL DE 3 COLUMNAS ---
-                    header = crear_header()
-                    estado_caja = crear_estado_caja()
-
-                    # Contenido según estado de caja
-                    if sesion_actual["id"]:
-                        columna_productos = crear_columna_productos()
-                        columna_carrito = crear_columna_carrito()
-                        columna_ventas = crear_columna_ventas()
-
-                        # Inicializar función de actualización del carrito
-                        if actualizar_carrito_fn:
-                            actualizar_carrito_fn()
-
-                        # Layout de 3 columnas SIN scroll horizontal
-                        contenido_principal = ft.Row([
-                            columna_productos,      # Izquierda - Productos
-                            columna_carrito,        # Centro - Carrito
-                            columna_ventas,         # Derecha - Ventas del día
-                        ], spacing=15)
-                    else:
-                        contenido_principal = ft.Container(
-                            content=ft.Column([
-                                ft.Icon(ft.icons.LOCK_OUTLINE, size=100, color=ft.colors.GREY_400),
-                                ft.Text("Caja Cerrada", size=24, weight="bold", color=ft.colors.GREY_600),
-                                ft.Text("Debe abrir caja para realizar ventas", size=16, color=ft.colors.GREY_500),
-                            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=15),
-                            alignment=ft.alignment.center,
-                            expand=True,
-                        )
+        return ft.Container(
+            content=ft.Column([
+                ft.Row([
+                    ft.Icon(ft.icons.RECEIPT_LONG, color=PRIMARY_COLOR, size=24),
+                    ft.Text("Ventas del Día", size=18, weight="bold", color=PRIMARY_COLOR),
+                ], spacing=8),
+                total_ventas_text,
+                ft.Container(
+                    content=ventas_list,
+                    height=450,
+                ),
+            ], spacing=12),
+            padding=15,
+            border_radius=12,
+            bgcolor=ft.colors.with_opacity(0.02, ft.colors.GREY),
+            width=350,
+            shadow=ft.BoxShadow(blur_radius=5, color=ft.colors.with_opacity(0.1, ft.colors.BLACK)),
+        )
 
-                    # Layout principal con scroll vertical solamente
-                    layout_principal = ft.Column([
-                        header,
-                        estado_caja,
-                        contenido_principal,
-                    ], spacing=15, scroll=ft.ScrollMode.AUTO, expand=True)
+    # --- LAYOUT PRINCIPAL DE 3 COLUMNAS ---
+    header = crear_header()
+    estado_caja = crear_estado_caja()
 
-                    # Agregar al contenido de la página
-                    if hasattr(content, 'controls'):
-                        content.controls.append(layout_principal)
-                    else:
-                        content.content = layout_principal
+    # Contenido según estado de caja
+    if sesion_actual["id"]:
+        columna_productos = crear_columna_productos()
+        columna_carrito = crear_columna_carrito()
+        columna_ventas = crear_columna_ventas()
 
-                    page.update()
-                    print("✅ Módulo de ventas PdV 3 COLUMNAS COMPLETO (PostgreSQL) cargado")
+        # Inicializar función de actualización del carrito
+        if actualizar_carrito_fn:
+            actualizar_carrito_fn()
+
+        # Layout de 3 columnas SIN scroll horizontal
+        contenido_principal = ft.Row([
+            columna_productos,      # Izquierda - Productos
+            columna_carrito,        # Centro - Carrito
+            columna_ventas,         # Derecha - Ventas del día
+        ], spacing=15)
+    else:
+        contenido_principal = ft.Container(
+            content=ft.Column([
+                ft.Icon(ft.icons.LOCK_OUTLINE, size=100, color=ft.colors.GREY_400),
+                ft.Text("Caja Cerrada", size=24, weight="bold", color=ft.colors.GREY_600),
+                ft.Text("Debe abrir caja para realizar ventas", size=16, color=ft.colors.GREY_500),
+            ], horizontal_alignment=ft.CrossAxisAlignment.CENTER, spacing=15),
+            alignment=ft.alignment.center,
+            expand=True,
+        )
+
+    # Layout principal con scroll vertical solamente
+    layout_principal = ft.Column([
+        header,
+        estado_caja,
+        contenido_principal,
+    ], spacing=15, scroll=ft.ScrollMode.AUTO, expand=True)
+
+    # Agregar al contenido de la página
+    if hasattr(content, 'controls'):
+        content.controls.append(layout_principal)
+    else:
+        content.content = layout_principal
+
+    page.update()
+    print("✅ Módulo de ventas PdV 3 COLUMNAS COMPLETO (PostgreSQL) cargado")
 
@@ -162,12 +162,11 @@ def crear_tablas_ventas():
                 ('Abono Líquido', 22000, 60, 'Botella'),
             ]
             
-            for nombre, precio, stock, unidad in productos_precios:
-                cur.execute("""
-                    UPDATE productos 
-                    SET precio = ?, stock = ?, unidad_medida = ? 
-                    WHERE nombre LIKE ? AND (precio IS NULL OR precio = 0)
-                """, (precio, stock, unidad, f'%{nombre}%'))
+            cur.executemany("""
+                UPDATE productos 
+                SET precio = ?, stock = ?, unidad_medida = ? 
+                WHERE nombre LIKE ? AND (precio IS NULL OR precio = 0)
+            """, [(precio, stock, unidad, f'%{nombre}%') for nombre, precio, stock, unidad in productos_precios])
             
             # Para productos que no coincidan, poner valores por defecto
             cur.execute("""
@@ -184,10 +183,11 @@ def crear_tablas_ventas():
     print("✅ Tablas del sistema de ventas configuradas correctamente")
 
 def insertar_productos_ejemplo():
-    """Inserta productos de ejemplo si no existen"""
+    """Inserta productos de ejemplo si no existen (un solo executemany en una transacción)"""
+    # Misma base que el resto del script (no la de DATABASE_URL)
     conn = sqlite3.connect(DB)
     cur = conn.cursor()
-    
+
     try:
         # Verificar si hay productos
         cur.execute("SELECT COUNT(*) FROM productos")
@@ -205,20 +205,19 @@ def insertar_productos_ejemplo():
                 ('Pala de Jardín', 'Herramientas', 32000, 15, 'Unidad', 'Pala de jardín con mango de madera'),
                 ('Tierra Negra', 'Sustratos', 12000, 80, 'Bolsa', 'Tierra negra 10kg'),
             ]
-            
-            for producto in productos_ejemplo:
-                cur.execute("""
-                    INSERT INTO productos (nombre, categoria, precio, stock, unidad_medida, descripcion, estado, creado_por)
-                    VALUES (?, ?, ?, ?, ?, ?, 'Activo', 1)
-                """, producto)
-            
+
+            cur.executemany("""
+                INSERT INTO productos (nombre, categoria, precio, stock, unidad_medida, descripcion, estado, creado_por)
+                VALUES (?, ?, ?, ?, ?, ?, 'Activo', 1)
+            """, productos_ejemplo)
+
             print("✅ Productos de ejemplo insertados")
         else:
             print("ℹ️ Ya existen productos en la base de datos")
-    
+
     except Exception as e:
         print(f"⚠️ Error insertando productos: {e}")
-    
+
     conn.commit()
     conn.close()
 
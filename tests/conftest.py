@@ -0,0 +1,55 @@
+"""
+Fixtures compartidos de los tests
+"""
+import os
+import shutil
+import tempfile
+import pytest
+
+# Sin DATABASE_URL la suite usa un archivo temporal y no data/vivero.db
+# (tiene que quedar definido antes de importar db_service)
+_directorio_temporal = None
+if not os.environ.get("DATABASE_URL"):
+    _directorio_temporal = tempfile.mkdtemp(prefix="vivero_tests_")
+    os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(_directorio_temporal, 'vivero.db')}"
+
+from modules.db_service import db  # noqa: E402
+
+
+@pytest.fixture(scope="session", autouse=True)
+def base_de_la_suite():
+    """Borra al terminar la base temporal de la suite (si se creó)"""
+    yield
+    if _directorio_temporal:
+        for conn in getattr(db, "_sqlite_conns", []):
+            conn.close()
+        shutil.rmtree(_directorio_temporal, ignore_errors=True)
+
+
+@pytest.fixture
+def db_temporal(tmp_path):
+    """
+    Apunta `db` a un archivo SQLite vacío durante el test
+
+    Los tests que crean tablas de la aplicación (productos, pedidos,
+    clientes...) lo usan para no depender ni escribir en la base de
+    DATABASE_URL: corren igual sobre una base vacía o una ya migrada, y al
+    terminar solo se borra el archivo temporal.
+    """
+    anterior = dict(db.__dict__)
+    db.db_url = f"sqlite:///{tmp_path / 'vivero_test.db'}"
+    db.db_type = "sqlite"
+    db.pool = None
+    db.replica_pool = None
+    db.replica_url = None
+    db._init_sqlite()
+    db.cache.clear()
+    db.schema.refresh()
+    yield db
+
+    for conn in db._sqlite_conns:
+        conn.close()
+    db.__dict__.clear()
+    db.__dict__.update(anterior)
+    db.cache.clear()
+    db.schema.refresh()
@@ -0,0 +1,164 @@
+"""
+Tests para el servicio de base de datos asíncrono (async_db_service.py)
+"""
+import asyncio
+import pytest
+from modules.db_service import db
+from modules.async_db_service import adb, AsyncDatabaseService
+from modules.sql_dialect import translate_to_asyncpg
+
+
+def ejecutar(corrutina_factory, backend=None):
+    """Ejecuta una corrutina en un event loop nuevo y cierra los recursos de ese loop"""
+    anterior = adb.backend
+    if backend:
+        adb.backend = backend
+
+    async def _envolver():
+        try:
+            return await corrutina_factory()
+        finally:
+            await adb.close()
+
+    try:
+        return asyncio.run(_envolver())
+    finally:
+        adb.backend = anterior
+
+
+@pytest.fixture
+def tabla_async():
+    """Tabla temporal para las pruebas"""
+    db.execute_command("DROP TABLE IF EXISTS prueba_async")
+    db.execute_command("CREATE TABLE prueba_async (id SERIAL PRIMARY KEY, nombre VARCHAR(50), cantidad INTEGER)")
+    db.invalidate_cache()
+    yield "prueba_async"
+    db.execute_command("DROP TABLE IF EXISTS prueba_async")
+
+
+class TestTraduccionAsyncpg:
+    """Tests para la traducción de placeholders a $n"""
+
+    def test_posicionales(self):
+        sql, nombres = translate_to_asyncpg("SELECT * FROM x WHERE a = %s AND b = %s")
+        assert sql == "SELECT * FROM x WHERE a = $1 AND b = $2"
+        assert nombres == ()
+
+    def test_con_nombre_repetido(self):
+        sql, nombres = translate_to_asyncpg("UPDATE x SET a = %(v)s WHERE b = %(id)s OR c = %(v)s")
+        assert sql == "UPDATE x SET a = $1 WHERE b = $2 OR c = $1"
+        assert list(nombres) == ["v", "id"]
+
+    def test_porcentaje_y_literales(self):
+        sql, _ = translate_to_asyncpg("SELECT '%s' FROM x WHERE a LIKE 'ab%%' AND b = %s")
+        assert sql == "SELECT '%s' FROM x WHERE a LIKE 'ab%' AND b = $1"
+
+
+@pytest.mark.parametrize("backend", [None, "thread"])
+class TestServicioAsync:
+    """Tests de la API async (backend nativo y respaldo en hilos)"""
+
+    def test_singleton(self, backend):
+        assert AsyncDatabaseService() is adb
+
+    def test_insert_y_select(self, tabla_async, backend):
+        async def flujo():
+            id1 = await adb.execute_command(
+                "INSERT INTO prueba_async (nombre, cantidad) VALUES (%s, %s) RETURNING id", ("a", 1)
+            )
+            id2 = await adb.execute_command(
+                "INSERT INTO prueba_async (nombre, cantidad) VALUES (%s, %s)", ("b", 2)
+            )
+            filas = await adb.execute_query("SELECT nombre, cantidad FROM prueba_async ORDER BY id")
+            uno = await adb.execute_query("SELECT COUNT(*) FROM prueba_async", fetch="one")
+            return id1, id2, filas, uno
+
+        id1, id2, filas, uno = ejecutar(flujo, backend)
+        assert (id1, id2) == (1, 2)
+        assert [tuple(f) for f in filas] == [("a", 1), ("b", 2)]
+        assert uno[0] == 2
+
+    def test_transaccion_revierte_y_confirma(self, tabla_async, backend):
+        async def flujo():
+            with pytest.raises(RuntimeError):
+                async with adb.transaction() as tx:
+                    await tx.execute_command("INSERT INTO prueba_async (nombre, cantidad) VALUES (%s, %s)", ("x", 1))
+                    raise RuntimeError("falla")
+            async with adb.transaction() as tx:
+                await tx.execute_command("INSERT INTO prueba_async (nombre, cantidad) VALUES (%s, %s)", ("y", 2))
+                await tx.execute_command("UPDATE prueba_async SET cantidad = cantidad + 1")
+
+        ejecutar(flujo, backend)
+        assert [tuple(f) for f in db.execute_query("SELECT nombre, cantidad FROM prueba_async")] == [("y", 3)]
+
+    def test_cache_invalidada_por_escritura_async(self, tabla_async, backend):
+        async def flujo():
+            consulta = "SELECT COUNT(*) FROM prueba_async"
+            antes = await adb.cached_query(consulta)
+            await adb.execute_command("INSERT INTO prueba_async (nombre, cantidad) VALUES (%s, %s)", ("z", 1))
+            despues = await adb.cached_query(consulta)
+            return antes[0][0], despues[0][0]
+
+        assert ejecutar(flujo, backend) == (0, 1)
+
+    def test_consultas_concurrentes(self, tabla_async, backend):
+        async def flujo():
+            await asyncio.gather(*[
+                adb.execute_command("INSERT INTO prueba_async (nombre, cantidad) VALUES (%s, %s)", (f"p{i}", i))
+                for i in range(10)
+            ])
+            return await adb.execute_query("SELECT SUM(cantidad) FROM prueba_async", fetch="one")
+
+        assert ejecutar(flujo, backend)[0] == sum(range(10))
+
+    @pytest.mark.skipif(db.db_type != "postgresql", reason="Requiere PostgreSQL")
+    def test_read_only_en_la_replica(self, backend):
+        async def flujo():
+            lectura = await adb.execute_query("SHOW transaction_read_only", fetch="one", read_only=True)
+            escritura = await adb.execute_query("SHOW transaction_read_only", fetch="one")
+            return lectura[0], escritura[0]
+
+        db.set_replica(db.db_url)
+        try:
+            assert ejecutar(flujo, backend) == ("on", "off")
+        finally:
+            db.set_replica(None)
+
+
+@pytest.mark.parametrize("backend", ["aiosqlite", "thread"])
+class TestKpisDashboard:
+    """El dashboard carga sus KPIs con adb"""
+
+    def test_igual_a_la_version_sincronica(self, db_temporal, backend):
+        from modules import dashboard
+        db.execute_command("CREATE TABLE clientes (id SERIAL PRIMARY KEY, nombre TEXT)")
+        db.execute_command("CREATE TABLE ventas (id SERIAL PRIMARY KEY, total INTEGER)")
+        db.execute_command("CREATE TABLE pedidos (id SERIAL PRIMARY KEY, estado TEXT)")
+        db.execute_command("INSERT INTO clientes (nombre) VALUES ('Ana'), ('Luis')")
+        db.execute_command("INSERT INTO ventas (total) VALUES (15000), (2500)")
+        db.execute_command("INSERT INTO pedidos (estado) VALUES ('Pendiente'), ('Pendiente'), ('Entregado')")
+
+        kpis = ejecutar(dashboard.obtener_kpis_async, backend)
+        assert kpis == dashboard.obtener_kpis() == {
+            "ventas_totales": 17500, "pedidos_pendientes": 2, "pedidos_entregados": 1, "clientes_totales": 2
+        }
+
+    def test_lee_de_la_replica(self, db_temporal, tmp_path, backend):
+        import sqlite3
+        from modules import dashboard
+        db.execute_command("CREATE TABLE clientes (id SERIAL PRIMARY KEY, nombre TEXT)")
+        db.execute_command("CREATE TABLE ventas (id SERIAL PRIMARY KEY, total INTEGER)")
+        db.execute_command("CREATE TABLE pedidos (id SERIAL PRIMARY KEY, estado TEXT)")
+        db.execute_command("INSERT INTO clientes (nombre) VALUES ('Ana')")
+
+        # La réplica es una copia de este momento; después la principal cambia
+        ruta = tmp_path / "replica.db"
+        with sqlite3.connect(db.sqlite_path) as origen, sqlite3.connect(ruta) as copia:
+            origen.backup(copia)
+        db.execute_command("INSERT INTO clientes (nombre) VALUES ('Luis')")
+        db.set_replica(f"sqlite:///{ruta}")
+        db.replica_max_lag = 3600
+
+        assert ejecutar(dashboard.obtener_kpis_async, backend)["clientes_totales"] == 1
+        assert dashboard.obtener_kpis()["clientes_totales"] == 1
+        assert db.execute_query("SELECT COUNT(*) FROM clientes", fetch="one")[0] == 2
@@ -0,0 +1,117 @@
+"""
+Tests para la carga masiva (bulk_load.py y db.bulk_load / db.execute_many)
+"""
+import pytest
+from datetime import datetime
+from modules.db_service import db
+from modules import bulk_load as carga
+
+
+@pytest.fixture
+def tabla_carga():
+    """Tabla temporal con clave única en 'codigo'"""
+    db.execute_command("DROP TABLE IF EXISTS prueba_carga")
+    db.execute_command("""
+        CREATE TABLE prueba_carga (
+            id SERIAL PRIMARY KEY,
+            codigo VARCHAR(20) UNIQUE,
+            nombre TEXT,
+            precio INTEGER,
+            creado TIMESTAMP
+        )
+    """)
+    yield "prueba_carga"
+    db.execute_command("DROP TABLE IF EXISTS prueba_carga")
+
+
+class TestAuxiliares:
+    """Tests para las funciones auxiliares"""
+
+    def test_formato_copy(self):
+        texto = carga.formato_copy([("a\tb", None, True, 5), ("línea\nnueva", "c\\d", False, 1.5)]).read()
+        assert texto == "a\\tb\t\\N\tt\t5\nlínea\\nnueva\tc\\\\d\tf\t1.5\n"
+
+    def test_clausula_conflicto(self):
+        cols = ["codigo", "nombre", "precio"]
+        assert carga.clausula_conflicto(cols, None, None) == ""
+        assert carga.clausula_conflicto(cols, ["codigo"], None) == (
+            " ON CONFLICT (codigo) DO UPDATE SET nombre = excluded.nombre, precio = excluded.precio"
+        )
+        assert carga.clausula_conflicto(cols, ["codigo"], []) == " ON CONFLICT (codigo) DO NOTHING"
+        assert carga.clausula_conflicto(cols, ["codigo"], ["precio"], "t", conservar_nulos=True) == (
+            " ON CONFLICT (codigo) DO UPDATE SET precio = COALESCE(excluded.precio, t.precio)"
+        )
+
+    def test_identificador_invalido(self):
+        with pytest.raises(ValueError):
+            carga.validar_identificador("productos; DROP TABLE x")
+
+    def test_lotes_de_generador(self):
+        assert [len(l) for l in carga.lotes((i for i in range(7)), 3)] == [3, 3, 1]
+
+    def test_deduplicar_conserva_la_ultima(self):
+        lote = [("A", 1), ("B", 2), ("A", 3)]
+        assert sorted(carga.deduplicar(lote, ["codigo", "precio"], ["codigo"])) == [("A", 3), ("B", 2)]
+
+
+class TestBulkLoad:
+    """Tests de db.bulk_load contra la base configurada"""
+
+    def test_carga_simple_por_lotes(self, tabla_carga):
+        ahora = datetime(2025, 1, 2, 3, 4, 5)
+        filas = ((f"P{i:05d}", f"Producto {i}", i * 100, ahora) for i in range(2500))
+        resultado = db.bulk_load(tabla_carga, ["codigo", "nombre", "precio", "creado"], filas, chunk_size=1000)
+
+        assert resultado["rows"] == 2500
+        fila = db.execute_query("SELECT COUNT(*), SUM(precio) FROM prueba_carga", fetch="one")
+        assert (fila[0], fila[1]) == (2500, sum(i * 100 for i in range(2500)))
+
+    def test_diccionarios_y_nulos(self, tabla_carga):
+        db.bulk_load(tabla_carga, ["codigo", "nombre", "precio"], [{"codigo": "X", "precio": 1}])
+        fila = db.execute_query("SELECT codigo, nombre, precio FROM prueba_carga", fetch="one")
+        assert tuple(fila) == ("X", None, 1)
+
+    def test_upsert(self, tabla_carga):
+        cols = ["codigo", "nombre", "precio"]
+        db.bulk_load(tabla_carga, cols, [("A", "uno", 1), ("B", "dos", 2)])
+        db.bulk_load(tabla_carga, cols, [("A", "uno bis", 10), ("C", "tres", 3), ("A", "uno final", 11)],
+                     conflict=["codigo"])
+
+        filas = db.execute_query("SELECT codigo, nombre, precio FROM prueba_carga ORDER BY codigo")
+        assert [tuple(f) for f in filas] == [("A", "uno final", 11), ("B", "dos", 2), ("C", "tres", 3)]
+
+    def test_conservar_nulos(self, tabla_carga):
+        cols = ["codigo", "nombre", "precio"]
+        db.bulk_load(tabla_carga, cols, [("A", "uno", 1)])
+        db.bulk_load(tabla_carga, cols, [("A", None, 5)], conflict=["codigo"], keep_on_null=True)
+        fila = db.execute_query("SELECT nombre, precio FROM prueba_carga", fetch="one")
+        assert tuple(fila) == ("uno", 5)
+
+    def test_ignorar_repetidos(self, tabla_carga):
+        cols = ["codigo", "nombre", "precio"]
+        db.bulk_load(tabla_carga, cols, [("A", "uno", 1)])
+        db.bulk_load(tabla_carga, cols, [("A", "otro", 9), ("B", "dos", 2)], conflict=["codigo"], update=[])
+        filas = db.execute_query("SELECT codigo, precio FROM prueba_carga ORDER BY codigo")
+        assert [tuple(f) for f in filas] == [("A", 1), ("B", 2)]
+
+    def test_error_revierte_todo(self, tabla_carga):
+        with pytest.raises(Exception):
+            db.bulk_load(tabla_carga, ["codigo", "precio"], [("A", 1), ("A", 2)], chunk_size=1)
+        assert db.execute_query("SELECT COUNT(*) FROM prueba_carga", fetch="one")[0] == 0
+
+    def test_invalida_cache(self, tabla_carga):
+        consulta = "SELECT COUNT(*) FROM prueba_carga"
+        assert db.cached_query(consulta)[0][0] == 0
+        db.bulk_load(tabla_carga, ["codigo"], [("A",)])
+        assert db.cached_query(consulta)[0][0] == 1
+
+
+class TestExecuteMany:
+    """Tests de db.execute_many"""
+
+    def test_insert_y_update(self, tabla_carga):
+        db.execute_many("INSERT INTO prueba_carga (codigo, precio) VALUES (%s, %s)",
+                        [(f"C{i}", i) for i in range(1200)])
+        db.execute_many("UPDATE prueba_carga SET precio = precio + 1 WHERE codigo = %s", [("C1",), ("C2",)])
+        fila = db.execute_query("SELECT COUNT(*), SUM(precio) FROM prueba_carga", fetch="one")
+        assert (fila[0], fila[1]) == (1200, sum(range(1200)) + 2)
@@ -0,0 +1,156 @@
+"""
+Tests para el índice de búsqueda de autocompletado (busqueda_service.py)
+"""
+import pytest
+from modules.db_service import db
+from modules import busqueda_service as busqueda
+from modules.busqueda_service import IndiceBusqueda
+
+
+NOMBRES = {
+    1: "Rosa Roja",
+    2: "Rosal trepador",
+    3: "Helecho Serrucho",
+    4: "Maceta de Barro N°12",
+    5: "Cedrón Paraguay",
+    6: "Rosa",
+    7: "Tierra para macetas",
+    8: "Orquídea blanca",
+}
+
+
+@pytest.fixture
+def indice():
+    return IndiceBusqueda(NOMBRES)
+
+
+class TestIndiceBusqueda:
+    """Tests del índice de trigramas"""
+
+    def test_orden_de_los_resultados(self, indice):
+        # Igual, empieza con, palabra que empieza con
+        assert indice.buscar("rosa") == [6, 1, 2]
+        assert indice.buscar("ros", limite=2) == [6, 1]
+
+    def test_sin_tildes_ni_mayusculas(self, indice):
+        assert indice.buscar("CEDRON") == [5]
+        assert indice.buscar("orquidea") == [8]
+        assert indice.buscar("Cedrón") == [5]
+
+    def test_varias_palabras_en_cualquier_orden(self, indice):
+        assert indice.buscar("barro maceta") == [4]
+        assert indice.buscar("mac") == [4, 7]
+
+    def test_contiene_despues_de_prefijos(self, indice):
+        # 'serrucho' contiene 'rucho'; nada empieza con eso
+        assert indice.buscar("rucho") == [3]
+        assert indice.buscar("cet") == [4, 7]
+
+    def test_terminos_cortos_en_medio_de_palabra(self, indice):
+        # Sin trigramas propios: 'ec' y 'ch' solo aparecen dentro de 'helecho'
+        assert indice.buscar("ec") == [3]
+        assert indice.buscar("ch") == [3]
+        assert indice.buscar("ro")[:3] == [6, 1, 2]  # primero los que empiezan con 'ro'
+        assert set(indice.buscar("ro")) == {1, 2, 4, 5, 6}  # barro, cedron
+        assert indice.buscar("z") == []
+
+    def test_errores_de_tipeo(self, indice):
+        assert indice.buscar("helcho") == [3]
+        assert indice.buscar("orqudea") == [8]
+        assert indice.buscar("rsoa")[:2] == [6, 1]
+        # Términos cortos no toleran errores
+        assert indice.buscar("rsa") == []
+
+    def test_filtro_y_limite(self, indice):
+        assert indice.buscar("rosa", admite=lambda clave: clave != 6) == [1, 2]
+        assert indice.buscar("") == [] and indice.buscar("   ") == []
+        assert indice.buscar("xyz") == []
+
+    def test_actualizacion_incremental(self, indice):
+        indice.agregar(9, "Rosa china")
+        indice.agregar(6, "Clavel")
+        indice.quitar(1)
+        assert indice.buscar("rosa") == [9, 2]
+        assert indice.buscar("clavel") == [6]
+        assert len(indice) == 8 and 1 not in indice
+
+        cambios = indice.sincronizar({6: "Clavel", 9: "Rosa china", 10: "Rosa azul"})
+        assert cambios == 7  # 6 quitados + 1 nuevo
+        assert indice.buscar("rosa") == [10, 9]
+        # No quedan trigramas de los textos quitados
+        assert set().union(*indice._claves_por_palabra.values()) == {6, 9, 10}
+        assert set().union(*indice._gramas.values()) == set(indice._claves_por_palabra)
+
+
+@pytest.fixture
+def productos_db(db_temporal):
+    """Tabla productos mínima y un índice compartido nuevo"""
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE productos (id SERIAL PRIMARY KEY, nombre TEXT NOT NULL, stock INTEGER DEFAULT 0)")
+        cur.execute("INSERT INTO productos (id, nombre, stock) VALUES (1, 'Rosa Roja', 5), (2, 'Helecho', 0), (3, 'Ñandutí decorativo', 2)")
+        conn.commit()
+    db.schema.refresh()
+    busqueda.limpiar_cache()
+    yield
+    busqueda.limpiar_cache()
+
+
+class TestIndiceProductos:
+    """Tests del índice compartido del catálogo"""
+
+    def test_se_arma_una_vez(self, productos_db, monkeypatch):
+        assert busqueda.buscar_productos("nanduti") == [3]
+        indice = busqueda.indice_productos()
+        monkeypatch.setattr(db, "execute_query", lambda *a, **k: pytest.fail("no debe releer el catálogo"))
+        assert busqueda.buscar_productos("r") == [1, 3]  # 'decorativo' contiene la r
+        for texto in ("ro", "ros", "rosa"):
+            assert busqueda.buscar_productos(texto) == [1]
+        assert busqueda.indice_productos() is indice
+
+    def test_se_actualiza_al_escribir_en_productos(self, productos_db):
+        assert busqueda.buscar_productos("helecho") == [2]
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE productos SET nombre = 'Helecho Serrucho' WHERE id = 2")
+            cur.execute("INSERT INTO productos (id, nombre) VALUES (4, 'Helecho Cuerno')")
+            cur.execute("DELETE FROM productos WHERE id = 1")
+            conn.commit()
+        assert busqueda.buscar_productos("helecho") == [4, 2]
+        assert busqueda.buscar_productos("rosa") == []
+
+    def test_filtro_de_la_pantalla(self, productos_db):
+        con_stock = {1, 3}
+        assert busqueda.buscar_productos("helecho", admite=con_stock.__contains__) == []
+
+
+class TestBuscadorCiudades:
+    """Tests del autocompletado de ciudades"""
+
+    def test_sin_tildes(self):
+        assert busqueda.buscar_ciudades("nemby") == ["Ñemby"]
+        assert busqueda.buscar_ciudades("ASUNCION") == ["Asunción", "Nueva Asunción"]
+        assert busqueda.buscar_ciudades("caacupe")[0] == "Caacupé"
+
+    def test_prefijo_luego_palabra_luego_contiene(self):
+        buscador = busqueda.BuscadorCiudades({"A": ["Villa Elisa", "Elisa Norte", "Marielisa", "Elisabet"]})
+        assert buscador.buscar("elisa", limite=None) == ["Elisabet", "Elisa Norte", "Villa Elisa", "Marielisa"]
+        assert buscador.buscar("elisa", limite=2) == ["Elisabet", "Elisa Norte"]
+        assert buscador.buscar("") == [] and buscador.buscar("zzz") == []
+
+    def test_departamentos(self):
+        buscador = busqueda.buscador_ciudades()
+        assert buscador.departamento("san lorenzo") == "Central"
+        assert buscador.departamento("Tacuaras") == "Ñeembucú"
+        assert buscador.departamento("Barrio Obrero") is None
+        assert buscador.agrupar(["Luque", "Encarnación", "Itá", "Barrio Obrero"]) == {
+            "Central": ["Luque", "Itá"], "Itapúa": ["Encarnación"], "Otras": ["Barrio Obrero"],
+        }
+
+    def test_validar(self):
+        assert busqueda.validar_ciudad("  ciudad  del ESTE ") == "Ciudad del Este"
+        assert busqueda.validar_ciudad("Ciudad del") is None
+        assert busqueda.validar_ciudad(None) is None
+
+    def test_se_arma_una_vez(self):
+        assert busqueda.buscador_ciudades() is busqueda.buscador_ciudades()
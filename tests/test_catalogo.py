@@ -0,0 +1,164 @@
+"""
+Tests para importación y exportación del catálogo (catalogo.py)
+"""
+import csv
+import pytest
+from modules.db_service import db
+from modules.migrations_new import StockLedgerMigration
+from modules import catalogo
+from modules import inventario_service as inventario
+
+
+@pytest.fixture
+def productos(db_temporal):
+    """Tabla productos vacía (misma forma que la migración); no toca una base real"""
+    db.execute_command("""
+        CREATE TABLE productos (
+            id SERIAL PRIMARY KEY,
+            nombre TEXT NOT NULL,
+            categoria TEXT,
+            unidad_medida TEXT,
+            precio_compra INTEGER DEFAULT 0,
+            precio_venta INTEGER DEFAULT 0,
+            stock INTEGER DEFAULT 0,
+            UNIQUE(nombre)
+        )
+    """)
+    db.schema.refresh()
+    yield "productos"
+
+
+def escribir_csv(ruta, filas, delimitador=";"):
+    with open(ruta, "w", newline="", encoding="utf-8") as archivo:
+        csv.writer(archivo, delimiter=delimitador).writerows(filas)
+    return str(ruta)
+
+
+def leer_productos():
+    filas = db.execute_query("SELECT nombre, categoria, precio_venta, stock FROM productos ORDER BY nombre")
+    return [tuple(f) for f in filas]
+
+
+class TestLectura:
+    """Tests de lectura y validación (sin base de datos)"""
+
+    def test_encabezados_con_alias_y_acentos(self, tmp_path):
+        ruta = escribir_csv(tmp_path / "lista.csv", [
+            ["Artículo", "RUBRO", "Precio Venta", "Existencia", "Color"],
+            ["Rosa", "Flores", "15.000", "10", "roja"],
+        ])
+        indices, ignorados, registros = catalogo.leer_catalogo(ruta)
+        assert list(indices.values()) == ["nombre", "categoria", "precio_venta", "stock"]
+        assert ignorados == ["Color"]
+        assert list(registros) == [(2, {"nombre": "Rosa", "categoria": "Flores",
+                                        "precio_venta": "15.000", "stock": "10"})]
+
+    def test_sin_columna_nombre(self, tmp_path):
+        ruta = escribir_csv(tmp_path / "lista.csv", [["Precio", "Stock"], ["1", "2"]])
+        with pytest.raises(ValueError):
+            catalogo.leer_catalogo(ruta)
+
+    def test_entero(self):
+        assert catalogo._entero("150.000 Gs.") == 150000
+        assert catalogo._entero("12500.0") == 12500
+        assert catalogo._entero(99.6) == 100
+        assert catalogo._entero("  ") is None
+        with pytest.raises(ValueError):
+            catalogo._entero("doce")
+
+    def test_errores_con_numero_de_linea(self, tmp_path):
+        ruta = escribir_csv(tmp_path / "lista.csv", [
+            ["Nombre", "Precio"],
+            ["Rosa", "15000"],
+            ["", "100"],
+            ["Helecho", "caro"],
+            ["Cactus", "-5"],
+        ])
+        _, _, registros = catalogo.leer_catalogo(ruta)
+        validas, errores = next(catalogo.validar_lotes(registros))
+        assert [f["nombre"] for f in validas] == ["Rosa"]
+        assert [linea for linea, _ in errores] == [3, 4, 5]
+
+
+class TestImportacion:
+    """Tests de vista previa, importación y exportación contra la base configurada"""
+
+    def test_previsualizar_no_modifica(self, productos, tmp_path):
+        db.bulk_load("productos", ["nombre", "precio_venta", "stock"],
+                     [("Rosa", 10000, 5), ("Helecho", 20000, 3)])
+        ruta = escribir_csv(tmp_path / "lista.csv", [
+            ["Nombre", "Precio", "Stock"],
+            ["Rosa", "12.000", "5"],
+            ["Helecho", "20000", "3"],
+            ["Cactus", "8000", "1"],
+            ["Orquídea", "x", "1"],
+        ])
+        resumen = catalogo.previsualizar(ruta)
+
+        assert (resumen["nuevos"], resumen["actualizados"], resumen["sin_cambios"]) == (1, 1, 1)
+        assert resumen["cambios_precio"] == [
+            {"nombre": "Rosa", "campo": "precio_venta", "antes": 10000, "despues": 12000}
+        ]
+        assert resumen["total_errores"] == 1
+        assert leer_productos() == [("Helecho", None, 20000, 3), ("Rosa", None, 10000, 5)]
+
+    def test_importar_celdas_vacias_no_pisan(self, productos, tmp_path):
+        db.bulk_load("productos", ["nombre", "categoria", "precio_venta", "stock"],
+                     [("Rosa", "Flores", 10000, 5)])
+        ruta = escribir_csv(tmp_path / "lista.csv", [
+            ["Nombre", "Categoría", "Precio", "Stock"],
+            ["Rosa", "", "12000", ""],
+            ["Cactus", "Suculentas", "8000", "2"],
+        ])
+        resultado = catalogo.importar(ruta)
+
+        assert (resultado["rows"], resultado["errores"]) == (2, 0)
+        assert leer_productos() == [("Cactus", "Suculentas", 8000, 2), ("Rosa", "Flores", 12000, 5)]
+
+    def test_importar_deja_ajustes_en_el_kardex(self, productos, tmp_path):
+        db.bulk_load("productos", ["nombre", "stock"], [("Rosa", 5), ("Helecho", 3)])
+        with db.get_connection() as conn:
+            StockLedgerMigration().up(conn)
+            conn.commit()
+        db.schema.refresh()
+        ruta = escribir_csv(tmp_path / "lista.csv", [["Nombre", "Stock"], ["Rosa", "8"], ["Helecho", "3"]])
+
+        catalogo.importar(ruta)
+        ajustes = db.execute_query("SELECT producto_id, cantidad FROM movimientos_stock WHERE tipo = 'ajuste'")
+        rosa = db.execute_query("SELECT id FROM productos WHERE nombre = 'Rosa'", fetch="one")[0]
+        assert [tuple(f) for f in ajustes] == [(rosa, 3)]
+        assert inventario.diferencias() == []
+
+    def test_importar_sin_kardex_no_confirma_el_stock(self, productos, tmp_path, monkeypatch):
+        db.bulk_load("productos", ["nombre", "stock"], [("Rosa", 5)])
+        with db.get_connection() as conn:
+            StockLedgerMigration().up(conn)
+            conn.commit()
+        db.schema.refresh()
+
+        def falla(*args, **kwargs):
+            raise RuntimeError("kardex caído")
+        monkeypatch.setattr(inventario, "registrar_movimientos", falla)
+        ruta = escribir_csv(tmp_path / "lista.csv", [["Nombre", "Stock"], ["Rosa", "8"], ["Cactus", "2"]])
+
+        with pytest.raises(RuntimeError):
+            catalogo.importar(ruta)
+        assert leer_productos() == [("Rosa", None, 0, 5)]
+
+    @pytest.mark.parametrize("extension", [".xlsx", ".csv"])
+    def test_exportar_e_importar(self, productos, tmp_path, extension):
+        if extension == ".xlsx" and catalogo.openpyxl is None:
+            pytest.skip("openpyxl no instalado")
+        db.bulk_load("productos", ["nombre", "categoria", "precio_venta", "stock"],
+                     [(f"Planta {i:03d}", "Interior", 1000 * i, i) for i in range(250)])
+        ruta = str(tmp_path / f"catalogo{extension}")
+
+        assert catalogo.exportar(ruta, lote=100) == 250
+        resumen = catalogo.previsualizar(ruta)
+        assert (resumen["sin_cambios"], resumen["total_errores"]) == (250, 0)
+
+        db.execute_command("DELETE FROM productos")
+        catalogo.importar(ruta)
+        assert leer_productos()[:2] == [("Planta 000", "Interior", 0, 0), ("Planta 001", "Interior", 1000, 1)]
+        assert db.execute_query("SELECT COUNT(*) FROM productos", fetch="one")[0] == 250
+
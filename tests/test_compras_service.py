@@ -0,0 +1,149 @@
+"""
+Tests para órdenes de compra y recepción (compras_service.py y migración 7)
+"""
+import pytest
+from modules.db_service import db
+from modules.migrations_new import StockLedgerMigration, PurchaseOrdersMigration
+from modules import inventario_service as inventario
+from modules import compras_service as compras
+
+
+@pytest.fixture
+def compras_db(db_temporal, monkeypatch):
+    """Proveedores, productos con kardex y la migración 7 aplicada"""
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE proveedores (id SERIAL PRIMARY KEY, nombre TEXT NOT NULL)")
+        cur.execute("""
+            CREATE TABLE productos (
+                id SERIAL PRIMARY KEY,
+                nombre TEXT NOT NULL,
+                stock INTEGER DEFAULT 0,
+                stock_minimo INTEGER,
+                precio_compra INTEGER DEFAULT 0,
+                proveedor_id INTEGER
+            )
+        """)
+        cur.execute("INSERT INTO proveedores (id, nombre) VALUES (1, 'Agro'), (2, 'Macetas SA')")
+        cur.execute("""
+            INSERT INTO productos (id, nombre, stock, stock_minimo, precio_compra, proveedor_id) VALUES
+            (1, 'Rosa', 2, 10, 8000, 1), (2, 'Helecho', 20, 10, 15000, 1), (3, 'Maceta', 0, 5, 9000, 2)
+        """)
+        StockLedgerMigration().up(conn)
+        PurchaseOrdersMigration().up(conn)
+        conn.commit()
+    db.schema.refresh()
+    yield
+
+
+def productos_actuales():
+    return {f[0]: (f[1], f[2]) for f in db.execute_query("SELECT id, stock, precio_compra FROM productos")}
+
+
+class TestOrdenes:
+    """Tests de alta y consulta de órdenes"""
+
+    def test_crear_agrupa_lineas(self, compras_db):
+        orden_id = compras.crear_orden(1, [(1, 10, 8500), (2, 5), (1, 5)], observaciones="Semanal")
+        orden = compras.obtener_orden(orden_id)
+        assert orden["estado"] == "Pendiente" and orden["proveedor"] == "Agro"
+        assert [(l["producto_id"], l["cantidad"], l["precio_compra"]) for l in orden["lineas"]] == [
+            (2, 5, None), (1, 15, 8500)
+        ]
+        assert compras.listar_ordenes()[0] == {
+            "id": orden_id, "proveedor": "Agro", "fecha": orden["fecha"], "estado": "Pendiente",
+            "lineas": 2, "total": 15 * 8500
+        }
+
+    @pytest.mark.parametrize("lineas", [[], [(1, 0)], [(1, 5, -10)]])
+    def test_lineas_invalidas(self, compras_db, lineas):
+        with pytest.raises(ValueError):
+            compras.crear_orden(1, lineas)
+
+    def test_anular_solo_pendientes(self, compras_db):
+        orden_id = compras.crear_orden(1, [(1, 10)])
+        compras.recibir(orden_id, [(1, 4)])
+        with pytest.raises(ValueError):
+            compras.anular_orden(orden_id)
+
+        otra = compras.crear_orden(2, [(3, 10)])
+        compras.anular_orden(otra)
+        assert compras.obtener_orden(otra)["estado"] == "Anulada"
+        with pytest.raises(ValueError):
+            compras.recibir(otra)
+
+    def test_lineas_sugeridas_del_proveedor(self, compras_db):
+        # Rosa (2 <= 10) es de Agro; Maceta (0 <= 5) es de Macetas SA; Helecho no está bajo el mínimo
+        assert [(l["producto_id"], l["precio_compra"]) for l in compras.lineas_sugeridas(1)] == [(1, 8000)]
+        assert [l["producto_id"] for l in compras.lineas_sugeridas(2)] == [3]
+
+
+class TestRecepcion:
+    """Tests de recepción en una sola transacción"""
+
+    def test_recepcion_parcial_y_total(self, compras_db):
+        orden_id = compras.crear_orden(1, [(1, 10, 8500), (2, 6)])
+
+        resultado = compras.recibir(orden_id, [(1, 4, 8800)], referencia="Remito 001")
+        assert resultado == {"orden_id": orden_id, "productos": 1, "unidades": 4, "estado": "Parcial"}
+        assert productos_actuales()[1] == (6, 8800)
+
+        # Sin líneas: recibe todo lo pendiente al costo de la orden
+        assert compras.recibir(orden_id)["estado"] == "Recibida"
+        assert productos_actuales() == {1: (12, 8500), 2: (26, 15000), 3: (0, 9000)}
+        assert [l["pendiente"] for l in compras.obtener_orden(orden_id)["lineas"]] == [0, 0]
+
+        assert inventario.diferencias() == []
+        referencias = db.execute_query(
+            "SELECT referencia, SUM(cantidad) FROM movimientos_stock WHERE tipo = 'recepcion' GROUP BY referencia ORDER BY referencia"
+        )
+        assert [tuple(f) for f in referencias] == [(f"OC #{orden_id}", 12), ("Remito 001", 4)]
+
+    def test_producto_fuera_de_la_orden_no_graba_nada(self, compras_db):
+        orden_id = compras.crear_orden(1, [(1, 10)])
+        antes = productos_actuales()
+        with pytest.raises(ValueError):
+            compras.recibir(orden_id, [(1, 5), (3, 2)])
+        assert productos_actuales() == antes
+        assert compras.obtener_orden(orden_id)["estado"] == "Pendiente"
+
+    def test_no_recibe_mas_de_lo_pendiente(self, compras_db):
+        orden_id = compras.crear_orden(1, [(1, 10), (2, 6)])
+        compras.recibir(orden_id, [(1, 7)])
+        antes = productos_actuales()
+        with pytest.raises(ValueError, match="pendiente"):
+            compras.recibir(orden_id, [(1, 2), (1, 2), (2, 6)])  # 4 de la rosa, quedan 3
+        assert productos_actuales() == antes
+        assert {l["producto_id"]: l["pendiente"] for l in compras.obtener_orden(orden_id)["lineas"]} == {1: 3, 2: 6}
+        assert compras.recibir(orden_id, [(1, 3), (2, 6)])["estado"] == "Recibida"
+
+    def test_falla_a_mitad_revierte_todo(self, compras_db, monkeypatch):
+        orden_id = compras.crear_orden(1, [(1, 10), (2, 10)])
+
+        def falla(*args, **kwargs):
+            raise RuntimeError("corte de conexión")
+        monkeypatch.setattr(compras, "actualizar_por_caso", falla)
+        antes = productos_actuales()
+        with pytest.raises(RuntimeError):
+            compras.recibir(orden_id, [(1, 10, 9000)])
+        assert productos_actuales() == antes
+        assert inventario.diferencias() == []
+
+    def test_entrega_grande_por_lotes(self, compras_db, monkeypatch):
+        monkeypatch.setattr(compras, "COMPRAS_LOTE_LINEAS", 2)
+        monkeypatch.setattr(inventario, "INVENTARIO_LOTE_MOVIMIENTOS", 2)
+        db.bulk_load("productos", ["id", "nombre", "stock", "precio_compra"],
+                     [(i, f"Plantín {i}", 0, 1000) for i in range(10, 60)])
+        lineas = [(i, i, 1000 + i) for i in range(10, 60)]
+        orden_id = compras.crear_orden(1, lineas)
+
+        assert compras.recibir(orden_id)["estado"] == "Recibida"
+        actuales = productos_actuales()
+        assert all(actuales[i] == (i, 1000 + i) for i in range(10, 60))
+
+    def test_ingreso_directo_sin_orden(self, compras_db):
+        resultado = compras.recibir(lineas=[(3, 12, 9500)], referencia="Factura 77")
+        assert resultado["estado"] is None
+        assert productos_actuales()[3] == (12, 9500)
+        with pytest.raises(ValueError):
+            compras.recibir()
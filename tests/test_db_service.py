@@ -65,3 +65,298 @@ class TestDatabaseService:
             cur = conn.cursor()
             cur.execute("DROP TABLE IF EXISTS test_trans")
             conn.commit()
+
+
+@pytest.mark.skipif(db.db_type != "sqlite", reason="Requiere SQLite")
+class TestSQLitePersistente:
+    """Tests para las conexiones SQLite persistentes por hilo"""
+
+    def test_misma_conexion_en_el_hilo(self):
+        """Dos bloques seguidos en el mismo hilo reutilizan la conexión"""
+        with db.get_connection() as c1:
+            real1 = getattr(c1, "raw", c1)
+        with db.get_connection() as c2:
+            real2 = getattr(c2, "raw", c2)
+        assert real1 is real2
+
+    def test_conexion_distinta_por_hilo(self):
+        """Cada hilo obtiene su propia conexión"""
+        import threading
+        conexiones = []
+
+        def obtener():
+            with db.get_connection() as conn:
+                conexiones.append(getattr(conn, "raw", conn))
+
+        hilo = threading.Thread(target=obtener)
+        hilo.start()
+        hilo.join()
+        with db.get_connection() as conn:
+            assert getattr(conn, "raw", conn) is not conexiones[0]
+
+    def test_pragmas_aplicados(self):
+        """La conexión usa WAL y synchronous=NORMAL"""
+        modo = db.execute_query("PRAGMA journal_mode", fetch="one")[0]
+        sincronico = db.execute_query("PRAGMA synchronous", fetch="one")[0]
+        assert modo.lower() == "wal"
+        assert sincronico == 1  # NORMAL
+
+    def test_sin_commit_se_descarta(self):
+        """Lo no confirmado se revierte al salir del bloque más externo"""
+        with db.get_connection() as conn:
+            conn.execute("CREATE TABLE IF NOT EXISTS test_persist (valor INTEGER)")
+            conn.commit()
+        with db.get_connection() as conn:
+            conn.execute("INSERT INTO test_persist (valor) VALUES (1)")
+        assert db.execute_query("SELECT COUNT(*) FROM test_persist", fetch="one")[0] == 0
+
+        with db.get_connection() as conn:
+            conn.execute("DROP TABLE test_persist")
+            conn.commit()
+
+
+@pytest.fixture
+def tabla_anidada():
+    """Tabla de prueba para los bloques anidados"""
+    db.execute_command("CREATE TABLE IF NOT EXISTS test_anidado (valor INTEGER)")
+    db.execute_command("DELETE FROM test_anidado")
+    yield
+    db.execute_command("DROP TABLE IF EXISTS test_anidado")
+
+
+def _valores_anidados():
+    return sorted(f[0] for f in db.execute_query("SELECT valor FROM test_anidado"))
+
+
+class TestBloquesAnidados:
+    """Un bloque dentro de otro no confirma ni descarta lo del exterior"""
+
+    def test_exterior_falla_despues_de_escritura_anidada(self, tabla_anidada):
+        with pytest.raises(RuntimeError):
+            with db.get_connection() as conn:
+                conn.cursor().execute("INSERT INTO test_anidado (valor) VALUES (1)")
+                db.execute_command("INSERT INTO test_anidado (valor) VALUES (2)")
+                raise RuntimeError("falla el bloque exterior")
+        assert 1 not in _valores_anidados()
+        if db.db_type == "sqlite":
+            # El savepoint del bloque interno se revierte con la transacción exterior
+            assert _valores_anidados() == []
+
+    def test_error_anidado_conserva_el_exterior(self, tabla_anidada):
+        with db.get_connection() as conn:
+            conn.cursor().execute("INSERT INTO test_anidado (valor) VALUES (1)")
+            with pytest.raises(Exception):
+                db.execute_command("INSERT INTO test_anidado (columna_inexistente) VALUES (2)")
+            conn.cursor().execute("INSERT INTO test_anidado (valor) VALUES (3)")
+            conn.commit()
+        assert _valores_anidados() == [1, 3]
+
+    def test_rollback_anidado_solo_deshace_lo_suyo(self, tabla_anidada):
+        with db.get_connection() as conn:
+            conn.cursor().execute("INSERT INTO test_anidado (valor) VALUES (1)")
+            with db.get_connection() as interna:
+                interna.cursor().execute("INSERT INTO test_anidado (valor) VALUES (2)")
+                interna.rollback()
+            conn.commit()
+        assert _valores_anidados() == [1]
+
+
+@pytest.fixture
+def replica():
+    """Restaura la configuración de réplica al terminar"""
+    max_lag = db.replica_max_lag
+    yield db
+    db.set_replica(None)
+    db.replica_max_lag = max_lag
+
+
+def _en_replica(read_only=True):
+    """True si la conexión obtenida ve la tabla que solo existe en la réplica SQLite"""
+    with db.get_connection(read_only=read_only) as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COUNT(*) FROM sqlite_master WHERE name = 'marca_replica'")
+        return cur.fetchone()[0] == 1
+
+
+@pytest.mark.skipif(db.db_type != "sqlite", reason="Requiere SQLite")
+class TestReplicaSQLite:
+    """Tests para el ruteo de lecturas a una réplica (copia del archivo SQLite)"""
+
+    @pytest.fixture
+    def url_replica(self, tmp_path, replica):
+        import sqlite3
+        ruta = tmp_path / "replica.db"
+        conn = sqlite3.connect(ruta)
+        conn.execute("CREATE TABLE marca_replica (id INTEGER)")
+        conn.commit()
+        conn.close()
+        return f"sqlite:///{ruta}"
+
+    def test_lectura_va_a_replica(self, url_replica):
+        db.set_replica(url_replica)
+        assert db.replica_lag() == 0.0
+        assert _en_replica()
+        assert not _en_replica(read_only=False)
+
+    def test_atraso_excedido_usa_principal(self, url_replica):
+        db.set_replica(url_replica)
+        db.replica_max_lag = -1
+        assert not _en_replica()
+
+    def test_replica_inexistente_usa_principal(self, tmp_path, replica):
+        db.set_replica(f"sqlite:///{tmp_path / 'no_existe.db'}")
+        assert db.replica_lag() is None
+        assert not _en_replica()
+
+    def test_replica_no_admite_escrituras(self, url_replica):
+        import sqlite3
+        db.set_replica(url_replica)
+        with pytest.raises(sqlite3.OperationalError):
+            with db.get_connection(read_only=True) as conn:
+                conn.execute("INSERT INTO marca_replica VALUES (1)")
+        assert db.replica_lag() is not None  # Error de la sentencia, no de la réplica
+
+    def test_error_de_sql_no_deja_la_replica(self, url_replica):
+        import sqlite3
+        db.set_replica(url_replica)
+        with pytest.raises(sqlite3.OperationalError):
+            db.execute_query("SELECT columna_inexistente FROM marca_replica", read_only=True)
+        assert _en_replica()
+
+
+@pytest.mark.skipif(db.db_type != "postgresql", reason="Requiere PostgreSQL")
+class TestReplicaPostgres:
+    """Tests para el ruteo de lecturas a una réplica PostgreSQL"""
+
+    def test_lectura_en_sesion_de_solo_lectura(self, replica):
+        db.set_replica(db.db_url)
+        assert db.replica_lag() == 0.0
+        with db.get_connection(read_only=True) as conn:
+            assert getattr(conn, "raw", conn).readonly
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            assert cur.fetchone()[0] == 1
+
+    def test_replica_caida_usa_principal(self, replica):
+        db.set_replica("postgresql://postgres@127.0.0.1:1/inexistente")
+        assert db.replica_lag() is None
+        assert db.execute_query("SELECT 1", fetch="one", read_only=True)[0] == 1
+
+    def test_error_de_sql_no_deja_la_replica(self, replica):
+        import psycopg2
+        db.set_replica(db.db_url)
+        with pytest.raises(psycopg2.errors.UndefinedColumn):
+            db.execute_query("SELECT columna_inexistente FROM pg_class", read_only=True)
+        assert db.replica_lag() == 0.0
+        with db.get_connection(read_only=True) as conn:
+            assert getattr(conn, "raw", conn).readonly
+
+
+# Consulta lenta (varios segundos) para cada motor
+CONSULTA_LENTA = (
+    "SELECT pg_sleep(5)" if db.db_type == "postgresql" else
+    "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 500000000) SELECT COUNT(*) FROM c"
+)
+
+
+class TestTimeoutYCancelacion:
+    """Tests para el límite de tiempo por sentencia y la cancelación de consultas"""
+
+    def _en_hilo(self, **kwargs):
+        """Lanza la consulta lenta en otro hilo; retorna (hilo, errores)"""
+        import threading
+        errores = []
+
+        def correr():
+            try:
+                db.execute_query(CONSULTA_LENTA, fetch="one", **kwargs)
+            except Exception as e:
+                errores.append(e)
+
+        hilo = threading.Thread(target=correr)
+        hilo.start()
+        return hilo, errores
+
+    def _esperar_registro(self, clave):
+        import time
+        for _ in range(200):
+            if clave in db._en_curso:
+                time.sleep(0.05)  # Dar tiempo a que la sentencia arranque
+                return
+            time.sleep(0.01)
+        raise AssertionError("La consulta no se registró")
+
+    def test_timeout(self):
+        from modules.db_service import QueryTimeoutError
+        with pytest.raises(QueryTimeoutError):
+            db.execute_query(CONSULTA_LENTA, fetch="one", timeout_ms=100)
+        # La conexión queda usable y sin límite
+        assert db.execute_query("SELECT 1", fetch="one")[0] == 1
+        if db.db_type == "postgresql":
+            assert db.execute_query("SHOW statement_timeout", fetch="one")[0] == "0"
+
+    def test_limite_por_sentencia(self):
+        import time
+        consulta = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c WHERE x < 100000) SELECT COUNT(*) FROM c"
+        with db.get_connection(timeout_ms=200) as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 1")
+            time.sleep(0.3)  # El bloque ya superó el límite, la sentencia nueva no
+            cur.execute(consulta)
+            assert cur.fetchone()[0] == 100000
+
+    def test_bloque_anidado_conserva_el_limite_exterior(self):
+        from modules.db_service import QueryTimeoutError
+        with pytest.raises(QueryTimeoutError):
+            with db.get_connection(timeout_ms=100) as conn:
+                with db.get_connection(cancel_key="anidada") as interna:
+                    interna.cursor().execute("SELECT 1")
+                conn.cursor().execute(CONSULTA_LENTA)
+        assert db.execute_query("SELECT 1", fetch="one")[0] == 1
+
+    def test_cancelar_desde_otro_hilo(self):
+        from modules.db_service import QueryCancelledError, QueryTimeoutError
+        hilo, errores = self._en_hilo(cancel_key="prueba")
+        self._esperar_registro("prueba")
+        assert db.cancel("prueba")
+        hilo.join(10)
+        assert len(errores) == 1
+        assert isinstance(errores[0], QueryCancelledError)
+        assert not isinstance(errores[0], QueryTimeoutError)
+        assert "prueba" not in db._en_curso
+
+    def test_consulta_nueva_reemplaza_a_la_anterior(self):
+        from modules.db_service import QueryCancelledError
+        hilo, errores = self._en_hilo(cancel_key="reporte")
+        self._esperar_registro("reporte")
+        assert db.execute_query("SELECT 2", fetch="one", cancel_key="reporte")[0] == 2
+        hilo.join(10)
+        assert len(errores) == 1 and isinstance(errores[0], QueryCancelledError)
+
+    def test_cancelar_clave_inexistente(self):
+        assert db.cancel("no-existe") is False
+
+    def test_cancelacion_tardia_no_toca_la_conexion(self):
+        """Después de desactivar el bloque, cancelar no interrumpe lo que corra en la conexión"""
+        from modules.db_service import _ControlConsulta
+
+        class ConexionFalsa:
+            cancelaciones = 0
+
+            def cancel(self):
+                self.cancelaciones += 1
+
+            interrupt = cancel
+
+            def set_progress_handler(self, *args):
+                pass
+
+        conn = ConexionFalsa()
+        control = _ControlConsulta(conn, "sqlite", 1000)
+        control.activar(1000)
+        assert control.cancelar() is True and conn.cancelaciones == 1
+
+        control = _ControlConsulta(conn, "sqlite", 1000)
+        control.activar(1000)
+        control.desactivar(1000)
+        assert control.cancelar() is False and conn.cancelaciones == 1
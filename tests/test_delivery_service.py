@@ -0,0 +1,75 @@
+"""
+Tests para el cálculo del costo de delivery (delivery_service.py)
+"""
+import pytest
+from modules import delivery_service as delivery
+from modules.ciudades_paraguay import CIUDADES_PARAGUAY
+from modules.db_service import db
+
+
+@pytest.fixture(autouse=True)
+def tarifas_limpias():
+    delivery.limpiar_cache()
+    yield
+    delivery.limpiar_cache()
+
+
+class TestTarifas:
+    """Tests de las tablas de tarifas"""
+
+    def test_tarifa_por_km(self, monkeypatch):
+        monkeypatch.setattr(delivery, "DELIVERY_TARIFAS_KM", [(10, 15000), (30, 40000)])
+        monkeypatch.setattr(delivery, "DELIVERY_COSTO_KM_EXTRA", 800)
+        assert delivery.tarifa_por_km(3) == 15000
+        assert delivery.tarifa_por_km(10) == 15000
+        assert delivery.tarifa_por_km(10.1) == 40000
+        assert delivery.tarifa_por_km(42.3) == 50000  # 40.000 + 12,3 km * 800 redondeado a 1.000
+
+    def test_recargo_volumen(self, monkeypatch):
+        monkeypatch.setattr(delivery, "DELIVERY_RECARGOS_VOLUMEN", [(20, 10000), (50, 25000)])
+        assert [delivery.recargo_volumen(u) for u in (0, 19, 20, 49, 50, 500)] == [0, 0, 10000, 10000, 25000, 25000]
+
+    def test_matriz_del_vivero_a_cada_ciudad(self, monkeypatch):
+        tarifas = delivery.tarifas_por_ciudad()
+        assert set(tarifas) == set(CIUDADES_PARAGUAY)
+        zona, km, tarifa = tarifas["Luque"]
+        assert zona == "Local" and tarifa == 15000 and 5 < km < 20
+        # Más lejos nunca cuesta menos fuera de las zonas
+        sin_zona = sorted((km, tarifa) for zona, km, tarifa in tarifas.values() if zona is None)
+        assert all(a[1] <= b[1] for a, b in zip(sin_zona, sin_zona[1:]))
+
+        # Se calcula una sola vez
+        monkeypatch.setattr(delivery, "km_desde_vivero", lambda c: pytest.fail("debía estar precalculada"))
+        assert delivery.tarifas_por_ciudad() is tarifas
+
+
+class TestCotizar:
+    """Tests de la cotización de un pedido"""
+
+    def test_por_zona_y_volumen(self):
+        assert delivery.cotizar("  luque ", "Barrio Itapuamí", unidades=25) == {
+            "ciudad": "Luque", "zona": "Local", "km": round(delivery.tarifas_por_ciudad()["Luque"][1], 1),
+            "tarifa": 15000, "recargo": 10000, "total": 25000,
+        }
+
+    def test_por_distancia(self):
+        cotizacion = delivery.cotizar("Encarnación")
+        assert cotizacion["zona"] is None and cotizacion["km"] > 300
+        assert cotizacion["total"] == delivery.tarifa_por_km(delivery.tarifas_por_ciudad()["Encarnación"][1])
+
+    def test_coordenadas_cerca_de_una_zona(self):
+        # A pocas cuadras del centro de San Lorenzo: tarifa de la zona
+        assert delivery.cotizar("", "-25.342, -57.512")["zona"] == "Local"
+        # Fuera del radio de cualquier ciudad con zona: por km hasta el punto
+        lejos = delivery.cotizar("Asunción", "-25.20, -57.20")
+        assert lejos["zona"] is None and lejos["total"] == delivery.tarifa_por_km(lejos["km"])
+
+    def test_sin_ubicacion(self):
+        assert delivery.cotizar("Ciudad inexistente", "sin datos") is None
+        assert delivery.cotizar(None) is None
+
+    def test_no_consulta_la_base(self, monkeypatch):
+        delivery.tarifas_por_ciudad()
+        monkeypatch.setattr(db, "get_connection", lambda *a, **k: pytest.fail("no debe consultar la base"))
+        for texto in ("A", "As", "Asu", "Asunción"):
+            delivery.cotizar(texto, "Calle Palma 123", 3)
@@ -0,0 +1,166 @@
+"""
+Tests para el PDF de despacho de varios pedidos (despacho_service.py)
+"""
+import pytest
+from contextlib import contextmanager
+from datetime import datetime
+from modules.db_service import db
+from modules import despacho_service as despacho
+from modules import rutas_service as rutas
+
+pypdf = pytest.importorskip("pypdf")
+
+
+@pytest.fixture
+def despacho_db(db_temporal):
+    """Cuatro pedidos en distintas ciudades con su cliente y detalle"""
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE clientes (id SERIAL PRIMARY KEY, nombre TEXT, telefono TEXT, ruc TEXT)")
+        cur.execute("INSERT INTO clientes (id, nombre, telefono, ruc) VALUES (1, 'Ana & Cía', '0981 111', NULL), (2, 'Beto', NULL, '123-4')")
+        cur.execute("""
+            CREATE TABLE pedidos (
+                id SERIAL PRIMARY KEY,
+                cliente_id INTEGER,
+                destino TEXT,
+                ubicacion TEXT,
+                fecha_pedido TIMESTAMP,
+                fecha_entrega TIMESTAMP,
+                estado TEXT DEFAULT 'Pendiente',
+                costo_delivery INTEGER,
+                costo_total INTEGER
+            )
+        """)
+        cur.execute("""
+            INSERT INTO pedidos (id, cliente_id, destino, ubicacion, estado, costo_delivery, costo_total) VALUES
+            (1, 1, 'Asunción', 'Calle Palma 123', 'Pendiente', 25000, 65000),
+            (2, 2, 'Luque', NULL, 'Pendiente', 15000, 20000),
+            (3, NULL, 'Areguá', '<sin número>', 'Pendiente', NULL, NULL),
+            (4, 2, 'Ciudad inexistente', NULL, 'Pendiente', 0, 5000)
+        """)
+        cur.execute("CREATE TABLE productos (id SERIAL PRIMARY KEY, nombre TEXT)")
+        cur.execute("INSERT INTO productos (id, nombre) VALUES (10, 'Rosa'), (20, 'Helecho')")
+        cur.execute("""
+            CREATE TABLE detalle_pedido (
+                id SERIAL PRIMARY KEY,
+                pedido_id INTEGER,
+                producto_id INTEGER,
+                cantidad INTEGER,
+                precio_unitario INTEGER,
+                subtotal INTEGER
+            )
+        """)
+        cur.execute("""
+            INSERT INTO detalle_pedido (pedido_id, producto_id, cantidad, precio_unitario, subtotal) VALUES
+            (1, 10, 2, 5000, 10000), (1, 20, 1, 30000, 30000), (2, 10, 1, 5000, 5000), (4, 99, 1, 5000, 5000)
+        """)
+        conn.commit()
+    db.schema.refresh()
+    rutas.limpiar_cache()
+    yield
+    despacho.cerrar_pool()
+
+
+def paginas(archivo):
+    return [pagina.extract_text() for pagina in pypdf.PdfReader(archivo).pages]
+
+
+class TestObtenerPedidos:
+    """Tests de la lectura de cabeceras y líneas"""
+
+    def test_dos_consultas_para_todos(self, despacho_db, monkeypatch):
+        consultas = []
+        original = db.get_connection
+
+        class Cursor:
+            def __init__(self, cur):
+                self.cur = cur
+
+            def execute(self, consulta, params=None):
+                consultas.append(consulta)
+                return self.cur.execute(consulta, params)
+
+            def __getattr__(self, nombre):
+                return getattr(self.cur, nombre)
+
+        class Conexion:
+            def __init__(self, conn):
+                self.conn = conn
+
+            def cursor(self):
+                return Cursor(self.conn.cursor())
+
+        @contextmanager
+        def contando(*args, **kwargs):
+            with original(*args, **kwargs) as conn:
+                yield Conexion(conn)
+
+        monkeypatch.setattr(db, "get_connection", contando)
+        pedidos, detalles = despacho.obtener_pedidos([4, 1, 2, 3, 99, 1])
+
+        assert len(consultas) == 2
+        assert sorted(pedidos) == [1, 2, 3, 4]
+        assert pedidos[1]["cliente"] == "Ana & Cía" and pedidos[3]["total"] == 0 and pedidos[3]["delivery"] == 0
+        assert detalles[1] == [("Rosa", 2, 5000, 10000), ("Helecho", 1, 30000, 30000)]
+        assert detalles[3] == [] and detalles[4] == [(None, 1, 5000, 5000)]
+
+    def test_sin_ids(self):
+        assert despacho.obtener_pedidos([]) == ({}, {})
+
+
+class TestGenerarDespacho:
+    """Tests del PDF unido con la hoja de ruta"""
+
+    def test_hoja_de_ruta_y_tickets_en_orden_de_visita(self, despacho_db, tmp_path):
+        archivo = str(tmp_path / "despacho.pdf")
+        resultado = despacho.generar_despacho([1, 2, 3, 4, 99], "tester", archivo=archivo)
+
+        assert resultado["archivo"] == archivo and resultado["omitidos"] == [99]
+        orden = resultado["orden"]
+        assert sorted(orden) == [1, 2, 3, 4] and orden[-1] == 4  # sin ubicación, al final
+        assert orden == resultado["plan"]["orden"]
+
+        textos = paginas(archivo)
+        assert len(textos) == 1 + len(orden)
+        hoja = textos[0]
+        assert "HOJA DE RUTA" in hoja and "Ana & Cía" in hoja and "Sin ubicar" in hoja
+        posiciones = [hoja.index(f"#{pedido_id}") for pedido_id in orden]
+        assert posiciones == sorted(posiciones)
+        for texto, pedido_id in zip(textos[1:], orden):
+            assert "TICKET DE PEDIDO" in texto and f"Pedido N°:\n{pedido_id}\n" in texto
+
+    def test_en_paralelo_igual_que_en_un_proceso(self, despacho_db, tmp_path, monkeypatch):
+        monkeypatch.setattr(despacho, "DESPACHO_MIN_PARALELO", 2)
+        dibujados = []
+        original = despacho.dibujar_tickets
+        monkeypatch.setattr(despacho, "dibujar_tickets", lambda datos, procesos: dibujados.append(procesos) or original(datos, procesos))
+
+        # Misma salida en las dos: las llegadas se calculan con la hora exacta
+        salida = datetime(2025, 3, 3, 8, 0)
+        paralelo = despacho.generar_despacho([1, 2, 3, 4], archivo=str(tmp_path / "a.pdf"), procesos=2, salida=salida)
+        monkeypatch.setattr(despacho, "DESPACHO_MIN_PARALELO", 100)
+        secuencial = despacho.generar_despacho([1, 2, 3, 4], archivo=str(tmp_path / "b.pdf"), procesos=2, salida=salida)
+
+        assert dibujados == [2, 1]
+        assert paralelo["orden"] == secuencial["orden"]
+        sin_hora = lambda textos: [t.split("Generado el")[0] for t in textos]
+        assert sin_hora(paginas(paralelo["archivo"])) == sin_hora(paginas(secuencial["archivo"]))
+
+    def test_un_solo_pool_entre_impresiones(self, despacho_db, tmp_path, monkeypatch):
+        monkeypatch.setattr(despacho, "DESPACHO_MIN_PARALELO", 2)
+        despacho.generar_despacho([1, 2], archivo=str(tmp_path / "a.pdf"), procesos=2)
+        pool = despacho._executor
+        despacho.generar_despacho([3, 4], archivo=str(tmp_path / "b.pdf"), procesos=2)
+        assert pool is not None and despacho._executor is pool
+        despacho.cerrar_pool()
+        assert despacho._executor is None
+
+    def test_sin_pypdf_arma_un_solo_documento(self, despacho_db, tmp_path, monkeypatch):
+        monkeypatch.setattr(despacho, "PdfWriter", None)
+        monkeypatch.setattr(despacho, "dibujar_tickets", lambda *a: pytest.fail("sin pypdf no se dibuja aparte"))
+        resultado = despacho.generar_despacho([2, 1], archivo=str(tmp_path / "c.pdf"))
+        textos = paginas(resultado["archivo"])
+        assert len(textos) == 3 and "HOJA DE RUTA" in textos[0]
+
+    def test_ningun_pedido(self, despacho_db, tmp_path):
+        assert despacho.generar_despacho([99], archivo=str(tmp_path / "d.pdf")) is None
@@ -0,0 +1,127 @@
+"""
+Tests para la geocodificación sin conexión (geocodificacion_service.py y migración 8)
+"""
+import random
+import pytest
+from modules.db_service import db
+from modules.migrations_new import GeocodeCacheMigration
+from modules.ciudades_paraguay import CIUDADES_PARAGUAY, COORDENADAS_CIUDADES
+from modules import geocodificacion_service as geo
+
+
+@pytest.fixture(autouse=True)
+def memoria_limpia():
+    geo.limpiar_cache()
+    yield
+    geo.limpiar_cache()
+
+
+@pytest.fixture
+def geo_db(db_temporal):
+    """Clientes, pedidos y la migración 8 aplicada"""
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE clientes (id SERIAL PRIMARY KEY, ciudad TEXT, direccion TEXT)")
+        cur.execute("CREATE TABLE pedidos (id SERIAL PRIMARY KEY, destino TEXT, ubicacion TEXT)")
+        GeocodeCacheMigration().up(conn)
+        conn.commit()
+    db.schema.refresh()
+    yield
+
+
+def guardadas():
+    return {f[0]: (f[1], f[2]) for f in db.execute_query("SELECT direccion, latitud, fuente FROM geocodificaciones")}
+
+
+class TestNomenclador:
+    """Tests del nomenclador y la ubicación sin conexión"""
+
+    def test_todas_las_ciudades_tienen_centroide(self):
+        assert set(COORDENADAS_CIUDADES) == set(CIUDADES_PARAGUAY)
+        # Todo dentro del Paraguay
+        assert all(-27.7 < lat < -19.2 and -62.7 < lon < -54.2 for lat, lon in COORDENADAS_CIUDADES.values())
+
+    @pytest.mark.parametrize("texto,esperado", [
+        ("Barrio Laurelty, San Lorenzo", "San Lorenzo"),
+        ("san juan bautista de ñeembucú", "San Juan Bautista de Ñeembucú"),
+        ("Compañía Itauguá Guazú", "Itauguá"),   # "Itá" no cuenta dentro de otra palabra
+        ("Calle Palma 123", None),
+        (None, None),
+    ])
+    def test_ciudad_en_texto(self, texto, esperado):
+        assert geo.ciudad_en_texto(texto) == esperado
+
+    def test_ubicar_sin_conexion(self):
+        assert geo.ubicar_sin_conexion("Luque", "-25.1, -57.4") == ((-25.1, -57.4), "coordenadas")
+        assert geo.ubicar_sin_conexion(" ENCARNACION ") == (COORDENADAS_CIUDADES["Encarnación"], "ciudad")
+        assert geo.ubicar_sin_conexion("", "Ruta 2 km 30, Capiatá") == (COORDENADAS_CIUDADES["Capiatá"], "ciudad")
+        assert geo.ubicar_sin_conexion("Otro país", "sin datos") is None
+
+    def test_clave_normalizada(self):
+        assert geo.clave_direccion(" Ñemby", "Calle  1") == geo.clave_direccion("nemby", "calle 1")
+        assert geo.clave_direccion(None, "") == ""
+
+
+class TestIndiceEspacial:
+    """Tests de la grilla de búsqueda por cercanía"""
+
+    def test_coincide_con_busqueda_exhaustiva(self):
+        azar = random.Random(3)
+        indice = geo.indice_ciudades()
+        for _ in range(200):
+            punto = (azar.uniform(-28, -19), azar.uniform(-63, -54))
+            esperado = sorted((geo.distancia_km(punto, c), n) for n, c in COORDENADAS_CIUDADES.items())[:3]
+            assert [(d, n) for d, n, _ in indice.cercanos(punto, 3)] == esperado
+
+    def test_radio(self):
+        indice = geo.indice_ciudades()
+        cerca = indice.cercanos(COORDENADAS_CIUDADES["San Lorenzo"], cantidad=None, radio_km=10)
+        nombres = {n for _, n, _ in cerca}
+        assert {"San Lorenzo", "Fernando de la Mora", "Luque"} <= nombres
+        assert "Encarnación" not in nombres and all(d <= 10 for d, _, _ in cerca)
+
+    def test_zona_mas_cercana(self):
+        nombre, distancia = geo.zona_mas_cercana((-25.34, -57.51))
+        assert nombre == "San Lorenzo" and distancia < 1
+        assert geo.zona_mas_cercana(None) is None
+        assert geo.IndiceEspacial().cercanos((-25.3, -57.5)) == []
+
+
+class TestCachePersistente:
+    """Tests de la tabla geocodificaciones"""
+
+    def test_geocodificar_guarda_y_reutiliza(self, geo_db, monkeypatch):
+        resultado = geo.geocodificar([("Luque", ""), ("Asunción", "-25.29, -57.60"), ("Marte", ""), ("luque", None)])
+        assert resultado == [COORDENADAS_CIUDADES["Luque"], (-25.29, -57.60), None, COORDENADAS_CIUDADES["Luque"]]
+        assert guardadas() == {
+            "luque": (COORDENADAS_CIUDADES["Luque"][0], "ciudad"),
+            "-25.29, -57.60 | asuncion": (-25.29, "coordenadas"),
+        }
+
+        # Con la memoria vacía sale de la tabla, sin volver a resolver
+        geo.limpiar_cache()
+        monkeypatch.setattr(geo, "ubicar_sin_conexion", lambda *a: pytest.fail("debía salir de la caché"))
+        assert geo.geocodificar([("Luque", "")]) == [COORDENADAS_CIUDADES["Luque"]]
+
+    def test_correccion_manual_gana(self, geo_db):
+        geo.geocodificar([("Areguá", "Casa frente a la iglesia")])
+        geo.fijar_ubicacion("Areguá", "Casa frente a la iglesia", (-25.30, -57.41))
+        geo.limpiar_cache()
+        assert geo.geocodificar([("aregua", "casa frente a la iglesia")]) == [(-25.30, -57.41)]
+        assert guardadas()["casa frente a la iglesia | aregua"][1] == "manual"
+        with pytest.raises(ValueError):
+            geo.fijar_ubicacion("", "", (-25.3, -57.4))
+
+    def test_geocodificar_existentes_por_lotes(self, geo_db):
+        db.bulk_load("pedidos", ["destino", "ubicacion"],
+                     [("Luque", f"Casa {i}") for i in range(25)] + [("Nowhere", "sin datos"), ("Luque", "Casa 1")])
+        db.bulk_load("clientes", ["ciudad", "direccion"], [("Villarrica", "Centro"), (None, "-25.31, -57.55")])
+        geo.fijar_ubicacion("Luque", "Casa 0", (-25.25, -57.48))
+
+        resumen = geo.geocodificar_existentes(tamanio_lote=4)
+        assert resumen == {"direcciones": 28, "nuevas": 26, "existentes": 1, "sin_ubicacion": 1}
+        assert guardadas()["casa 0 | luque"] == (-25.25, "manual")
+        assert len(guardadas()) == 27
+
+        # Una segunda pasada no tiene nada nuevo
+        assert geo.geocodificar_existentes()["nuevas"] == 0
@@ -0,0 +1,159 @@
+"""
+Tests de planes de ejecución para las consultas frecuentes (migración 3)
+Fallan si alguna consulta crítica vuelve a hacer un escaneo completo de tabla
+"""
+import sqlite3
+import pytest
+from modules.db_service import db
+from modules.migrations_new import InitialMigration, HotQueryIndexesMigration
+
+
+# (alias de tabla vigilada, consulta representativa)
+CONSULTAS_CRITICAS = [
+    # Listado de pedidos filtrado por estado (pedidos.refrescar_pedidos)
+    ("p", """
+        SELECT p.id, p.cliente_id, p.fecha_pedido FROM pedidos p
+        WHERE p.estado = 'Pendiente'
+        ORDER BY p.fecha_pedido DESC LIMIT 50
+    """),
+    # Pedidos pendientes por fecha de entrega (rutas de reparto)
+    ("p", """
+        SELECT p.id, p.cliente_id FROM pedidos p
+        WHERE p.estado = 'Pendiente' AND p.fecha_entrega < '2024-03-01'
+        ORDER BY p.fecha_entrega
+    """),
+    # Sesión de caja abierta del usuario (ventas.obtener_sesion_activa)
+    ("sc", """
+        SELECT sc.id, sc.monto_apertura FROM sesiones_caja sc
+        WHERE sc.usuario_id = 3 AND sc.estado = 'Abierta'
+        ORDER BY sc.fecha_apertura DESC LIMIT 1
+    """),
+    # Cierre de caja (ventas.cerrar_caja)
+    ("v", "SELECT SUM(v.total) FROM ventas v WHERE v.sesion_caja_id = 7"),
+    # Ventas de un día (reportes, dashboard)
+    ("v", """
+        SELECT v.cliente_id, SUM(v.total) FROM ventas v
+        WHERE v.fecha_venta >= '2024-01-10' AND v.fecha_venta < '2024-01-11'
+        GROUP BY v.cliente_id
+    """),
+    # Productos más vendidos en un rango (reportes)
+    ("dv", """
+        SELECT dv.producto_id, SUM(dv.cantidad), SUM(dv.subtotal)
+        FROM ventas v
+        JOIN detalle_ventas dv ON dv.venta_id = v.id
+        WHERE v.fecha_venta >= '2024-01-10' AND v.fecha_venta < '2024-01-11'
+        GROUP BY dv.producto_id
+    """),
+]
+
+
+class TestIndicesSQLite:
+    """Planes de ejecución sobre una base SQLite en memoria"""
+
+    @pytest.fixture
+    def conn(self):
+        conn = sqlite3.connect(":memory:")
+        InitialMigration().up(conn)
+        HotQueryIndexesMigration().up(conn, motor="sqlite")
+
+        cur = conn.cursor()
+        cur.execute("INSERT INTO usuarios (id, username, password, nombre_completo) VALUES (1, 'u', 'x', 'U')")
+        cur.executemany(
+            "INSERT INTO sesiones_caja (id, caja_id, usuario_id, fecha_apertura, estado) VALUES (?, 1, ?, ?, ?)",
+            [(i, i % 20, f"2024-01-{i % 28 + 1:02d}", "Abierta" if i % 50 == 0 else "Cerrada")
+             for i in range(1, 2001)]
+        )
+        cur.executemany(
+            "INSERT INTO ventas (id, sesion_caja_id, cliente_id, usuario_id, fecha_venta, total) VALUES (?, ?, ?, 1, ?, ?)",
+            [(i, i % 2000, i % 300, f"2024-01-{i % 28 + 1:02d} 10:00:00", 1000 * (i % 17))
+             for i in range(1, 5001)]
+        )
+        cur.executemany(
+            "INSERT INTO detalle_ventas (id, venta_id, producto_id, cantidad, precio_unitario, subtotal) VALUES (?, ?, ?, 1, 100, 100)",
+            [(i, i % 5000 + 1, i % 80) for i in range(1, 10001)]
+        )
+        cur.executemany(
+            "INSERT INTO pedidos (id, usuario_id, cliente_id, fecha_pedido, fecha_entrega, estado) VALUES (?, 1, ?, ?, ?, ?)",
+            [(i, i % 300, f"2024-01-{i % 28 + 1:02d}", f"2024-02-{i % 28 + 1:02d}",
+              "Pendiente" if i % 20 == 0 else "Entregado")
+             for i in range(1, 5001)]
+        )
+        cur.execute("ANALYZE")
+        yield conn
+        conn.close()
+
+    @pytest.mark.parametrize("alias,consulta", CONSULTAS_CRITICAS)
+    def test_sin_escaneo_completo(self, conn, alias, consulta):
+        """Ninguna consulta crítica debe recorrer la tabla completa"""
+        plan = [fila[3] for fila in conn.execute(f"EXPLAIN QUERY PLAN {consulta}")]
+        escaneos = [paso for paso in plan if paso.strip() == f"SCAN {alias}"]
+        assert not escaneos, f"Escaneo completo de '{alias}': {plan}"
+
+    def test_indices_reemplazados_eliminados(self, conn):
+        """Los índices de una columna cubiertos por los compuestos ya no existen"""
+        nombres = {fila[0] for fila in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        for nombre, _, _ in HotQueryIndexesMigration.REEMPLAZADOS:
+            assert nombre not in nombres
+        for nombre, *_ in HotQueryIndexesMigration.INDICES:
+            assert nombre in nombres
+
+
+@pytest.mark.skipif(db.db_type != "postgresql", reason="Requiere PostgreSQL")
+class TestIndicesPostgres:
+    """Planes de ejecución sobre un esquema temporal de PostgreSQL"""
+
+    @pytest.fixture
+    def conn(self):
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("CREATE SCHEMA test_indices")
+            cur.execute("SET LOCAL search_path TO test_indices")
+            InitialMigration().up(conn)
+            HotQueryIndexesMigration().up(conn, motor="postgresql")
+
+            cur.execute("INSERT INTO usuarios (id, username, password, nombre_completo) VALUES (1, 'u', 'x', 'U')")
+            cur.execute("INSERT INTO cajas (id, nombre) VALUES (1, 'Caja')")
+            cur.execute("""
+                INSERT INTO sesiones_caja (id, caja_id, usuario_id, fecha_apertura, estado)
+                SELECT i, 1, 1, TIMESTAMP '2024-01-01' + i * INTERVAL '1 hour',
+                       CASE WHEN i % 500 = 0 THEN 'Abierta' ELSE 'Cerrada' END
+                FROM generate_series(1, 20000) AS i
+            """)
+            cur.execute("""
+                INSERT INTO ventas (id, sesion_caja_id, usuario_id, fecha_venta, total)
+                SELECT i, i % 20000 + 1, 1, TIMESTAMP '2022-01-01' + i * INTERVAL '30 minutes', i % 17 * 1000
+                FROM generate_series(1, 50000) AS i
+            """)
+            cur.execute("INSERT INTO productos (id, nombre) VALUES (1, 'P')")
+            cur.execute("""
+                INSERT INTO detalle_ventas (venta_id, producto_id, cantidad, precio_unitario, subtotal)
+                SELECT i % 50000 + 1, 1, 1, 100, 100 FROM generate_series(1, 100000) AS i
+            """)
+            cur.execute("""
+                INSERT INTO pedidos (id, usuario_id, fecha_pedido, fecha_entrega, estado)
+                SELECT i, 1, TIMESTAMP '2024-01-01' + i * INTERVAL '1 minute',
+                       TIMESTAMP '2024-02-01' + i * INTERVAL '1 minute',
+                       CASE WHEN i % 100 = 0 THEN 'Pendiente' ELSE 'Entregado' END
+                FROM generate_series(1, 50000) AS i
+            """)
+            cur.execute("ANALYZE")
+            try:
+                yield conn
+            finally:
+                conn.rollback()
+
+    @staticmethod
+    def _nodos(plan):
+        yield plan
+        for hijo in plan.get("Plans", []):
+            yield from TestIndicesPostgres._nodos(hijo)
+
+    @pytest.mark.parametrize("alias,consulta", CONSULTAS_CRITICAS)
+    def test_sin_seq_scan(self, conn, alias, consulta):
+        """Ninguna consulta crítica debe hacer Seq Scan sobre la tabla vigilada"""
+        cur = conn.cursor()
+        cur.execute(f"EXPLAIN (FORMAT JSON) {consulta}")
+        plan = cur.fetchone()[0][0]["Plan"]
+        escaneos = [n for n in self._nodos(plan)
+                    if n["Node Type"] == "Seq Scan" and n.get("Alias") == alias]
+        assert not escaneos, f"Seq Scan sobre '{alias}': {plan}"
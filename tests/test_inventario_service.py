@@ -0,0 +1,142 @@
+"""
+Tests para el kardex de stock (inventario_service.py y migración 5)
+"""
+import pytest
+from datetime import date, datetime
+from modules.db_service import db
+from modules.migrations_new import StockLedgerMigration
+from modules import inventario_service as inventario
+
+
+@pytest.fixture
+def kardex(db_temporal):
+    """Productos con stock inicial y la migración 5 aplicada (saldo inicial incluido)"""
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE productos (id SERIAL PRIMARY KEY, nombre TEXT NOT NULL, stock INTEGER DEFAULT 0)")
+        cur.execute("CREATE TABLE detalle_pedido (id SERIAL PRIMARY KEY, pedido_id INTEGER, producto_id INTEGER, cantidad INTEGER)")
+        cur.execute("INSERT INTO productos (id, nombre, stock) VALUES (1, 'Rosa', 10), (2, 'Helecho', 5), (3, 'Maceta', 0)")
+        StockLedgerMigration().up(conn)
+        conn.commit()
+    db.schema.refresh()
+    yield
+    inventario.detener_cortes_periodicos()
+
+
+def stock_productos():
+    return {f[0]: f[1] for f in db.execute_query("SELECT id, stock FROM productos")}
+
+
+def registrar(movimientos, tipo="venta", **kwargs):
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        inventario.registrar_movimientos(cur, movimientos, tipo, **kwargs)
+        conn.commit()
+
+
+def fechar(desde_id, fecha):
+    """Mueve al pasado los movimientos desde un id (simula historial)"""
+    db.execute_command("UPDATE movimientos_stock SET fecha = %s WHERE id >= %s", (fecha, desde_id))
+
+
+class TestMovimientos:
+    """Tests de registro de movimientos"""
+
+    def test_saldo_inicial_de_la_migracion(self, kardex):
+        assert inventario.stock_al() == {1: 10, 2: 5}
+        assert inventario.diferencias() == []
+
+    def test_registrar_actualiza_stock(self, kardex):
+        registrar([(1, -3), (2, -1), (1, -2), (3, 0)], referencia="V001")
+        assert stock_productos() == {1: 5, 2: 4, 3: 0}
+        assert inventario.stock_al() == {1: 5, 2: 4}
+        filas = db.execute_query("SELECT COUNT(*) FROM movimientos_stock WHERE referencia = 'V001'", fetch="one")
+        assert filas[0] == 3  # la cantidad cero no se registra
+
+    def test_lotes_grandes(self, kardex, monkeypatch):
+        monkeypatch.setattr(inventario, "INVENTARIO_LOTE_MOVIMIENTOS", 7)
+        registrar([(i % 3 + 1, 1) for i in range(50)], tipo="recepcion")
+        assert stock_productos() == {1: 27, 2: 22, 3: 16}
+
+    def test_rollback_deshace_todo(self, kardex):
+        with pytest.raises(RuntimeError):
+            with db.get_connection() as conn:
+                cur = conn.cursor()
+                inventario.registrar_movimientos(cur, [(1, -4)], "venta")
+                raise RuntimeError("falla a mitad de la venta")
+        assert stock_productos()[1] == 10
+        assert inventario.stock_al()[1] == 10
+
+    def test_tipo_invalido(self, kardex):
+        with pytest.raises(ValueError):
+            registrar([(1, 1)], tipo="regalo")
+
+    def test_pedidos_entregados_y_devueltos(self, kardex):
+        db.execute_many("INSERT INTO detalle_pedido (pedido_id, producto_id, cantidad) VALUES (%s, %s, %s)",
+                        [(7, 1, 2), (7, 1, 1), (8, 2, 4)])
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            assert inventario.registrar_pedidos(cur, [7, 8]) == 2
+            conn.commit()
+        assert stock_productos() == {1: 7, 2: 1, 3: 0}
+
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            inventario.registrar_pedidos(cur, [8], entregados=False)
+            conn.commit()
+        assert stock_productos()[2] == 5
+
+    def test_diferencias_detecta_ediciones_directas(self, kardex):
+        db.execute_command("UPDATE productos SET stock = 99 WHERE id = 2")
+        assert inventario.diferencias() == [{"id": 2, "nombre": "Helecho", "stock": 99, "kardex": 5}]
+
+
+class TestStockAlDia:
+    """Tests de stock histórico con y sin cortes"""
+
+    def historial(self):
+        """Saldo inicial el 1/3, ventas el 5/3 y una recepción el 10/3"""
+        fechar(1, datetime(2025, 3, 1, 8, 0))
+        registrar([(1, -4), (2, -2)])
+        fechar(3, datetime(2025, 3, 5, 12, 0))
+        registrar([(1, 20), (3, 6)], tipo="recepcion")
+        fechar(5, datetime(2025, 3, 10, 9, 0))
+
+    def test_sin_cortes(self, kardex):
+        self.historial()
+        assert inventario.stock_al(date(2025, 2, 28)) == {}
+        assert inventario.stock_al(date(2025, 3, 4)) == {1: 10, 2: 5}
+        assert inventario.stock_al(date(2025, 3, 5)) == {1: 6, 2: 3}
+        assert inventario.stock_al() == {1: 26, 2: 3, 3: 6}
+        assert inventario.stock_al(date(2025, 3, 5), [2]) == {2: 3}
+
+    def test_cortes_dan_el_mismo_resultado(self, kardex):
+        self.historial()
+        esperado = {d: inventario.stock_al(date(2025, 3, d)) for d in (4, 5, 10)}
+
+        assert inventario.tomar_corte() is not None
+        assert inventario.tomar_corte() is None  # sin movimientos nuevos
+        db.execute_command("UPDATE cortes_stock SET fecha = %s", (datetime(2025, 3, 10, 12, 0),))
+        registrar([(1, -1)])
+
+        assert inventario.stock_al(date(2025, 3, 4)) == esperado[4]  # antes del corte: se reconstruye
+        assert inventario.stock_al(date(2025, 3, 5)) == esperado[5]
+        assert inventario.stock_al(date(2025, 3, 10)) == esperado[10]  # corte + movimientos posteriores
+        assert inventario.stock_al() == {1: 25, 2: 3, 3: 6}
+
+        # Un segundo corte parte del anterior
+        inventario.tomar_corte()
+        snapshot = db.execute_query("""
+            SELECT producto_id, stock FROM snapshots_stock
+            WHERE corte_id = (SELECT MAX(id) FROM cortes_stock) ORDER BY producto_id
+        """)
+        assert [tuple(f) for f in snapshot] == [(1, 25), (2, 3), (3, 6)]
+
+    def test_kardex_con_saldo(self, kardex):
+        self.historial()
+        resultado = inventario.kardex(1, desde=date(2025, 3, 5))
+        assert resultado["saldo_inicial"] == 10
+        assert [(m["tipo"], m["cantidad"], m["saldo"]) for m in resultado["movimientos"]] == [
+            ("venta", -4, 6), ("recepcion", 20, 26)
+        ]
+        assert len(inventario.kardex(1, hasta=date(2025, 3, 5))["movimientos"]) == 2
@@ -0,0 +1,199 @@
+"""
+Tests para la grabación de pedidos por diferencias y las operaciones por lote
+(pedidos_service.py y migración 9)
+"""
+import pytest
+from modules.db_service import db
+from modules.migrations_new import StockLedgerMigration, OrderVersionMigration
+from modules import inventario_service as inventario
+from modules import pedidos_service
+
+
+@pytest.fixture
+def pedidos_db(db_temporal):
+    """Pedidos #1 y #2 pendientes, #3 entregado, con kardex y la migración 9 aplicada"""
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE pedidos (
+                id SERIAL PRIMARY KEY,
+                destino TEXT,
+                estado TEXT DEFAULT 'Pendiente',
+                fecha_entrega TIMESTAMP
+            )
+        """)
+        cur.execute("CREATE TABLE productos (id SERIAL PRIMARY KEY, nombre TEXT NOT NULL, stock INTEGER DEFAULT 0)")
+        cur.execute("INSERT INTO productos (id, nombre, stock) VALUES (10, 'Rosa', 50), (20, 'Helecho', 50), (30, 'Maceta', 50)")
+        cur.execute("""
+            CREATE TABLE detalle_pedido (
+                id SERIAL PRIMARY KEY,
+                pedido_id INTEGER NOT NULL,
+                producto_id INTEGER NOT NULL,
+                cantidad INTEGER NOT NULL,
+                precio_unitario INTEGER NOT NULL,
+                subtotal INTEGER NOT NULL
+            )
+        """)
+        cur.execute("INSERT INTO pedidos (id, destino, estado) VALUES (1, 'Luque', 'Pendiente'), (2, 'Itá', 'Pendiente'), (3, 'Limpio', 'Entregado')")
+        cur.execute("""
+            INSERT INTO detalle_pedido (pedido_id, producto_id, cantidad, precio_unitario, subtotal) VALUES
+            (1, 10, 2, 5000, 10000), (1, 20, 1, 30000, 30000), (1, 30, 4, 1000, 4000), (2, 10, 1, 5000, 5000)
+        """)
+        StockLedgerMigration().up(conn)
+        OrderVersionMigration().up(conn)
+        conn.commit()
+    db.schema.refresh()
+    yield
+
+
+def detalle():
+    filas = db.execute_query(
+        "SELECT id, producto_id, cantidad, precio_unitario, subtotal FROM detalle_pedido WHERE pedido_id = 1 ORDER BY producto_id"
+    )
+    return [tuple(f) for f in filas]
+
+
+def estados():
+    return {f[0]: (f[1], f[2]) for f in db.execute_query("SELECT id, estado, version FROM pedidos")}
+
+
+class ContadorCursor:
+    """Cursor que cuenta las sentencias de escritura"""
+
+    def __init__(self, cur):
+        self.cur = cur
+        self.escrituras = []
+
+    def execute(self, consulta, params=None):
+        if not consulta.lstrip().upper().startswith("SELECT"):
+            self.escrituras.append(consulta.split()[0].upper())
+        return self.cur.execute(consulta, params)
+
+    def __getattr__(self, nombre):
+        return getattr(self.cur, nombre)
+
+
+class TestDiferencias:
+    """Tests del cálculo de altas, cambios y bajas"""
+
+    def test_diferencias_detalle(self):
+        actuales = [(1, 10, 2, 5000, 10000), (2, 20, 1, 30000, 30000), (3, 30, 4, 1000, 4000), (4, 10, 1, 5000, 5000)]
+        editadas = [(10, 3, 5000), (30, 4, 1000), (40, 1, 2500), (40, 1, 2500)]
+        assert pedidos_service.diferencias_detalle(actuales, editadas) == {
+            "altas": [(40, 2, 2500, 5000)],
+            "cambios": [(1, 3, 5000, 15000)],
+            "bajas": [2, 4],  # quitado y fila repetida
+        }
+
+    def test_sin_cambios(self):
+        actuales = [(1, 10, 2, 5000, 10000)]
+        assert pedidos_service.diferencias_detalle(actuales, [(10, 2, 5000)]) == {"altas": [], "cambios": [], "bajas": []}
+
+    def test_linea_invalida(self):
+        with pytest.raises(ValueError):
+            pedidos_service.diferencias_detalle([], [(10, 0, 5000)])
+
+
+class TestGuardarDetalle:
+    """Tests de la grabación en la base"""
+
+    def test_una_sentencia_por_tipo_y_conserva_ids(self, pedidos_db):
+        ids_antes = {f[1]: f[0] for f in detalle()}
+        with db.get_connection() as conn:
+            cur = ContadorCursor(conn.cursor())
+            resultado = pedidos_service.guardar_detalle(cur, 1, [(10, 2, 5000), (20, 3, 28000), (50, 1, 7000), (60, 2, 100)])
+            conn.commit()
+
+        assert resultado == {"altas": 2, "cambios": 1, "bajas": 1}
+        assert cur.escrituras == ["DELETE", "UPDATE", "INSERT"]
+        filas = detalle()
+        assert [f[1:] for f in filas] == [
+            (10, 2, 5000, 10000), (20, 3, 28000, 84000), (50, 1, 7000, 7000), (60, 2, 100, 200)
+        ]
+        # Las líneas que siguen en el pedido mantienen su fila
+        assert filas[0][0] == ids_antes[10] and filas[1][0] == ids_antes[20]
+
+    def test_sin_cambios_no_escribe(self, pedidos_db):
+        with db.get_connection() as conn:
+            cur = ContadorCursor(conn.cursor())
+            pedidos_service.guardar_detalle(cur, 1, [(10, 2, 5000), (20, 1, 30000), (30, 4, 1000)])
+            conn.commit()
+        assert cur.escrituras == []
+
+
+class TestVersion:
+    """Tests del control de concurrencia optimista"""
+
+    def test_segundo_usuario_no_pisa_al_primero(self, pedidos_db):
+        assert pedidos_service.usa_version()
+        version = db.execute_query("SELECT version FROM pedidos WHERE id = 1", fetch="one")[0]
+
+        # Ambos abrieron el pedido en la misma versión; el primero guarda
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            nueva = pedidos_service.actualizar_pedido(cur, 1, version, {"destino": "Areguá"})
+            conn.commit()
+        assert nueva == version + 1
+
+        with pytest.raises(pedidos_service.PedidoModificadoError):
+            with db.get_connection() as conn:
+                cur = conn.cursor()
+                pedidos_service.guardar_detalle(cur, 1, [(10, 1, 5000)])
+                pedidos_service.actualizar_pedido(cur, 1, version, {"destino": "Itá"})
+                conn.commit()
+
+        # Nada del segundo usuario quedó grabado
+        assert db.execute_query("SELECT destino, version FROM pedidos WHERE id = 1", fetch="one")[0] == "Areguá"
+        assert len(detalle()) == 3
+
+    def test_pedido_eliminado(self, pedidos_db):
+        with pytest.raises(pedidos_service.PedidoModificadoError):
+            with db.get_connection() as conn:
+                pedidos_service.actualizar_pedido(conn.cursor(), 99, 1, {"destino": "Itá"})
+
+    def test_sin_columna_version(self, pedidos_db, monkeypatch):
+        monkeypatch.setattr(pedidos_service, "usa_version", lambda: False)
+        with db.get_connection() as conn:
+            assert pedidos_service.actualizar_pedido(conn.cursor(), 1, None, {"estado": "Entregado"}) is None
+            conn.commit()
+        assert db.execute_query("SELECT estado FROM pedidos WHERE id = 1", fetch="one")[0] == "Entregado"
+
+
+class TestOperacionesPorLote:
+    """Tests de entregar, reprogramar, cancelar y eliminar varios pedidos"""
+
+    def test_marcar_entregados(self, pedidos_db):
+        assert pedidos_service.marcar_entregados([2, 1, 3, 99, 1]) == {"procesados": [1, 2], "omitidos": [3, 99]}
+        assert estados() == {1: ("Entregado", 2), 2: ("Entregado", 2), 3: ("Entregado", 1)}
+        stock = {f[0]: f[1] for f in db.execute_query("SELECT id, stock FROM productos")}
+        assert stock == {10: 47, 20: 49, 30: 46}
+        assert inventario.diferencias() == []
+
+    def test_reprogramar(self, pedidos_db):
+        assert pedidos_service.reprogramar([1, 3], "2025-04-10")["procesados"] == [1]
+        fechas = {f[0]: f[1] for f in db.execute_query("SELECT id, fecha_entrega FROM pedidos")}
+        assert str(fechas[1])[:10] == "2025-04-10" and fechas[3] is None
+        with pytest.raises(ValueError):
+            pedidos_service.reprogramar([1], "mañana")
+
+    def test_cancelar_no_toca_entregados(self, pedidos_db):
+        assert pedidos_service.cancelar([1, 3]) == {"procesados": [1], "omitidos": [3]}
+        assert estados()[1] == ("Cancelado", 2) and estados()[3] == ("Entregado", 1)
+        # Un cancelado ya no se entrega
+        assert pedidos_service.marcar_entregados([1])["omitidos"] == [1]
+
+    def test_eliminar(self, pedidos_db):
+        assert pedidos_service.eliminar([1, 3, 99]) == {"procesados": [1, 3], "omitidos": [99]}
+        assert list(estados()) == [2]
+        assert db.execute_query("SELECT COUNT(*) FROM detalle_pedido WHERE pedido_id = 1", fetch="one")[0] == 0
+
+    def test_falla_a_mitad_revierte_todo(self, pedidos_db, monkeypatch):
+        def falla(*args, **kwargs):
+            raise RuntimeError("corte de conexión")
+        monkeypatch.setattr(inventario, "registrar_pedidos", falla)
+        with pytest.raises(RuntimeError):
+            pedidos_service.marcar_entregados([1, 2])
+        assert estados()[1] == ("Pendiente", 1)
+
+    def test_lista_vacia(self, pedidos_db):
+        assert pedidos_service.cancelar([]) == {"procesados": [], "omitidos": []}
@@ -0,0 +1,111 @@
+"""
+Tests para ajustes masivos de precios (precios_service.py y migración 4)
+"""
+import pytest
+from modules.db_service import db
+from modules.migrations_new import PriceAdjustmentsMigration
+from modules import precios_service as precios
+
+
+@pytest.fixture
+def catalogo(db_temporal):
+    """Productos y proveedores de prueba con la migración 4 aplicada"""
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE proveedores (id SERIAL PRIMARY KEY, nombre TEXT NOT NULL)")
+        cur.execute("""
+            CREATE TABLE productos (
+                id SERIAL PRIMARY KEY,
+                nombre TEXT NOT NULL UNIQUE,
+                categoria TEXT,
+                precio_compra INTEGER DEFAULT 0,
+                precio_venta INTEGER DEFAULT 0,
+                fecha_actualizacion TIMESTAMP
+            )
+        """)
+        PriceAdjustmentsMigration().up(conn)
+        cur.execute("INSERT INTO proveedores (id, nombre) VALUES (1, 'Agro'), (2, 'Macetas SA')")
+        conn.commit()
+    db.schema.refresh()
+
+    db.bulk_load("productos", ["id", "nombre", "categoria", "precio_compra", "precio_venta", "proveedor_id"], [
+        (1, "Rosa", "Flores", 8000, 12000, 1),
+        (2, "Tulipán", "Flores", 10000, 12340, 1),
+        (3, "Maceta 20cm", "Macetas", 15000, 16000, 2),
+        (4, "Helecho", "Plantas", 0, 25000, None),
+    ])
+    yield
+
+
+def precios_actuales():
+    return {f[0]: f[1] for f in db.execute_query("SELECT nombre, precio_venta FROM productos")}
+
+
+class TestRegla:
+    """Tests de validación de reglas (sin base de datos)"""
+
+    def test_regla_valida(self):
+        regla = precios.regla_ajuste("porcentaje", 7.5, categoria="Flores", redondeo=500)
+        assert regla["valor"] == 7.5 and regla["categoria"] == "Flores" and regla["redondeo"] == 500
+
+    @pytest.mark.parametrize("argumentos", [
+        {"tipo": "descuento", "valor": 5},
+        {"tipo": "porcentaje", "valor": -100},
+        {"tipo": "porcentaje", "valor": 5, "redondeo": 300},
+        {"tipo": "porcentaje", "valor": 5, "modo_redondeo": "bancario"},
+    ])
+    def test_regla_invalida(self, argumentos):
+        with pytest.raises(ValueError):
+            precios.regla_ajuste(**argumentos)
+
+
+class TestAjustes:
+    """Tests de vista previa, aplicación y reversión contra la base configurada"""
+
+    def test_porcentaje_con_redondeo(self, catalogo):
+        regla = precios.regla_ajuste("porcentaje", 10, redondeo=500, modo_redondeo="cercano")
+        vista = precios.previsualizar_ajuste(regla)
+        assert vista["productos"] == 4
+        assert precios_actuales()["Rosa"] == 12000  # la vista previa no modifica
+
+        assert precios.aplicar_ajuste(regla)["productos"] == 4
+        # 13200 -> 13000, 13574 -> 13500, 17600 -> 17500, 27500
+        assert precios_actuales() == {"Rosa": 13000, "Tulipán": 13500, "Maceta 20cm": 17500, "Helecho": 27500}
+
+    def test_modos_de_redondeo(self, catalogo):
+        for modo, esperado in (("arriba", 14000), ("abajo", 13000)):
+            regla = precios.regla_ajuste("porcentaje", 10, categoria="Flores", redondeo=1000, modo_redondeo=modo)
+            assert precios.previsualizar_ajuste(regla)["ejemplos"][0] == {
+                "id": 1, "nombre": "Rosa", "antes": 12000, "despues": esperado
+            }
+
+    def test_filtros_y_monto(self, catalogo):
+        precios.aplicar_ajuste(precios.regla_ajuste("monto", 1000, proveedor_id=1, redondeo=1))
+        assert precios_actuales() == {"Rosa": 13000, "Tulipán": 13340, "Maceta 20cm": 16000, "Helecho": 25000}
+
+    def test_margen_minimo(self, catalogo):
+        # Margen actual: Rosa 50%, Tulipán 23.4%, Maceta 6.7%; Helecho sin costo no se toca
+        regla = precios.regla_ajuste("margen", 30, margen_menor_a=30, redondeo=100)
+        assert precios.aplicar_ajuste(regla)["productos"] == 2
+        assert precios_actuales() == {"Rosa": 12000, "Tulipán": 13000, "Maceta 20cm": 19500, "Helecho": 25000}
+
+    def test_sin_cambios_no_se_registran(self, catalogo):
+        regla = precios.regla_ajuste("porcentaje", 0.01, redondeo=1000)
+        assert precios.previsualizar_ajuste(regla)["productos"] == 1  # solo Tulipán (12340 -> 12000)
+
+    def test_revertir_respeta_ediciones_posteriores(self, catalogo):
+        ajuste = precios.aplicar_ajuste(precios.regla_ajuste("porcentaje", 20, categoria="Flores"))
+        db.execute_command("UPDATE productos SET precio_venta = 99000 WHERE nombre = 'Rosa'")
+
+        assert precios.revertir_ajuste(ajuste["ajuste_id"]) == {"revertidos": 1, "conservados": 1}
+        assert precios_actuales()["Tulipán"] == 12340
+        assert precios_actuales()["Rosa"] == 99000
+        assert precios.listar_ajustes()[0]["revertido"] is True
+        with pytest.raises(ValueError):
+            precios.revertir_ajuste(ajuste["ajuste_id"])
+
+    def test_invalida_catalogo_del_punto_de_venta(self, catalogo):
+        consulta = "SELECT precio_venta FROM productos WHERE nombre = 'Rosa'"
+        assert db.cached_query(consulta, tags=["productos"])[0][0] == 12000
+        precios.aplicar_ajuste(precios.regla_ajuste("porcentaje", 50, redondeo=1))
+        assert db.cached_query(consulta, tags=["productos"])[0][0] == 18000
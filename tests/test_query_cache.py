@@ -0,0 +1,127 @@
+"""
+Tests para la caché de resultados (query_cache.py y db.cached_query)
+"""
+import time
+import pytest
+from modules.db_service import db
+from modules.query_cache import QueryCache
+
+
+class TestQueryCache:
+    """Tests para el LRU con invalidación por tags"""
+
+    def test_hit_y_copia(self):
+        cache = QueryCache(max_entries=10, max_bytes=10**6, ttl=60)
+        cache.put(("q", ()), [(1, "a")], frozenset({"t"}))
+        filas = cache.get(("q", ()))
+        assert filas == [(1, "a")]
+        filas.append((2, "b"))
+        assert cache.get(("q", ())) == [(1, "a")]
+
+    def test_lru_por_entradas(self):
+        cache = QueryCache(max_entries=2, max_bytes=10**6, ttl=60)
+        cache.put(("a", ()), [(1,)], frozenset())
+        cache.put(("b", ()), [(2,)], frozenset())
+        cache.get(("a", ()))
+        cache.put(("c", ()), [(3,)], frozenset())
+        assert cache.get(("b", ())) is None
+        assert cache.get(("a", ())) == [(1,)]
+
+    def test_limite_de_memoria(self):
+        cache = QueryCache(max_entries=100, max_bytes=2000, ttl=60)
+        cache.put(("grande", ()), [("x" * 5000,)], frozenset())
+        assert cache.get(("grande", ())) is None
+        assert cache.stats()["bytes"] == 0
+
+    def test_ttl(self):
+        cache = QueryCache(max_entries=10, max_bytes=10**6, ttl=0.01)
+        cache.put(("q", ()), [(1,)], frozenset())
+        time.sleep(0.02)
+        assert cache.get(("q", ())) is None
+
+    def test_invalidacion_por_tag(self):
+        cache = QueryCache(max_entries=10, max_bytes=10**6, ttl=60)
+        cache.put(("c", ()), [(1,)], frozenset({"clientes"}))
+        cache.put(("p", ()), [(1,)], frozenset({"productos"}))
+        cache.invalidate(["clientes"])
+        assert cache.get(("c", ())) is None
+        assert cache.get(("p", ())) == [(1,)]
+
+    def test_generacion_descarta_resultado_viejo(self):
+        cache = QueryCache(max_entries=10, max_bytes=10**6, ttl=60)
+        generacion = cache.generacion(["clientes"])
+        cache.invalidate(["clientes"])  # Escritura concurrente
+        cache.put(("c", ()), [(1,)], frozenset({"clientes"}), generacion=generacion)
+        assert cache.get(("c", ())) is None
+
+    def test_suscripcion_a_invalidaciones(self):
+        cache = QueryCache(max_entries=10, max_bytes=10**6, ttl=60)
+        avisos = []
+        cancelar = cache.subscribe("productos", avisos.append)
+        cache.subscribe("productos", lambda tag: 1 / 0)  # un oyente que falla no afecta al resto
+        cache.invalidate(["clientes", "productos"])
+        assert avisos == ["productos"]
+        cancelar()
+        cache.invalidate(["productos"])
+        assert avisos == ["productos"]
+
+
+class TestCachedQueryDB:
+    """Tests de integración con DatabaseService"""
+
+    @pytest.fixture
+    def tabla(self):
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("CREATE TABLE IF NOT EXISTS test_cache (id SERIAL PRIMARY KEY, nombre TEXT)")
+            cur.execute("DELETE FROM test_cache")
+            conn.commit()
+        db.invalidate_cache()
+        yield
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("DROP TABLE IF EXISTS test_cache")
+            conn.commit()
+
+    def _contar(self):
+        return db.cached_query("SELECT COUNT(*) FROM test_cache")[0][0]
+
+    def test_execute_command_invalida(self, tabla):
+        assert self._contar() == 0
+        hits = db.cache.stats()["hits"]
+        assert self._contar() == 0
+        assert db.cache.stats()["hits"] == hits + 1
+
+        db.execute_command("INSERT INTO test_cache (nombre) VALUES (%s)", ("a",))
+        assert self._contar() == 1
+
+    def test_transaccion_invalida_solo_al_confirmar(self, tabla):
+        assert self._contar() == 0
+
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("INSERT INTO test_cache (nombre) VALUES (%s)", ("a",))
+            conn.rollback()
+        assert self._contar() == 0
+
+        with db.transaction() as conn:
+            cur = conn.cursor()
+            cur.execute("UPDATE test_cache SET nombre = 'b'")
+            cur.execute("INSERT INTO test_cache (nombre) VALUES (%s)", ("c",))
+        assert self._contar() == 1
+
+    @pytest.mark.parametrize("forma", ["rollback", "error", "sin_commit"])
+    def test_lectura_dentro_de_transaccion_revertida(self, tabla, forma):
+        """Lo cacheado dentro de una transacción que se revierte no sobrevive"""
+        try:
+            with db.get_connection() as conn:
+                conn.cursor().execute("INSERT INTO test_cache (nombre) VALUES (%s)", ("a",))
+                # En SQLite la lectura anidada comparte la conexión y ve la fila sin confirmar
+                self._contar()
+                if forma == "rollback":
+                    conn.rollback()
+                elif forma == "error":
+                    raise RuntimeError("falla")
+        except RuntimeError:
+            pass
+        assert self._contar() == 0
@@ -0,0 +1,110 @@
+"""
+Tests para la instrumentación de consultas (query_metrics.py)
+"""
+import pytest
+from modules.db_service import db
+from modules.query_metrics import metrics, fingerprint
+
+
+@pytest.fixture
+def metricas_limpias():
+    """Métricas activas y vacías; restaura la configuración al terminar"""
+    estado = (metrics.enabled, metrics.slow_threshold_ms, metrics.slow_sample_rate)
+    metrics.enabled = True
+    metrics.reset()
+    yield metrics
+    metrics.enabled, metrics.slow_threshold_ms, metrics.slow_sample_rate = estado
+    metrics.reset()
+
+
+class TestFingerprint:
+    """Tests para la normalización de consultas"""
+
+    def test_literales_y_parametros(self):
+        assert fingerprint("SELECT * FROM ventas WHERE id = 5") == "SELECT * FROM ventas WHERE id = ?"
+        assert fingerprint("SELECT * FROM ventas WHERE id = %s") == "SELECT * FROM ventas WHERE id = ?"
+        assert fingerprint("SELECT * FROM clientes WHERE nombre = 'Ana'") == "SELECT * FROM clientes WHERE nombre = ?"
+
+    def test_espacios_y_listas(self):
+        a = fingerprint("SELECT id\n   FROM pedidos WHERE id IN (1, 2, 3)")
+        b = fingerprint("SELECT id FROM pedidos WHERE id IN (%s,%s)")
+        assert a == b == "SELECT id FROM pedidos WHERE id IN (?...)"
+
+    def test_identificadores_con_digitos(self):
+        assert fingerprint("SELECT col1 FROM tabla2") == "SELECT col1 FROM tabla2"
+
+
+class TestQueryMetrics:
+    """Tests para el acumulador de métricas"""
+
+    def test_registro_y_snapshot(self, metricas_limpias):
+        huella = metrics.record("SELECT 1 WHERE x = 10", 3.0, "modulo.a")
+        metrics.record("SELECT 1 WHERE x = 20", 7.0, "modulo.b")
+        metrics.add_rows(huella, 4)
+
+        datos = metrics.snapshot()["queries"][huella]
+        assert datos["count"] == 2
+        assert datos["total_ms"] == 10.0
+        assert datos["max_ms"] == 7.0
+        assert datos["rows"] == 4
+        assert datos["callers"] == {"modulo.a": 1, "modulo.b": 1}
+        assert sum(datos["histogram"].values()) == 2
+
+    def test_log_consultas_lentas(self, metricas_limpias):
+        metrics.slow_threshold_ms = 100
+        metrics.slow_sample_rate = 1.0
+        metrics.record("SELECT rapido", 5.0, "m")
+        metrics.record("SELECT lento", 150.0, "m", (1, 2))
+
+        lentas = metrics.slow_queries()
+        assert len(lentas) == 1
+        assert lentas[0]["sql"] == "SELECT lento"
+        assert lentas[0]["params"] == "(1, 2)"
+
+    def test_muestreo_cero_no_registra(self, metricas_limpias):
+        metrics.slow_threshold_ms = 0
+        metrics.slow_sample_rate = 0.0
+        metrics.record("SELECT lento", 500.0, "m")
+        assert metrics.slow_queries() == []
+
+    def test_reset(self, metricas_limpias):
+        metrics.record("SELECT 1", 1.0, "m")
+        metrics.reset()
+        assert metrics.snapshot()["queries"] == {}
+
+
+class TestInstrumentacionDB:
+    """Tests de la integración con DatabaseService"""
+
+    def test_execute_query_registra_llamador_y_filas(self, metricas_limpias):
+        db.execute_query("SELECT 1 AS a UNION ALL SELECT 2", fetch="all")
+
+        consultas = metrics.snapshot()["queries"]
+        datos = consultas[fingerprint("SELECT 1 AS a UNION ALL SELECT 2")]
+        assert datos["count"] == 1
+        assert datos["rows"] == 2
+        assert datos["callers"] == {__name__: 1}
+
+    def test_cursor_crudo_instrumentado(self, metricas_limpias):
+        with db.get_connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT 42")
+            assert cur.fetchone()[0] == 42
+
+        assert metrics.snapshot()["queries"][fingerprint("SELECT 42")]["rows"] == 1
+
+    def test_desactivado_no_registra(self, metricas_limpias):
+        metrics.enabled = False
+        db.execute_query("SELECT 7", fetch="one")
+        assert metrics.snapshot()["queries"] == {}
+
+    @pytest.mark.skipif(db.db_type != "postgresql", reason="Requiere PostgreSQL")
+    def test_desactivado_entrega_conexion_real(self, metricas_limpias):
+        """Sin métricas ni caché no hay envoltorio"""
+        metrics.enabled = False
+        db.cache.enabled = False
+        try:
+            with db.get_connection() as conn:
+                assert not hasattr(conn, "raw")
+        finally:
+            db.cache.enabled = True
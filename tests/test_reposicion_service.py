@@ -0,0 +1,128 @@
+"""
+Tests para alertas de reposición (reposicion_service.py y migración 6)
+"""
+import threading
+import pytest
+from datetime import datetime, timedelta
+from modules.db_service import db
+from modules.migrations_new import StockLedgerMigration, ReorderIndexesMigration
+from modules import inventario_service as inventario
+from modules import reposicion_service as reposicion
+
+
+@pytest.fixture
+def stock(db_temporal, monkeypatch):
+    """Productos con stock y mínimo, kardex y la migración 6 aplicada"""
+    monkeypatch.setattr(reposicion, "_alertados", None)
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("""
+            CREATE TABLE productos (
+                id SERIAL PRIMARY KEY,
+                nombre TEXT NOT NULL,
+                stock INTEGER DEFAULT 0,
+                stock_minimo INTEGER
+            )
+        """)
+        cur.execute("CREATE TABLE detalle_pedido (id SERIAL PRIMARY KEY, pedido_id INTEGER, producto_id INTEGER, cantidad INTEGER)")
+        cur.execute("""
+            INSERT INTO productos (id, nombre, stock, stock_minimo) VALUES
+            (1, 'Rosa', 40, 10), (2, 'Helecho', 3, 10), (3, 'Maceta', 0, NULL), (4, 'Cactus', 6, NULL)
+        """)
+        StockLedgerMigration().up(conn)
+        ReorderIndexesMigration().up(conn)
+        conn.commit()
+    db.schema.refresh()
+    yield
+
+
+def vender(movimientos, dias_atras=0):
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("SELECT COALESCE(MAX(id), 0) FROM movimientos_stock")
+        desde = cur.fetchone()[0]
+        inventario.registrar_movimientos(cur, movimientos, "venta")
+        if dias_atras:
+            cur.execute("UPDATE movimientos_stock SET fecha = %s WHERE id > %s",
+                        (datetime.now() - timedelta(days=dias_atras), desde))
+        conn.commit()
+
+
+class TestEstado:
+    """Tests de clasificación (sin base de datos)"""
+
+    @pytest.mark.parametrize("stock,minimo,esperado", [
+        (0, 10, "AGOTADO"), (5, 10, "CRÍTICO"), (6, 10, "BAJO"), (10, 10, "BAJO"), (11, 10, "OK"),
+    ])
+    def test_estado_stock(self, stock, minimo, esperado):
+        assert reposicion.estado_stock(stock, minimo) == esperado
+
+
+class TestSugerencias:
+    """Tests del conjunto bajo mínimo y cantidades sugeridas"""
+
+    def test_bajo_minimo(self, stock):
+        assert [f[0] for f in reposicion.bajo_minimo()] == [3, 2]  # Cactus (6 > 5) no entra
+        assert [f[1] for f in reposicion.bajo_minimo("HELE")] == ["Helecho"]
+
+    def test_predicado_coincide_con_el_indice(self):
+        assert reposicion.PREDICADO_BAJO_MINIMO is ReorderIndexesMigration.PREDICADO
+
+    def test_usa_indice_parcial(self, stock):
+        predicado = reposicion.PREDICADO_BAJO_MINIMO.format(stock=inventario.columna_stock())
+        plan = db.execute_query(f"EXPLAIN QUERY PLAN SELECT id FROM productos WHERE {predicado}")
+        assert "idx_productos_bajo_minimo" in " ".join(str(f[-1]) for f in plan)
+
+    def test_sugerido_por_velocidad_de_venta(self, stock):
+        # Helecho: 42 unidades en 30 días = 1.4/día -> 14 días de cobertura = 20 (redondeo arriba)
+        db.execute_command("UPDATE productos SET stock = 45 WHERE id = 2")
+        vender([(2, -42)], dias_atras=3)
+        vender([(2, -50)], dias_atras=60)  # fuera de la ventana
+        db.execute_command("UPDATE productos SET stock = 3 WHERE id = 2")
+
+        sugerencias = {s["id"]: s for s in reposicion.sugerencias(dias=30, cobertura=14)}
+        assert sugerencias[2]["por_dia"] == 1.4
+        assert sugerencias[2]["sugerido"] == 10 + 20 - 3
+        # Maceta sin ventas: llevar al doble del mínimo por defecto
+        assert sugerencias[3] == {"id": 3, "nombre": "Maceta", "stock": 0, "stock_minimo": 5,
+                                  "estado": "AGOTADO", "por_dia": 0.0, "sugerido": 10}
+
+
+class TestAlertas:
+    """Tests de notificación al cruzar el mínimo"""
+
+    def test_revisar_informa_solo_los_nuevos(self, stock):
+        assert reposicion.revisar() == []  # primera revisión: estado base
+        vender([(1, -35), (4, -1)])
+        nuevos = reposicion.revisar()
+        assert [n["nombre"] for n in nuevos] == ["Rosa", "Cactus"]  # Cactus: 6 -> 5 (mínimo por defecto)
+        assert reposicion.revisar() == []
+
+    def test_suscriptor_recibe_alerta_tras_commit(self, stock):
+        recibido = threading.Event()
+        alertas = []
+
+        def callback(nuevos, total):
+            alertas.append(([n["id"] for n in nuevos], total))
+            recibido.set()
+
+        reposicion.revisar()  # estado base antes de suscribir
+        cancelar = reposicion.suscribir(callback)
+        try:
+            vender([(1, -31)])  # la escritura invalida 'productos' y despierta al hilo
+            assert recibido.wait(5)
+            assert alertas[-1] == ([1], 3)
+        finally:
+            cancelar()
+
+    def test_dashboard_encadena_el_on_close_de_la_pagina(self, monkeypatch):
+        from types import SimpleNamespace
+        from modules import dashboard
+        cerrados, cancelados = [], []
+        monkeypatch.setattr(dashboard, "cancelar_alertas", lambda page: cancelados.append(page))
+        page = SimpleNamespace(on_close=lambda e: cerrados.append(e))
+
+        dashboard._cancelar_alertas_al_cerrar(page)
+        dashboard._cancelar_alertas_al_cerrar(page)  # reabrir el dashboard no lo encadena dos veces
+        page.on_close("evento")
+        assert cerrados == ["evento"] and cancelados == [page]
@@ -0,0 +1,147 @@
+"""
+Tests para la optimización de rutas de entrega (rutas_service.py)
+"""
+import itertools
+import random
+import time
+import pytest
+from datetime import date, datetime, timedelta
+from modules import rutas_service as rutas
+from modules import geocodificacion_service as geo
+
+
+SALIDA = datetime(2025, 3, 3, 8, 0)
+ORIGEN = (-25.3397, -57.5088)
+
+
+@pytest.fixture(autouse=True)
+def cache_limpia():
+    rutas.limpiar_cache()
+    yield
+    rutas.limpiar_cache()
+
+
+def paradas_al_azar(n, semilla=7, limite=None):
+    azar = random.Random(semilla)
+    return [
+        {"id": i, "coordenadas": (-25.34 + azar.uniform(-0.15, 0.15), -57.5 + azar.uniform(-0.15, 0.15)), "limite": limite}
+        for i in range(1, n + 1)
+    ]
+
+
+def largo(orden, paradas, volver=False):
+    coords = {p["id"]: p["coordenadas"] for p in paradas}
+    puntos = [ORIGEN] + [coords[i] for i in orden] + ([ORIGEN] if volver else [])
+    return sum(rutas.distancia_km(a, b) for a, b in zip(puntos, puntos[1:]))
+
+
+class TestUbicaciones:
+    """Tests de coordenadas y fechas límite"""
+
+    def test_distancia_km(self):
+        # Asunción - San Lorenzo: unos 8 km en línea recta
+        assert 7 < rutas.distancia_km((-25.2637, -57.5759), (-25.3397, -57.5088)) < 12
+
+    @pytest.mark.parametrize("texto,esperado", [
+        ("-25.3001, -57.6202", (-25.3001, -57.6202)),
+        ("https://www.google.com/maps/@-25.28,-57.63,15z", (-25.28, -57.63)),
+        ("https://maps.google.com/?q=-25.3,-57.6", (-25.3, -57.6)),
+        ("Calle Palma 123", None),
+        ("", None),
+    ])
+    def test_coordenadas_de_texto(self, texto, esperado):
+        assert geo.coordenadas_de_texto(texto) == esperado
+
+    def test_ubicar_por_ciudad(self):
+        assert rutas.ubicar("  ñemby ", "Barrio Centro") == rutas.ubicar("Ñemby")
+        assert rutas.ubicar("Luque", "-25.1, -57.4") == (-25.1, -57.4)
+        assert rutas.ubicar("Ciudad inexistente", "sin datos") is None
+
+    def test_limite_entrega(self):
+        assert rutas.limite_entrega(date(2025, 3, 3)) == datetime(2025, 3, 3, 18, 0)
+        assert rutas.limite_entrega("2025-03-04") == datetime(2025, 3, 4, 18, 0)
+        assert rutas.limite_entrega("05/03/2025") == datetime(2025, 3, 5, 18, 0)
+        assert rutas.limite_entrega("mañana") is None
+
+
+class TestOptimizacion:
+    """Tests del orden de visita"""
+
+    def test_cerca_del_optimo_en_rutas_cortas(self):
+        diferencias = []
+        for semilla in range(10):
+            paradas = paradas_al_azar(7, semilla)
+            resultado = rutas.optimizar_ruta(paradas, origen=ORIGEN, salida=SALIDA)
+            optimo = min(largo(orden, paradas) for orden in itertools.permutations(range(1, 8)))
+            diferencias.append(largo(resultado["orden"], paradas) / optimo - 1)
+        assert max(diferencias) < 0.05
+        assert sum(d < 1e-9 for d in diferencias) >= 8  # casi siempre el óptimo exacto
+
+    def test_cincuenta_paradas_en_menos_de_un_segundo(self):
+        paradas = paradas_al_azar(50)
+        inicio = time.perf_counter()
+        resultado = rutas.optimizar_ruta(paradas, origen=ORIGEN, salida=SALIDA)
+        assert time.perf_counter() - inicio < 1.0
+        assert sorted(resultado["orden"]) == list(range(1, 51))
+        assert resultado["distancia_km"] < resultado["distancia_original_km"] / 2
+
+    def test_con_regreso_al_vivero(self):
+        paradas = paradas_al_azar(12)
+        resultado = rutas.optimizar_ruta(paradas, origen=ORIGEN, salida=SALIDA, volver=True)
+        assert resultado["distancia_km"] == pytest.approx(largo(resultado["orden"], paradas, volver=True) * 1.3, abs=0.1)
+
+    def test_pedido_urgente_se_entrega_a_tiempo(self):
+        # El urgente está lejos y sin límite quedaría al final
+        paradas = [{"id": i, "coordenadas": (-25.34 + 0.01 * i, -57.5), "limite": None} for i in range(1, 9)]
+        paradas.append({"id": 99, "coordenadas": (-25.34, -57.2), "limite": SALIDA + timedelta(hours=2)})
+        sin_limite = rutas.optimizar_ruta([dict(p, limite=None) for p in paradas], origen=ORIGEN, salida=SALIDA)
+        assert sin_limite["orden"][-1] == 99 or sin_limite["orden"][0] == 99
+
+        resultado = rutas.optimizar_ruta(paradas, origen=ORIGEN, salida=SALIDA)
+        assert resultado["orden"].index(99) < 3
+        assert resultado["tarde"] == []
+        assert resultado["llegadas"][99] <= SALIDA + timedelta(hours=2)
+
+    def test_paradas_sin_ubicacion_van_al_final(self):
+        paradas = paradas_al_azar(4) + [{"id": 50, "coordenadas": None, "limite": None}]
+        resultado = rutas.optimizar_ruta(paradas, origen=ORIGEN, salida=SALIDA)
+        assert resultado["orden"][-1] == 50 and resultado["sin_ubicacion"] == [50]
+        assert 50 not in resultado["llegadas"]
+
+    def test_cache_por_conjunto_de_paradas(self, monkeypatch):
+        paradas = paradas_al_azar(10)
+        primero = rutas.optimizar_ruta(paradas, origen=ORIGEN, salida=SALIDA)
+        primero["orden"].clear()  # el llamador no puede alterar la caché
+
+        monkeypatch.setattr(rutas, "_construir", lambda *a: pytest.fail("debía salir de la caché"))
+        segundo = rutas.optimizar_ruta(paradas, origen=ORIGEN, salida=SALIDA + timedelta(minutes=5))
+        assert len(segundo["orden"]) == 10
+
+    def test_cache_ignora_el_orden_de_las_paradas(self, monkeypatch):
+        paradas = paradas_al_azar(10)
+        primero = rutas.optimizar_ruta(paradas, origen=ORIGEN, salida=SALIDA)
+
+        monkeypatch.setattr(rutas, "_construir", lambda *a: pytest.fail("debía salir de la caché"))
+        segundo = rutas.optimizar_ruta(list(reversed(paradas)), origen=ORIGEN, salida=SALIDA)
+        assert segundo["orden"] == primero["orden"]
+        assert segundo["distancia_km"] == primero["distancia_km"]
+
+    def test_llegadas_desde_la_salida_real(self, monkeypatch):
+        """Con la caché, las llegadas se corren con la salida pedida, no la redondeada"""
+        paradas = paradas_al_azar(6, limite=SALIDA + timedelta(minutes=40))
+        primero = rutas.optimizar_ruta(paradas, origen=ORIGEN, salida=SALIDA)
+
+        monkeypatch.setattr(rutas, "_construir", lambda *a: pytest.fail("debía salir de la caché"))
+        segundo = rutas.optimizar_ruta(paradas, origen=ORIGEN, salida=SALIDA + timedelta(minutes=14))
+        for i, llegada in primero["llegadas"].items():
+            assert segundo["llegadas"][i] == llegada + timedelta(minutes=14)
+        assert segundo["tarde"] == [i for i in segundo["orden"] if segundo["llegadas"][i] > SALIDA + timedelta(minutes=40)]
+
+    def test_planificar_pedidos(self):
+        plan = rutas.planificar_pedidos([
+            (1, "Luque", "", None),
+            (2, "Lugar desconocido", "", "2025-03-03"),
+            (3, "Asunción", "-25.29, -57.60", "2025-03-03"),
+        ], salida=SALIDA)
+        assert sorted(plan["orden"][:2]) == [1, 3] and plan["orden"][2] == 2
+        assert plan["coordenadas"][3] == (-25.29, -57.60)
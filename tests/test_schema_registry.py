@@ -0,0 +1,50 @@
+"""
+Tests para el registro de metadatos del esquema (schema_registry.py)
+"""
+import pytest
+from modules.db_service import db
+
+
+@pytest.fixture
+def tabla():
+    """Tabla de prueba con columnas alternativas (tel en lugar de telefono)"""
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("CREATE TABLE IF NOT EXISTS test_schema (id SERIAL PRIMARY KEY, nombre TEXT, tel VARCHAR(20))")
+        conn.commit()
+    db.schema.refresh()
+    yield "test_schema"
+    with db.get_connection() as conn:
+        cur = conn.cursor()
+        cur.execute("DROP TABLE IF EXISTS test_schema")
+        conn.commit()
+    db.schema.refresh()
+
+
+class TestSchemaRegistry:
+    """Tests para consultas de columnas y SELECT precompilados"""
+
+    def test_columnas(self, tabla):
+        assert db.schema.has_table(tabla)
+        assert db.schema.has_column(tabla, "tel")
+        assert db.schema.has_column(tabla, "TEL")
+        assert not db.schema.has_column(tabla, "telefono")
+        assert "char" in db.schema.column_type(tabla, "tel")  # varchar(20) / character varying
+        assert db.schema.first_column(tabla, "telefono", "tel") == "tel"
+
+    def test_select_compilado(self, tabla):
+        sql = db.schema.select(tabla, [
+            ("id", ["id"]),
+            ("telefono", ["telefono", "tel"]),
+            ("ciudad", ["ciudad"]),
+        ], where="id = %s")
+        assert sql == "SELECT id, tel AS telefono, '' AS ciudad FROM test_schema WHERE id = %s"
+        assert db.execute_query(sql, (1,), fetch="one") is None
+
+    def test_select_memoizado(self, tabla):
+        campos = [("id", ["id"]), ("nombre", ["nombre"])]
+        assert db.schema.select(tabla, campos) is db.schema.select(tabla, campos)
+
+    def test_coalesce(self, tabla):
+        sql = db.schema.select(tabla, [("id", ["id"]), ("telefono", ["tel"])], coalesce=("telefono",))
+        assert sql == "SELECT id, COALESCE(tel, '') AS telefono FROM test_schema"
@@ -0,0 +1,92 @@
+"""
+Tests para la traducción de dialecto PostgreSQL -> SQLite (sql_dialect.py)
+"""
+import sqlite3
+import pytest
+from modules.sql_dialect import translate_to_sqlite as t
+
+
+class TestParametros:
+    """Tests para placeholders y porcentajes"""
+
+    def test_placeholders(self):
+        assert t("SELECT * FROM x WHERE a = %s AND b = %s") == "SELECT * FROM x WHERE a = ? AND b = ?"
+
+    def test_placeholders_con_nombre(self):
+        assert t("UPDATE x SET a = %(valor)s") == "UPDATE x SET a = :valor"
+
+    def test_porcentaje_escapado(self):
+        assert t("SELECT * FROM x WHERE a LIKE 'ab%%'") == "SELECT * FROM x WHERE a LIKE 'ab%'"
+
+    def test_literales_intactos(self):
+        sql = "SELECT 'usa %s y COALESCE' AS txt, \"SERIAL\" FROM x -- ILIKE %s"
+        assert t(sql) == sql
+
+
+class TestFunciones:
+    """Tests para palabras clave y funciones propias de PostgreSQL"""
+
+    def test_ilike(self):
+        assert t("WHERE nombre ILIKE %s") == "WHERE nombre LIKE ?"
+        assert t("WHERE nombre NOT ilike %s") == "WHERE nombre NOT LIKE ?"
+
+    def test_identificadores_no_se_tocan(self):
+        assert t("SELECT coalesce_total, serial_num FROM x") == "SELECT coalesce_total, serial_num FROM x"
+
+    def test_serial(self):
+        assert t("id SERIAL PRIMARY KEY, n SERIAL") == "id INTEGER PRIMARY KEY AUTOINCREMENT, n INTEGER"
+
+    def test_now_y_lastval(self):
+        assert t("SELECT NOW(), lastval()") == "SELECT CURRENT_TIMESTAMP, last_insert_rowid()"
+
+    def test_casts(self):
+        assert t("WHERE v.fecha::date = %s") == "WHERE DATE(v.fecha) = ?"
+        assert t("SELECT %s::int + 1") == "SELECT CAST(? AS INTEGER) + 1"
+        assert t("SELECT SUM(total)::numeric(10,2)") == "SELECT CAST(SUM(total) AS REAL)"
+
+
+class TestEjecucionSQLite:
+    """Las consultas traducidas se ejecutan en SQLite"""
+
+    @pytest.fixture
+    def conn(self):
+        conn = sqlite3.connect(":memory:")
+        conn.execute(t("CREATE TABLE clientes (id SERIAL PRIMARY KEY, nombre VARCHAR(100), ruc TEXT)"))
+        yield conn
+        conn.close()
+
+    def test_insert_returning_e_ilike(self, conn):
+        cur = conn.execute(t("INSERT INTO clientes (nombre) VALUES (%s) RETURNING id"), ("Ana López",))
+        assert cur.fetchone()[0] == 1
+        filas = conn.execute(t("SELECT nombre FROM clientes WHERE nombre ILIKE %s"), ("%ana%",)).fetchall()
+        assert filas == [("Ana López",)]
+
+    def test_information_schema(self, conn):
+        filas = conn.execute(t(
+            "SELECT column_name FROM information_schema.columns "
+            "WHERE table_name = 'clientes' ORDER BY ordinal_position"
+        )).fetchall()
+        assert [f[0] for f in filas] == ["id", "nombre", "ruc"]
+
+
+class TestTablas:
+    """Tests para la detección de tablas leídas y escritas"""
+
+    def test_tablas_modificadas(self):
+        from modules.sql_dialect import tablas_modificadas
+        assert tablas_modificadas("INSERT INTO ventas (a) VALUES (%s)") == {"ventas"}
+        assert tablas_modificadas("UPDATE public.productos SET stock = 1") == {"productos"}
+        assert tablas_modificadas("DELETE FROM \"Clientes\" WHERE id = 1") == {"clientes"}
+        assert tablas_modificadas(
+            "INSERT INTO stock (id) VALUES (1) ON CONFLICT (id) DO UPDATE SET id = 2"
+        ) == {"stock"}
+        assert tablas_modificadas("SELECT * FROM pedidos FOR UPDATE") == frozenset()
+        assert tablas_modificadas("INSERT OR IGNORE INTO productos (id) VALUES (1)") == {"productos"}
+        assert tablas_modificadas("INSERT OR REPLACE INTO productos (id) VALUES (1)") == {"productos"}
+        assert tablas_modificadas("insert or abort into ventas (id) values (1)") == {"ventas"}
+        assert tablas_modificadas("UPDATE OR IGNORE clientes SET nombre = 'a'") == {"clientes"}
+
+    def test_tablas_leidas(self):
+        from modules.sql_dialect import tablas_leidas
+        sql = "SELECT * FROM ventas v JOIN clientes c ON c.id = v.cliente_id WHERE x IN (SELECT id FROM usuarios)"
+        assert tablas_leidas(sql) == {"ventas", "clientes", "usuarios"}
@@ -10,6 +10,7 @@ from modules.utils import (
     validate_ruc,
     sanitize_string,
     normalize_phone,
+    normalizar_texto,
     calcular_subtotal,
     calcular_total_con_descuento,
     calcular_vuelto,
@@ -92,6 +93,11 @@ class TestSanitizacion:
         assert normalize_phone("0981123456") == "595981123456"
         assert normalize_phone("981123456") == "595981123456"
 
+    def test_normalizar_texto(self):
+        assert normalizar_texto("  Cedrón  Paraguay ") == "cedron paraguay"
+        assert normalizar_texto("ÑANDUTÍ") == "nanduti"
+        assert normalizar_texto(None) == ""
+
 
 class TestCalculos:
     """Tests para funciones de cálculo"""
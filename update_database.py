@@ -301,16 +301,19 @@ def verificar_y_actualizar_bd():
             
             fecha_actual = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
             
+            # Una sola consulta para los existentes; cada INSERT por separado
+            # para que un error de integridad omita solo esa fila
+            cur.execute("SELECT nombre FROM productos")
+            existentes = {fila[0] for fila in cur.fetchall()}
             for producto in productos_basicos:
+                if producto[0] in existentes:
+                    continue
                 try:
-                    # Verificar si ya existe
-                    cur.execute("SELECT id FROM productos WHERE nombre = ?", (producto[0],))
-                    if not cur.fetchone():
-                        cur.execute("""
-                            INSERT INTO productos (nombre, categoria, unidad_medida, precio_compra, precio_venta, stock, fecha_creacion, fecha_actualizacion)
-                            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                        """, (*producto, fecha_actual, fecha_actual))
-                        print(f"   ✅ Producto '{producto[0]}' agregado")
+                    cur.execute("""
+                        INSERT INTO productos (nombre, categoria, unidad_medida, precio_compra, precio_venta, stock, fecha_creacion, fecha_actualizacion)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                    """, (*producto, fecha_actual, fecha_actual))
+                    print(f"   ✅ Producto '{producto[0]}' agregado")
                 except sqlite3.IntegrityError as e:
                     print(f"   ⚠️ Producto '{producto[0]}' ya existe o error: {e}")
         